@@ -29,7 +29,18 @@ INPUT_ALLOCATION_DAYS = 1.0
 INPUT_MIN_FREIGHT = None
 INPUT_MAX_FREIGHT = None
 TOGGLE_PARETO = False
+# Pruning rule used with TOGGLE_PARETO, e.g. {"method": "nearest", "value": 5, "score": "cost"}; None keeps the 20% closest
+PRUNING = None
 TOGGLE_USE_RECEPTION = False
+MODEL_BACKEND = "pyomo"  # "pyomo", "sparse" (direct LP writer) or "network" (min-cost flow, no CBC); the last two for pure LP runs only
+# CBC settings, e.g. {"threads": 8, "rel_gap": 0.005}; None uses the defaults (all cores, zero gap, 600 s)
+SOLVER_SETTINGS = None
+# Solve the connected components of the route graph as separate models on a process pool
+DECOMPOSE = False
+# Also run each MILP instance with the kernel search and with plain CBC, both with the same time
+# limit, to compare the cost each reaches in equal wall time (needs the MILP options above)
+COMPARE_KERNEL_SEARCH = False
+KERNEL_BENCHMARK_SECONDS = 60
 
 # =============================================================================
 # DATA GENERATION CONFIGURATION
@@ -158,7 +169,7 @@ import sys
 sys.path.append(PROJECT_ROOT)
 
 from src.logic.osrm import OSRMClient
-from src.logic.optimization import run_optimization_model
+from src.logic.optimization import run_optimization_model, PHASE_LABELS
 
 def construct_df_compat(df_ofertas, df_armazens):
     """
@@ -258,6 +269,35 @@ def build_distance_matrix(df_ofertas, df_armazens):
 
     return df_dist, matrix_time
 
+def compare_kernel_search(model_args):
+    """
+    Runs the model with the kernel search and with plain CBC, each with KERNEL_BENCHMARK_SECONDS
+    of time limit, and returns the benchmark columns of both runs.
+    """
+    row = {}
+    for label, backend in (("Kernel Search", "kernel_search"), ("CBC", "pyomo")):
+        settings = dict(SOLVER_SETTINGS or {}, time_limit=KERNEL_BENCHMARK_SECONDS)
+        start = time.perf_counter()
+        _, results_dict = run_optimization_model(**model_args, backend=backend, solver_settings=settings)
+        wall_time = time.perf_counter() - start
+        kpis = results_dict.get("kpis", {})
+        model_stats = results_dict.get("model_stats", {})
+        print(f"  {label}: {results_dict.get('status')} | objective {results_dict.get('objective', 0.0):.2f} | "
+              f"gap {kpis.get('mip_gap')} | {wall_time:.2f}s")
+
+        row[f"{label} Status"] = results_dict.get("status")
+        row[f"{label} Objective"] = results_dict.get("objective")
+        row[f"{label} Gap (%)"] = kpis.get("mip_gap")
+        row[f"{label} Wall Time (seconds)"] = wall_time
+        if backend == "kernel_search":
+            # "complete" or "time_budget"; the gap is the one of the last restricted MILP
+            row["Kernel Search Outcome"] = model_stats.get("kernel_search")
+            row["Kernel Routes"] = model_stats.get("kernel_routes")
+
+    if row["Kernel Search Objective"] is not None and row["CBC Objective"] is not None:
+        row["Kernel Search Saving vs CBC (%)"] = 100.0 * (row["CBC Objective"] - row["Kernel Search Objective"]) / max(1.0, abs(row["CBC Objective"]))
+    return row
+
 def main():
     print("Starting Benchmark Execution...")
 
@@ -295,6 +335,7 @@ def main():
                 df_storage=df_storage,
                 detailed_log=False,
                 toggle_pareto=TOGGLE_PARETO,
+                pruning=PRUNING,
                 toggle_min_max_capacity=TOGGLE_MIN_MAX_CAPACITY,
                 input_min_load=INPUT_MIN_LOAD,
                 input_max_load=INPUT_MAX_LOAD,
@@ -302,7 +343,10 @@ def main():
                 input_allocation_days=INPUT_ALLOCATION_DAYS,
                 input_min_freight=INPUT_MIN_FREIGHT,
                 input_max_freight=INPUT_MAX_FREIGHT,
-                lang="pt"
+                lang="pt",
+                backend=MODEL_BACKEND,
+                solver_settings=SOLVER_SETTINGS,
+                decompose=DECOMPOSE
             )
 
             # Extract metrics
@@ -317,13 +361,44 @@ def main():
             print(f"Resolution Time: {execution_time:.2f}s")
             print(f"Optimal Value: {optimal_value:.2f}")
 
-            results.append({
+            timings = results_dict.get("timings", {})
+            model_stats = results_dict.get("model_stats", {})
+            print(f"Model Size: {model_stats.get('valid_routes')} valid routes | {model_stats.get('variables')} variables | "
+                  f"{model_stats.get('constraints')} constraints | {model_stats.get('nonzeros')} nonzeros")
+            for phase in PHASE_LABELS:
+                if phase in timings:
+                    print(f"  {phase}: {timings[phase]:.3f}s")
+
+            row = {
                 "Number of Supply Nodes": num_supply_nodes,
                 "Number of Demand Nodes": num_demand_nodes,
                 "Distance Matrix Time (seconds)": df_dist_time,
                 "Resolution Time (seconds)": execution_time,
-                "Optimal Value": optimal_value
-            })
+                "Optimal Value": optimal_value,
+                "Valid Routes": model_stats.get("valid_routes"),
+                "Variables": model_stats.get("variables"),
+                "Constraints": model_stats.get("constraints"),
+                "Nonzeros": model_stats.get("nonzeros"),
+                "Peak Python Memory (MB)": results_dict.get("kpis", {}).get("peak_rss_mb"),
+                "Peak Solver Memory (MB)": results_dict.get("kpis", {}).get("solver_peak_rss_mb"),
+                "Python CPU Time (seconds)": results_dict.get("kpis", {}).get("cpu_time"),
+                "Solver CPU Time (seconds)": results_dict.get("kpis", {}).get("solver_cpu_time"),
+            }
+            # One column per phase, so the benchmark shows where the time goes as the instances grow
+            for phase in PHASE_LABELS:
+                row[f"{phase} (seconds)"] = timings.get(phase)
+
+            if COMPARE_KERNEL_SEARCH:
+                print(f"Kernel search vs CBC, {KERNEL_BENCHMARK_SECONDS}s each:")
+                row.update(compare_kernel_search(dict(
+                    df_supply=df_supply.copy(), df_demand=df_demand.copy(), df_compat=df_compat, df_dist=df_dist,
+                    df_freight=df_freight, df_storage=df_storage, detailed_log=False, toggle_pareto=TOGGLE_PARETO,
+                    pruning=PRUNING, toggle_min_max_capacity=TOGGLE_MIN_MAX_CAPACITY, input_min_load=INPUT_MIN_LOAD,
+                    input_max_load=INPUT_MAX_LOAD, toggle_use_reception=TOGGLE_USE_RECEPTION,
+                    input_allocation_days=INPUT_ALLOCATION_DAYS, input_min_freight=INPUT_MIN_FREIGHT,
+                    input_max_freight=INPUT_MAX_FREIGHT, lang="pt", decompose=DECOMPOSE
+                )))
+            results.append(row)
 
         except Exception as e:
             print(f"Error during optimization run: {e}")
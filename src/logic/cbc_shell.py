@@ -0,0 +1,149 @@
+"""
+CBC runs of the Pyomo models with the solver subprocess owned by the run.
+
+Pyomo's shell solver captures the CBC output itself and can only echo it to sys.stdout, which is
+shared by every thread of the process: two runs of the web app solving at the same time would
+mix their logs, or write into a log already closed. Here the model is written with Pyomo's LP
+writer, CBC is run with its output on a pipe read by the calling thread (each line goes to the
+callback of that run, see resource_monitor.run_watched), and the CBC solution file is loaded back
+into the model variables.
+
+The command line is the one of the Pyomo CBC plugin (options, '-printingOptions all', '-import',
+'-mipstart', '-stat=1', '-solve', '-solu'), so the log reads the same; the solver status and
+termination condition are reported as a Pyomo SolverResults.
+"""
+import os
+import shutil
+import tempfile
+import time
+
+import pyomo.environ as pyo
+from pyomo.opt import SolverResults, SolverStatus, TerminationCondition
+
+from src.logic.resource_monitor import run_watched
+
+# Termination of a search stopped by a limit, by the third word of the CBC status line "Stopped on ..."
+STOPPED_TERMINATIONS = {
+    "time": TerminationCondition.maxTimeLimit,
+    "iterations": TerminationCondition.maxIterations,
+    "nodes": TerminationCondition.maxEvaluations,
+    "solutions": TerminationCondition.maxEvaluations,
+}
+
+def command_line(executable, options, lp_path, soln_path, mipstart_path=None):
+    """The CBC command line for the LP file, with options (name -> value) first."""
+    cmd = [executable]
+    for name, val in options.items():
+        cmd.extend(['-' + name, str(val)])
+    cmd.extend(['-printingOptions', 'all', '-import', lp_path])
+    if mipstart_path is not None:
+        cmd.extend(['-mipstart', mipstart_path])
+    cmd.extend(['-stat=1', '-solve', '-solu', soln_path])
+    return cmd
+
+def write_mipstart(model, symbol_map, path):
+    """
+    Writes the current values of the integer variables as a CBC mipstart file. CBC only reads the
+    nonzero integer values and ignores the column indexes.
+    """
+    by_object = symbol_map.byObject
+    with open(path, 'w') as f:
+        column = 0
+        for var in model.component_data_objects(pyo.Var):
+            if var.value and (var.is_integer() or var.is_binary()) and id(var) in by_object:
+                f.write(f"{column} {by_object[id(var)]} {var.value}\n")
+                column += 1
+
+def load_solution(model, symbol_map, path):
+    """
+    Reads a CBC solution file written with '-printingOptions all' and sets the variables of the
+    model from it. Returns the SolverResults with the status and termination condition.
+    """
+    results = SolverResults()
+    if not os.path.exists(path):
+        results.solver.status = SolverStatus.error
+        results.solver.termination_condition = TerminationCondition.error
+        return results
+
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        words = f.readline().split()
+        first = words[0] if words else ""
+        if first == "Optimal":
+            results.solver.status = SolverStatus.ok
+            results.solver.termination_condition = TerminationCondition.optimal
+        elif first in ("Infeasible", "PrimalInfeasible") or words[:2] == ["Integer", "infeasible"]:
+            results.solver.status = SolverStatus.warning
+            results.solver.termination_condition = TerminationCondition.infeasible
+            return results
+        elif first == "Unbounded" or words[:2] == ["Dual", "infeasible"]:
+            results.solver.status = SolverStatus.warning
+            results.solver.termination_condition = TerminationCondition.unbounded
+            return results
+        elif words[:2] == ["Stopped", "on"]:
+            # The values are the incumbent, if the search found one
+            results.solver.status = SolverStatus.aborted
+            results.solver.termination_condition = STOPPED_TERMINATIONS.get(
+                words[2] if len(words) > 2 else "", TerminationCondition.other)
+        else:
+            results.solver.status = SolverStatus.error
+            results.solver.termination_condition = TerminationCondition.error
+            return results
+
+        by_symbol = symbol_map.bySymbol
+        for line in f:
+            parts = line.split()
+            # Lines look like: "<index> <name> <value> <reduced cost or dual>", optionally prefixed by '**'
+            if parts and parts[0] == "**":
+                parts = parts[1:]
+            if len(parts) < 3:
+                continue
+            obj = by_symbol.get(parts[1])
+            # Rows come first, with the same layout
+            if obj is None or obj.ctype is not pyo.Var:
+                continue
+            obj.set_value(float(parts[2]), skip_validation=True)
+    return results
+
+def solve(model, executable, options, on_line=None, warmstart=False):
+    """
+    Solves a Pyomo model with CBC. on_line(line) gets each line of the CBC output as it arrives;
+    with warmstart, the current values of the integer variables are passed to CBC as its initial
+    solution. Raises RuntimeError if the executable is missing.
+
+    Returns:
+        (results, timings): the SolverResults (the variables are loaded when a solution exists)
+        and the seconds spent writing the LP file, in CBC and loading the solution ('lp_write',
+        'solver', 'solution_load').
+    """
+    if not executable or not os.path.exists(executable):
+        raise RuntimeError("CBC executable not found in PATH.")
+
+    work_dir = tempfile.mkdtemp(prefix='granum_cbc_')
+    lp_path = os.path.join(work_dir, 'model.lp')
+    soln_path = os.path.join(work_dir, 'model.soln')
+    mipstart_path = os.path.join(work_dir, 'model.mipstart') if warmstart else None
+
+    timings = {}
+    smap_id = None
+    try:
+        start = time.perf_counter()
+        _, smap_id = model.write(lp_path, io_options={"symbolic_solver_labels": False})
+        symbol_map = model.solutions.symbol_map[smap_id]
+        if warmstart:
+            write_mipstart(model, symbol_map, mipstart_path)
+        timings["lp_write"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        run_watched(command_line(executable, options, lp_path, soln_path, mipstart_path), on_line=on_line)
+        timings["solver"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = load_solution(model, symbol_map, soln_path)
+        timings["solution_load"] = time.perf_counter() - start
+        return results, timings
+
+    finally:
+        if smap_id is not None:
+            # Session models are solved many times: drop the names of this run
+            del model.solutions.symbol_map[smap_id]
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,132 @@
+"""
+Multi-level coarsening of the warehouses for national-scale LP solves.
+
+Warehouses of the same municipality, of the same type and with the same storage tariffs accept the
+same products at the same tariffs and are a few kilometers apart, so they compete for the same
+supply. The LP is solved in two levels:
+
+1. coarsen: each group of such warehouses becomes one super-node with their summed effective
+   capacity; the super-node has a route from an origin for a product when any member has one, at
+   the distance of the closest member;
+2. refine: the inflow of each super-node, per (origin, product), is split among its members by a
+   small local transportation LP with their own capacities and route costs.
+
+Any allocation of the whole model maps to the coarse model at a cost not higher (same tariffs, no
+longer distances, capacities summed), so the optimum of the coarse model is a lower bound of the
+whole model, and the refined allocation is feasible for it: the optimality gap of the result is
+(refined cost - coarse optimum) / refined cost.
+"""
+
+# Storage tariff of routes without a tariff, as in the model objective
+DEFAULT_STORAGE_COST = 50.0
+
+def warehouse_clusters(destinations_list, municipality, warehouse_type, storage_cost, all_products):
+    """
+    Groups the destinations with the same municipality, type and storage tariff of every product.
+    Destinations without a municipality stay alone. Returns {representative: [members]}, the
+    representative being the first member in the order of destinations_list.
+    """
+    groups = {}
+    for d in destinations_list:
+        city = (municipality or {}).get(d)
+        if not city:
+            key = (None, d)
+        else:
+            tariffs = tuple(storage_cost.get((d, p), DEFAULT_STORAGE_COST) for p in all_products)
+            key = (str(city).strip().upper(), (warehouse_type or {}).get(d), tariffs)
+        groups.setdefault(key, []).append(d)
+
+    return {members[0]: members for members in groups.values()}
+
+def coarsen_inputs(inputs, clusters):
+    """
+    Returns (coarse inputs, plan): the model inputs with one destination per cluster (named after
+    its representative) and what refine_problem and refined_solution need to map the coarse
+    solution back to the warehouses.
+    """
+    node_of = {d: rep for rep, members in clusters.items() for d in members}
+    total_capacity = inputs["demand_total_capacity"]
+    initial_inventory = inputs["demand_initial_inventory"]
+    effective_capacity = {
+        d: max(0.0, total_capacity.get(d, 0.0) - initial_inventory.get(d, 0.0)) for d in node_of
+    }
+
+    distance = inputs["distance"]
+    coarse_distance = {}
+    for (o, d, _) in inputs["valid_routes"]:
+        key = (o, node_of[d])
+        coarse_distance[key] = min(coarse_distance.get(key, distance[(o, d)]), distance[(o, d)])
+
+    coarse = dict(
+        inputs,
+        destinations_list=[d for d in inputs["destinations_list"] if d in clusters],
+        valid_routes=list(dict.fromkeys((o, node_of[d], p) for (o, d, p) in inputs["valid_routes"])),
+        demand_total_capacity={rep: sum(effective_capacity[d] for d in members) for rep, members in clusters.items()},
+        demand_initial_inventory={},
+        distance=coarse_distance,
+        # Members share their tariffs: the representative's are those of the super-node
+        storage_cost={(d, p): val for (d, p), val in inputs["storage_cost"].items() if d in clusters},
+    )
+    plan = {
+        "clusters": clusters,
+        "node_of": node_of,
+        "valid_routes": inputs["valid_routes"],
+        "effective_capacity": effective_capacity,
+    }
+    return coarse, plan
+
+def refine_problem(solution, plan):
+    """
+    Local transportation problem that splits the inflow of the super-nodes with several members.
+    Its supply pairs are ((origin, representative), product) with the coarse flow of the route to
+    the super-node, and its routes ((origin, representative), member, product) the member routes.
+    Returns (indexes of those routes in plan["valid_routes"], local routes, local supply).
+    """
+    clusters = plan["clusters"]
+    node_of = plan["node_of"]
+    flow = solution["flow"]
+
+    indexes = []
+    routes = []
+    supply = {}
+    for r, (o, d, p) in enumerate(plan["valid_routes"]):
+        rep = node_of[d]
+        if len(clusters[rep]) < 2:
+            continue
+        val = flow.get((o, rep, p), 0.0)
+        if val <= 0:
+            continue
+        indexes.append(r)
+        routes.append(((o, rep), d, p))
+        supply[((o, rep), p)] = val
+    return indexes, routes, supply
+
+def refined_solution(solution, plan, indexes, local):
+    """
+    Solution of the whole model from the coarse solution and the local one (a dict with the flows
+    'x' of the local routes, aligned with indexes, 'dummy_capacity' per member in 'dest_keys' and
+    'dummy_unallocated' per local supply pair in 'supply_keys', as returned by the LP solvers).
+    Super-nodes of one warehouse keep the flows of the coarse solution. The objective is left to
+    the caller, who has the route costs.
+    """
+    clusters = plan["clusters"]
+    node_of = plan["node_of"]
+    valid_routes = plan["valid_routes"]
+
+    flow = {}
+    for (o, d, p) in valid_routes:
+        rep = node_of[d]
+        flow[(o, d, p)] = solution["flow"].get((o, rep, p), 0.0) if len(clusters[rep]) == 1 else 0.0
+    for r, val in zip(indexes, local["x"]):
+        flow[valid_routes[r]] = float(val)
+
+    dummy_capacity = {
+        d: val for d, val in solution["dummy_capacity"].items() if len(clusters[d]) == 1
+    }
+    dummy_capacity.update(zip(local["dest_keys"], (float(val) for val in local["dummy_capacity"])))
+
+    dummy_unallocated = dict(solution["dummy_unallocated"])
+    for ((o, _), p), val in zip(local["supply_keys"], local["dummy_unallocated"]):
+        dummy_unallocated[(o, p)] = dummy_unallocated.get((o, p), 0.0) + float(val)
+
+    return {"flow": flow, "dummy_capacity": dummy_capacity, "dummy_unallocated": dummy_unallocated}
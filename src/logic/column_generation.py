@@ -0,0 +1,160 @@
+"""
+Column generation (lazy route generation) for the pure LP allocation model.
+
+With a large registry the valid routes approach |O| x |D| x |P|, and a flow variable per route is
+what the solver and the model spend their memory on. Most routes never carry flow, so the LP is
+solved on a small set of candidate routes and grown only where it pays:
+
+1. the initial set holds the k cheapest routes of each (origin, product) with supply;
+2. the restricted LP (src.logic.sparse_lp) is solved with CBC, which also returns the duals u of the
+   supply rows and v of the capacity rows (v <= 0; 0 for destinations without candidate routes,
+   whose capacity is unused);
+3. every omitted route is priced, reduced cost = unit cost - u[o, p] - v[d]; the most negative ones
+   of each (origin, product) join the set and the LP is solved again.
+
+When no omitted route has a negative reduced cost the duals of the restricted LP are feasible for
+the whole LP, so the solution of the restricted LP is optimal for it. Pricing is a vectorized pass
+over NumPy arrays of the routes: the omitted routes are never written to the solver.
+"""
+import numpy as np
+
+from src.logic import sparse_lp
+
+# Candidate routes per (origin, product) in the initial set and added per round
+DEFAULT_INITIAL_ROUTES = 5
+DEFAULT_ROUTES_PER_ROUND = 5
+
+# Reduced costs above -REDUCED_COST_TOLERANCE * max(1, unit cost) are solver noise, not improvements
+REDUCED_COST_TOLERANCE = 1e-6
+
+# Safety net: the set grows every round, so the loop ends after at most |routes| rounds anyway
+DEFAULT_MAX_ROUNDS = 200
+
+def cheapest_per_group(group, cost, k, candidates=None):
+    """
+    Indexes of the k cheapest entries of each group (ties by index), among the candidate indexes
+    (all by default). group and cost are arrays aligned by index.
+    """
+    if candidates is None:
+        candidates = np.arange(len(group))
+    if len(candidates) == 0:
+        return candidates
+    order = candidates[np.lexsort((candidates, cost[candidates], group[candidates]))]
+    sorted_groups = group[order]
+    # Position of each entry inside its group: index minus the start of the group
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    return np.sort(order[rank < k])
+
+def reduced_costs(cost, route_src, route_dst, supply_duals, capacity_duals):
+    """Reduced cost of every route with supply (route_src >= 0) under the given duals."""
+    return cost - supply_duals[route_src] - capacity_duals[route_dst]
+
+def solve_column_generation(valid_routes, supply, effective_capacity, unit_cost, big_m_capacity, big_m_unallocated,
+                            initial_routes=DEFAULT_INITIAL_ROUTES, routes_per_round=DEFAULT_ROUTES_PER_ROUND,
+                            max_rounds=DEFAULT_MAX_ROUNDS, options=None, on_round=None):
+    """
+    Solves the transportation LP by column generation.
+
+    Args:
+        valid_routes, supply, effective_capacity, unit_cost, big_m_capacity, big_m_unallocated:
+            as in sparse_lp.build_transport_lp, for the whole set of routes.
+        initial_routes: cheapest routes of each (origin, product) in the initial set.
+        routes_per_round: most negative routes of each (origin, product) added per round.
+        max_rounds: most restricted LPs solved.
+        options: CBC command line options of each solve (see optimization.cbc_options).
+        on_round: optional callback(round info) after each round, with the keys of 'rounds' below.
+
+    Returns:
+        dict with 'status' ('optimal' when no omitted route has a negative reduced cost, 'stopped'
+        at max_rounds, or the status of a failed solve), 'objective', the route flows 'x' (aligned
+        with valid_routes, zero on routes never generated), 'dummy_capacity' per destination in
+        'dest_keys', 'dummy_unallocated' per supply pair in 'supply_keys', 'columns' (routes in the
+        final set), 'rounds' (per round: 'round', 'columns', 'objective', 'added', 'min_reduced_cost'),
+        the solver 'timings' summed over the rounds and the CBC 'log' of the last solve.
+    """
+    n_routes = len(valid_routes)
+
+    supply_keys = [key for key, val in supply.items() if val > 0]
+    supply_index = {key: i for i, key in enumerate(supply_keys)}
+    dest_keys = list(dict.fromkeys(d for (_, d, _) in valid_routes))
+    dest_index = {d: j for j, d in enumerate(dest_keys)}
+
+    cost = np.asarray(unit_cost, dtype=float).reshape(n_routes)
+    route_src = np.fromiter((supply_index.get((o, p), -1) for (o, _, p) in valid_routes), dtype=np.int64, count=n_routes)
+    route_dst = np.fromiter((dest_index[d] for (_, d, _) in valid_routes), dtype=np.int64, count=n_routes)
+
+    # Routes of pairs without supply never carry flow and are never priced
+    priced = np.flatnonzero(route_src >= 0)
+    in_set = np.zeros(n_routes, dtype=bool)
+    in_set[cheapest_per_group(route_src, cost, initial_routes, priced)] = True
+
+    rounds = []
+    timings = {}
+    result = None
+    status = "stopped"
+    for round_number in range(1, max_rounds + 1):
+        columns = np.flatnonzero(in_set)
+        problem = sparse_lp.build_transport_lp([valid_routes[r] for r in columns.tolist()], supply, effective_capacity,
+                                               cost[columns], big_m_capacity, big_m_unallocated)
+        result = sparse_lp.solve_transport_lp(problem, options=options, duals=True)
+        for phase, seconds in result["timings"].items():
+            timings[phase] = timings.get(phase, 0.0) + seconds
+        if result["status"] != "optimal":
+            status = result["status"]
+            break
+
+        # Duals of the restricted rows, in the indexes of the whole set of routes
+        duals = result["duals"]
+        n_supply = len(problem["supply_keys"])
+        supply_duals = duals[:n_supply]
+        capacity_duals = np.zeros(len(dest_keys))
+        capacity_duals[[dest_index[d] for d in problem["dest_keys"]]] = duals[n_supply:]
+
+        omitted = priced[~in_set[priced]]
+        rc = reduced_costs(cost[omitted], route_src[omitted], route_dst[omitted], supply_duals, capacity_duals)
+        negative = rc < -REDUCED_COST_TOLERANCE * np.maximum(1.0, np.abs(cost[omitted]))
+        added = cheapest_per_group(route_src[omitted], rc, routes_per_round, np.flatnonzero(negative))
+
+        info = {
+            "round": round_number,
+            "columns": len(columns),
+            "objective": result["objective"],
+            "added": len(added),
+            "min_reduced_cost": float(rc.min()) if len(rc) else 0.0,
+        }
+        rounds.append(info)
+        if on_round is not None:
+            on_round(info)
+
+        if len(added) == 0:
+            status = "optimal"
+            break
+        in_set[omitted[added]] = True
+
+    x = np.zeros(n_routes)
+    dummy_capacity = np.zeros(len(dest_keys))
+    dummy_unallocated = np.zeros(len(supply_keys))
+    objective = 0.0
+    if result is not None and result["status"] == "optimal":
+        solved = result["x"]
+        n_columns = problem["n_routes"]
+        x[columns] = solved[:n_columns]
+        n_dest = len(problem["dest_keys"])
+        dummy_capacity[[dest_index[d] for d in problem["dest_keys"]]] = solved[n_columns:n_columns + n_dest]
+        dummy_unallocated[:] = solved[n_columns + n_dest:]
+        objective = result["objective"]
+
+    return {
+        "status": status,
+        "objective": objective,
+        "x": x,
+        "dummy_capacity": dummy_capacity,
+        "dummy_unallocated": dummy_unallocated,
+        "dest_keys": dest_keys,
+        "supply_keys": supply_keys,
+        "columns": int(in_set.sum()),
+        "rounds": rounds,
+        "timings": timings,
+        "log": result["log"] if result is not None else "",
+    }
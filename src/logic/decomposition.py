@@ -0,0 +1,81 @@
+"""
+Connected-component decomposition of the allocation model.
+
+Every constraint of the model (LP or MILP) involves the routes of a single supply pair
+(origin, product) or of a single destination, and the objective is a sum over routes and
+dummies. So when the graph of supply pairs and destinations linked by valid routes splits into
+independent components (for example regions that never share a warehouse), each component
+can be solved as its own model and the solutions merged into the solution of the whole model.
+
+The sub-models are solved in parallel on a process pool (multiprocess), falling back to solving
+them one after the other in this process when a pool cannot be started.
+"""
+import io
+import os
+
+from multiprocess import Pool
+
+from src.logic.resource_monitor import adopting_children
+from src.logic.run_log import RunLog
+
+def route_components(valid_routes):
+    """
+    Splits valid_routes into the connected components of the supply pair / destination graph.
+    Returns a list of route lists, largest component first; routes keep their relative order.
+    """
+    parent = {}
+
+    def find(node):
+        root = node
+        while parent[root] != root:
+            root = parent[root]
+        # Path compression
+        while parent[node] != root:
+            parent[node], node = root, parent[node]
+        return root
+
+    for (o, d, p) in valid_routes:
+        a, b = ("s", o, p), ("d", d)
+        parent.setdefault(a, a)
+        parent.setdefault(b, b)
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[root_b] = root_a
+
+    components = {}
+    for (o, d, p) in valid_routes:
+        components.setdefault(find(("d", d)), []).append((o, d, p))
+
+    return sorted(components.values(), key=len, reverse=True)
+
+def _run_captured(task):
+    # Runs one sub-solve with its own in-memory log, returning the result, the log text and the profile
+    solve, args = task
+    buffer = io.StringIO()
+    log = RunLog(buffer)
+    result = solve(*args, log=log)
+    return result, buffer.getvalue(), log.timings, log.model_stats
+
+def solve_components(solve, tasks, processes=None):
+    """
+    Calls solve(*args, log=...) for each args in tasks, in parallel on up to `processes` worker processes
+    (adopted by the ResourceMonitor of the run, if any).
+    Returns a list of (result, log text, timings, model_stats) (see RunLog), in the order of tasks.
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(1, min(processes, len(tasks)))
+
+    jobs = [(solve, args) for args in tasks]
+    if processes > 1:
+        try:
+            # The workers are started by the constructor
+            with adopting_children():
+                pool = Pool(processes=processes)
+            with pool:
+                return pool.map(_run_captured, jobs, chunksize=1)
+        except (AssertionError, OSError) as e:
+            # Daemonic processes cannot have children, and the pool may fail to start
+            print(f"Warning: process pool unavailable, solving components sequentially: {e}")
+
+    return [_run_captured(job) for job in jobs]
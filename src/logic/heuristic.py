@@ -0,0 +1,264 @@
+"""
+Greedy heuristic for the allocation model: a feasible allocation in milliseconds, without a solver.
+
+greedy_allocation sends supply along the routes in increasing order of unit cost (freight plus
+storage), in three passes with the same priorities as the penalties of the model objective:
+
+1. within the effective capacity and the reception limit of each warehouse;
+2. above the reception limit (artificial reception, 0.1 x Big M capacity per ton);
+3. above the capacity (artificial capacity, Big M capacity per ton).
+
+Supply left after the third pass has no route and stays unallocated. With a minimum and maximum
+freight each route carries a load that whole trips can make; warehouses that end up below the
+minimum reception are closed and the passes repeated without them.
+
+A local-improvement pass then moves flow to cheaper routes of the same supply: into the spare room
+of another warehouse, or by exchanging flow with a route of another supply that can use the
+warehouse left behind (which keeps the inflow of both warehouses). It stops when no move saves cost.
+
+The result is not optimal: it is the instant preview of a run and the starting solution of the MILP
+(see optimization._milp_warm_start).
+"""
+import math
+
+import numpy as np
+
+EPS = 1e-9
+
+# Artificial reception costs a tenth of the artificial capacity, as in the MILP objective
+RECEPTION_PENALTY_RATIO = 0.1
+
+# Passes of the local improvement over the loaded routes
+MAX_IMPROVEMENT_PASSES = 10
+
+def feasible_load(load, freight_min=None, freight_max=None):
+    """
+    Largest load up to `load` that whole trips between freight_min and freight_max tons can carry,
+    and the number of trips. Without a maximum freight a single trip carries any load.
+    """
+    if load <= EPS:
+        return 0.0, 0
+    if freight_max is None:
+        if freight_min is not None and load < freight_min - 1e-6:
+            return 0.0, 0
+        return load, 1
+    if freight_max <= 0:
+        # No trip carries any load
+        return 0.0, 0
+
+    trips = math.ceil(load / freight_max - 1e-9)
+    if freight_min is not None and trips * freight_min > load + 1e-6:
+        trips -= 1
+        load = trips * freight_max
+    if trips <= 0:
+        return 0.0, 0
+    return load, trips
+
+def greedy_allocation(valid_routes, supply, effective_capacity, unit_cost, big_m_capacity, big_m_unallocated,
+                      reception_limit=None, reception_min=None, freight_min=None, freight_max=None, improve=True):
+    """
+    Greedy allocation with local improvement.
+
+    Args:
+        valid_routes: list of (o, d, p) tuples.
+        supply: dict (o, p) -> tons available.
+        effective_capacity: dict d -> max(0, total capacity - initial inventory).
+        unit_cost: sequence of the per-ton cost of each route, aligned with valid_routes.
+        big_m_capacity: penalty per ton of artificial capacity.
+        big_m_unallocated: penalty per ton of unallocated supply.
+        reception_limit: optional dict d -> most tons received over the horizon (None: no limit).
+        reception_min: optional dict d -> least tons received by a warehouse in use (None: no minimum).
+        freight_min, freight_max: optional tons per trip of a route.
+        improve: run the local improvement after the greedy passes.
+
+    Returns:
+        dict with 'objective' (with the penalties of the model objective), the route flows 'x' and
+        'trips' (aligned with valid_routes), 'dummy_capacity' and 'dummy_reception' per destination
+        in 'dest_keys', 'dummy_unallocated' per supply pair in 'supply_keys' and 'moves', the
+        number of local improvements applied.
+    """
+    n_routes = len(valid_routes)
+
+    supply_keys = [key for key, val in supply.items() if val > 0]
+    supply_index = {key: i for i, key in enumerate(supply_keys)}
+    dest_keys = list(dict.fromkeys(d for (_, d, _) in valid_routes))
+    dest_index = {d: j for j, d in enumerate(dest_keys)}
+    n_dest = len(dest_keys)
+
+    cost = np.asarray(unit_cost, dtype=float).reshape(n_routes)
+    route_src = np.fromiter((supply_index.get((o, p), -1) for (o, _, p) in valid_routes), dtype=np.int64, count=n_routes)
+    route_dst = np.fromiter((dest_index[d] for (_, d, _) in valid_routes), dtype=np.int64, count=n_routes)
+
+    # Routes of pairs without supply never carry flow; the others in increasing order of cost
+    active = np.flatnonzero(route_src >= 0)
+    order = active[np.argsort(cost[active], kind='stable')]
+
+    supply_values = np.fromiter((supply[key] for key in supply_keys), dtype=float, count=len(supply_keys))
+    capacity = np.fromiter((effective_capacity.get(d, 0.0) for d in dest_keys), dtype=float, count=n_dest)
+    limit = np.full(n_dest, np.inf)
+    minimum = np.zeros(n_dest)
+    for j, d in enumerate(dest_keys):
+        if reception_limit and reception_limit.get(d) is not None:
+            limit[j] = reception_limit[d]
+        if reception_min and reception_min.get(d) is not None:
+            minimum[j] = reception_min[d]
+
+    load = _trip_loads(freight_min, freight_max)
+    closed = np.zeros(n_dest, dtype=bool)
+    while True:
+        x, inflow = _greedy_passes(order, route_src, route_dst, supply_values, capacity, limit, closed, load)
+        # Warehouses in use below the minimum reception are closed and the supply routed again
+        received = np.asarray(inflow)
+        below = (received > EPS) & (received < minimum - 1e-6)
+        if not below.any():
+            break
+        closed |= below
+
+    moves = 0
+    if improve:
+        moves = _improve(x, inflow, order, route_src, route_dst, cost, capacity, limit, minimum, closed, load)
+    trips = np.fromiter((load(val)[1] for val in x), dtype=np.int64, count=n_routes)
+    x = np.asarray(x)
+    inflow = np.asarray(inflow)
+
+    routed = np.bincount(route_src[active], weights=x[active], minlength=len(supply_keys))
+    unallocated = np.maximum(0.0, supply_values - routed)
+    dummy_capacity = np.maximum(0.0, inflow - capacity)
+    dummy_reception = np.where(np.isfinite(limit), np.maximum(0.0, inflow - limit), 0.0)
+
+    objective = (float(cost @ x) + big_m_capacity * float(dummy_capacity.sum())
+                 + big_m_capacity * RECEPTION_PENALTY_RATIO * float(dummy_reception.sum())
+                 + big_m_unallocated * float(unallocated.sum()))
+    return {
+        "objective": objective,
+        "x": x,
+        "trips": trips,
+        "dummy_capacity": dummy_capacity,
+        "dummy_reception": dummy_reception,
+        "dummy_unallocated": unallocated,
+        "dest_keys": dest_keys,
+        "supply_keys": supply_keys,
+        "moves": moves,
+    }
+
+def _trip_loads(freight_min, freight_max):
+    # feasible_load with the freight limits of the run
+    return lambda val: feasible_load(val, freight_min, freight_max)
+
+def _greedy_passes(order, route_src, route_dst, supply_values, capacity, limit, closed, load):
+    # The three passes of the module docstring; returns the route flows and the inflow per destination,
+    # as lists (the loops below are sequential, plain floats are faster than NumPy scalars)
+    x = [0.0] * len(route_src)
+    inflow = [0.0] * len(capacity)
+    left = supply_values.tolist()
+    order = [r for r in order.tolist() if not closed[route_dst[r]]]
+    src = route_src.tolist()
+    dst = route_dst.tolist()
+
+    for respect_limit, respect_capacity in ((True, True), (False, True), (False, False)):
+        room = (np.minimum(capacity, limit) if respect_limit else capacity).tolist()
+        for r in order:
+            i = src[r]
+            if left[i] <= EPS:
+                continue
+            j = dst[r]
+            amount = left[i]
+            if respect_capacity:
+                amount = min(amount, room[j] - inflow[j])
+                if amount <= EPS:
+                    continue
+            # The route may already carry a load from an earlier pass
+            new_load, _ = load(x[r] + amount)
+            delta = new_load - x[r]
+            if delta <= EPS:
+                continue
+            x[r] = new_load
+            inflow[j] += delta
+            left[i] -= delta
+    return x, inflow
+
+def _improve(x, inflow, order, route_src, route_dst, cost, capacity, limit, minimum, closed, load):
+    """
+    Local improvement of the greedy allocation, in place on the lists x and inflow.
+    Returns the number of moves applied.
+    """
+    src = route_src.tolist()
+    dst = route_dst.tolist()
+    costs = cost.tolist()
+    room = np.minimum(capacity, limit).tolist()
+    minimum = minimum.tolist()
+
+    # Routes of each supply pair in increasing order of cost, and the route of each (pair, destination)
+    alternatives = {}
+    route_of = {}
+    for r in order.tolist():
+        if not closed[dst[r]]:
+            alternatives.setdefault(src[r], []).append(r)
+            route_of[(src[r], dst[r])] = r
+
+    loaded_at = {}
+    for r in (r for r, val in enumerate(x) if val > EPS):
+        loaded_at.setdefault(dst[r], set()).add(r)
+
+    def feasible(val):
+        return val <= EPS or abs(load(val)[0] - val) <= 1e-6
+
+    def kept(j, val):
+        # A warehouse either stays empty or receives at least its minimum
+        return val <= EPS or val >= minimum[j] - 1e-6
+
+    def move(r, r2, delta):
+        for route, step in ((r, -delta), (r2, delta)):
+            x[route] += step
+            if x[route] > EPS:
+                loaded_at.setdefault(dst[route], set()).add(route)
+            else:
+                x[route] = 0.0
+                loaded_at.get(dst[route], set()).discard(route)
+
+    moves = 0
+    for _ in range(MAX_IMPROVEMENT_PASSES):
+        improved = False
+        # The most expensive loads first
+        for r in sorted((r for r, val in enumerate(x) if val > EPS), key=lambda r: -costs[r]):
+            i, j = src[r], dst[r]
+            for r2 in alternatives.get(i, []):
+                if x[r] <= EPS or costs[r2] >= costs[r] - EPS:
+                    break
+                j2 = dst[r2]
+                if j2 == j:
+                    continue
+
+                # Shift into the spare room of the cheaper warehouse
+                spare = room[j2] - inflow[j2]
+                if spare > EPS:
+                    delta = min(x[r], spare)
+                    if (feasible(x[r] - delta) and feasible(x[r2] + delta) and kept(j, inflow[j] - delta)
+                            and kept(j2, inflow[j2] + delta)):
+                        move(r, r2, delta)
+                        inflow[j] -= delta
+                        inflow[j2] += delta
+                        moves += 1
+                        improved = True
+                        continue
+
+                # Exchange with a load of the cheaper warehouse that can go to this one
+                for q in sorted(loaded_at.get(j2, ())):
+                    q2 = route_of.get((src[q], j))
+                    if q2 is None or q == r2 or q2 == r:
+                        continue
+                    if costs[r] + costs[q] - costs[r2] - costs[q2] <= EPS * max(1.0, costs[r] + costs[q]):
+                        continue
+                    delta = min(x[r], x[q])
+                    if not (feasible(x[r] - delta) and feasible(x[q] - delta)
+                            and feasible(x[r2] + delta) and feasible(x[q2] + delta)):
+                        continue
+                    move(r, r2, delta)
+                    move(q, q2, delta)
+                    moves += 1
+                    improved = True
+                    if x[r] <= EPS:
+                        break
+        if not improved:
+            break
+    return moves
@@ -0,0 +1,120 @@
+"""
+Kernel search (fix-and-optimize) for the MILP with logistics limits.
+
+Branching over the trips of every route and the activation of every warehouse at once is what makes
+CBC time out on large instances, while most routes never carry flow in a good allocation. Kernel
+search solves a sequence of small restricted MILPs instead:
+
+1. the LP relaxation ranks the routes: those with flow form the kernel, together with the routes of
+   any known allocation (the greedy heuristic); the others are sorted by reduced cost;
+2. the restricted MILP on the kernel routes gives the first incumbent;
+3. the remaining routes are added a bucket at a time: the MILP on the kernel plus the bucket is
+   solved from the incumbent, with its cost as the cutoff, and the bucket routes used by an improved
+   solution join the kernel.
+
+Every restricted MILP keeps all the supply, so each solution is an allocation of the whole model.
+The search ends when the buckets or the time budget run out and returns the best solution found.
+It is complete when every bucket was tried and the last restricted MILP was solved to optimality;
+the bound of that MILP only holds for its routes, so the solution is proven optimal for the whole
+model only when the last restricted MILP had every route.
+"""
+import time
+
+import numpy as np
+
+# Flow below this is a floating point zero
+EPS = 1e-6
+
+# Buckets tried after the kernel: the routes of high reduced cost seldom improve the allocation
+DEFAULT_MAX_BUCKETS = 10
+
+# Least time given to a restricted MILP; the search stops when less than this is left
+MIN_SUBPROBLEM_SECONDS = 2.0
+
+def initial_kernel(lp_flow, reduced_cost, known_flows=()):
+    """
+    Splits the route indexes into the kernel (flow in the LP relaxation or in any of known_flows,
+    arrays aligned with lp_flow) and the other routes in increasing order of reduced cost.
+    """
+    lp_flow = np.asarray(lp_flow, dtype=float)
+    in_kernel = lp_flow > EPS
+    for flows in known_flows:
+        in_kernel |= np.asarray(flows, dtype=float) > EPS
+
+    rest = np.flatnonzero(~in_kernel)
+    rest = rest[np.argsort(np.asarray(reduced_cost, dtype=float)[rest], kind='stable')]
+    return np.flatnonzero(in_kernel), rest
+
+def make_buckets(rest, bucket_size, max_buckets=DEFAULT_MAX_BUCKETS):
+    """The first max_buckets slices of bucket_size routes of rest (a ranked array of route indexes)."""
+    bucket_size = max(1, int(bucket_size))
+    return [rest[start:start + bucket_size] for start in range(0, len(rest), bucket_size)][:max_buckets]
+
+def kernel_search(kernel, buckets, solve, time_budget, min_seconds=MIN_SUBPROBLEM_SECONDS, on_step=None,
+                  clock=time.perf_counter):
+    """
+    Runs the kernel search loop.
+
+    Args:
+        kernel: route indexes of the initial kernel.
+        buckets: list of arrays of route indexes, in the order they are tried.
+        solve: callback(route indexes, incumbent or None, time limit in seconds) solving the restricted
+            MILP on those routes from the incumbent and with its cost as the cutoff. Returns None when
+            it found no solution, otherwise a dict with at least 'objective' and 'used', the route
+            indexes carrying flow, and optionally 'proven_optimal' (True if missing) and 'bound'.
+        time_budget: seconds for the whole search.
+        min_seconds: least time of a restricted MILP.
+        on_step: optional callback(step info) after each restricted MILP, with the keys of 'steps' below.
+
+    Returns:
+        dict with the best solution returned by solve ('solution', None if none), 'status'
+        ('complete' when every bucket was tried and the last restricted MILP was proven optimal,
+        'time_budget' when the budget ran out first or stopped that MILP), the 'bound' of the last
+        restricted MILP (None if unknown), the final 'kernel' size and 'steps' (per restricted MILP:
+        'step', 'routes', 'objective' of its solution or None, 'proven', 'improved', 'best' objective
+        so far and 'seconds').
+    """
+    start = clock()
+    kernel = set(int(r) for r in kernel)
+    best = None
+    steps = []
+    status = "complete"
+    bound = None
+
+    # The kernel first, then each bucket on top of it
+    stages = [np.array([], dtype=np.int64)] + list(buckets)
+    for step, bucket in enumerate(stages):
+        left = time_budget - (clock() - start)
+        if left < min_seconds and step > 0:
+            status = "time_budget"
+            break
+        # The time left is shared among the stages still to run
+        time_limit = max(min_seconds, left / (len(stages) - step))
+
+        routes = sorted(kernel.union(int(r) for r in bucket))
+        step_start = clock()
+        result = solve(routes, best, time_limit)
+        improved = result is not None and (best is None or result["objective"] < best["objective"] - EPS * max(1.0, abs(best["objective"])))
+        proven = result is not None and result.get("proven_optimal", True)
+        bound = result.get("bound") if result is not None else None
+        if improved:
+            best = result
+            kernel.update(int(r) for r in result["used"])
+
+        info = {
+            "step": step,
+            "routes": len(routes),
+            "objective": result["objective"] if result is not None else None,
+            "proven": proven,
+            "improved": improved,
+            "best": best["objective"] if best is not None else None,
+            "seconds": clock() - step_start,
+        }
+        steps.append(info)
+        if on_step is not None:
+            on_step(info)
+
+    # A last restricted MILP stopped by its time limit used up the share of the budget it was given
+    if status == "complete" and not steps[-1]["proven"]:
+        status = "time_budget"
+    return {"solution": best, "status": status, "bound": bound, "kernel": len(kernel), "steps": steps}
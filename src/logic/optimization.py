@@ -2,14 +2,31 @@ from src.logic.i18n import translate
 import pyomo.environ as pyo
 from pyomo.opt import SolverFactory
 import pandas as pd
-import sys
+import numpy as np
 import io
-import tempfile
 import os
+import threading
 import math
+import hashlib
+import functools
 
 import time
 
+from src.logic import sparse_lp
+from src.logic import cbc_shell
+from src.logic import min_cost_flow
+from src.logic import heuristic
+from src.logic import column_generation
+from src.logic import coarsening
+from src.logic import kernel_search
+from src.logic import sensitivity
+from src.logic.decomposition import route_components, solve_components
+from src.logic.presolve import presolve_inputs, postsolve_solution
+from src.logic.run_log import RunLog
+from src.logic.resource_monitor import ResourceMonitor, ENV_PYTHON_LIMIT, ENV_SOLVER_LIMIT, checkpoint, current_monitor
+from src.logic.solver_progress import SolverProgress
+from src.logic.route_pruning import prune_routes, normalize_pruning, PARETO_PRUNING
+
 def safe_parse_numeric(val):
     if pd.isna(val):
         return 0.0
@@ -21,15 +38,225 @@ def safe_parse_numeric(val):
         return 0.0
     return float(val_str.replace('.', '').replace(',', '.'))
 
-def run_optimization_model(df_supply, df_demand, df_compat, df_dist, df_freight, df_storage, detailed_log=False,
-                           toggle_pareto=False, toggle_min_max_capacity=False, input_min_load=None, input_max_load=None,
-                           toggle_use_reception=False, input_allocation_days=None, input_min_freight=None, input_max_freight=None, lang="pt"):
+def build_valid_routes(origins, destinations, products, distance, prod_dest_compat, toggle_pareto=False,
+                       pruning=None, freight_cost=None, avg_freight=0.0, storage_cost=None):
     """
-    Runs the linear optimization mathematical model for product allocation.
+    Lists the (Origin, Destination, Product) combinations that can carry flow: the pair must
+    have a known distance and the product must be compatible with the warehouse type.
+    With toggle_pareto, only the best destinations of each (origin, product) are kept: the 20%
+    closest by default, or by the rule in pruning (k nearest, percentile or radius, by distance or
+    by unit cost, see src.logic.route_pruning). The costs are only needed to prune by unit cost.
     """
-    # Start of the timer to measure total time from call to solution
-    start_time = time.time()
+    if not toggle_pareto:
+        pruning = None
+    elif not pruning:
+        pruning = PARETO_PRUNING
+    return prune_routes(origins, destinations, products, distance, prod_dest_compat, pruning,
+                        freight_cost=freight_cost, avg_freight=avg_freight, storage_cost=storage_cost)
+
+def _print_pruning(pruning, log, lang="pt"):
+    pruning = normalize_pruning(pruning)
+    text = {
+        "percentile": translate("Poda de rotas: {value:g}% melhores destinos de cada origem e produto, por {score}", lang),
+        "nearest": translate("Poda de rotas: {value:g} melhores destinos de cada origem e produto, por {score}", lang),
+        "radius": translate("Poda de rotas: destinos a até {value:g} km de cada origem", lang),
+    }[pruning["method"]]
+    score = translate("distância", lang) if pruning["score"] == "distance" else translate("custo unitário (frete + armazenagem)", lang)
+    log.print(text.format(value=pruning["value"], score=score))
+
+def compute_big_m_penalties(freight_cost, distance, storage_cost):
+    """
+    Dynamic penalty costs for the slack (dummy) variables, based on the maximum system costs.
+    Returns (big_m_capacity, big_m_unallocated).
+    """
+    max_freight = max(freight_cost.values()) if freight_cost else 0.0
+    max_dist = max(distance.values()) if distance else 0.0
+    max_storage = max(storage_cost.values()) if storage_cost else 0.0
+
+    # Big M da Capacidade: ordens de grandeza maior que o custo de transportar e armazenar
+    val_big_m_cap = (max_freight * max_dist + max_storage) * 1000
+    if val_big_m_cap == 0:
+        val_big_m_cap = 10000
+
+    # Unallocated Big M: must be even higher than lack of capacity, forcing allocation whenever possible
+    val_big_m_unalloc = val_big_m_cap * 10
+    return val_big_m_cap, val_big_m_unalloc
+
+def build_route_indexes(valid_routes):
+    """
+    Builds adjacency indexes over the valid routes so constraint rules can look up
+    their routes directly instead of scanning the full (Origin x Destination x Product) grid.
+
+    Returns:
+        routes_by_origin_product: dict (o, p) -> list of destinations d
+        routes_by_destination: dict d -> list of (o, p)
+    """
+    routes_by_origin_product = {}
+    routes_by_destination = {}
+    for (o, d, p) in valid_routes:
+        routes_by_origin_product.setdefault((o, p), []).append(d)
+        routes_by_destination.setdefault(d, []).append((o, p))
+    return routes_by_origin_product, routes_by_destination
+
+def needs_milp(toggle_min_max_capacity, input_min_load, input_max_load, toggle_use_reception, input_min_freight, input_max_freight):
+    """
+    Decides whether the run needs the MILP model (any logistics limit is active) or the plain LP.
+    """
+    if toggle_min_max_capacity:
+        if (input_min_load is not None and str(input_min_load).strip() != "") or \
+           (input_max_load is not None and str(input_max_load).strip() != "") or \
+           (input_min_freight is not None and str(input_min_freight).strip() != "") or \
+           (input_max_freight is not None and str(input_max_freight).strip() != "") or \
+           toggle_use_reception:
+            return True
+    return False
+
+def needs_integer_variables(limits):
+    """
+    Classifies a run with logistics limits (see parse_milp_limits). Only a minimum freight per route
+    and a minimum reception per warehouse need the integer trips and the warehouse activation of the
+    MILP. The maximum freight and the maximum reception are linear: the LP with the reception limits
+    has the optimum of the MILP, and the trips of each route are ceil(flow / maximum freight).
+    """
+    return limits["frete_min"] is not None or limits["carga_min"] is not None
+
+def parse_milp_limits(input_allocation_days, input_min_load, input_max_load, input_min_freight, input_max_freight):
+    """
+    Parses the logistics limits typed in the UI. Blank or invalid fields become None (limit disabled).
+    Returns a dict with 'days', 'carga_min', 'carga_max', 'frete_min' and 'frete_max'.
+    """
+    # Calculate days multiplier
+    try:
+        days = float(input_allocation_days) if input_allocation_days else 1.0
+    except:
+        days = 1.0
+
+    # Parse numeric limits
+    def parse_float(val):
+        if val is None or str(val).strip() == "":
+            return None
+        try:
+            return float(val)
+        except:
+            return None
+
+    return {
+        "days": days,
+        "carga_min": parse_float(input_min_load),
+        "carga_max": parse_float(input_max_load),
+        "frete_min": parse_float(input_min_freight),
+        "frete_max": parse_float(input_max_freight),
+    }
+
+def reception_max_values(destinations, demand_reception_capacity, toggle_use_reception, carga_max):
+    """
+    Maximum daily reception per warehouse. Note: toggle_use_reception and carga_max are mutually
+    exclusive in UI logic, but here we explicitly state priority: database capacity overrides if activated.
+    """
+    values = {}
+    for d in destinations:
+        if toggle_use_reception:
+            values[d] = demand_reception_capacity.get(d, 0.0)
+        elif carga_max is not None:
+            values[d] = carga_max
+        else:
+            values[d] = None
+    return values
+
+# Accepted values of the CBC presolve and cuts levels
+PRESOLVE_LEVELS = ("on", "off", "more")
+CUTS_LEVELS = ("on", "off", "root", "ifmove")
+
+# Objective of the solve: Big M penalties on the dummies in one objective, or the lexicographic
+# two-phase solve (dummies first, then the cost; see _solve_lexicographic)
+OBJECTIVE_MODES = ("penalty", "lexicographic")
 
+# Relative slack of the phase 1 level kept by phase 2 of the lexicographic solve (CBC adds its own
+# feasibility tolerance, so a level of zero stays zero)
+LEXICOGRAPHIC_TOLERANCE = 1e-9
+
+def default_solver_settings():
+    """
+    Default CBC settings: one thread per available core, the original 600 s time limit,
+    exact optimality (zero gap), the CBC default presolve and cuts and the Big M penalty objective.
+    """
+    return {
+        "threads": os.cpu_count() or 1,
+        "time_limit": 600,
+        "rel_gap": 0.0,
+        "abs_gap": None,
+        "presolve": "on",
+        "cuts": "on",
+        "seed": None,
+        "objective": "penalty",
+    }
+
+def normalize_solver_settings(solver_settings=None):
+    """
+    Completes solver_settings with the defaults. Blank or invalid values fall back to the default.
+    rel_gap is a fraction (0.005 = 0.5%), abs_gap is in R$ and time_limit in seconds.
+    """
+    settings = default_solver_settings()
+    if not solver_settings:
+        return settings
+
+    def parse(val, cast, minimum):
+        if val is None or str(val).strip() == "":
+            return None
+        try:
+            val = cast(float(val))
+        except (TypeError, ValueError):
+            return None
+        return val if val >= minimum else None
+
+    for name, cast, minimum in (("threads", int, 1), ("time_limit", float, 1), ("rel_gap", float, 0),
+                                ("abs_gap", float, 0), ("seed", int, 0)):
+        val = parse(solver_settings.get(name), cast, minimum)
+        if val is not None:
+            settings[name] = val
+
+    if solver_settings.get("presolve") in PRESOLVE_LEVELS:
+        settings["presolve"] = solver_settings["presolve"]
+    if solver_settings.get("cuts") in CUTS_LEVELS:
+        settings["cuts"] = solver_settings["cuts"]
+    if solver_settings.get("objective") in OBJECTIVE_MODES:
+        settings["objective"] = solver_settings["objective"]
+
+    return settings
+
+def cbc_options(settings):
+    """
+    CBC command line options (name -> value) for normalized solver settings.
+    The time limit counts wall-clock time, otherwise CBC adds up the time of all threads.
+    """
+    options = {
+        "sec": settings["time_limit"],
+        "timeMode": "elapsed",
+        "threads": settings["threads"],
+        "ratioGap": settings["rel_gap"],
+        "presolve": settings["presolve"],
+        "cuts": settings["cuts"],
+    }
+    if settings["abs_gap"] is not None:
+        options["allowableGap"] = settings["abs_gap"]
+    if settings["seed"] is not None:
+        options["randomCbcSeed"] = settings["seed"]
+    return options
+
+def _print_solver_settings(settings, log, lang="pt"):
+    log.print(translate("Configurações do solver: {threads} thread(s), limite de tempo {time_limit:g} s, gap relativo {rel_gap:.2%}, gap absoluto {abs_gap}, presolve {presolve}, cortes {cuts}, semente {seed}", lang).format(
+        threads=settings["threads"], time_limit=settings["time_limit"], rel_gap=settings["rel_gap"],
+        abs_gap=settings["abs_gap"] if settings["abs_gap"] is not None else "-",
+        presolve=settings["presolve"], cuts=settings["cuts"],
+        seed=settings["seed"] if settings["seed"] is not None else "-"))
+    if settings["objective"] == "lexicographic":
+        log.print(translate("Objetivo lexicográfico: a fase 1 minimiza a capacidade artificial e a oferta não alocada, a fase 2 minimiza o custo real mantendo esse nível.", lang))
+
+def prepare_model_data(df_supply, df_demand, df_compat, df_dist, df_freight, df_storage, lang="pt"):
+    """
+    Converts the input tables into the dictionaries consumed by the model builders.
+    The result can be reused by several runs with different model options (see run_prepared_model).
+    """
     # 1. Data preparation
 
     # Supply
@@ -66,6 +293,9 @@ def run_optimization_model(df_supply, df_demand, df_compat, df_dist, df_freight,
     demand_initial_inventory = {}
     demand_reception_capacity = {}
     is_public = {}
+    # Municipality and type of each warehouse, to group neighbouring warehouses (see src.logic.coarsening)
+    dest_municipality = {}
+    dest_type = {}
 
     # Store the mapping from CDA back to full formatted name for the final output
     cda_to_name = {}
@@ -85,6 +315,7 @@ def run_optimization_model(df_supply, df_demand, df_compat, df_dist, df_freight,
             parts.append(str(row[name_col]).strip())
         if mun_col_dest and pd.notna(row[mun_col_dest]):
             parts.append(str(row[mun_col_dest]).strip())
+            dest_municipality[cda] = str(row[mun_col_dest]).strip()
 
         if parts:
             dest_name_full = " - ".join(parts)
@@ -153,6 +384,7 @@ def run_optimization_model(df_supply, df_demand, df_compat, df_dist, df_freight,
                 cda = f"Dest {idx}"
 
             tipo_armazem = row[tipo_col] if tipo_col else None
+            dest_type[cda] = tipo_armazem
 
             # If we have no type information, we assume it accepts (or we could reject, but assuming True is safer if it fails)
             if tipo_armazem and (prod, tipo_armazem) in compat_dict:
@@ -245,64 +477,37 @@ def run_optimization_model(df_supply, df_demand, df_compat, df_dist, df_freight,
             for dest in demand_total_capacity.keys():
                 storage_cost[(dest, prod)] = 50.0
 
+    return {
+        "supply": supply,
+        "demand_total_capacity": demand_total_capacity,
+        "demand_initial_inventory": demand_initial_inventory,
+        "demand_reception_capacity": demand_reception_capacity,
+        "is_public": is_public,
+        "dest_municipality": dest_municipality,
+        "dest_type": dest_type,
+        "cda_to_name": cda_to_name,
+        "prod_dest_compat": prod_dest_compat,
+        "distance": distance,
+        "freight_cost": freight_cost,
+        "storage_cost": storage_cost,
+        "avg_freight": avg_freight,
+        "all_products": all_products,
+        "origins_list": df_supply['Cidade'].unique().tolist(),
+    }
 
-    # 2. Despacho: LP ou MILP
-
-    use_milp = False
-    if toggle_min_max_capacity:
-        if (input_min_load is not None and str(input_min_load).strip() != "") or \
-           (input_max_load is not None and str(input_max_load).strip() != "") or \
-           (input_min_freight is not None and str(input_min_freight).strip() != "") or \
-           (input_max_freight is not None and str(input_max_freight).strip() != "") or \
-           toggle_use_reception:
-            use_milp = True
-
-    if use_milp:
-        return _run_milp_optimization_model(
-            start_time=start_time,
-            supply=supply, demand_total_capacity=demand_total_capacity,
-            demand_initial_inventory=demand_initial_inventory,
-            demand_reception_capacity=demand_reception_capacity,
-            is_public=is_public, cda_to_name=cda_to_name,
-            prod_dest_compat=prod_dest_compat, distance=distance,
-            freight_cost=freight_cost, storage_cost=storage_cost, avg_freight=avg_freight,
-            all_products=all_products, origins_list=df_supply['Cidade'].unique().tolist(),
-            detailed_log=detailed_log,
-            input_min_load=input_min_load, input_max_load=input_max_load,
-            toggle_use_reception=toggle_use_reception, input_allocation_days=input_allocation_days,
-            input_min_freight=input_min_freight, input_max_freight=input_max_freight,
-            toggle_pareto=toggle_pareto,
-            lang=lang
-        )
-
-    # 2. Pyomo Model Construction (Original LP)
-
-    # Redirect output directly to a temporary file on disk (to avoid Out of Memory)
-    old_stdout = sys.stdout
-
-    log_dir = os.path.join(tempfile.gettempdir(), 'granum_logs')
-    os.makedirs(log_dir, exist_ok=True)
-
-    # Clean up old files so we don't run out of disk space
-
-    now = time.time()
-    for filename in os.listdir(log_dir):
-        filepath = os.path.join(log_dir, filename)
-        if os.path.isfile(filepath):
-            # Deletes files created more than 1 hour ago
-            if os.stat(filepath).st_mtime < now - 3600:
-                try:
-                    os.remove(filepath)
-                except Exception:
-                    pass
+# Statuses of runs that produced an allocation: "feasible" is a MILP incumbent found before a solver
+# limit (time, nodes) stopped the search, not proven optimal (see kpis "proven_optimal" and "mip_gap"),
+# or the allocation of the greedy heuristic (results_dict["heuristic"]). results_dict["model_class"]
+# is the model actually solved, "lp" or "milp" (see needs_integer_variables)
+SOLVED_STATUSES = ("optimal", "feasible")
 
-    log_fd, log_path = tempfile.mkstemp(suffix='.txt', prefix='optimization_log_', dir=log_dir)
-    log_filename = os.path.basename(log_path)
-    new_stdout = os.fdopen(log_fd, 'w', encoding='utf-8')
-    sys.stdout = new_stdout
+# CBC terminations caused by a limit of the search, which may still leave a feasible incumbent
+LIMIT_TERMINATIONS = (pyo.TerminationCondition.maxTimeLimit, pyo.TerminationCondition.maxIterations,
+                      pyo.TerminationCondition.maxEvaluations, pyo.TerminationCondition.other)
 
-    # Variables to hold structured results
-    results_dict = {
+def new_results_dict():
+    """Empty structured result shared by every model path."""
+    return {
         "status": "error",
         "objective": 0.0,
         "routes": [],
@@ -317,800 +522,2400 @@ def run_optimization_model(df_supply, df_demand, df_compat, df_dist, df_freight,
             "capacity": [],
             "unallocated": [],
             "general": []
-        }
+        },
+        "session_reused": False,
+        "heuristic": False,
+        "model_class": None,
+        "sensitivity": None,
+        "timings": {},
+        "model_stats": {}
     }
 
-    try:
-        print(translate("Iniciando a construção do modelo matemático...", lang))
-        model = pyo.ConcreteModel(name="Alocacao_Armazens")
+# Phases of a run measured in results_dict["timings"] (seconds), in the order they happen
+PHASE_LABELS = {
+    "data_prep": "Preparação dos dados",
+    "routes": "Rotas válidas",
+    "presolve": "Presolve",
+    "heuristic": "Heurística gulosa",
+    "coarsening": "Agregação de armazéns",
+    "model_build": "Construção do modelo",
+    "pricing": "Geração de colunas (precificação)",
+    "warm_start": "Solução inicial (warm start)",
+    "lp_write": "Escrita do arquivo LP",
+    "solver": "Solver",
+    "solution_load": "Leitura da solução",
+    "refinement": "Refinamento local",
+    "reporting": "Relatório dos resultados",
+    "sensitivity": "Análise de sensibilidade",
+}
+
+def _presolve(inputs, log, aggregate_products=False, lang="pt"):
+    """
+    Presolves the model inputs (see src.logic.presolve) and logs what was removed.
+    Returns the reduced inputs and the plan to map their solution back.
+    """
+    with log.timed("presolve"):
+        reduced, plan = presolve_inputs(inputs, aggregate_products=aggregate_products)
 
-        # =========================================================================
-        # 2.1 CONJUNTOS (SETS)
-        # =========================================================================
-        # Defines the indices over which the model will operate.
+    removed = plan["removed"]
+    log.print(translate("Presolve: {routes} rotas sem oferta, {dests} armazéns sem rotas e {origins} origens sem oferta removidos; {merged} produtos agrupados a produtos equivalentes.", lang).format(
+        routes=removed["routes"], dests=removed["destinations"], origins=removed["origins"], merged=plan["merged"]))
+    log.model_stats["presolved_routes"] = len(reduced["valid_routes"])
+    return reduced, plan
 
-        model.Origins = pyo.Set(initialize=df_supply['Cidade'].unique().tolist(), doc=translate("Cidades de Origem da Oferta", lang))
-        model.Destinations = pyo.Set(initialize=list(demand_total_capacity.keys()), doc=translate("Armazéns de Destino", lang))
-        model.Products = pyo.Set(initialize=all_products, doc=translate("Tipos de Produtos", lang))
+def _print_run_profile(log, kpis, lang="pt"):
+    """
+    Prints the model size, the time of each phase collected by the run log and the
+    memory and CPU usage in kpis (see src.logic.resource_monitor).
+    """
+    stats = {name: (val if val is not None else "-") for name, val in log.model_stats.items()}
+    log.print("\n" + translate("--- PERFIL DA EXECUÇÃO ---", lang))
+    log.print(translate("Tamanho do modelo: {routes} rotas válidas, {variables} variáveis, {constraints} restrições, {nonzeros} coeficientes não nulos", lang).format(
+        routes=stats.get("valid_routes", "-"), variables=stats.get("variables", "-"),
+        constraints=stats.get("constraints", "-"), nonzeros=stats.get("nonzeros", "-")))
+    for phase, label in PHASE_LABELS.items():
+        if phase in log.timings:
+            log.print(translate("{phase}: {val:.3f} s", lang).format(phase=translate(label, lang), val=log.timings[phase]))
+    log.print(translate("Pico de memória: {python:.0f} MB no Python, {solver:.0f} MB no solver. Tempo de CPU: {cpu:.2f} s no Python, {solver_cpu:.2f} s no solver", lang).format(
+        python=kpis["peak_rss_mb"], solver=kpis["solver_peak_rss_mb"], cpu=kpis["cpu_time"], solver_cpu=kpis["solver_cpu_time"]))
+
+def _memory_limit_message(exceeded, lang="pt"):
+    """Error message of a run aborted by a memory ceiling (a MemoryLimitExceeded)."""
+    if exceeded.kind == "python":
+        text = translate("Execução interrompida: a memória do processo Python chegou a {rss:.0f} MB, acima do limite de {limit:.0f} MB ({env}).", lang)
+        env = ENV_PYTHON_LIMIT
+    else:
+        text = translate("Execução interrompida: a memória do solver chegou a {rss:.0f} MB, acima do limite de {limit:.0f} MB ({env}).", lang)
+        env = ENV_SOLVER_LIMIT
+    return text.format(rss=exceeded.rss_mb, limit=exceeded.limit_mb, env=env)
 
-        # [PERFORMANCE BEST PRACTICE]
-        # We pre-filter valid routes in Python before creating decision variables.
-        # This avoids the 'combinatorial explosion' of empty variables in the solver, improving
-        # significantly memory usage and optimization speed.
-        valid_routes = []
-        for o in model.Origins:
-            for p in model.Products:
-                compatible_dests = []
-                # Reúne todos os destinos válidos para esta origem e produto
-                for d in model.Destinations:
-                    if (o, d) in distance and prod_dest_compat.get((p, d), False):
-                        dist_val = distance[(o, d)]
-                        # Armazena apenas a distância para o Pareto
-                        compatible_dests.append((d, dist_val))
-
-                if compatible_dests:
-                    if toggle_pareto:
-                        # Ordena pela menor distância
-                        compatible_dests.sort(key=lambda x: x[1])
-                        # Aplica a regra 80/20, arredondando sempre para cima
-                        limit = max(1, math.ceil(len(compatible_dests) * 0.20))
-                        compatible_dests = compatible_dests[:limit]
-
-                    # Adiciona os destinos filtrados às rotas válidas
-                    for d, _ in compatible_dests:
-                        valid_routes.append((o, d, p))
-
-        print(translate("Total de combinações (Origem x Destino x Produto) válidas: {val}", lang).format(val=len(valid_routes)))
-        model.ValidRoutes = pyo.Set(initialize=valid_routes, dimen=3, doc=translate("Rotas Válidas (Origem, Destino, Produto)", lang))
-
-        # =========================================================================
-        # 2.2 PARÂMETROS (PARAMETERS)
-        # =========================================================================
-        # Valores fixos conhecidos fornecidos como dados de entrada para o modelo.
-
-        # --- Parâmetros de Oferta e Demanda ---
-        def supply_init(model, o, p):
-            return supply.get((o, p), 0.0)
-        model.Supply = pyo.Param(model.Origins, model.Products, initialize=supply_init, doc=translate("Oferta disponível por (Origem, Produto)", lang))
-
-        def total_capacity_init(model, d):
-            return demand_total_capacity.get(d, 0.0)
-        model.TotalCapacity = pyo.Param(model.Destinations, initialize=total_capacity_init, doc=translate("Capacidade estática total do armazém (ton)", lang))
-
-        def initial_inventory_init(model, d):
-            return demand_initial_inventory.get(d, 0.0)
-        model.InitialInventory = pyo.Param(model.Destinations, initialize=initial_inventory_init, doc=translate("Estoque inicial presente no armazém (ton)", lang))
-
-        # --- Parâmetros de Custos e Distâncias ---
-        def dist_init(model, o, d):
-            return distance.get((o, d), 999999.0)
-        model.Distance = pyo.Param(model.Origins, model.Destinations, initialize=dist_init, doc=translate("Distância entre Origem e Destino (km)", lang))
-
-        def freight_init(model, o):
-            return freight_cost.get(o, avg_freight)
-        model.Freight = pyo.Param(model.Origins, initialize=freight_init, doc=translate("Custo unitário de frete (R$/ton-km) a partir da Origem", lang))
-
-        def storage_init(model, d, p):
-            return storage_cost.get((d, p), 50.0)
-        model.Storage = pyo.Param(model.Destinations, model.Products, initialize=storage_init, doc=translate("Tarifa de armazenagem no Destino para o Produto (R$/ton)", lang))
+def run_optimization_model(df_supply, df_demand, df_compat, df_dist, df_freight, df_storage, detailed_log=False,
+                           toggle_pareto=False, toggle_min_max_capacity=False, input_min_load=None, input_max_load=None,
+                           toggle_use_reception=False, input_allocation_days=None, input_min_freight=None, input_max_freight=None, lang="pt",
+                           backend="pyomo", milp_warmstart=True, solver_settings=None, decompose=False,
+                           log_filename=None, pruning=None, coarsen=False):
+    """
+    Runs the linear optimization mathematical model for product allocation.
 
-        # --- Penalty Parameters (Big M) ---
-        # We calculate a dynamic Big M based on maximum system costs
-        max_freight = max(freight_cost.values()) if freight_cost else 0.0
-        max_dist = max(distance.values()) if distance else 0.0
-        max_storage = max(storage_cost.values()) if storage_cost else 0.0
-
-        # Big M da Capacidade: ordens de grandeza maior que o custo de transportar e armazenar
-        val_big_m_cap = (max_freight * max_dist + max_storage) * 1000
-        if val_big_m_cap == 0:
-            val_big_m_cap = 10000
-
-        # Unallocated Big M: must be even higher than lack of capacity, forcing allocation whenever possible
-        val_big_m_unalloc = val_big_m_cap * 10
-
-        print(translate("Valor dinâmico para Big_M (Capacidade Artificial): {val:.2e}", lang).format(val=val_big_m_cap))
-        print(translate("Valor dinâmico para Big_M (Oferta Não Alocada): {val:.2e}", lang).format(val=val_big_m_unalloc))
-
-        model.BigMCapacity = pyo.Param(initialize=val_big_m_cap, doc=translate("Custo de penalização por tonelada de capacidade artificial", lang))
-        model.BigMUnallocated = pyo.Param(initialize=val_big_m_unalloc, doc=translate("Custo de penalização por tonelada de oferta não alocada", lang))
-
-        # =========================================================================
-        # 2.3 DECISION VARIABLES
-        # =========================================================================
-        # Values the solver will attempt to determine to optimize the result.
-
-        # Fluxo de produto (quantidade a ser transportada) em toneladas
-        model.Flow = pyo.Var(model.ValidRoutes, domain=pyo.NonNegativeReals, doc=translate("Quantidade transportada (o, d, p)", lang))
-
-        # Slack variables (Dummies) to ensure mathematical viability of the model
-        model.DummyCapacity = pyo.Var(model.Destinations, domain=pyo.NonNegativeReals, doc=translate("Capacidade extra artificial alocada (ton)", lang))
-        model.DummyUnallocated = pyo.Var(model.Origins, model.Products, domain=pyo.NonNegativeReals, doc=translate("Oferta não alocada a nenhum destino (ton)", lang))
-
-        # =========================================================================
-        # 2.4 OBJECTIVE FUNCTION
-        # =========================================================================
-        # Mathematical expression to be minimized (Minimize Costs).
-
-        def objective_rule(model):
-            # Custo normal do sistema = (Custo de Frete) + (Custo de Armazenagem)
-            normal_costs = sum(
-                (model.Flow[o, d, p] * model.Distance[o, d] * model.Freight[o]) +
-                (model.Flow[o, d, p] * model.Storage[d, p])
-                for (o, d, p) in model.ValidRoutes
-            )
+    toggle_pareto prunes the routes of each (origin, product) to the 20% closest destinations;
+    pruning sets another rule for it from src.logic.route_pruning (k nearest, percentile or radius,
+    by distance or by unit cost), e.g. {"method": "nearest", "value": 5, "score": "cost"}.
+
+    backend selects how the pure LP (no MILP options) is built: "pyomo" builds the Pyomo model,
+    "sparse" assembles the constraint matrix directly from NumPy arrays and "network" solves it as a
+    min-cost flow without CBC, "column_generation" solves it with CBC on a small set of routes grown
+    by their reduced costs (see src.logic.column_generation), with the same optimum.
+    MILP runs use Pyomo and CBC, on the whole model or, with "kernel_search", on restricted models of
+    the most promising routes within the time limit (see src.logic.kernel_search; the best solution
+    found has status "feasible", the LP relaxation as its bound, "complete" or "time_budget" in
+    results_dict["model_stats"]["kernel_search"] and the bound of the last restricted MILP in
+    results_dict["model_stats"]["kernel_restricted_bound"]). With "heuristic" both return the greedy
+    allocation of src.logic.heuristic without a solver (results_dict["heuristic"] is True, status
+    "feasible"); the other backends run it first as a preview, in the run log and in
+    results_dict["kpis"]["heuristic_objective"].
+    milp_warmstart gives CBC a feasible initial solution for MILP runs (see _milp_warm_start).
+    solver_settings sets the CBC threads, gaps, time limit, presolve, cuts and seed (see normalize_solver_settings);
+    the settings used are recorded in results_dict["solver_settings"].
+    decompose solves each connected component of the route graph as its own model, in parallel
+    (see src.logic.decomposition); the merged result is the same as solving the whole model.
+    coarsen solves the pure LP on super-nodes of the warehouses of the same municipality, type and
+    tariffs and splits their inflow among the warehouses with a local LP (see src.logic.coarsening);
+    the result has status "feasible" and its optimality gap to the coarse optimum in
+    results_dict["kpis"]["coarsening_gap"] (percent).
+    log_filename is an existing file of the log directory to write the run log to, for callers
+    that follow the solver progress while the model is running (see src.logic.solver_progress);
+    by default each run creates its own log file.
+    results_dict["timings"] has the seconds spent in each phase of the run (see PHASE_LABELS) and
+    results_dict["model_stats"] the size of the model solved (valid routes, variables, constraints, nonzeros).
+    The peak memory (MB) and CPU time (s) of the Python process and of the solver are recorded in
+    results_dict["kpis"]; runs crossing the memory ceilings of src.logic.resource_monitor end in error.
+    """
+    # Start of the timer to measure total time from call to solution
+    start_time = time.time()
+
+    # 1. Data preparation
+    prep_start = time.perf_counter()
+    data = prepare_model_data(df_supply, df_demand, df_compat, df_dist, df_freight, df_storage, lang=lang)
+    timings = {"data_prep": time.perf_counter() - prep_start}
+
+    return run_prepared_model(
+        data, detailed_log=detailed_log, toggle_pareto=toggle_pareto,
+        toggle_min_max_capacity=toggle_min_max_capacity, input_min_load=input_min_load, input_max_load=input_max_load,
+        toggle_use_reception=toggle_use_reception, input_allocation_days=input_allocation_days,
+        input_min_freight=input_min_freight, input_max_freight=input_max_freight, lang=lang,
+        backend=backend, start_time=start_time, milp_warmstart=milp_warmstart, solver_settings=solver_settings,
+        decompose=decompose, log_filename=log_filename, timings=timings, pruning=pruning, coarsen=coarsen
+    )
+
+def run_prepared_model(data, detailed_log=False, toggle_pareto=False, toggle_min_max_capacity=False, input_min_load=None,
+                       input_max_load=None, toggle_use_reception=False, input_allocation_days=None, input_min_freight=None,
+                       input_max_freight=None, lang="pt", backend="pyomo", start_time=None, session=None,
+                       milp_warmstart=True, solver_settings=None, decompose=False, log_filename=None, timings=None,
+                       pruning=None, coarsen=False):
+    """
+    Runs the model on data already converted by prepare_model_data.
 
-            # Penalty cost for violating logical constraints
-            dummy_capacity_costs = sum(model.DummyCapacity[d] * model.BigMCapacity for d in model.Destinations)
-            dummy_unallocated_costs = sum(model.DummyUnallocated[o, p] * model.BigMUnallocated for o in model.Origins for p in model.Products)
+    session is an optional ScenarioSession (see src.logic.scenario_session). When the model it holds
+    has the same structure as this run, only the parameters are updated and the model is re-solved.
+    timings holds the phases already measured by the caller (the data preparation).
+    Returns (log_filename, results_dict).
+    """
+    if start_time is None:
+        start_time = time.time()
 
-            return normal_costs + dummy_capacity_costs + dummy_unallocated_costs
+    settings = normalize_solver_settings(solver_settings)
 
-        model.Objective = pyo.Objective(rule=objective_rule, sense=pyo.minimize, doc=translate("Minimização dos Custos Totais", lang))
+    # 2. Despacho: LP ou MILP
+    use_milp = needs_milp(toggle_min_max_capacity, input_min_load, input_max_load, toggle_use_reception,
+                          input_min_freight, input_max_freight)
 
-        # =========================================================================
-        # 2.5 CONSTRAINTS
-        # =========================================================================
-        # Rules that decision variables must strictly obey.
+    if use_milp:
+        log_filename, results_dict = _run_milp_optimization_model(
+            start_time=start_time,
+            **data,
+            detailed_log=detailed_log,
+            input_min_load=input_min_load, input_max_load=input_max_load,
+            toggle_use_reception=toggle_use_reception, input_allocation_days=input_allocation_days,
+            input_min_freight=input_min_freight, input_max_freight=input_max_freight,
+            toggle_pareto=toggle_pareto, milp_warmstart=milp_warmstart, backend=backend,
+            solver_settings=settings, lang=lang, session=session, decompose=decompose, log_filename=log_filename,
+            timings=timings, pruning=pruning, coarsen=coarsen
+        )
+    else:
+        log_filename, results_dict = _run_lp_optimization_model(
+            start_time=start_time,
+            supply=data["supply"], demand_total_capacity=data["demand_total_capacity"],
+            demand_initial_inventory=data["demand_initial_inventory"], cda_to_name=data["cda_to_name"],
+            prod_dest_compat=data["prod_dest_compat"], distance=data["distance"],
+            freight_cost=data["freight_cost"], storage_cost=data["storage_cost"], avg_freight=data["avg_freight"],
+            all_products=data["all_products"], origins_list=data["origins_list"],
+            detailed_log=detailed_log, toggle_pareto=toggle_pareto, backend=backend,
+            solver_settings=settings, lang=lang, session=session, decompose=decompose, log_filename=log_filename,
+            timings=timings, pruning=pruning, coarsen=coarsen, dest_municipality=data.get("dest_municipality"),
+            dest_type=data.get("dest_type")
+        )
 
-        # Constraint 1: Flow Conservation (Supply Limit)
-        # The total available supply in an origin for a product MUST be routed,
-        # whether via actual allocation (Flow) or slack (DummyUnallocated).
-        def supply_rule(model, o, p):
-            if model.Supply[o, p] <= 0:
-                return pyo.Constraint.Skip
+    results_dict["solver_settings"] = settings
+    return log_filename, results_dict
 
-            valid_dests = [d for d in model.Destinations if (o, d, p) in model.ValidRoutes]
-            if not valid_dests:
-                # There are no valid routes, all supply goes to the dummy variable
-                return model.DummyUnallocated[o, p] == model.Supply[o, p]
+def _run_lp_optimization_model(start_time, supply, demand_total_capacity, demand_initial_inventory, cda_to_name,
+                               prod_dest_compat, distance, freight_cost, storage_cost, avg_freight,
+                               all_products, origins_list, detailed_log, toggle_pareto=False, backend="pyomo", lang="pt",
+                               session=None, solver_settings=None, decompose=False, log_filename=None, timings=None,
+                               pruning=None, coarsen=False, dest_municipality=None, dest_type=None):
+    """
+    Versão LP do modelo (sem limites logísticos).
+    """
+    # 2. Model Construction (Original LP)
 
-            flow_sum = sum(model.Flow[o, d, p] for d in valid_dests)
-            return flow_sum + model.DummyUnallocated[o, p] == model.Supply[o, p]
+    # Log written directly to a temporary file on disk (to avoid Out of Memory)
+    log = RunLog.open('optimization_log_', log_filename)
+    log.timings.update(timings or {})
 
-        model.SupplyConstraint = pyo.Constraint(model.Origins, model.Products, rule=supply_rule, doc=translate("Restrição de Limite de Oferta", lang))
+    # Variables to hold structured results
+    results_dict = new_results_dict()
+    results_dict["model_class"] = "lp"
+    monitor = ResourceMonitor().start()
 
-        # Constraint 2: Warehouse Capacity Limit
-        # The total quantity arriving at a destination cannot exceed its real available capacity.
-        # Available Capacity = (Total Capacity - Initial Inventory)
-        # If the solver has no alternative, it will use DummyCapacity paying the penalty.
-        def capacity_rule(model, d):
-            valid_ops = [(o, p) for o in model.Origins for p in model.Products if (o, d, p) in model.ValidRoutes]
-            if not valid_ops:
-                return pyo.Constraint.Skip
+    try:
+        log.print(translate("Iniciando a construção do modelo matemático...", lang))
 
-            flow_sum = sum(model.Flow[o, d, p] for (o, p) in valid_ops)
+        destinations_list = list(demand_total_capacity.keys())
 
-            # Tratamento para evitar capacidade efetiva negativa caso estoque inicial > total
-            # Extracting numerical value to allow boolean verification
-            effective_cap = max(0.0, pyo.value(model.TotalCapacity[d]) - pyo.value(model.InitialInventory[d]))
+        # [PERFORMANCE BEST PRACTICE]
+        # We pre-filter valid routes in Python before creating decision variables.
+        # This avoids the 'combinatorial explosion' of empty variables in the solver, improving
+        # significantly memory usage and optimization speed.
+        if toggle_pareto:
+            _print_pruning(pruning or PARETO_PRUNING, log, lang)
+        with log.timed("routes"):
+            valid_routes = build_valid_routes(origins_list, destinations_list, all_products,
+                                              distance, prod_dest_compat, toggle_pareto, pruning=pruning,
+                                              freight_cost=freight_cost, avg_freight=avg_freight, storage_cost=storage_cost)
+        log.model_stats["valid_routes"] = len(valid_routes)
+        log.print(translate("Total de combinações (Origem x Destino x Produto) válidas: {val}", lang).format(val=len(valid_routes)))
 
-            if effective_cap > 0:
-                return flow_sum <= (model.TotalCapacity[d] - model.InitialInventory[d]) + model.DummyCapacity[d]
-            else:
-                # If there is effectively no capacity, the warehouse can only receive load generating Dummy
-                return flow_sum <= model.DummyCapacity[d]
-
-        model.CapacityConstraint = pyo.Constraint(model.Destinations, rule=capacity_rule, doc=translate("Restrição de Limite de Capacidade Efetiva", lang))
-
-        # Show the model for debug only if requested by the user
-        if detailed_log:
-            model.pprint()
-
-        # 3. Solucionar o modelo
-        print("\n" + translate("Chamando solver CBC...", lang))
-        solver = SolverFactory('cbc')
-        # Time limit to prevent infinite locking
-        solver.options['sec'] = 600
-
-        results = solver.solve(model, tee=True)
-
-        print("\n" + translate("=== STATUS DA OTIMIZAÇÃO ===", lang))
-        print(translate("Status do Solver: {status}", lang).format(status=results.solver.status))
-        print(translate("Condição de Término: {condition}", lang).format(condition=results.solver.termination_condition))
-
-        if results.solver.status == pyo.SolverStatus.ok and results.solver.termination_condition == pyo.TerminationCondition.optimal:
-            print(translate("Solução Ótima Encontrada!", lang))
-
-            objective_value = pyo.value(model.Objective)
-            print(translate("Custo Total (Função Objetivo): R$ {val:,.2f}", lang).format(val=objective_value))
-
-            results_dict["status"] = "optimal"
-            results_dict["objective"] = objective_value
-
-            print("\n" + translate("--- DETALHES DO FLUXO (Alocação) ---", lang))
-            total_transported = 0
-            total_km = 0.0
-            total_freight_cost = 0.0
-            total_storage_cost = 0.0
-
-            for (o, d, p) in model.ValidRoutes:
-                val = pyo.value(model.Flow[o, d, p])
-                if val > 0.001:  # ignore floating point zeros
-                    d_name = cda_to_name.get(d, d)
-                    dist = pyo.value(model.Distance[o, d])
-                    f_cost = pyo.value(model.Freight[o])
-                    s_cost = pyo.value(model.Storage[d, p])
-
-                    route_freight = val * dist * f_cost
-                    route_storage = val * s_cost
-                    route_total = route_freight + route_storage
-
-                    print(translate("De: {o} | Para: {d} | Produto: {p} | Qtd: {val:.2f} ton", lang).format(o=o, d=d_name, p=p, val=val))
-
-                    results_dict["routes"].append({
-                        "Origem": o,
-                        "Destino": d_name,
-                        "Produto": p,
-                        "Quantidade (ton)": val,
-                        "Distancia (km)": dist,
-                        "Custo Frete (R$)": route_freight,
-                        "Custo Armazenagem (R$)": route_storage,
-                        "Custo Total (R$)": route_total,
-                        "Custo Frete Unitario (R$/ton-km)": f_cost,
-                        "Custo Armaz. Unitario (R$/ton)": s_cost
-                    })
-
-                    total_transported += val
-                    total_km += dist
-                    total_freight_cost += route_freight
-                    total_storage_cost += route_storage
-
-            print("\n" + translate("Total de produtos alocados: {val:.2f} toneladas", lang).format(val=total_transported))
-
-            results_dict["kpis"]["total_tons"] = total_transported
-            results_dict["kpis"]["total_km"] = total_km
-            results_dict["kpis"]["total_freight_cost"] = total_freight_cost
-            results_dict["kpis"]["total_storage_cost"] = total_storage_cost
-
-            # Check usage of Dummy variables
-            dummy_cap_used = False
-            print("\n" + translate("--- AVISOS: CAPACIDADE ARTIFICIAL (DUMMIES) ---", lang))
-            for d in model.Destinations:
-                d_val = pyo.value(model.DummyCapacity[d])
-                if d_val > 0.001:
-                    dummy_cap_used = True
-                    d_name = cda_to_name.get(d, d)
-                    msg = translate("O Armazém \'{d_name}\' precisou de capacidade de armazenamento artificial de {d_val:.2f} toneladas.", lang).format(d_name=d_name, d_val=d_val)
-                    print(translate("ALERTA: {msg}", lang).format(msg=msg))
-                    results_dict["warnings"]["capacity"].append(msg)
-
-            if not dummy_cap_used:
-                print(translate("Nenhuma capacidade artificial foi necessária. O modelo encontrou solução com as capacidades reais.", lang))
-
-            dummy_unalloc_used = False
-            print("\n" + translate("--- AVISOS: OFERTA SEM ROTAS / NÃO ALOCADA (DUMMIES) ---", lang))
-            for o in model.Origins:
-                for p in model.Products:
-                    u_val = pyo.value(model.DummyUnallocated[o, p])
-                    if u_val > 0.001:
-                        dummy_unalloc_used = True
-                        msg = translate("A origem \'{o}\' possui oferta de \'{p}\' não alocada: {u_val:.2f} toneladas.", lang).format(o=o, p=p, u_val=u_val)
-                        print(translate("ALERTA: {msg}", lang).format(msg=msg))
-                        results_dict["warnings"]["unallocated"].append(msg)
-
-            if not dummy_unalloc_used:
-                print(translate("Toda a oferta conseguiu ser escoada em rotas válidas para algum destino.", lang))
-
-            if dummy_cap_used or dummy_unalloc_used:
-                print("\n" + translate("Nota: Foram utilizadas variáveis dummies com custo elevado para impedir que o modelo falhasse por inviabilidade.", lang))
-                print(translate("Custo de Capacidade Artificial (Big M) = {val:.2e}", lang).format(val=pyo.value(model.BigMCapacity)))
-                print(translate("Custo de Oferta Não Alocada (Big M) = {val:.2e}", lang).format(val=pyo.value(model.BigMUnallocated)))
+        # --- Penalty Parameters (Big M) ---
+        # We calculate a dynamic Big M based on maximum system costs
+        val_big_m_cap, val_big_m_unalloc = compute_big_m_penalties(freight_cost, distance, storage_cost)
+        log.print(translate("Valor dinâmico para Big_M (Capacidade Artificial): {val:.2e}", lang).format(val=val_big_m_cap))
+        log.print(translate("Valor dinâmico para Big_M (Oferta Não Alocada): {val:.2e}", lang).format(val=val_big_m_unalloc))
+
+        lp_inputs = dict(
+            origins_list=origins_list, destinations_list=destinations_list, all_products=all_products,
+            valid_routes=valid_routes, supply=supply,
+            demand_total_capacity=demand_total_capacity, demand_initial_inventory=demand_initial_inventory,
+            distance=distance, freight_cost=freight_cost, avg_freight=avg_freight, storage_cost=storage_cost,
+            big_m_cap=val_big_m_cap, big_m_unalloc=val_big_m_unalloc
+        )
 
+        # Products only meet in the capacities of the LP, so interchangeable ones are solved as one
+        model_inputs = lp_inputs
+        lp_inputs, plan = _presolve(lp_inputs, log, aggregate_products=True, lang=lang)
+
+        settings = solver_settings or normalize_solver_settings()
+        _print_solver_settings(settings, log, lang)
+
+        # Instant allocation: the answer of the heuristic backend, a preview while the solver runs otherwise
+        preview = _heuristic_preview(lp_inputs, log, results_dict, lang=lang)
+
+        if backend == "kernel_search":
+            # Without logistics limits there are no trips or activations to branch on
+            log.print(translate("Sem limites logísticos não há variáveis inteiras: o LP é resolvido pelo modelo completo.", lang))
+            backend = "pyomo"
+
+        # Coarse model on super-nodes of neighbouring warehouses, refined after the solve
+        full_inputs, coarse_plan = lp_inputs, None
+        if coarsen and backend != "heuristic":
+            lp_inputs, coarse_plan = _coarsen(lp_inputs, dest_municipality, dest_type, log, lang)
+
+        components = route_components(lp_inputs["valid_routes"]) if decompose and backend != "heuristic" else []
+        if backend == "heuristic":
+            solution = preview
+        elif len(components) > 1:
+            solve = functools.partial(_solve_lp_component, backend=backend, detailed_log=detailed_log, lang=lang)
+            solution = _solve_decomposed(solve, components, lp_inputs, settings, log, lang)
+        elif backend != "pyomo":
+            solution = _solve_lp_component(lp_inputs, settings, log, backend=backend, detailed_log=detailed_log, lang=lang)
         else:
-            print(translate("Não foi possível encontrar uma solução ótima. O modelo pode estar mal-condicionado.", lang))
-            results_dict["status"] = "infeasible"
-            results_dict["warnings"]["general"].append(translate("O modelo não encontrou solução ótima.", lang))
+            with log.timed("model_build"):
+                key = model_structure_key("lp", lp_inputs["valid_routes"], lp_inputs["supply"], lp_inputs["distance"],
+                                          freight_cost, avg_freight, lp_inputs["destinations_list"])
+                model, reused = _session_model(
+                    session, key,
+                    build=lambda: _build_lp_model(lang=lang, **lp_inputs),
+                    update=lambda m: _update_lp_params(m, lp_inputs["demand_total_capacity"], lp_inputs["demand_initial_inventory"],
+                                                       lp_inputs["storage_cost"], val_big_m_cap, val_big_m_unalloc),
+                    frame=model_frame_key("lp", lp_inputs["origins_list"], lp_inputs["destinations_list"], lp_inputs["all_products"]),
+                    patch=lambda m: _patch_session_model(m, lp_inputs["valid_routes"], lp_inputs["supply"], lp_inputs["distance"],
+                                                         freight_cost, avg_freight, log, lang)
+                )
+            _print_session_reuse(reused, log, lang)
+            results_dict["session_reused"] = bool(reused)
+
+            monitor.check()
+            solution = _solve_lp_model(model, log, detailed_log=detailed_log, solver_settings=settings, lang=lang)
+
+        # A solver terminated at a memory ceiling is an error, not an infeasible model
+        monitor.check()
+
+        if coarse_plan is not None:
+            solution = _refine(solution, coarse_plan, full_inputs, settings, log, results_dict, backend=backend, lang=lang)
+            monitor.check()
+
+        with log.timed("reporting"):
+            solution = postsolve_solution(solution, plan)
+            _report_lp_result(
+                results_dict, solution, log,
+                origins_list=origins_list, destinations_list=destinations_list, all_products=all_products,
+                distance=distance, freight_cost=freight_cost, avg_freight=avg_freight, storage_cost=storage_cost,
+                big_m_cap=val_big_m_cap, big_m_unalloc=val_big_m_unalloc, cda_to_name=cda_to_name, lang=lang
+            )
+        if results_dict["status"] == "optimal":
+            with log.timed("sensitivity"):
+                _report_sensitivity(results_dict, solution, model_inputs, log, cda_to_name, settings, lang=lang)
 
     except Exception as e:
-        print("\n" + translate("ERRO DURANTE A OTIMIZAÇÃO: {err}", lang).format(err=str(e)))
         results_dict["status"] = "error"
-        results_dict["warnings"]["general"].append(translate("Erro: {err}", lang).format(err=str(e)))
-        import traceback
-        # print_exc defaults to sys.stderr. Let's print formatting to sys.stdout
-        # so it gets caught in our buffer!
-        print(traceback.format_exc())
+        if monitor.exceeded is not None:
+            # The monitor terminated the solver: report the ceiling rather than the failure it caused
+            message = _memory_limit_message(monitor.exceeded, lang)
+            log.print("\n" + message)
+            results_dict["warnings"]["general"].append(message)
+        else:
+            log.print("\n" + translate("ERRO DURANTE A OTIMIZAÇÃO: {err}", lang).format(err=str(e)))
+            results_dict["warnings"]["general"].append(translate("Erro: {err}", lang).format(err=str(e)))
+            import traceback
+            # print_exc defaults to sys.stderr, the traceback goes to the run log instead
+            log.print(traceback.format_exc())
 
     finally:
+        monitor.stop()
+        results_dict["kpis"].update(monitor.kpis())
+        results_dict["timings"] = dict(log.timings)
+        results_dict["model_stats"] = dict(log.model_stats)
+        _print_run_profile(log, results_dict["kpis"], lang)
+
         # Registrar tempo total e imprimir no log
         end_time = time.time()
         total_time_seconds = end_time - start_time
-        print("\n" + translate("Tempo de execução: {val:.2f} segundos.", lang).format(val=total_time_seconds))
+        log.print("\n" + translate("Tempo de execução: {val:.2f} segundos.", lang).format(val=total_time_seconds))
 
         # Adds time to the results dictionary
         results_dict["kpis"]["execution_time"] = total_time_seconds
 
-        # Close the temporary log file and restore stdout
-        new_stdout.close()
-        sys.stdout = old_stdout
+        # Close the temporary log file
+        log.close()
 
     # Retornar o nome do arquivo de log salvo e os dados estruturados
-    return log_filename, results_dict
+    return log.filename, results_dict
 
-def _run_milp_optimization_model(start_time, supply, demand_total_capacity, demand_initial_inventory,
-                                 demand_reception_capacity, is_public, cda_to_name,
-                                 prod_dest_compat, distance, freight_cost, storage_cost, avg_freight,
-                                 all_products, origins_list, detailed_log,
-                                 input_min_load, input_max_load, toggle_use_reception,
-                                 input_allocation_days, input_min_freight, input_max_freight, toggle_pareto=False, lang="pt"):
+def _build_lp_model(origins_list, destinations_list, all_products, valid_routes, supply,
+                    demand_total_capacity, demand_initial_inventory, distance, freight_cost, avg_freight,
+                    storage_cost, big_m_cap, big_m_unalloc, reception_max=None, days=1.0, lang="pt"):
     """
-    Versão MILP do modelo, inclui restrições extras e variáveis binárias (RouteActive).
+    Builds the LP allocation model with Pyomo.
+    Capacities, storage tariffs and penalties are mutable Params, so a built model can be
+    re-solved after parameter changes without being rebuilt (see src.logic.scenario_session).
+    reception_max (tons per day by destination, None for no limit) adds the maximum reception over
+    `days` of the MILP, with its artificial reception, for the runs whose limits are all linear
+    (see needs_integer_variables).
     """
+    model = pyo.ConcreteModel(name="Alocacao_Armazens")
 
-    # Calculate days multiplier
-    try:
-        days = float(input_allocation_days) if input_allocation_days else 1.0
-    except:
-        days = 1.0
+    # =========================================================================
+    # 2.1 CONJUNTOS (SETS)
+    # =========================================================================
+    # Defines the indices over which the model will operate.
 
-    # Parse numeric limits
-    def parse_float(val):
-        if val is None or str(val).strip() == "":
-            return None
-        try:
-            return float(val)
-        except:
-            return None
+    model.Origins = pyo.Set(initialize=origins_list, doc=translate("Cidades de Origem da Oferta", lang))
+    model.Destinations = pyo.Set(initialize=destinations_list, doc=translate("Armazéns de Destino", lang))
+    model.Products = pyo.Set(initialize=all_products, doc=translate("Tipos de Produtos", lang))
+    model.ValidRoutes = pyo.Set(initialize=valid_routes, dimen=3, doc=translate("Rotas Válidas (Origem, Destino, Produto)", lang))
 
-    carga_min = parse_float(input_min_load)
-    carga_max = parse_float(input_max_load)
-    frete_min = parse_float(input_min_freight)
-    frete_max = parse_float(input_max_freight)
-
-    # Redirecionar output
-    old_stdout = sys.stdout
-    log_dir = os.path.join(tempfile.gettempdir(), 'granum_logs')
-    os.makedirs(log_dir, exist_ok=True)
-
-    now = time.time()
-    for filename in os.listdir(log_dir):
-        filepath = os.path.join(log_dir, filename)
-        if os.path.isfile(filepath):
-            if os.stat(filepath).st_mtime < now - 3600:
-                try:
-                    os.remove(filepath)
-                except Exception:
-                    pass
+    # Adjacency indexes built once, so each rule below is linear in its own routes
+    routes_by_origin_product, routes_by_destination = build_route_indexes(valid_routes)
 
-    log_fd, log_path = tempfile.mkstemp(suffix='.txt', prefix='optimization_log_milp_', dir=log_dir)
-    log_filename = os.path.basename(log_path)
-    new_stdout = os.fdopen(log_fd, 'w', encoding='utf-8')
-    sys.stdout = new_stdout
+    # =========================================================================
+    # 2.2 PARÂMETROS (PARAMETERS)
+    # =========================================================================
+    # Valores fixos conhecidos fornecidos como dados de entrada para o modelo.
 
-    results_dict = {
-        "status": "error",
-        "objective": 0.0,
-        "routes": [],
-        "kpis": {
-            "total_tons": 0.0,
-            "total_km": 0.0,
-            "total_freight_cost": 0.0,
-            "total_storage_cost": 0.0,
-            "execution_time": 0.0
-        },
-        "warnings": {
-            "capacity": [],
-            "unallocated": [],
-            "general": []
-        }
-    }
+    _add_common_params(model, supply, demand_total_capacity, demand_initial_inventory, distance,
+                       freight_cost, avg_freight, storage_cost, big_m_cap, big_m_unalloc, lang)
 
-    try:
-        print(translate("Iniciando a construção do modelo matemático (MILP com restrições de limite)...", lang))
-        model = pyo.ConcreteModel(name="Alocacao_Armazens_MILP")
-
-        # =========================================================================
-        # 3.1 CONJUNTOS (SETS)
-        # =========================================================================
-        # Defines the indices over which the model will operate.
-        model.Origins = pyo.Set(initialize=origins_list, doc=translate("Cidades de Origem da Oferta", lang))
-        model.Destinations = pyo.Set(initialize=list(demand_total_capacity.keys()), doc=translate("Armazéns de Destino", lang))
-        model.Products = pyo.Set(initialize=all_products, doc=translate("Tipos de Produtos", lang))
-
-        valid_routes = []
-        for o in model.Origins:
-            for p in model.Products:
-                compatible_dests = []
-                # Reúne todos os destinos válidos para esta origem e produto
-                for d in model.Destinations:
-                    if (o, d) in distance and prod_dest_compat.get((p, d), False):
-                        dist_val = distance[(o, d)]
-                        # Armazena apenas a distância para o Pareto
-                        compatible_dests.append((d, dist_val))
-
-                if compatible_dests:
-                    if toggle_pareto:
-                        # Ordena pela menor distância
-                        compatible_dests.sort(key=lambda x: x[1])
-                        # Aplica a regra 80/20, arredondando sempre para cima
-                        limit = max(1, math.ceil(len(compatible_dests) * 0.20))
-                        compatible_dests = compatible_dests[:limit]
-
-                    # Adiciona os destinos filtrados às rotas válidas
-                    for d, _ in compatible_dests:
-                        valid_routes.append((o, d, p))
-
-        print(translate("Total de combinações (Origem x Destino x Produto) válidas: {val}", lang).format(val=len(valid_routes)))
-        model.ValidRoutes = pyo.Set(initialize=valid_routes, dimen=3, doc=translate("Rotas Válidas (Origem, Destino, Produto)", lang))
-
-        # =========================================================================
-        # 3.2 PARÂMETROS (PARAMETERS)
-        # =========================================================================
-        # Valores fixos conhecidos fornecidos como dados de entrada para o modelo.
-
-        # --- Constants and Logistics Limit Parameters ---
-        model.Days = pyo.Param(initialize=days, within=pyo.Any, doc=translate("Dias de alocação", lang))
-        model.FreightMin = pyo.Param(initialize=frete_min, within=pyo.Any, doc=translate("Carga mínima de frete por rota", lang))
-        model.FreightMax = pyo.Param(initialize=frete_max, within=pyo.Any, doc=translate("Carga máxima de frete por rota", lang))
-
-        def reception_min_init(model, d):
-            return carga_min
-        model.ReceptionMin = pyo.Param(model.Destinations, initialize=reception_min_init, within=pyo.Any, doc=translate("Carga mínima diária de recepção", lang))
+    # =========================================================================
+    # 2.3 DECISION VARIABLES
+    # =========================================================================
+    # Values the solver will attempt to determine to optimize the result.
+
+    # Fluxo de produto (quantidade a ser transportada) em toneladas
+    model.Flow = pyo.Var(model.ValidRoutes, domain=pyo.NonNegativeReals, doc=translate("Quantidade transportada (o, d, p)", lang))
+
+    # Slack variables (Dummies) to ensure mathematical viability of the model
+    model.DummyCapacity = pyo.Var(model.Destinations, domain=pyo.NonNegativeReals, doc=translate("Capacidade extra artificial alocada (ton)", lang))
+    model.DummyUnallocated = pyo.Var(model.SupplyPairs, domain=pyo.NonNegativeReals, doc=translate("Oferta não alocada a nenhum destino (ton)", lang))
+
+    with_reception = reception_max is not None and any(val is not None for val in reception_max.values())
+    if with_reception:
+        model.Days = pyo.Param(initialize=days, mutable=True, within=pyo.Any, doc=translate("Dias de alocação", lang))
 
         def reception_max_init(model, d):
-            if toggle_use_reception:
-                return demand_reception_capacity.get(d, 0.0)
-            elif carga_max is not None:
-                return carga_max
+            return reception_max.get(d)
+        model.ReceptionMax = pyo.Param(model.Destinations, initialize=reception_max_init, mutable=True, within=pyo.Any, doc=translate("Carga máxima diária de recepção ou capacidade do banco", lang))
+        model.DummyReception = pyo.Var(model.Destinations, domain=pyo.NonNegativeReals, doc=translate("Capacidade de recepção diária extra artificial alocada (ton)", lang))
+
+    # =========================================================================
+    # 2.4 OBJECTIVE FUNCTION
+    # =========================================================================
+    # Mathematical expression to be minimized (Minimize Costs).
+
+    _add_route_cost(model, lang)
+
+    def objective_rule(model):
+        # Custo normal do sistema = (Custo de Frete) + (Custo de Armazenagem)
+        normal_costs = model.RouteCost
+
+        # Penalty cost for violating logical constraints
+        dummy_capacity_costs = pyo.quicksum(model.DummyCapacity[d] for d in model.Destinations) * model.BigMCapacity
+        dummy_unallocated_costs = pyo.quicksum(model.DummyUnallocated[o, p] for (o, p) in model.SupplyPairs) * model.BigMUnallocated
+        if with_reception:
+            dummy_capacity_costs += pyo.quicksum(model.DummyReception[d] for d in model.Destinations) * (model.BigMCapacity * 0.1)
+
+        return normal_costs + dummy_capacity_costs + dummy_unallocated_costs
+
+    model.Objective = pyo.Objective(rule=objective_rule, sense=pyo.minimize, doc=translate("Minimização dos Custos Totais", lang))
+    _add_lexicographic_objectives(model, lang)
+
+    # =========================================================================
+    # 2.5 CONSTRAINTS
+    # =========================================================================
+    # Rules that decision variables must strictly obey.
+
+    _add_supply_and_capacity_constraints(model, routes_by_origin_product, routes_by_destination, lang)
+    if with_reception:
+        _add_max_reception_constraint(model, reception_max, routes_by_destination, lang)
+
+    return model
+
+def _add_common_params(model, supply, demand_total_capacity, demand_initial_inventory, distance,
+                       freight_cost, avg_freight, storage_cost, big_m_cap, big_m_unalloc, lang="pt"):
+    """
+    Supply, capacity, cost and penalty parameters shared by the LP and MILP models.
+    """
+    # --- Parâmetros de Oferta e Demanda ---
+    def supply_init(model, o, p):
+        return supply.get((o, p), 0.0)
+    model.Supply = pyo.Param(model.Origins, model.Products, initialize=supply_init, mutable=True, doc=translate("Oferta disponível por (Origem, Produto)", lang))
+
+    # Only pairs with supply need a slack: the others have nothing to leave unallocated
+    supply_pairs = [(o, p) for o in model.Origins for p in model.Products if supply.get((o, p), 0.0) > 0]
+    model.SupplyPairs = pyo.Set(initialize=supply_pairs, dimen=2, doc=translate("Pares (Origem, Produto) com oferta", lang))
+
+    def total_capacity_init(model, d):
+        return demand_total_capacity.get(d, 0.0)
+    model.TotalCapacity = pyo.Param(model.Destinations, initialize=total_capacity_init, mutable=True, doc=translate("Capacidade estática total do armazém (ton)", lang))
+
+    def initial_inventory_init(model, d):
+        return demand_initial_inventory.get(d, 0.0)
+    model.InitialInventory = pyo.Param(model.Destinations, initialize=initial_inventory_init, mutable=True, doc=translate("Estoque inicial presente no armazém (ton)", lang))
+
+    # Tratamento para evitar capacidade efetiva negativa caso estoque inicial > total
+    # Available Capacity = max(0, Total Capacity - Initial Inventory)
+    def effective_capacity_init(model, d):
+        return max(0.0, pyo.value(model.TotalCapacity[d]) - pyo.value(model.InitialInventory[d]))
+    model.EffectiveCapacity = pyo.Param(model.Destinations, initialize=effective_capacity_init, mutable=True, doc=translate("Capacidade efetiva disponível no armazém (ton)", lang))
+
+    # --- Parâmetros de Custos e Distâncias ---
+    def dist_init(model, o, d):
+        return distance.get((o, d), 999999.0)
+    model.Distance = pyo.Param(model.Origins, model.Destinations, initialize=dist_init, doc=translate("Distância entre Origem e Destino (km)", lang))
+
+    def freight_init(model, o):
+        return freight_cost.get(o, avg_freight)
+    model.Freight = pyo.Param(model.Origins, initialize=freight_init, doc=translate("Custo unitário de frete (R$/ton-km) a partir da Origem", lang))
+
+    def storage_init(model, d, p):
+        return storage_cost.get((d, p), 50.0)
+    model.Storage = pyo.Param(model.Destinations, model.Products, initialize=storage_init, mutable=True, doc=translate("Tarifa de armazenagem no Destino para o Produto (R$/ton)", lang))
+
+    # --- Penalty Parameters (Big M) ---
+    model.BigMCapacity = pyo.Param(initialize=big_m_cap, mutable=True, doc=translate("Custo de penalização por tonelada de capacidade artificial", lang))
+    model.BigMUnallocated = pyo.Param(initialize=big_m_unalloc, mutable=True, doc=translate("Custo de penalização por tonelada de oferta não alocada", lang))
+
+def _add_route_cost(model, lang="pt"):
+    """
+    Real cost of the allocation, freight plus storage, shared by the LP and MILP objectives.
+    """
+    def route_cost_rule(model):
+        return pyo.quicksum(
+            model.Flow[o, d, p] * (pyo.value(model.Distance[o, d]) * pyo.value(model.Freight[o]) + model.Storage[d, p])
+            for (o, d, p) in model.ValidRoutes
+        )
+    model.RouteCost = pyo.Expression(rule=route_cost_rule, doc=translate("Custo de frete e armazenagem (R$)", lang))
+
+def _add_lexicographic_objectives(model, lang="pt"):
+    """
+    Objectives of the two phases of the lexicographic solve, deactivated (see _solve_lexicographic).
+    Infeasibility adds up the dummies in tons, weighted in the proportions of their penalties with
+    artificial capacity as the unit, so that Objective == RouteCost + BigMCapacity * Infeasibility.
+    """
+    def infeasibility_rule(model):
+        infeasibility = pyo.quicksum(model.DummyCapacity[d] for d in model.Destinations)
+        if hasattr(model, "DummyReception"):
+            infeasibility += pyo.quicksum(model.DummyReception[d] for d in model.Destinations) * 0.1
+        unallocated = pyo.quicksum(model.DummyUnallocated[o, p] for (o, p) in model.SupplyPairs)
+        return infeasibility + unallocated * (model.BigMUnallocated / model.BigMCapacity)
+    model.Infeasibility = pyo.Expression(rule=infeasibility_rule, doc=translate("Capacidade artificial e oferta não alocada ponderadas (ton)", lang))
+
+    model.InfeasibilityObjective = pyo.Objective(expr=model.Infeasibility, sense=pyo.minimize, doc=translate("Fase 1: minimização da inviabilidade", lang))
+    model.CostObjective = pyo.Objective(expr=model.RouteCost, sense=pyo.minimize, doc=translate("Fase 2: minimização do custo real", lang))
+    model.InfeasibilityObjective.deactivate()
+    model.CostObjective.deactivate()
+
+def _add_supply_and_capacity_constraints(model, routes_by_origin_product, routes_by_destination, lang="pt"):
+    """
+    Supply conservation and static capacity constraints shared by the LP and MILP models.
+    """
+    # Constraint 1: Flow Conservation (Supply Limit)
+    # The total available supply in an origin for a product MUST be routed,
+    # whether via actual allocation (Flow) or slack (DummyUnallocated).
+    def supply_rule(model, o, p):
+        # The build is where the Python process grows the most: stop it at a memory ceiling
+        checkpoint()
+        valid_dests = routes_by_origin_product.get((o, p), [])
+        if not valid_dests:
+            # There are no valid routes, all supply goes to the dummy variable
+            return model.DummyUnallocated[o, p] == model.Supply[o, p]
+
+        flow_sum = pyo.quicksum(model.Flow[o, d, p] for d in valid_dests)
+        return flow_sum + model.DummyUnallocated[o, p] == model.Supply[o, p]
+
+    model.SupplyConstraint = pyo.Constraint(model.SupplyPairs, rule=supply_rule, doc=translate("Restrição de Limite de Oferta", lang))
+
+    # Constraint 2: Warehouse Capacity Limit
+    # The total quantity arriving at a destination cannot exceed its real available capacity.
+    # If the solver has no alternative, it will use DummyCapacity paying the penalty.
+    # If there is effectively no capacity, the warehouse can only receive load generating Dummy.
+    def capacity_rule(model, d):
+        checkpoint()
+        valid_ops = routes_by_destination.get(d, [])
+        if not valid_ops:
+            return pyo.Constraint.Skip
+
+        flow_sum = pyo.quicksum(model.Flow[o, d, p] for (o, p) in valid_ops)
+        return flow_sum <= model.EffectiveCapacity[d] + model.DummyCapacity[d]
+
+    model.CapacityConstraint = pyo.Constraint(model.Destinations, rule=capacity_rule, doc=translate("Restrição de Limite de Capacidade Efetiva", lang))
+
+def _solve_with_log(solver, model, log, warmstart=False):
+    """
+    Runs CBC on a Pyomo model with the options of the Pyomo solver, its output read from the pipe of
+    the subprocess into a _SolverStream, so it reaches the run log line by line and the log can be
+    followed while the solver is running (see src.logic.solver_progress). sys.stdout is not touched:
+    concurrent runs in the same process keep their logs apart (see src.logic.cbc_shell).
+    The solver subprocess is watched by the ResourceMonitor of the run (see src.logic.resource_monitor).
+    Returns the Pyomo results and the SolverProgress parsed from the output, which holds the final
+    incumbent and bound (the solution file does not report the bound of a search stopped by a limit).
+    The LP file writing, CBC and solution loading times and the model size go to the run log.
+    """
+    progress = SolverProgress()
+    stream = _SolverStream(log, progress, monitor=current_monitor())
+    executable = solver.executable()
+    log.print("Solver command line: " + str(executable))
+    log.print()
+    log.flush()
+
+    results, timings = cbc_shell.solve(model, executable, dict(solver.options), on_line=stream.write, warmstart=warmstart)
+    stream.close()
+
+    for phase in ("lp_write", "solver", "solution_load"):
+        log.add_time(phase, timings.get(phase, 0.0))
+    log.model_stats.update(variables=model.nvariables(), constraints=model.nconstraints(), nonzeros=progress.nonzeros)
+    return results, progress
+
+# Seconds between the ResourceMonitor samples taken as the solver output arrives
+OUTPUT_SAMPLE_INTERVAL = 0.05
+
+class _SolverStream(io.TextIOBase):
+    """
+    Receives the solver output: each complete line is written to the run log and fed to the
+    SolverProgress as it arrives, with the time of the first and last ones.
+    The monitor of the run, if given, is also sampled as the output arrives, so the solver is
+    adopted as soon as it starts and its CPU time is known up to its last lines.
+    """
+    def __init__(self, log, progress, monitor=None):
+        super().__init__()
+        self.log = log
+        self.progress = progress
+        self.monitor = monitor
+        self.first_line = None
+        self.last_line = None
+        self._sampled = None
+        self._partial = ""
+        # Writers may be other threads than the one closing the stream
+        self._lock = threading.Lock()
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        with self._lock:
+            lines = (self._partial + text).split("\n")
+            self._partial = lines.pop()
+            if lines:
+                now = time.perf_counter()
+                if self.first_line is None:
+                    self.first_line = now
+                self.last_line = now
+                for line in lines:
+                    self._emit(line + "\n")
+                self.log.flush()
+                if self.monitor is not None and (self._sampled is None or now - self._sampled >= OUTPUT_SAMPLE_INTERVAL):
+                    self._sampled = now
+                    self.monitor.sample()
+        return len(text)
+
+    def _emit(self, line):
+        self.progress.feed(line)
+        self.log.write(line)
+
+    def close(self):
+        with self._lock:
+            if self._partial:
+                self._emit(self._partial + "\n")
+                self._partial = ""
+                self.log.flush()
+        super().close()
+
+def _solve_lp_model(model, log, detailed_log=False, solver_settings=None, lang="pt"):
+    """
+    Solves a model built by _build_lp_model with CBC.
+    Returns the solution as plain dictionaries, or None if no optimal solution was found.
+    """
+    settings = solver_settings or normalize_solver_settings()
+    if settings["objective"] == "lexicographic":
+        phase_settings = dict(settings, objective="penalty")
+        return _solve_lexicographic(model, lambda m, first_phase: _solve_lp_model(
+            m, log, detailed_log=detailed_log and first_phase, solver_settings=phase_settings, lang=lang), log, lang)
+
+    # Show the model for debug only if requested by the user
+    if detailed_log:
+        model.pprint(ostream=log)
+
+    # 3. Solucionar o modelo
+    log.print("\n" + translate("Chamando solver CBC...", lang))
+    solver = SolverFactory('cbc')
+    # Threads, gaps, presolve/cuts and the time limit (to prevent infinite locking)
+    for name, val in cbc_options(solver_settings or normalize_solver_settings()).items():
+        solver.options[name] = val
+
+    results, _ = _solve_with_log(solver, model, log)
+
+    log.print("\n" + translate("=== STATUS DA OTIMIZAÇÃO ===", lang))
+    log.print(translate("Status do Solver: {status}", lang).format(status=results.solver.status))
+    log.print(translate("Condição de Término: {condition}", lang).format(condition=results.solver.termination_condition))
+
+    if results.solver.status != pyo.SolverStatus.ok or results.solver.termination_condition != pyo.TerminationCondition.optimal:
+        return None
+
+    with log.timed("solution_load"):
+        return {
+            "objective": pyo.value(model.Objective),
+            "flow": {(o, d, p): pyo.value(model.Flow[o, d, p]) for (o, d, p) in model.ValidRoutes},
+            "dummy_capacity": {d: pyo.value(model.DummyCapacity[d]) for d in model.Destinations},
+            "dummy_unallocated": {(o, p): pyo.value(model.DummyUnallocated[o, p]) for (o, p) in model.SupplyPairs},
+        }
+
+def _solve_lexicographic(model, solve, log, lang="pt"):
+    """
+    Solves a model built by _build_lp_model or _build_milp_model lexicographically instead of with its
+    Big M objective: phase 1 minimizes the Infeasibility (dummies, with small weights), phase 2 the
+    RouteCost with the Infeasibility held at the phase 1 level. Without penalties of 6 to 9 orders of
+    magnitude above the costs, the simplex and the MILP search work on well-scaled coefficients.
+    solve(model, first_phase) solves the active objective (each phase has the solver time limit).
+
+    Returns the phase 2 solution with "infeasibility" and "cost", the values of both phases, or None
+    if a phase found no solution. Its "objective" is still the Big M objective, comparable with the
+    other modes; for a MILP, "bound" is converted to it and proven means both phases were.
+    The model is left with its Big M objective active.
+    """
+    model.Objective.deactivate()
+    model.InfeasibilityObjective.activate()
+    try:
+        log.print("\n" + translate("--- OBJETIVO LEXICOGRÁFICO: FASE 1 (INVIABILIDADE) ---", lang))
+        first = solve(model, True)
+        if first is None:
             return None
+        level = pyo.value(model.Infeasibility)
+        log.print(translate("Nível de inviabilidade da fase 1: {val:,.4f} ton ponderadas", lang).format(val=level))
+
+        model.InfeasibilityObjective.deactivate()
+        model.CostObjective.activate()
+        model.InfeasibilityLevel = pyo.Constraint(expr=model.Infeasibility <= level * (1 + LEXICOGRAPHIC_TOLERANCE))
+        log.print("\n" + translate("--- OBJETIVO LEXICOGRÁFICO: FASE 2 (CUSTO REAL) ---", lang))
+        second = solve(model, False)
+    finally:
+        model.InfeasibilityObjective.deactivate()
+        model.CostObjective.deactivate()
+        if hasattr(model, "InfeasibilityLevel"):
+            model.del_component(model.InfeasibilityLevel)
+        model.Objective.activate()
+
+    if second is None:
+        return None
+
+    second["infeasibility"] = pyo.value(model.Infeasibility)
+    second["cost"] = pyo.value(model.RouteCost)
+    if "proven_optimal" in second:
+        big_m = pyo.value(model.BigMCapacity)
+        if first["proven_optimal"]:
+            bound = None if second["bound"] is None else second["bound"] + big_m * level
+        else:
+            # An unproven level only bounds the penalties
+            bound = None if first["bound"] is None else big_m * first["bound"]
+        second["proven_optimal"] = first["proven_optimal"] and second["proven_optimal"]
+        second["bound"] = bound
+    return second
 
-        model.ReceptionMax = pyo.Param(model.Destinations, initialize=reception_max_init, within=pyo.Any, doc=translate("Carga máxima diária de recepção ou capacidade do banco", lang))
+def _update_lp_params(model, demand_total_capacity, demand_initial_inventory, storage_cost, big_m_cap, big_m_unalloc):
+    """
+    Applies the what-if parameters of a new run to an already built model (LP or MILP).
+    Only values are changed, the model structure is kept.
+    """
+    for d in model.Destinations:
+        total = demand_total_capacity.get(d, 0.0)
+        inventory = demand_initial_inventory.get(d, 0.0)
+        model.TotalCapacity[d] = total
+        model.InitialInventory[d] = inventory
+        model.EffectiveCapacity[d] = max(0.0, total - inventory)
+        for p in model.Products:
+            model.Storage[d, p] = storage_cost.get((d, p), 50.0)
+
+    model.BigMCapacity = big_m_cap
+    model.BigMUnallocated = big_m_unalloc
+
+def model_structure_key(kind, valid_routes, supply, distance, freight_cost, avg_freight, destinations_list, active_limits=None):
+    """
+    Fingerprint of everything that shapes a built model: sets, routes, supply and route costs,
+    plus which optional MILP constraints exist (active_limits). Two runs with the same key only
+    differ in mutable parameters, so the second one can reuse the model built by the first.
+    """
+    routes_part = [(o, d, p, distance.get((o, d)), freight_cost.get(o, avg_freight)) for (o, d, p) in valid_routes]
+    supply_part = sorted((str(k), v) for k, v in supply.items())
+    payload = repr((kind, routes_part, supply_part, list(destinations_list), active_limits))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
 
+def model_frame_key(kind, origins_list, destinations_list, all_products, active_limits=None):
+    """
+    Fingerprint of the sets and optional constraints of a built model, without its routes and
+    supply: a kept model with the same frame can take route and supply edits in place
+    (see _patch_session_model).
+    """
+    payload = repr((kind, list(origins_list), list(destinations_list), list(all_products), active_limits))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
 
-        # --- Parâmetros de Oferta e Demanda ---
-        def supply_init(model, o, p):
-            return supply.get((o, p), 0.0)
-        model.Supply = pyo.Param(model.Origins, model.Products, initialize=supply_init, doc=translate("Oferta disponível por (Origem, Produto)", lang))
+def _session_model(session, key, build, update, frame=None, patch=None):
+    """
+    Returns (model, reused) for a run in a scenario session:
+    - the kept model when its key matches, after applying the new parameters with update(model)
+      (reused is "parameters");
+    - the kept model when only its routes or supply changed (same frame) and patch(model) could
+      apply the edits, then updated (reused is "edits");
+    - a freshly built one otherwise (reused is False).
+    """
+    if session is not None and session.model is not None:
+        if session.key == key:
+            update(session.model)
+            return session.model, "parameters"
+        if patch is not None and frame is not None and session.frame == frame and patch(session.model):
+            update(session.model)
+            session.store(key, session.model, frame)
+            return session.model, "edits"
+
+    model = build()
+    if session is not None:
+        session.store(key, model, frame)
+    return model, False
+
+def _print_session_reuse(reused, log, lang="pt"):
+    if reused == "parameters":
+        log.print(translate("Modelo reaproveitado da sessão de cenário: apenas os parâmetros foram atualizados.", lang))
+    elif reused == "edits":
+        log.print(translate("Modelo reaproveitado da sessão de cenário: as edições foram aplicadas sem reconstruir o modelo.", lang))
+
+# Share of the routes of a kept model that may be fixed at zero before rebuilding pays off
+MAX_FIXED_ROUTE_SHARE = 0.5
+
+def _patch_session_model(model, valid_routes, supply, distance, freight_cost, avg_freight, log, lang="pt"):
+    """
+    Applies the route and supply edits of a new run (a compatibility toggled, a supply weight
+    changed) to a model kept by the scenario session, when they fit in it: the routes no longer
+    valid have their flow (and their trips, in the MILP) fixed at zero, which the LP writer leaves
+    out of the solve, the routes valid again are released and the supply is updated.
+    New routes, new supply pairs, changed route costs or edits leaving more than
+    MAX_FIXED_ROUTE_SHARE of the model routes fixed need a rebuild. Returns True if the model was patched.
+    """
+    if any(r not in model.ValidRoutes for r in valid_routes):
+        return False
+    if len(model.ValidRoutes) - len(valid_routes) > MAX_FIXED_ROUTE_SHARE * len(model.ValidRoutes):
+        return False
+    if any(val > 0 and key not in model.SupplyPairs for key, val in supply.items()):
+        return False
+
+    # Route costs are constants of the model objective
+    for (o, d) in {(o, d) for (o, d, _) in valid_routes}:
+        if distance.get((o, d), 999999.0) != pyo.value(model.Distance[o, d]) or \
+           freight_cost.get(o, avg_freight) != pyo.value(model.Freight[o]):
+            return False
+
+    has_trips = hasattr(model, "RouteActive")
+    valid = set(valid_routes)
+    fixed = released = 0
+    for r in model.ValidRoutes:
+        if r in valid:
+            if model.Flow[r].fixed:
+                model.Flow[r].unfix()
+                if has_trips:
+                    model.RouteActive[r].unfix()
+                released += 1
+        elif not model.Flow[r].fixed:
+            model.Flow[r].fix(0.0)
+            if has_trips:
+                model.RouteActive[r].fix(0)
+            fixed += 1
+
+    changed = 0
+    for (o, p) in model.SupplyPairs:
+        val = supply.get((o, p), 0.0)
+        if val != pyo.value(model.Supply[o, p]):
+            model.Supply[o, p] = val
+            changed += 1
+
+    log.print(translate("Edições aplicadas ao modelo da sessão: {fixed} rotas desativadas, {released} rotas reativadas, {changed} ofertas alteradas.", lang).format(
+        fixed=fixed, released=released, changed=changed))
+    return True
+
+def _component_inputs(routes, origins_list, destinations_list, all_products, valid_routes, supply,
+                      demand_total_capacity, demand_initial_inventory, distance, freight_cost, avg_freight,
+                      storage_cost, big_m_cap, big_m_unalloc):
+    """
+    Model inputs restricted to one connected component of the route graph (see route_components).
+    The penalties stay those of the whole model, so the component objectives add up to its objective.
+    """
+    origins = {o for (o, _, _) in routes}
+    destinations = {d for (_, d, _) in routes}
+    products = {p for (_, _, p) in routes}
+    supply_keys = {(o, p) for (o, _, p) in routes}
+
+    return dict(
+        origins_list=[o for o in origins_list if o in origins],
+        destinations_list=[d for d in destinations_list if d in destinations],
+        all_products=[p for p in all_products if p in products],
+        valid_routes=routes,
+        supply={key: val for key, val in supply.items() if key in supply_keys},
+        demand_total_capacity={d: val for d, val in demand_total_capacity.items() if d in destinations},
+        demand_initial_inventory={d: val for d, val in demand_initial_inventory.items() if d in destinations},
+        distance={(o, d): distance[(o, d)] for (o, d, _) in routes},
+        freight_cost={o: val for o, val in freight_cost.items() if o in origins},
+        avg_freight=avg_freight,
+        storage_cost={(d, p): val for (d, p), val in storage_cost.items() if d in destinations and p in products},
+        big_m_cap=big_m_cap, big_m_unalloc=big_m_unalloc
+    )
+
+def _solve_decomposed(solve, components, inputs, solver_settings, log, lang="pt"):
+    """
+    Solves each component with solve(component_inputs, solver_settings) on a process pool and merges
+    the solutions into the solution of the whole model. The CBC threads are shared among the processes.
+    Supply without any route is not in a component and is left unallocated, as in the whole model.
+    The timings and model sizes of the components are added to the run log (with several processes,
+    the summed times exceed the wall time of the decomposed solve).
+    Returns None if any component has no solution.
+    """
+    threads = solver_settings["threads"] or 1
+    processes = max(1, min(len(components), threads))
+    sub_settings = dict(solver_settings, threads=max(1, threads // processes))
+
+    log.print("\n" + translate("Modelo decomposto em {n} componentes independentes, resolvidos em {proc} processo(s).", lang).format(
+        n=len(components), proc=processes))
+
+    tasks = [(_component_inputs(routes, **inputs), sub_settings) for routes in components]
+    results = solve_components(solve, tasks, processes=processes)
+
+    merged = {"objective": 0.0}
+    failed = False
+    for i, (routes, (solution, output, timings, model_stats)) in enumerate(zip(components, results), start=1):
+        log.print("\n" + translate("--- COMPONENTE {i}/{n}: {routes} rotas ---", lang).format(i=i, n=len(components), routes=len(routes)))
+        log.print(output, end="")
+
+        for phase, seconds in timings.items():
+            log.add_time(phase, seconds)
+        for name, val in model_stats.items():
+            total = log.model_stats.get(name, 0)
+            log.model_stats[name] = None if total is None or val is None else total + val
+
+        if solution is None:
+            failed = True
+            continue
+
+        supply_keys = {(o, p) for (o, _, p) in routes}
+        merged["objective"] += solution["objective"]
+        if "proven_optimal" in solution:
+            # MILP components: the whole model is proven optimal only if every component is
+            merged["proven_optimal"] = merged.get("proven_optimal", True) and solution["proven_optimal"]
+            bound = merged.get("bound", 0.0)
+            merged["bound"] = None if bound is None or solution["bound"] is None else bound + solution["bound"]
+        for name, values in solution.items():
+            if name in ("objective", "proven_optimal", "bound"):
+                continue
+            if name in ("infeasibility", "cost"):
+                # Phase values of lexicographic solves add up like the objective
+                merged[name] = merged.get(name, 0.0) + values
+                continue
+            if name == "dummy_unallocated":
+                # The component model also has the (origin, product) pairs of other components, all at zero
+                values = {key: val for key, val in values.items() if key in supply_keys}
+            merged.setdefault(name, {}).update(values)
+
+    if failed:
+        return None
+
+    merged.setdefault("dummy_unallocated", {})
+    routed = {(o, p) for (o, _, p) in inputs["valid_routes"]}
+    for key, val in inputs["supply"].items():
+        if val > 0 and key not in routed:
+            merged["dummy_unallocated"][key] = val
+            merged["objective"] += val * inputs["big_m_unalloc"]
+            if "infeasibility" in merged:
+                merged["infeasibility"] += val * inputs["big_m_unalloc"] / inputs["big_m_cap"]
+            if merged.get("bound") is not None:
+                merged["bound"] += val * inputs["big_m_unalloc"]
+
+    # Routes in the order of the whole model
+    for name in ("flow", "trips"):
+        if name in merged:
+            merged[name] = {r: merged[name].get(r, 0.0) for r in inputs["valid_routes"]}
+
+    return merged
+
+def _solve_lp_component(lp_inputs, solver_settings, log, backend="pyomo", detailed_log=False, lang="pt"):
+    """
+    Builds and solves the LP for the given inputs with the chosen backend, without a scenario session.
+    """
+    if backend == "heuristic":
+        return _heuristic_solution(lp_inputs)
+    if backend == "network":
+        if solver_settings["objective"] == "lexicographic":
+            # Shortest paths add the penalties to route costs without pivoting on them
+            log.print(translate("O fluxo de custo mínimo não sofre com a escala das penalidades: o objetivo com Big M é resolvido diretamente.", lang))
+        return _solve_lp_network(log=log, lang=lang, **lp_inputs)
+    if backend == "column_generation":
+        return _solve_lp_column_generation(log=log, solver_settings=solver_settings, lang=lang, **lp_inputs)
+    if backend == "sparse":
+        return _solve_lp_sparse(log=log, solver_settings=solver_settings, lang=lang, **lp_inputs)
+
+    with log.timed("model_build"):
+        model = _build_lp_model(lang=lang, **lp_inputs)
+    return _solve_lp_model(model, log, detailed_log=detailed_log, solver_settings=solver_settings, lang=lang)
+
+def _transport_lp_data(destinations_list, valid_routes, demand_total_capacity, demand_initial_inventory,
+                       distance, freight_cost, avg_freight, storage_cost):
+    """
+    Effective capacity per destination and unit cost per valid route, the inputs of the
+    backends that solve the LP without Pyomo.
+    """
+    effective_capacity = {
+        d: max(0.0, demand_total_capacity.get(d, 0.0) - demand_initial_inventory.get(d, 0.0))
+        for d in destinations_list
+    }
+    unit_cost = [
+        distance[(o, d)] * freight_cost.get(o, avg_freight) + storage_cost.get((d, p), 50.0)
+        for (o, d, p) in valid_routes
+    ]
+    return effective_capacity, unit_cost
+
+def _solve_lp_network(origins_list, destinations_list, all_products, valid_routes, supply,
+                      demand_total_capacity, demand_initial_inventory, distance, freight_cost, avg_freight,
+                      storage_cost, big_m_cap, big_m_unalloc, log, lang="pt"):
+    """
+    Solves the same LP as _build_lp_model as a min-cost flow in NumPy, without Pyomo or CBC
+    (see src.logic.min_cost_flow). Returns the solution as plain dictionaries.
+    """
+    with log.timed("model_build"):
+        effective_capacity, unit_cost = _transport_lp_data(destinations_list, valid_routes, demand_total_capacity,
+                                                           demand_initial_inventory, distance, freight_cost, avg_freight, storage_cost)
+
+    log.print("\n" + translate("Resolvendo como fluxo de custo mínimo (sem CBC)...", lang))
+    with log.timed("solver"):
+        result = min_cost_flow.solve_transport_mcf(valid_routes, supply, effective_capacity, unit_cost, big_m_cap, big_m_unalloc)
+    log.print(translate("Simplex de rede concluído em {pivots} pivôs.", lang).format(pivots=result["pivots"]))
+
+    # Size of the equivalent LP (as built by the sparse backend): a row per supply pair and per
+    # destination, each dummy in its own row and routes without supply only in the capacity rows
+    supply_keys = set(result["supply_keys"])
+    n_nodes = len(result["dest_keys"]) + len(supply_keys)
+    supplied_routes = sum(1 for (o, _, p) in valid_routes if (o, p) in supply_keys)
+    log.model_stats.update(variables=len(valid_routes) + n_nodes, constraints=n_nodes,
+                           nonzeros=len(valid_routes) + supplied_routes + n_nodes)
+
+    log.print("\n" + translate("=== STATUS DA OTIMIZAÇÃO ===", lang))
+    log.print(translate("Condição de Término: {condition}", lang).format(condition="optimal"))
+
+    return {
+        "objective": result["objective"],
+        "flow": dict(zip(valid_routes, result["x"].tolist())),
+        "dummy_capacity": dict(zip(result["dest_keys"], result["dummy_capacity"].tolist())),
+        "dummy_unallocated": dict(zip(result["supply_keys"], result["dummy_unallocated"].tolist())),
+    }
 
-        def total_capacity_init(model, d):
-            return demand_total_capacity.get(d, 0.0)
-        model.TotalCapacity = pyo.Param(model.Destinations, initialize=total_capacity_init, doc=translate("Capacidade estática total do armazém (ton)", lang))
+def _solve_lp_sparse(origins_list, destinations_list, all_products, valid_routes, supply,
+                     demand_total_capacity, demand_initial_inventory, distance, freight_cost, avg_freight,
+                     storage_cost, big_m_cap, big_m_unalloc, log, solver_settings=None, lang="pt"):
+    """
+    Solves the same LP as _build_lp_model, but assembles the constraint matrix directly
+    from NumPy arrays and writes the LP file for CBC in one pass (see src.logic.sparse_lp).
+    Returns the solution as plain dictionaries, or None if no optimal solution was found.
+    """
+    with log.timed("model_build"):
+        effective_capacity, unit_cost = _transport_lp_data(destinations_list, valid_routes, demand_total_capacity,
+                                                           demand_initial_inventory, distance, freight_cost, avg_freight, storage_cost)
+        problem = sparse_lp.build_transport_lp(valid_routes, supply, effective_capacity, unit_cost, big_m_cap, big_m_unalloc)
+    log.model_stats.update(variables=problem["n_cols"], constraints=problem["n_rows"], nonzeros=len(problem["data"]))
+    log.print(translate("Matriz esparsa montada: {rows} restrições, {cols} variáveis, {nnz} coeficientes não nulos.", lang).format(
+        rows=problem["n_rows"], cols=problem["n_cols"], nnz=len(problem["data"])))
+
+    settings = solver_settings or normalize_solver_settings()
+    if settings["objective"] == "lexicographic":
+        result = _solve_sparse_lexicographic(problem, cbc_options(settings), big_m_cap, log, lang)
+    else:
+        result = _run_sparse(problem, cbc_options(settings), log, lang)
+
+    if result["status"] != "optimal":
+        return None
+
+    x = result["x"]
+    n_routes = problem["n_routes"]
+    n_dest = len(problem["dest_keys"])
+    solution = {
+        "objective": result["objective"],
+        "flow": dict(zip(valid_routes, x[:n_routes].tolist())),
+        "dummy_capacity": dict(zip(problem["dest_keys"], x[n_routes:n_routes + n_dest].tolist())),
+        "dummy_unallocated": dict(zip(problem["supply_keys"], x[n_routes + n_dest:].tolist())),
+    }
+    for name in ("infeasibility", "cost"):
+        if name in result:
+            solution[name] = result[name]
+    return solution
+
+def _solve_lp_column_generation(origins_list, destinations_list, all_products, valid_routes, supply,
+                                demand_total_capacity, demand_initial_inventory, distance, freight_cost, avg_freight,
+                                storage_cost, big_m_cap, big_m_unalloc, log, solver_settings=None, lang="pt"):
+    """
+    Solves the same LP as _build_lp_model by column generation (see src.logic.column_generation):
+    only the routes that can lower the cost are written to CBC. Returns the solution as plain
+    dictionaries, or None if no optimal solution was found. A solution stopped by the round limit
+    before pricing out every route is returned with "proven_optimal" False (and no bound).
+    """
+    settings = solver_settings or normalize_solver_settings()
+    if settings["objective"] == "lexicographic":
+        # The reduced costs are priced with the duals of the Big M objective
+        log.print(translate("A geração de colunas precifica as rotas com os duais do objetivo com Big M, que é resolvido diretamente.", lang))
+
+    with log.timed("model_build"):
+        effective_capacity, unit_cost = _transport_lp_data(destinations_list, valid_routes, demand_total_capacity,
+                                                           demand_initial_inventory, distance, freight_cost, avg_freight, storage_cost)
+
+    def report_round(info):
+        log.print(translate("Rodada {round}: {columns} rotas no modelo, custo R$ {objective:,.2f}, menor custo reduzido {rc:,.4f}, {added} rotas adicionadas", lang).format(
+            round=info["round"], columns=info["columns"], objective=info["objective"], rc=info["min_reduced_cost"], added=info["added"]))
+        log.flush()
+
+    log.print("\n" + translate("Resolvendo por geração de colunas (rotas sob demanda)...", lang))
+    start = time.perf_counter()
+    result = column_generation.solve_column_generation(valid_routes, supply, effective_capacity, unit_cost, big_m_cap,
+                                                       big_m_unalloc, options=cbc_options(settings), on_round=report_round)
+    for phase, seconds in result["timings"].items():
+        log.add_time(phase, seconds)
+    # The rest of the loop: building the restricted LPs and pricing the omitted routes
+    log.add_time("pricing", time.perf_counter() - start - sum(result["timings"].values()))
+
+    n_rows = len(result["supply_keys"]) + len(result["dest_keys"])
+    log.model_stats.update(variables=result["columns"] + n_rows, constraints=n_rows,
+                           nonzeros=2 * result["columns"] + n_rows, generated_routes=result["columns"])
+
+    log.print("\n" + translate("=== STATUS DA OTIMIZAÇÃO ===", lang))
+    log.print(translate("Condição de Término: {condition}", lang).format(condition=result["status"]))
+    if result["status"] == "optimal":
+        log.print(translate("Nenhuma rota omitida tem custo reduzido negativo: ótimo do LP completo com {columns} de {routes} rotas ({share:.1%}).", lang).format(
+            columns=result["columns"], routes=len(valid_routes), share=result["columns"] / max(1, len(valid_routes))))
+    elif result["status"] == "stopped":
+        log.print(translate("Limite de rodadas atingido: a solução é viável, mas o ótimo do LP completo não foi comprovado.", lang))
+    else:
+        log.print(result["log"])
+        return None
+
+    solution = {
+        "objective": result["objective"],
+        "flow": dict(zip(valid_routes, result["x"].tolist())),
+        "dummy_capacity": dict(zip(result["dest_keys"], result["dummy_capacity"].tolist())),
+        "dummy_unallocated": dict(zip(result["supply_keys"], result["dummy_unallocated"].tolist())),
+    }
+    if result["status"] == "stopped":
+        solution.update(proven_optimal=False, bound=None)
+    return solution
+
+def _run_sparse(problem, options, log, lang="pt"):
+    # One CBC call on a sparse_lp problem, with its output, timings and status in the run log
+    log.print("\n" + translate("Chamando solver CBC...", lang))
+    result = sparse_lp.solve_transport_lp(problem, options=options)
+    for phase, seconds in result["timings"].items():
+        log.add_time(phase, seconds)
+    log.print(result["log"])
+
+    log.print("\n" + translate("=== STATUS DA OTIMIZAÇÃO ===", lang))
+    log.print(translate("Condição de Término: {condition}", lang).format(condition=result["status"]))
+    return result
+
+def _solve_sparse_lexicographic(problem, options, big_m_cap, log, lang="pt"):
+    """
+    Lexicographic solve of a sparse_lp problem, as _solve_lexicographic for the Pyomo models.
+    Returns the phase 2 result with "infeasibility", "cost" and the Big M "objective" of its
+    solution, or the result of phase 1 if it failed.
+    """
+    infeasibility, cost = sparse_lp.phase_objectives(problem, big_m_cap)
+
+    log.print("\n" + translate("--- OBJETIVO LEXICOGRÁFICO: FASE 1 (INVIABILIDADE) ---", lang))
+    first = _run_sparse(dict(problem, c=infeasibility), options, log, lang)
+    if first["status"] != "optimal":
+        return first
+    level = float(infeasibility @ first["x"])
+    log.print(translate("Nível de inviabilidade da fase 1: {val:,.4f} ton ponderadas", lang).format(val=level))
+
+    log.print("\n" + translate("--- OBJETIVO LEXICOGRÁFICO: FASE 2 (CUSTO REAL) ---", lang))
+    bounded = sparse_lp.add_row(dict(problem, c=cost), infeasibility, sparse_lp.ROW_LE,
+                                level * (1 + LEXICOGRAPHIC_TOLERANCE))
+    second = _run_sparse(bounded, options, log, lang)
+    if second["status"] == "optimal":
+        x = second["x"]
+        second.update(infeasibility=float(infeasibility @ x), cost=float(cost @ x), objective=float(problem["c"] @ x))
+    return second
+
+
+def _heuristic_solution(inputs, limits=None, reception_max=None):
+    """
+    Greedy allocation of src.logic.heuristic for the model inputs, as plain dictionaries like the
+    solutions of the solvers, with "heuristic" True and the number of local improvements in "moves".
+    With limits (MILP runs) it respects the logistics limits and has the trips and dummy reception.
+    """
+    valid_routes = inputs["valid_routes"]
+    effective_capacity, unit_cost = _transport_lp_data(
+        inputs["destinations_list"], valid_routes, inputs["demand_total_capacity"], inputs["demand_initial_inventory"],
+        inputs["distance"], inputs["freight_cost"], inputs["avg_freight"], inputs["storage_cost"])
+
+    limit_options = {}
+    if limits is not None:
+        days = limits["days"]
+        limit_options = dict(
+            reception_limit={d: reception_max[d] * days for d in inputs["destinations_list"] if reception_max.get(d) is not None},
+            reception_min={d: limits["carga_min"] * days for d in inputs["destinations_list"]} if limits["carga_min"] is not None else None,
+            freight_min=limits["frete_min"], freight_max=limits["frete_max"],
+        )
+    result = heuristic.greedy_allocation(valid_routes, inputs["supply"], effective_capacity, unit_cost,
+                                         inputs["big_m_cap"], inputs["big_m_unalloc"], **limit_options)
+
+    solution = {
+        "objective": result["objective"],
+        "heuristic": True,
+        "moves": result["moves"],
+        "flow": dict(zip(valid_routes, result["x"].tolist())),
+        "dummy_capacity": dict(zip(result["dest_keys"], result["dummy_capacity"].tolist())),
+        "dummy_unallocated": dict(zip(result["supply_keys"], result["dummy_unallocated"].tolist())),
+    }
+    if limits is not None:
+        solution.update(
+            proven_optimal=False, bound=None,
+            trips=dict(zip(valid_routes, result["trips"].tolist())),
+            dummy_reception=dict(zip(result["dest_keys"], result["dummy_reception"].tolist())),
+        )
+    return solution
 
-        def initial_inventory_init(model, d):
-            return demand_initial_inventory.get(d, 0.0)
-        model.InitialInventory = pyo.Param(model.Destinations, initialize=initial_inventory_init, doc=translate("Estoque inicial presente no armazém (ton)", lang))
+def _heuristic_preview(inputs, log, results_dict, limits=None, reception_max=None, lang="pt"):
+    """
+    Runs _heuristic_solution and writes its cost to the run log, where the progress of the run shows
+    it while the solver is running (see src.logic.solver_progress), and to
+    results_dict["kpis"]["heuristic_objective"]. Returns the solution, or None if the heuristic failed.
+    """
+    try:
+        with log.timed("heuristic"):
+            solution = _heuristic_solution(inputs, limits, reception_max)
+    except Exception as e:
+        log.print(translate("Heurística gulosa indisponível: {err}", lang).format(err=str(e)))
+        return None
 
-        # --- Parâmetros de Custos e Distâncias ---
-        def dist_init(model, o, d):
-            return distance.get((o, d), 999999.0)
-        model.Distance = pyo.Param(model.Origins, model.Destinations, initialize=dist_init, doc=translate("Distância entre Origem e Destino (km)", lang))
+    active_routes = sum(1 for val in solution["flow"].values() if val > 1e-6)
+    log.print(translate("Prévia heurística: R$ {val:,.2f} ({routes} rotas ativas, {moves} melhorias locais, {ms:.0f} ms)", lang).format(
+        val=solution["objective"], routes=active_routes, moves=solution["moves"], ms=log.timings["heuristic"] * 1000))
+    log.flush()
+    results_dict["kpis"]["heuristic_objective"] = solution["objective"]
+    return solution
 
-        def freight_init(model, o):
-            return freight_cost.get(o, avg_freight)
-        model.Freight = pyo.Param(model.Origins, initialize=freight_init, doc=translate("Custo unitário de frete (R$/ton-km) a partir da Origem", lang))
+def _coarsen(lp_inputs, dest_municipality, dest_type, log, lang="pt"):
+    """
+    Groups the warehouses of the same municipality, type and tariffs into super-nodes
+    (see src.logic.coarsening) and logs the reduction. Returns (coarse inputs, plan), or
+    (lp_inputs, None) when no two warehouses can be grouped.
+    """
+    with log.timed("coarsening"):
+        clusters = coarsening.warehouse_clusters(lp_inputs["destinations_list"], dest_municipality, dest_type,
+                                                 lp_inputs["storage_cost"], lp_inputs["all_products"])
+        if len(clusters) == len(lp_inputs["destinations_list"]):
+            log.print(translate("Agregação de armazéns: nenhum armazém tem outro do mesmo município, tipo e tarifa; o modelo completo é resolvido.", lang))
+            return lp_inputs, None
+        coarse, plan = coarsening.coarsen_inputs(lp_inputs, clusters)
+
+    log.print(translate("Agregação de armazéns: {dests} armazéns em {nodes} supernós, {routes} rotas agregadas de {total}.", lang).format(
+        dests=len(lp_inputs["destinations_list"]), nodes=len(clusters), routes=len(coarse["valid_routes"]),
+        total=len(lp_inputs["valid_routes"])))
+    log.model_stats["coarse_nodes"] = len(clusters)
+    return coarse, plan
+
+def _refine(solution, plan, lp_inputs, solver_settings, log, results_dict, backend="pyomo", lang="pt"):
+    """
+    Splits the inflow of each super-node of the coarse solution among its warehouses with one local
+    LP over all super-nodes (solved by CBC, or as a min-cost flow with the network backend). Logs the
+    optimality gap to the coarse optimum, a lower bound of the whole model, and records them in
+    results_dict["kpis"] ("coarsening_bound", "coarsening_gap" in percent). Returns the solution of
+    the whole model with "coarsened" True, or None if a solve failed.
+    """
+    if solution is None:
+        return None
+
+    with log.timed("refinement"):
+        effective_capacity, unit_cost = _transport_lp_data(
+            lp_inputs["destinations_list"], lp_inputs["valid_routes"], lp_inputs["demand_total_capacity"],
+            lp_inputs["demand_initial_inventory"], lp_inputs["distance"], lp_inputs["freight_cost"],
+            lp_inputs["avg_freight"], lp_inputs["storage_cost"])
+        indexes, routes, supply = coarsening.refine_problem(solution, plan)
+        local_cost = [unit_cost[r] for r in indexes]
+        local_capacity = {d: effective_capacity[d] for (_, d, _) in routes}
+
+    log.print("\n" + translate("--- REFINAMENTO LOCAL: {routes} rotas entre os armazéns dos supernós ---", lang).format(routes=len(routes)))
+    big_m_cap, big_m_unalloc = lp_inputs["big_m_cap"], lp_inputs["big_m_unalloc"]
+    if not routes:
+        local = {"x": [], "dummy_capacity": [], "dummy_unallocated": [], "dest_keys": [], "supply_keys": []}
+    elif backend == "network":
+        with log.timed("solver"):
+            local = min_cost_flow.solve_transport_mcf(routes, supply, local_capacity, local_cost, big_m_cap, big_m_unalloc)
+    else:
+        problem = sparse_lp.build_transport_lp(routes, supply, local_capacity, local_cost, big_m_cap, big_m_unalloc)
+        result = _run_sparse(problem, cbc_options(solver_settings), log, lang)
+        if result["status"] != "optimal":
+            return None
+        x = result["x"]
+        n_routes, n_dest = problem["n_routes"], len(problem["dest_keys"])
+        local = {"x": x[:n_routes], "dummy_capacity": x[n_routes:n_routes + n_dest],
+                 "dummy_unallocated": x[n_routes + n_dest:], "dest_keys": problem["dest_keys"],
+                 "supply_keys": problem["supply_keys"]}
+
+    refined = coarsening.refined_solution(solution, plan, indexes, local)
+    cost = sum(val * c for val, c in zip(refined["flow"].values(), unit_cost))
+    infeasibility = (sum(refined["dummy_capacity"].values())
+                     + sum(refined["dummy_unallocated"].values()) * big_m_unalloc / big_m_cap)
+    refined["objective"] = cost + big_m_cap * infeasibility
+    if "infeasibility" in solution:
+        refined.update(infeasibility=infeasibility, cost=cost)
+    refined["coarsened"] = True
+
+    bound = solution["objective"]
+    gap = max(0.0, refined["objective"] - bound) / refined["objective"] if refined["objective"] > 0 else 0.0
+    log.print(translate("Refinamento: custo R$ {val:,.2f}; limite inferior do modelo agregado R$ {bound:,.2f}; gap de otimalidade {gap:.4%}", lang).format(
+        val=refined["objective"], bound=bound, gap=gap))
+    results_dict["kpis"]["coarsening_bound"] = bound
+    results_dict["kpis"]["coarsening_gap"] = gap * 100
+    return refined
+
+def _report_lp_result(results_dict, solution, log, lang="pt", **report_kwargs):
+    """
+    Records the outcome of an LP solve in results_dict: the allocation details when a solution was
+    found (status "optimal", or "feasible" for the heuristic, a coarsened model or a column generation
+    stopped by its round limit), the infeasibility warning otherwise.
+    """
+    if solution is not None:
+        if solution.get("heuristic"):
+            log.print(translate("Solução heurística encontrada (sem otimalidade comprovada).", lang))
+        elif solution.get("coarsened"):
+            log.print(translate("Solução agregada e refinada encontrada (gap limitado pelo modelo agregado).", lang))
+        elif not solution.get("proven_optimal", True):
+            log.print(translate("Solução Viável Encontrada (otimalidade não comprovada).", lang))
+        else:
+            log.print(translate("Solução Ótima Encontrada!", lang))
+        log.print(translate("Custo Total (Função Objetivo): R$ {val:,.2f}", lang).format(val=solution["objective"]))
 
-        def storage_init(model, d, p):
-            return storage_cost.get((d, p), 50.0)
-        model.Storage = pyo.Param(model.Destinations, model.Products, initialize=storage_init, doc=translate("Tarifa de armazenagem no Destino para o Produto (R$/ton)", lang))
+        proven = not (solution.get("heuristic") or solution.get("coarsened")) and solution.get("proven_optimal", True)
+        results_dict["status"] = "optimal" if proven else "feasible"
+        results_dict["heuristic"] = bool(solution.get("heuristic"))
+        results_dict["objective"] = solution["objective"]
+        _report_phase_objectives(results_dict, solution, log, lang)
 
-        max_freight = max(freight_cost.values()) if freight_cost else 0.0
-        max_dist = max(distance.values()) if distance else 0.0
-        max_storage = max(storage_cost.values()) if storage_cost else 0.0
+        _report_lp_solution(results_dict, solution, log, lang=lang, **report_kwargs)
 
-        val_big_m_cap = (max_freight * max_dist + max_storage) * 1000
-        if val_big_m_cap == 0:
-            val_big_m_cap = 10000
+    else:
+        log.print(translate("Não foi possível encontrar uma solução ótima. O modelo pode estar mal-condicionado.", lang))
+        results_dict["status"] = "infeasible"
+        results_dict["warnings"]["general"].append(translate("O modelo não encontrou solução ótima.", lang))
 
-        val_big_m_unalloc = val_big_m_cap * 10
+# Unused routes listed in the sensitivity analysis, those closest to entering the allocation
+SENSITIVITY_MAX_ROUTES = 200
 
-        # --- Penalty Parameters (Big M) ---
-        model.BigMCapacity = pyo.Param(initialize=val_big_m_cap, doc=translate("Custo de penalização por tonelada de capacidade artificial", lang))
-        model.BigMUnallocated = pyo.Param(initialize=val_big_m_unalloc, doc=translate("Custo de penalização por tonelada de oferta não alocada", lang))
-
-        # Big M para as Rotas (Indexado por ValidRoutes)
-        def big_m_flow_init(model, o, d, p):
-            f_max = pyo.value(model.FreightMax, exception=False)
-            if f_max is not None:
-                return f_max
-            else:
-                # The route's real ceiling is ONLY the supply from that origin (since capacity can expand with dummy)
-                local_max = pyo.value(model.Supply[o, p])
-                return local_max if local_max > 0 else 999999.0
-                
-        model.UpperFlow = pyo.Param(model.ValidRoutes, initialize=big_m_flow_init, doc=translate("Big M Dinâmico e Local por Rota", lang))
-
-        # 2. Big M for Warehouses (Indexed by Destinations)
-        def big_m_warehouse_init(model, d):
-            # The absolute maximum a warehouse can receive is the sum of all supply pointed to it
-            valid_ops = [(o, p) for o in model.Origins for p in model.Products if (o, d, p) in model.ValidRoutes]
-            max_possible_arrival = sum(pyo.value(model.Supply[o, p]) for (o, p) in valid_ops)
-            
-            return max_possible_arrival if max_possible_arrival > 0 else 999999.0
-            
-        model.BigMWarehouse = pyo.Param(model.Destinations, initialize=big_m_warehouse_init, doc=translate("Big M Dinâmico por Armazém", lang))
-
-        # =========================================================================
-        # 3.3 DECISION VARIABLES
-        # =========================================================================
-        # Values the solver will attempt to determine to optimize the result.
-
-        # Fluxo de produto (quantidade a ser transportada) em toneladas
-        model.Flow = pyo.Var(model.ValidRoutes, domain=pyo.NonNegativeReals, doc=translate("Quantidade transportada (o, d, p)", lang))
-
-        # Slack variables (Dummies) to ensure mathematical viability of the model
-        model.DummyCapacity = pyo.Var(model.Destinations, domain=pyo.NonNegativeReals, doc=translate("Capacidade extra artificial alocada (ton)", lang))
-        model.DummyUnallocated = pyo.Var(model.Origins, model.Products, domain=pyo.NonNegativeReals, doc=translate("Oferta não alocada a nenhum destino (ton)", lang))
-        model.DummyReception = pyo.Var(model.Destinations, domain=pyo.NonNegativeReals, doc=translate("Capacidade de recepção diária extra artificial alocada (ton)", lang))
+def _report_sensitivity(results_dict, solution, model_inputs, log, cda_to_name, solver_settings, reception_max=None, lang="pt"):
+    """
+    Records the sensitivity analysis of an optimal LP allocation (see src.logic.sensitivity) in
+    results_dict["sensitivity"]: the marginal value of capacity per warehouse ("capacity"), the
+    marginal cost of supply per origin and product ("supply") and the unused routes of lowest
+    reduced cost with the cost at which each would enter the allocation ("routes").
+    The duals are those of the transportation LP with the Big M objective, so the analysis is skipped
+    in lexicographic mode and when a maximum reception (reception_max) constrains the warehouses.
+    """
+    log.print("\n" + translate("--- ANÁLISE DE SENSIBILIDADE ---", lang))
+    if solver_settings["objective"] == "lexicographic":
+        log.print(translate("No modo lexicográfico o custo é minimizado numa segunda fase, enquanto os duais seriam preços do objetivo com Big M: análise de sensibilidade indisponível.", lang))
+        return
+    if reception_max and any(val is not None for val in reception_max.values()):
+        log.print(translate("A recepção máxima dos armazéns não entra nos duais do problema de transporte: análise de sensibilidade indisponível.", lang))
+        return
+
+    valid_routes = model_inputs["valid_routes"]
+    effective_capacity, unit_cost = _transport_lp_data(
+        model_inputs["destinations_list"], valid_routes, model_inputs["demand_total_capacity"],
+        model_inputs["demand_initial_inventory"], model_inputs["distance"], model_inputs["freight_cost"],
+        model_inputs["avg_freight"], model_inputs["storage_cost"])
+    flow = [solution["flow"].get(r, 0.0) for r in valid_routes]
+
+    duals = sensitivity.transport_duals(valid_routes, model_inputs["supply"], effective_capacity, unit_cost, flow,
+                                        solution["dummy_capacity"], solution["dummy_unallocated"],
+                                        model_inputs["big_m_cap"], model_inputs["big_m_unalloc"])
+    if duals is None:
+        log.print(translate("Os duais não puderam ser recuperados da alocação (tolerância do solver); análise de sensibilidade indisponível.", lang))
+        return
+
+    received = {}
+    for (_, d, _), val in zip(valid_routes, flow):
+        received[d] = received.get(d, 0.0) + val
+
+    capacity = [
+        {
+            "Armazém": cda_to_name.get(d, d),
+            "Capacidade Efetiva (ton)": effective_capacity.get(d, 0.0),
+            "Recebido (ton)": received.get(d, 0.0),
+            "Valor Marginal (R$/ton)": 0.0 - v,
+        }
+        for d, v in duals["capacity"].items()
+    ]
+    capacity.sort(key=lambda row: -row["Valor Marginal (R$/ton)"])
+
+    supply = [
+        {"Origem": o, "Produto": p, "Custo Marginal (R$/ton)": u}
+        for (o, p), u in duals["supply"].items()
+    ]
+
+    reduced_cost = duals["reduced_cost"]
+    lower = sensitivity.cost_ranging(unit_cost, flow, reduced_cost)
+    unused = np.flatnonzero(~np.isnan(lower))
+    unused = unused[np.argsort(reduced_cost[unused], kind='stable')][:SENSITIVITY_MAX_ROUTES]
+    routes = [
+        {
+            "Origem": valid_routes[r][0],
+            "Destino": cda_to_name.get(valid_routes[r][1], valid_routes[r][1]),
+            "Produto": valid_routes[r][2],
+            "Custo Unitário (R$/ton)": unit_cost[r],
+            "Custo Reduzido (R$/ton)": float(reduced_cost[r]),
+            "Custo Limite (R$/ton)": float(lower[r]),
+        }
+        for r in unused.tolist()
+    ]
+
+    results_dict["sensitivity"] = {"capacity": capacity, "supply": supply, "routes": routes}
+
+    binding = [row for row in capacity if row["Valor Marginal (R$/ton)"] > 1e-6]
+    log.print(translate("{n} armazéns com capacidade esgotada (valor marginal positivo).", lang).format(n=len(binding)))
+    for row in binding[:10]:
+        log.print(translate("Armazém: {d} | +1 ton de capacidade economiza R$ {val:,.2f}", lang).format(
+            d=row["Armazém"], val=row["Valor Marginal (R$/ton)"]))
+
+def _report_phase_objectives(results_dict, solution, log, lang="pt"):
+    # Both objectives of a lexicographic solve (see _solve_lexicographic), as kpis "infeasibility" and "cost"
+    if "infeasibility" not in solution:
+        return
+    log.print(translate("Fase 1 (inviabilidade): {infeasibility:,.4f} ton ponderadas. Fase 2 (custo real): R$ {cost:,.2f}", lang).format(
+        infeasibility=solution["infeasibility"], cost=solution["cost"]))
+    results_dict["kpis"]["infeasibility"] = solution["infeasibility"]
+    results_dict["kpis"]["cost"] = solution["cost"]
+
+def _report_lp_solution(results_dict, solution, log, origins_list, destinations_list, all_products,
+                        distance, freight_cost, avg_freight, storage_cost, big_m_cap, big_m_unalloc,
+                        cda_to_name, lang="pt"):
+    """
+    Fills the routes, KPIs and warnings of results_dict from an LP solution and prints the
+    allocation details to the log. Shared by every LP backend.
+    """
+    log.print("\n" + translate("--- DETALHES DO FLUXO (Alocação) ---", lang))
+    total_transported = 0
+    total_km = 0.0
+    total_freight_cost = 0.0
+    total_storage_cost = 0.0
+
+    for (o, d, p), val in solution["flow"].items():
+        if val > 0.001:  # ignore floating point zeros
+            d_name = cda_to_name.get(d, d)
+            dist = distance.get((o, d), 999999.0)
+            f_cost = freight_cost.get(o, avg_freight)
+            s_cost = storage_cost.get((d, p), 50.0)
+
+            route_freight = val * dist * f_cost
+            route_storage = val * s_cost
+            route_total = route_freight + route_storage
+
+            log.print(translate("De: {o} | Para: {d} | Produto: {p} | Qtd: {val:.2f} ton", lang).format(o=o, d=d_name, p=p, val=val))
+
+            results_dict["routes"].append({
+                "Origem": o,
+                "Destino": d_name,
+                "Produto": p,
+                "Quantidade (ton)": val,
+                "Distancia (km)": dist,
+                "Custo Frete (R$)": route_freight,
+                "Custo Armazenagem (R$)": route_storage,
+                "Custo Total (R$)": route_total,
+                "Custo Frete Unitario (R$/ton-km)": f_cost,
+                "Custo Armaz. Unitario (R$/ton)": s_cost
+            })
+
+            total_transported += val
+            total_km += dist
+            total_freight_cost += route_freight
+            total_storage_cost += route_storage
+
+    log.print("\n" + translate("Total de produtos alocados: {val:.2f} toneladas", lang).format(val=total_transported))
+
+    results_dict["kpis"]["total_tons"] = total_transported
+    results_dict["kpis"]["total_km"] = total_km
+    results_dict["kpis"]["total_freight_cost"] = total_freight_cost
+    results_dict["kpis"]["total_storage_cost"] = total_storage_cost
+
+    # Check usage of Dummy variables
+    dummy_cap_used = False
+    log.print("\n" + translate("--- AVISOS: CAPACIDADE ARTIFICIAL (DUMMIES) ---", lang))
+    for d in destinations_list:
+        d_val = solution["dummy_capacity"].get(d, 0.0)
+        if d_val > 0.001:
+            dummy_cap_used = True
+            d_name = cda_to_name.get(d, d)
+            msg = translate("O Armazém \'{d_name}\' precisou de capacidade de armazenamento artificial de {d_val:.2f} toneladas.", lang).format(d_name=d_name, d_val=d_val)
+            log.print(translate("ALERTA: {msg}", lang).format(msg=msg))
+            results_dict["warnings"]["capacity"].append(msg)
+
+    if not dummy_cap_used:
+        log.print(translate("Nenhuma capacidade artificial foi necessária. O modelo encontrou solução com as capacidades reais.", lang))
+
+    dummy_unalloc_used = False
+    log.print("\n" + translate("--- AVISOS: OFERTA SEM ROTAS / NÃO ALOCADA (DUMMIES) ---", lang))
+    for o in origins_list:
+        for p in all_products:
+            u_val = solution["dummy_unallocated"].get((o, p), 0.0)
+            if u_val > 0.001:
+                dummy_unalloc_used = True
+                msg = translate("A origem \'{o}\' possui oferta de \'{p}\' não alocada: {u_val:.2f} toneladas.", lang).format(o=o, p=p, u_val=u_val)
+                log.print(translate("ALERTA: {msg}", lang).format(msg=msg))
+                results_dict["warnings"]["unallocated"].append(msg)
+
+    if not dummy_unalloc_used:
+        log.print(translate("Toda a oferta conseguiu ser escoada em rotas válidas para algum destino.", lang))
+
+    if dummy_cap_used or dummy_unalloc_used:
+        log.print("\n" + translate("Nota: Foram utilizadas variáveis dummies com custo elevado para impedir que o modelo falhasse por inviabilidade.", lang))
+        log.print(translate("Custo de Capacidade Artificial (Big M) = {val:.2e}", lang).format(val=big_m_cap))
+        log.print(translate("Custo de Oferta Não Alocada (Big M) = {val:.2e}", lang).format(val=big_m_unalloc))
 
-        # Binary Variables for Limits
-        model.RouteActive = pyo.Var(model.ValidRoutes, domain=pyo.NonNegativeIntegers, doc=translate("Número de viagens na rota", lang))
-        # model.WarehouseActive declared further down in the MILP Constraints section
 
-        # =========================================================================
-        # 3.4 OBJECTIVE FUNCTION
-        # =========================================================================
-        # Mathematical expression to be minimized (Minimize Costs).
+def _run_milp_optimization_model(start_time, supply, demand_total_capacity, demand_initial_inventory,
+                                 demand_reception_capacity, is_public, cda_to_name,
+                                 prod_dest_compat, distance, freight_cost, storage_cost, avg_freight,
+                                 all_products, origins_list, detailed_log,
+                                 input_min_load, input_max_load, toggle_use_reception,
+                                 input_allocation_days, input_min_freight, input_max_freight, toggle_pareto=False, lang="pt",
+                                 session=None, milp_warmstart=True, solver_settings=None, decompose=False,
+                                 log_filename=None, timings=None, pruning=None, backend="pyomo", coarsen=False,
+                                 dest_municipality=None, dest_type=None):
+    """
+    Versão MILP do modelo, inclui restrições extras e variáveis binárias (RouteActive).
+    backend "heuristic" returns the greedy allocation without CBC, "kernel_search" solves restricted
+    MILPs grown from the LP relaxation (see _solve_milp_kernel_search); any other backend uses CBC
+    on the whole model. The warehouses are never coarsened: reception limits and trips belong to each warehouse.
+    """
+    limits = parse_milp_limits(input_allocation_days, input_min_load, input_max_load, input_min_freight, input_max_freight)
 
-        def objective_rule(model):
-            normal_costs = sum(
-                (model.Flow[o, d, p] * model.Distance[o, d] * model.Freight[o]) +
-                (model.Flow[o, d, p] * model.Storage[d, p])
-                for (o, d, p) in model.ValidRoutes
-            )
-            dummy_capacity_costs = sum(model.DummyCapacity[d] * model.BigMCapacity for d in model.Destinations)
-            dummy_reception_costs = sum(model.DummyReception[d] * (model.BigMCapacity * 0.1) for d in model.Destinations)
-            dummy_unallocated_costs = sum(model.DummyUnallocated[o, p] * model.BigMUnallocated for o in model.Origins for p in model.Products)
-            return normal_costs + dummy_capacity_costs + dummy_reception_costs + dummy_unallocated_costs
-
-        model.Objective = pyo.Objective(rule=objective_rule, sense=pyo.minimize, doc=translate("Minimização dos Custos Totais", lang))
-
-        # =========================================================================
-        # 3.5 CONSTRAINTS
-        # =========================================================================
-        # Rules that decision variables must strictly obey.
-
-        # Constraint 1: Flow Conservation (Supply Limit)
-        def supply_rule(model, o, p):
-            if model.Supply[o, p] <= 0:
-                return pyo.Constraint.Skip
-            valid_dests = [d for d in model.Destinations if (o, d, p) in model.ValidRoutes]
-            if not valid_dests:
-                return model.DummyUnallocated[o, p] == model.Supply[o, p]
-            flow_sum = sum(model.Flow[o, d, p] for d in valid_dests)
-            return flow_sum + model.DummyUnallocated[o, p] == model.Supply[o, p]
-        model.SupplyConstraint = pyo.Constraint(model.Origins, model.Products, rule=supply_rule, doc=translate("Restrição de Limite de Oferta", lang))
-
-        # Constraint 2: Static Effective Capacity Limit
-        def capacity_rule(model, d):
-            valid_ops = [(o, p) for o in model.Origins for p in model.Products if (o, d, p) in model.ValidRoutes]
-            if not valid_ops:
-                return pyo.Constraint.Skip
-            flow_sum = sum(model.Flow[o, d, p] for (o, p) in valid_ops)
-            effective_cap = max(0.0, pyo.value(model.TotalCapacity[d]) - pyo.value(model.InitialInventory[d]))
-            if effective_cap > 0:
-                return flow_sum <= (model.TotalCapacity[d] - model.InitialInventory[d]) + model.DummyCapacity[d]
-            else:
-                return flow_sum <= model.DummyCapacity[d]
-        model.CapacityConstraint = pyo.Constraint(model.Destinations, rule=capacity_rule, doc=translate("Restrição de Limite de Capacidade Efetiva", lang))
-
-# =========================================================================
-        # 3.6 MILP CONSTRAINTS (ADDITIONAL LOGISTICS LIMITS)
-        # =========================================================================
-        print("\n" + translate("--- CONFIGURAÇÕES DE LIMITES LOGÍSTICOS (MILP) ---", lang))
-        print(translate("Dias de alocação considerados: {val}", lang).format(val=pyo.value(model.Days, exception=False)))
-        if pyo.value(model.FreightMin, exception=False) is not None:
-            print(translate("Carga mínima de frete por rota ativada: {val} ton", lang).format(val=pyo.value(model.FreightMin, exception=False)))
-        if pyo.value(model.FreightMax, exception=False) is not None:
-            print(translate("Carga máxima de frete por rota ativada: {val} ton", lang).format(val=pyo.value(model.FreightMax, exception=False)))
-
-        if list(model.Destinations):
-            if pyo.value(model.ReceptionMin[list(model.Destinations)[0]], exception=False) is not None:
-                print(translate("Carga mínima diária de recepção ativada: {val1} ton/dia (Total: {val2} ton)", lang).format(val1=pyo.value(model.ReceptionMin[list(model.Destinations)[0]], exception=False), val2=pyo.value(model.ReceptionMin[list(model.Destinations)[0]], exception=False) * pyo.value(model.Days, exception=False)))
-            if toggle_use_reception:
-                print(translate("Capacidade máxima de recepção do banco de dados ativada.", lang))
-            elif pyo.value(model.ReceptionMax[list(model.Destinations)[0]], exception=False) is not None: # Note: this assumes same for all if not toggle
-                print(translate("Carga máxima diária de recepção ativada: {val} ton/dia", lang).format(val=pyo.value(model.ReceptionMax[list(model.Destinations)[0]], exception=False)))
-
-        def route_active_max_rule(model, o, d, p):
-            return model.Flow[o, d, p] <= model.RouteActive[o, d, p] * model.UpperFlow[o, d, p]
-            
-        model.RouteActiveMaxRule = pyo.Constraint(model.ValidRoutes, rule=route_active_max_rule, doc=translate("Limite máximo de frete ou local", lang))
-
-        # Minimum Freight limit (optional)
-        if pyo.value(model.FreightMin, exception=False) is not None:
-            def route_active_min_rule(model, o, d, p):
-                return model.Flow[o, d, p] >= model.RouteActive[o, d, p] * pyo.value(model.FreightMin, exception=False)
-            model.RouteActiveMinRule = pyo.Constraint(model.ValidRoutes, rule=route_active_min_rule, doc=translate("Limite mínimo de frete na rota caso ela seja usada", lang))
-
-        # Binary variable for warehouse activation:
-        # If a warehouse is used (receives any flow), WarehouseActive = 1
-        model.WarehouseActive = pyo.Var(model.Destinations, domain=pyo.Binary, doc=translate("1 se o armazém receber qualquer rota, 0 caso contrário", lang))
-
-        # Link warehouse flow with its activation variable (WarehouseActive)
-        def link_warehouse_active_rule(model, d):
-            valid_ops = [(o, p) for o in model.Origins for p in model.Products if (o, d, p) in model.ValidRoutes]
-            if not valid_ops:
-                return model.WarehouseActive[d] == 0
-
-            flow_sum = sum(model.Flow[o, d, p] for (o, p) in valid_ops)
-            
-            # Using clean parameter
-            return flow_sum <= model.WarehouseActive[d] * model.BigMWarehouse[d]
-            
-        model.LinkWarehouseActive = pyo.Constraint(model.Destinations, rule=link_warehouse_active_rule, doc=translate("Vincula o armazém a rotas ativas", lang))
-
-        # Minimum cargo reception limit in warehouse (optional)
-        def min_reception_rule(model, d):
-            reception_min_val = pyo.value(model.ReceptionMin[d], exception=False)
-            if reception_min_val is None:
-                return pyo.Constraint.Skip
-
-            valid_ops = [(o, p) for o in model.Origins for p in model.Products if (o, d, p) in model.ValidRoutes]
-            if not valid_ops:
-                return pyo.Constraint.Skip
-            flow_sum = sum(model.Flow[o, d, p] for (o, p) in valid_ops)
-            return flow_sum >= model.WarehouseActive[d] * (reception_min_val * pyo.value(model.Days, exception=False))
-        model.MinReceptionRule = pyo.Constraint(model.Destinations, rule=min_reception_rule, doc=translate("Recepção Mínima do Armazém se for ativado", lang))
-
-        # Maximum cargo reception limit in warehouse (optional or by Database Reception Cap.)
-        # Note: toggle_use_reception and carga_max are mutually exclusive in UI logic,
-        # but here we explicitly state priority: database capacity overrides if activated.
-        def max_reception_rule(model, d):
-            valid_ops = [(o, p) for o in model.Origins for p in model.Products if (o, d, p) in model.ValidRoutes]
-            if not valid_ops:
-                return pyo.Constraint.Skip
-
-            flow_sum = sum(model.Flow[o, d, p] for (o, p) in valid_ops)
-
-            reception_max_val = pyo.value(model.ReceptionMax[d], exception=False)
-            if reception_max_val is not None:
-                limit = reception_max_val * pyo.value(model.Days, exception=False)
-                # Flow can use dummy reception if limit is exceeded
-                return flow_sum <= limit + model.DummyReception[d]
-            return pyo.Constraint.Skip
+    # Log da execução
+    log = RunLog.open('optimization_log_milp_', log_filename)
+    log.timings.update(timings or {})
 
-        model.MaxReceptionRule = pyo.Constraint(model.Destinations, rule=max_reception_rule, doc=translate("Recepção Máxima no Armazém com tolerância de folga DummyReception", lang))
-
-        
-
-
-        if detailed_log:
-            model.pprint()
-
-        print("\n" + translate("Chamando solver CBC (MILP)...", lang))
-        solver = SolverFactory('cbc')
-        solver.options['sec'] = 600
-
-        results = solver.solve(model, tee=True)
-
-        print("\n" + translate("=== STATUS DA OTIMIZAÇÃO ===", lang))
-        print(translate("Status do Solver: {status}", lang).format(status=results.solver.status))
-        print(translate("Condição de Término: {condition}", lang).format(condition=results.solver.termination_condition))
-
-        if results.solver.status == pyo.SolverStatus.ok and results.solver.termination_condition == pyo.TerminationCondition.optimal:
-            print(translate("Solução Ótima Encontrada!", lang))
-            objective_value = pyo.value(model.Objective)
-            print(translate("Custo Total (Função Objetivo): R$ {val:,.2f}", lang).format(val=objective_value))
-
-            results_dict["status"] = "optimal"
-            results_dict["objective"] = objective_value
-
-            print("\n" + translate("--- DETALHES DO FLUXO (Alocação) ---", lang))
-            total_transported = 0
-            total_km = 0.0
-            total_freight_cost = 0.0
-            total_storage_cost = 0.0
-
-            for (o, d, p) in model.ValidRoutes:
-                val = pyo.value(model.Flow[o, d, p])
-                if val > 0.001:
-                    d_name = cda_to_name.get(d, d)
-                    dist = pyo.value(model.Distance[o, d])
-                    f_cost = pyo.value(model.Freight[o])
-                    s_cost = pyo.value(model.Storage[d, p])
-
-                    route_freight = val * dist * f_cost
-                    route_storage = val * s_cost
-                    route_total = route_freight + route_storage
-
-                    viagens = pyo.value(model.RouteActive[o, d, p])
-                    viagens_val = int(round(viagens)) if viagens is not None else None
-
-                    print(translate("De: {o} | Para: {d} | Produto: {p} | Qtd: {val:.2f} ton | Viagens: {viagens}", lang).format(o=o, d=d_name, p=p, val=val, viagens=viagens_val))
-
-                    results_dict["routes"].append({
-                        "Origem": o,
-                        "Destino": d_name,
-                        "Produto": p,
-                        "Quantidade (ton)": val,
-                        "Distancia (km)": dist,
-                        "Custo Frete (R$)": route_freight,
-                        "Custo Armazenagem (R$)": route_storage,
-                        "Custo Total (R$)": route_total,
-                        "Custo Frete Unitario (R$/ton-km)": f_cost,
-                        "Custo Armaz. Unitario (R$/ton)": s_cost,
-                        "Qtd. de Viagens": viagens_val
-                    })
-
-                    total_transported += val
-                    total_km += dist
-                    total_freight_cost += route_freight
-                    total_storage_cost += route_storage
-
-            print("\n" + translate("Total de produtos alocados: {val:.2f} toneladas", lang).format(val=total_transported))
-
-            results_dict["kpis"]["total_tons"] = total_transported
-            results_dict["kpis"]["total_km"] = total_km
-            results_dict["kpis"]["total_freight_cost"] = total_freight_cost
-            results_dict["kpis"]["total_storage_cost"] = total_storage_cost
-
-            # Check usage of Dummy variables
-            dummy_cap_used = False
-            print("\n" + translate("--- AVISOS: CAPACIDADE ARTIFICIAL (DUMMIES) ---", lang))
-            for d in model.Destinations:
-                d_val = pyo.value(model.DummyCapacity[d])
-                if d_val > 0.001:
-                    dummy_cap_used = True
-                    d_name = cda_to_name.get(d, d)
-                    msg = translate("O Armazém \'{d_name}\' precisou de capacidade de armazenamento artificial de {d_val:.2f} toneladas.", lang).format(d_name=d_name, d_val=d_val)
-                    print(translate("ALERTA: {msg}", lang).format(msg=msg))
-                    results_dict["warnings"]["capacity"].append(msg)
-
-            if not dummy_cap_used:
-                print(translate("Nenhuma capacidade estática artificial foi necessária.", lang))
-
-            if "reception" not in results_dict["warnings"]:
-                results_dict["warnings"]["reception"] = []
-
-            dummy_reception_used = False
-            print("\n" + translate("--- AVISOS: RECEPÇÃO DIÁRIA ARTIFICIAL (DUMMIES) ---", lang))
-            for d in model.Destinations:
-                d_val = pyo.value(model.DummyReception[d])
-                if d_val > 0.001:
-                    dummy_reception_used = True
-                    d_name = cda_to_name.get(d, d)
-                    msg = translate("O Armazém \'{d_name}\' precisou de capacidade de recepção diária artificial de {d_val:.2f} toneladas.", lang).format(d_name=d_name, d_val=d_val)
-                    print(translate("ALERTA: {msg}", lang).format(msg=msg))
-                    results_dict["warnings"]["reception"].append(msg)
-
-            if not dummy_reception_used:
-                print(translate("Nenhuma capacidade de recepção artificial foi necessária.", lang))
-
-            if "freight" not in results_dict["warnings"]:
-                results_dict["warnings"]["freight"] = []
-
-            dummy_unalloc_used = False
-            print("\n" + translate("--- AVISOS: OFERTA SEM ROTAS / NÃO ALOCADA (DUMMIES) ---", lang))
-            for o in model.Origins:
-                for p in model.Products:
-                    u_val = pyo.value(model.DummyUnallocated[o, p])
-                    if u_val > 0.001:
-                        dummy_unalloc_used = True
-
-                        # Infer if non-allocation could be due to tight freight
-                        if frete_min is not None or frete_max is not None:
-                            msg = translate("A origem \'{o}\' possui oferta de \'{p}\' não alocada ({u_val:.2f} toneladas). Isso provavelmente ocorreu devido às restrições de carga de frete mínima/máxima impostas.", lang).format(o=o, p=p, u_val=u_val)
-                            print(translate("ALERTA: {msg}", lang).format(msg=msg))
-                            results_dict["warnings"]["freight"].append(msg)
-                        else:
-                            msg = translate("A origem \'{o}\' possui oferta de \'{p}\' não alocada: {u_val:.2f} toneladas.", lang).format(o=o, p=p, u_val=u_val)
-                            print(translate("ALERTA: {msg}", lang).format(msg=msg))
-                            results_dict["warnings"]["unallocated"].append(msg)
-
-            if not dummy_unalloc_used:
-                print(translate("Toda a oferta conseguiu ser escoada em rotas válidas.", lang))
-
-            if dummy_cap_used or dummy_reception_used or dummy_unalloc_used:
-                print("\n" + translate("Nota: Foram utilizadas variáveis dummies com custo elevado para impedir que o modelo falhasse por inviabilidade.", lang))
+    results_dict = new_results_dict()
+    monitor = ResourceMonitor().start()
 
+    try:
+        log.print(translate("Iniciando a construção do modelo matemático (MILP com restrições de limite)...", lang))
+
+        destinations_list = list(demand_total_capacity.keys())
+        if toggle_pareto:
+            _print_pruning(pruning or PARETO_PRUNING, log, lang)
+        with log.timed("routes"):
+            valid_routes = build_valid_routes(origins_list, destinations_list, all_products,
+                                              distance, prod_dest_compat, toggle_pareto, pruning=pruning,
+                                              freight_cost=freight_cost, avg_freight=avg_freight, storage_cost=storage_cost)
+        log.model_stats["valid_routes"] = len(valid_routes)
+        log.print(translate("Total de combinações (Origem x Destino x Produto) válidas: {val}", lang).format(val=len(valid_routes)))
+
+        val_big_m_cap, val_big_m_unalloc = compute_big_m_penalties(freight_cost, distance, storage_cost)
+        reception_max = reception_max_values(destinations_list, demand_reception_capacity, toggle_use_reception, limits["carga_max"])
+
+        model_inputs = dict(
+            origins_list=origins_list, destinations_list=destinations_list, all_products=all_products,
+            valid_routes=valid_routes, supply=supply,
+            demand_total_capacity=demand_total_capacity, demand_initial_inventory=demand_initial_inventory,
+            distance=distance, freight_cost=freight_cost, avg_freight=avg_freight, storage_cost=storage_cost,
+            big_m_cap=val_big_m_cap, big_m_unalloc=val_big_m_unalloc
+        )
+
+        _print_milp_limits(limits, reception_max, destinations_list, toggle_use_reception, log, lang)
+
+        # Trips are counted per product, so the MILP keeps its products apart
+        full_inputs = model_inputs
+        model_inputs, plan = _presolve(model_inputs, log, lang=lang)
+        if coarsen:
+            log.print(translate("A agregação de armazéns vale apenas para execuções sem limites logísticos: o MILP é resolvido com todos os armazéns.", lang))
+
+        settings = solver_settings or normalize_solver_settings()
+        _print_solver_settings(settings, log, lang)
+
+        integer = needs_integer_variables(limits)
+        _print_model_class(integer, limits, log, lang)
+        results_dict["model_class"] = "milp" if integer else "lp"
+
+        # Instant allocation within the logistics limits: the answer of the heuristic backend, otherwise
+        # a preview while CBC runs and a starting solution for it
+        preview = _heuristic_preview(model_inputs, log, results_dict, limits=limits, reception_max=reception_max, lang=lang)
+
+        components = route_components(model_inputs["valid_routes"]) if decompose and backend != "heuristic" else []
+        if backend == "heuristic":
+            solution = preview
+        elif not integer and len(components) > 1:
+            solve = functools.partial(_solve_milp_as_lp, limits=limits, reception_max=reception_max, backend=backend,
+                                      detailed_log=detailed_log, lang=lang)
+            solution = _solve_decomposed(solve, components, model_inputs, settings, log, lang)
+        elif not integer:
+            solution = _solve_milp_as_lp(model_inputs, settings, log, limits, reception_max, backend=backend,
+                                         session=session, results_dict=results_dict, detailed_log=detailed_log, lang=lang)
+        elif len(components) > 1:
+            if backend == "kernel_search":
+                solve = functools.partial(_solve_milp_kernel_search, limits=limits, reception_max=reception_max,
+                                          detailed_log=detailed_log, lang=lang)
+            else:
+                solve = functools.partial(_solve_milp_component, limits=limits, reception_max=reception_max,
+                                          milp_warmstart=milp_warmstart, detailed_log=detailed_log, lang=lang)
+            solution = _solve_decomposed(solve, components, model_inputs, settings, log, lang)
+        elif backend == "kernel_search":
+            solution = _solve_milp_kernel_search(model_inputs, settings, log, limits, reception_max,
+                                                 heuristic_flows=preview["flow"] if preview else None,
+                                                 detailed_log=detailed_log, lang=lang)
         else:
-            print(translate("Não foi possível encontrar uma solução ótima.", lang))
+            def build():
+                return _build_milp_model(limits=limits, reception_max=reception_max, lang=lang, **model_inputs)
+
+            def update(model):
+                _update_lp_params(model, demand_total_capacity, demand_initial_inventory, storage_cost,
+                                  val_big_m_cap, val_big_m_unalloc)
+                _update_milp_params(model, limits, reception_max)
+
+            # Which optional constraints exist is structural, their values are not
+            active_limits = (limits["carga_min"] is not None, limits["frete_min"] is not None,
+                             tuple(d for d in model_inputs["destinations_list"] if reception_max[d] is not None))
+            key = model_structure_key("milp", model_inputs["valid_routes"], model_inputs["supply"], distance, freight_cost,
+                                      avg_freight, model_inputs["destinations_list"], active_limits=active_limits)
+            frame = model_frame_key("milp", model_inputs["origins_list"], model_inputs["destinations_list"],
+                                    model_inputs["all_products"], active_limits=active_limits)
+
+            def patch(model):
+                return _patch_session_model(model, model_inputs["valid_routes"], model_inputs["supply"], distance,
+                                            freight_cost, avg_freight, log, lang)
+
+            with log.timed("model_build"):
+                model, reused = _session_model(session, key, build, update, frame=frame, patch=patch)
+            _print_session_reuse(reused, log, lang)
+            results_dict["session_reused"] = bool(reused)
+
+            with log.timed("warm_start"):
+                warmstart = milp_warmstart and _milp_warm_start(model, reused, model_inputs, log, lang,
+                                                                heuristic_flows=preview["flow"] if preview else None)
+            monitor.check()
+            solution = _solve_milp_model(model, log, detailed_log=detailed_log, warmstart=warmstart, solver_settings=settings, lang=lang)
+
+        # A solver terminated at a memory ceiling is an error, not an infeasible model
+        monitor.check()
+
+        if solution is not None:
+            proven = solution["proven_optimal"]
+            if solution.get("heuristic"):
+                log.print(translate("Solução heurística encontrada (sem otimalidade comprovada).", lang))
+            elif proven:
+                log.print(translate("Solução Ótima Encontrada!", lang))
+            else:
+                log.print(translate("Solução Viável Encontrada (otimalidade não comprovada).", lang))
+            log.print(translate("Custo Total (Função Objetivo): R$ {val:,.2f}", lang).format(val=solution["objective"]))
+
+            results_dict["status"] = "optimal" if proven else "feasible"
+            results_dict["heuristic"] = bool(solution.get("heuristic"))
+            results_dict["objective"] = solution["objective"]
+            _report_phase_objectives(results_dict, solution, log, lang)
+            results_dict["kpis"].update(_bound_kpis(solution["objective"], solution["bound"], proven))
+            if results_dict["kpis"]["best_bound"] is not None:
+                log.print(translate("Melhor limite inferior: R$ {bound:,.2f} (gap de {gap:.2f}%)", lang).format(
+                    bound=results_dict["kpis"]["best_bound"], gap=results_dict["kpis"]["mip_gap"]))
+
+            with log.timed("reporting"):
+                solution = postsolve_solution(solution, plan)
+                _report_milp_solution(
+                    results_dict, solution, log,
+                    origins_list=origins_list, destinations_list=destinations_list, all_products=all_products,
+                    distance=distance, freight_cost=freight_cost, avg_freight=avg_freight, storage_cost=storage_cost,
+                    cda_to_name=cda_to_name, limits=limits, lang=lang
+                )
+            # Linear limits are solved as the LP, which has the duals of the LP runs
+            if not integer and results_dict["status"] == "optimal":
+                with log.timed("sensitivity"):
+                    _report_sensitivity(results_dict, solution, full_inputs, log, cda_to_name, settings,
+                                        reception_max=reception_max, lang=lang)
+
+        else:
+            log.print(translate("Não foi possível encontrar uma solução ótima.", lang))
             results_dict["status"] = "infeasible"
             results_dict["warnings"]["general"].append(translate("O modelo não encontrou solução ótima.", lang))
 
     except Exception as e:
-        print("\n" + translate("ERRO DURANTE A OTIMIZAÇÃO: {err}", lang).format(err=str(e)))
         results_dict["status"] = "error"
-        results_dict["warnings"]["general"].append(translate("Erro: {err}", lang).format(err=str(e)))
-        import traceback
-        print(traceback.format_exc())
+        if monitor.exceeded is not None:
+            message = _memory_limit_message(monitor.exceeded, lang)
+            log.print("\n" + message)
+            results_dict["warnings"]["general"].append(message)
+        else:
+            log.print("\n" + translate("ERRO DURANTE A OTIMIZAÇÃO: {err}", lang).format(err=str(e)))
+            results_dict["warnings"]["general"].append(translate("Erro: {err}", lang).format(err=str(e)))
+            import traceback
+            log.print(traceback.format_exc())
 
     finally:
+        monitor.stop()
+        results_dict["kpis"].update(monitor.kpis())
+        results_dict["timings"] = dict(log.timings)
+        results_dict["model_stats"] = dict(log.model_stats)
+        _print_run_profile(log, results_dict["kpis"], lang)
+
         end_time = time.time()
         total_time_seconds = end_time - start_time
-        print("\n" + translate("Tempo de execução: {val:.2f} segundos.", lang).format(val=total_time_seconds))
+        log.print("\n" + translate("Tempo de execução: {val:.2f} segundos.", lang).format(val=total_time_seconds))
         results_dict["kpis"]["execution_time"] = total_time_seconds
 
-        new_stdout.close()
-        sys.stdout = old_stdout
+        log.close()
 
-    return log_filename, results_dict
+    return log.filename, results_dict
+
+def _bound_kpis(objective, bound, proven):
+    """
+    KPIs of the quality of a MILP solution: whether it is proven optimal, the best bound of the
+    search and the relative gap between them in percent (None when the bound is unknown).
+    """
+    gap = None
+    if bound is not None:
+        # The bound is printed rounded by CBC, it never exceeds the objective of a minimization
+        bound = min(bound, objective)
+        gap = (objective - bound) / max(abs(objective), 1e-10) * 100.0
+    return {"proven_optimal": proven, "best_bound": bound, "mip_gap": gap}
+
+def _milp_warm_start(model, reused, model_inputs, log, lang="pt", heuristic_flows=None):
+    """
+    Sets the initial incumbent for branch-and-bound: the previous solution of a reused session model,
+    otherwise the cheaper of the LP solution without logistics limits and the greedy heuristic
+    allocation (heuristic_flows, route flows within the limits). They are repaired to fit the current
+    limits. Returns True if a starting solution was set.
+    """
+    candidates = []
+    if reused:
+        start_flows = {r: pyo.value(model.Flow[r], exception=False) or 0.0 for r in model.ValidRoutes}
+        candidates.append((translate("solução anterior da sessão", lang), start_flows))
+    else:
+        start_flows = _lp_start_flows(
+            model_inputs["valid_routes"], model_inputs["supply"], model_inputs["demand_total_capacity"],
+            model_inputs["demand_initial_inventory"], model_inputs["distance"], model_inputs["freight_cost"],
+            model_inputs["avg_freight"], model_inputs["storage_cost"], model_inputs["big_m_cap"], model_inputs["big_m_unalloc"]
+        )
+        if start_flows is not None:
+            candidates.append((translate("relaxação LP", lang), start_flows))
+        if heuristic_flows is not None:
+            candidates.append((translate("heurística gulosa", lang), heuristic_flows))
+
+    if not candidates:
+        return False
+
+    _, routes_by_destination = build_route_indexes(model_inputs["valid_routes"])
+    best = None
+    for source, flows in candidates:
+        active_routes = _set_milp_start(model, flows, routes_by_destination)
+        cost = pyo.value(model.Objective)
+        if best is None or cost < best[2]:
+            best = (source, active_routes, cost, flows)
+    if best[3] is not candidates[-1][1]:
+        _set_milp_start(model, best[3], routes_by_destination)
+
+    log.print(translate("Solução inicial (warm start) a partir da {source}: {routes} rotas ativas, custo R$ {val:,.2f}", lang).format(
+        source=best[0], routes=best[1], val=best[2]))
+    return True
+
+def _solve_milp_component(model_inputs, solver_settings, log, limits, reception_max, milp_warmstart=True,
+                          detailed_log=False, lang="pt"):
+    """
+    Builds and solves the MILP for the given inputs, without a scenario session.
+    """
+    reception_max = {d: reception_max[d] for d in model_inputs["destinations_list"]}
+    with log.timed("model_build"):
+        model = _build_milp_model(limits=limits, reception_max=reception_max, lang=lang, **model_inputs)
+    with log.timed("warm_start"):
+        warmstart = milp_warmstart and _milp_warm_start(
+            model, False, model_inputs, log, lang,
+            heuristic_flows=_heuristic_solution(model_inputs, limits, reception_max)["flow"])
+    return _solve_milp_model(model, log, detailed_log=detailed_log, warmstart=warmstart, solver_settings=solver_settings, lang=lang)
+
+def _solve_milp_as_lp(model_inputs, solver_settings, log, limits, reception_max, backend="pyomo", session=None,
+                      results_dict=None, detailed_log=False, lang="pt"):
+    """
+    Solves a run whose logistics limits are all linear (see needs_integer_variables) as an LP: the LP
+    model with the maximum reception, or the plain LP with any LP backend when no warehouse has one.
+    The trips of each route are derived from its flow and the maximum freight. Returns the solution
+    in the form of _solve_milp_model (with trips and dummy reception), or None; it is proven optimal
+    unless column generation stopped at its round limit.
+    """
+    destinations = model_inputs["destinations_list"]
+    reception_max = {d: reception_max.get(d) for d in destinations}
+    with_reception = any(val is not None for val in reception_max.values())
+
+    frete_max = limits["frete_max"]
+    valid_routes = model_inputs["valid_routes"]
+    if frete_max is not None and frete_max <= 0:
+        # No trip can carry any load, as in the MILP: the model is solved without routes
+        log.print(translate("Carga máxima de frete de {val:g} t: nenhuma rota pode transportar carga.", lang).format(val=frete_max))
+        model_inputs = dict(model_inputs, valid_routes=[])
+
+    if backend in ("sparse", "network", "column_generation") and not with_reception:
+        solution = _solve_lp_component(model_inputs, solver_settings, log, backend=backend, lang=lang)
+    else:
+        if with_reception and backend not in ("pyomo", "kernel_search"):
+            log.print(translate("A recepção máxima é resolvida pelo modelo completo (Pyomo).", lang))
+        active_limits = tuple(d for d in destinations if reception_max[d] is not None) or None
+        key = model_structure_key("lp", model_inputs["valid_routes"], model_inputs["supply"], model_inputs["distance"],
+                                  model_inputs["freight_cost"], model_inputs["avg_freight"], destinations,
+                                  active_limits=active_limits)
+
+        def update(model):
+            _update_lp_params(model, model_inputs["demand_total_capacity"], model_inputs["demand_initial_inventory"],
+                              model_inputs["storage_cost"], model_inputs["big_m_cap"], model_inputs["big_m_unalloc"])
+            if with_reception:
+                model.Days = limits["days"]
+                for d in model.Destinations:
+                    model.ReceptionMax[d] = reception_max[d]
+
+        with log.timed("model_build"):
+            model, reused = _session_model(
+                session, key,
+                build=lambda: _build_lp_model(reception_max=reception_max, days=limits["days"], lang=lang, **model_inputs),
+                update=update,
+                frame=model_frame_key("lp", model_inputs["origins_list"], destinations, model_inputs["all_products"],
+                                      active_limits=active_limits),
+                patch=lambda m: _patch_session_model(m, model_inputs["valid_routes"], model_inputs["supply"], model_inputs["distance"],
+                                                     model_inputs["freight_cost"], model_inputs["avg_freight"], log, lang)
+            )
+        _print_session_reuse(reused, log, lang)
+        if results_dict is not None:
+            results_dict["session_reused"] = bool(reused)
+        solution = _solve_lp_model(model, log, detailed_log=detailed_log, solver_settings=solver_settings, lang=lang)
+
+    if solution is None:
+        return None
+
+    # Without a minimum freight any number of trips carries the flow; the fewest is ceil(flow / maximum)
+    solution["flow"] = {r: solution["flow"].get(r, 0.0) for r in valid_routes}
+    trips = {}
+    inflow = {}
+    for (o, d, p), val in solution["flow"].items():
+        if val <= 1e-6:
+            trips[(o, d, p)] = 0
+        else:
+            trips[(o, d, p)] = math.ceil(val / frete_max - 1e-9) if frete_max is not None else 1
+        inflow[d] = inflow.get(d, 0.0) + val
+
+    solution["trips"] = trips
+    solution["dummy_reception"] = {
+        d: max(0.0, inflow.get(d, 0.0) - reception_max[d] * limits["days"]) if reception_max[d] is not None else 0.0
+        for d in destinations
+    }
+    # Column generation stopped by its round limit has no proof of optimality, nor a bound
+    if solution.get("proven_optimal", True):
+        solution["proven_optimal"] = True
+        solution["bound"] = solution["objective"]
+    return solution
+
+def _print_model_class(integer, limits, log, lang="pt"):
+    # Which path a run with logistics limits takes (see needs_integer_variables)
+    if integer:
+        log.print(translate("Classificação do modelo: frete mínimo ou recepção mínima exigem viagens inteiras e ativação de armazéns; resolvido como MILP.", lang))
+    elif limits["frete_max"] is not None and limits["frete_max"] > 0:
+        log.print(translate("Classificação do modelo: os limites ativos são lineares; resolvido como LP, com as viagens de cada rota calculadas como ⌈fluxo / {val:g} t⌉.", lang).format(val=limits["frete_max"]))
+    else:
+        log.print(translate("Classificação do modelo: os limites ativos são lineares; resolvido como LP, com uma viagem por rota usada.", lang))
+
+def _solve_milp_kernel_search(model_inputs, solver_settings, log, limits, reception_max, heuristic_flows=None,
+                              detailed_log=False, lang="pt"):
+    """
+    Solves the MILP by kernel search (see src.logic.kernel_search): restricted MILPs on the routes
+    used by the LP relaxation, grown by buckets of routes in order of reduced cost, within the time
+    limit of the solver settings. Returns the best solution found, or None if no restricted MILP
+    found a solution. "proven_optimal" needs a complete search whose last MILP had every route, and
+    "bound" is then its bound; otherwise "bound" is the LP relaxation, and the bound of the last
+    restricted MILP (which only covers its routes) goes to log.model_stats["kernel_restricted_bound"].
+    Whether the search completed or ran out of time goes to log.model_stats["kernel_search"].
+    """
+    valid_routes = model_inputs["valid_routes"]
+    big_m_cap, big_m_unalloc = model_inputs["big_m_cap"], model_inputs["big_m_unalloc"]
+    settings = solver_settings or normalize_solver_settings()
+    if settings["objective"] == "lexicographic":
+        # The cutoff of each restricted MILP is the cost of the incumbent
+        log.print(translate("A busca em kernel compara as soluções pelo objetivo com Big M, que é resolvido diretamente.", lang))
+    if heuristic_flows is None:
+        heuristic_flows = _heuristic_solution(model_inputs, limits, reception_max)["flow"]
+
+    # LP relaxation: trips and activations relax away, leaving the transportation LP; without the
+    # reception limits its optimum is a lower bound of the MILP
+    with log.timed("model_build"):
+        effective_capacity, unit_cost = _transport_lp_data(
+            model_inputs["destinations_list"], valid_routes, model_inputs["demand_total_capacity"],
+            model_inputs["demand_initial_inventory"], model_inputs["distance"], model_inputs["freight_cost"],
+            model_inputs["avg_freight"], model_inputs["storage_cost"])
+        problem = sparse_lp.build_transport_lp(valid_routes, model_inputs["supply"], effective_capacity, unit_cost,
+                                               big_m_cap, big_m_unalloc)
+    log.print("\n" + translate("--- BUSCA EM KERNEL: RELAXAÇÃO LP ---", lang))
+    relaxation = sparse_lp.solve_transport_lp(problem, options=cbc_options(settings), duals=True)
+    for phase, seconds in relaxation["timings"].items():
+        log.add_time(phase, seconds)
+    if relaxation["status"] != "optimal":
+        log.print(relaxation["log"])
+        return None
+
+    n_supply = len(problem["supply_keys"])
+    supply_index = {key: i for i, key in enumerate(problem["supply_keys"])}
+    dest_index = {d: j for j, d in enumerate(problem["dest_keys"])}
+    route_src = np.fromiter((supply_index.get((o, p), -1) for (o, _, p) in valid_routes), dtype=np.int64, count=len(valid_routes))
+    route_dst = np.fromiter((dest_index[d] for (_, d, _) in valid_routes), dtype=np.int64, count=len(valid_routes))
+    # Routes without supply (index -1) get an infinite reduced cost and are tried last
+    supply_duals = np.append(relaxation["duals"][:n_supply], -np.inf)
+    rc = column_generation.reduced_costs(problem["c"][:problem["n_routes"]], route_src, route_dst, supply_duals,
+                                         relaxation["duals"][n_supply:])
+
+    lp_flow = relaxation["x"][:problem["n_routes"]]
+    known = [np.fromiter((heuristic_flows.get(r, 0.0) for r in valid_routes), dtype=float, count=len(valid_routes))]
+    kernel, rest = kernel_search.initial_kernel(lp_flow, rc, known)
+    buckets = kernel_search.make_buckets(rest, len(kernel))
+    log.print(translate("Relaxação LP: R$ {val:,.2f}. Kernel inicial com {kernel} de {routes} rotas; {buckets} grupos de até {size} rotas a seguir, por custo reduzido.", lang).format(
+        val=relaxation["objective"], kernel=len(kernel), routes=len(valid_routes), buckets=len(buckets), size=len(kernel)))
+
+    def solve(indexes, incumbent, time_limit):
+        routes = [valid_routes[r] for r in indexes]
+        destinations = {d for (_, d, _) in routes}
+        # Every supply pair stays in the restricted model, so its solution allocates the whole supply
+        inputs = dict(model_inputs, valid_routes=routes,
+                      destinations_list=[d for d in model_inputs["destinations_list"] if d in destinations])
+        with log.timed("model_build"):
+            model = _build_milp_model(limits=limits, reception_max=reception_max, lang=lang, **inputs)
+        with log.timed("warm_start"):
+            if incumbent is None:
+                warmstart = _milp_warm_start(model, False, inputs, log, lang, heuristic_flows=heuristic_flows)
+            else:
+                _set_milp_start(model, incumbent["flow"], build_route_indexes(routes)[1])
+                warmstart = True
+        solution = _solve_milp_model(model, log, detailed_log=detailed_log and incumbent is None, warmstart=warmstart,
+                                     solver_settings=dict(settings, time_limit=time_limit, objective="penalty"), lang=lang,
+                                     cutoff=incumbent["objective"] if incumbent is not None else None)
+        if solution is None:
+            return None
+        for name in ("flow", "trips"):
+            solution[name] = {r: solution[name].get(r, 0.0) for r in valid_routes}
+        solution["used"] = [i for i, r in enumerate(valid_routes) if solution["flow"][r] > kernel_search.EPS]
+        return solution
+
+    def report_step(info):
+        if info["objective"] is None:
+            outcome = translate("sem solução melhor", lang)
+        else:
+            outcome = translate("custo R$ {val:,.2f}", lang).format(val=info["objective"])
+        log.print("\n" + translate("Busca em kernel, etapa {step}: {routes} rotas, {outcome} em {sec:.1f} s; melhor custo R$ {best:,.2f}", lang).format(
+            step=info["step"], routes=info["routes"], outcome=outcome, sec=info["seconds"],
+            best=info["best"] if info["best"] is not None else float("nan")))
+        log.flush()
+
+    result = kernel_search.kernel_search(kernel, buckets, solve, settings["time_limit"], on_step=report_step)
+    log.model_stats["kernel_routes"] = result["kernel"]
+    log.model_stats["kernel_search"] = result["status"]
+    if result["status"] == "complete":
+        log.print(translate("Busca em kernel concluída: {steps} MILPs restritos, kernel final com {kernel} rotas.", lang).format(
+            steps=len(result["steps"]), kernel=result["kernel"]))
+    else:
+        log.print(translate("Busca em kernel interrompida pelo limite de tempo após {steps} MILPs restritos, kernel final com {kernel} rotas.", lang).format(
+            steps=len(result["steps"]), kernel=result["kernel"]))
+
+    solution = result["solution"]
+    if solution is None:
+        return None
+    del solution["used"]
+    # Optimal for the whole model only if the last restricted MILP left no route out
+    proven = result["status"] == "complete" and result["steps"][-1]["routes"] == len(valid_routes)
+    solution.update(proven_optimal=proven, bound=result["bound"])
+    if not proven:
+        # The bound of the last restricted MILP only holds for its routes: the one of the whole
+        # model is the LP relaxation
+        solution["bound"] = relaxation["objective"]
+        log.model_stats["kernel_restricted_bound"] = result["bound"]
+        log.print(translate("O limite inferior do modelo completo é a relaxação LP (R$ {val:,.2f}); o do último MILP restrito vale só para as suas rotas.", lang).format(
+            val=relaxation["objective"]))
+    return solution
+
+def _upper_flow_value(frete_max, supply_value):
+    # The route's real ceiling is ONLY the supply from that origin (since capacity can expand with dummy)
+    if frete_max is not None:
+        return frete_max
+    return supply_value if supply_value > 0 else 999999.0
+
+def _max_trips_value(frete_min, frete_max, supply_value):
+    """
+    Most trips a route can need. Without a maximum freight one trip carries the whole supply;
+    with a minimum freight a route cannot make more trips than its supply fills (none below it).
+    More trips than the flow needs cost nothing, so no solution is lost.
+    """
+    if frete_max is None:
+        trips = 1
+    elif frete_max > 0:
+        trips = math.ceil(supply_value / frete_max - 1e-9)
+    else:
+        trips = 0
+    if frete_min is not None and frete_min > 0:
+        trips = min(trips, math.floor((supply_value + 1e-6) / frete_min))
+    return max(0, trips)
+
+def _route_capacity_value(frete_min, frete_max, supply_value):
+    # Most a route can carry: its supply, or fewer full trips when the minimum freight caps them
+    upper_flow = _upper_flow_value(frete_max, supply_value)
+    return min(supply_value, _max_trips_value(frete_min, frete_max, supply_value) * upper_flow)
+
+def _warehouse_big_m_value(frete_min, frete_max, supply, valid_ops):
+    # The absolute maximum a warehouse can receive: what its routes can carry. Capacity and reception
+    # do not bound it, the dummies let the flow exceed them.
+    return sum(_route_capacity_value(frete_min, frete_max, supply.get((o, p), 0.0)) for (o, p) in valid_ops)
+
+def _build_milp_model(origins_list, destinations_list, all_products, valid_routes, supply,
+                      demand_total_capacity, demand_initial_inventory, distance, freight_cost, avg_freight,
+                      storage_cost, big_m_cap, big_m_unalloc, limits, reception_max, lang="pt"):
+    """
+    Builds the MILP allocation model with Pyomo: the LP model plus trips per route, warehouse
+    activation and the optional freight and reception limits given by parse_milp_limits.
+    The limits are mutable Params; which of them are active is part of the model structure.
+    """
+    model = pyo.ConcreteModel(name="Alocacao_Armazens_MILP")
+
+    # =========================================================================
+    # 3.1 CONJUNTOS (SETS)
+    # =========================================================================
+    # Defines the indices over which the model will operate.
+    model.Origins = pyo.Set(initialize=origins_list, doc=translate("Cidades de Origem da Oferta", lang))
+    model.Destinations = pyo.Set(initialize=destinations_list, doc=translate("Armazéns de Destino", lang))
+    model.Products = pyo.Set(initialize=all_products, doc=translate("Tipos de Produtos", lang))
+    model.ValidRoutes = pyo.Set(initialize=valid_routes, dimen=3, doc=translate("Rotas Válidas (Origem, Destino, Produto)", lang))
+
+    # Adjacency indexes built once, so each rule below is linear in its own routes
+    routes_by_origin_product, routes_by_destination = build_route_indexes(valid_routes)
+
+    # =========================================================================
+    # 3.2 PARÂMETROS (PARAMETERS)
+    # =========================================================================
+    # Valores fixos conhecidos fornecidos como dados de entrada para o modelo.
+
+    # --- Constants and Logistics Limit Parameters ---
+    model.Days = pyo.Param(initialize=limits["days"], mutable=True, within=pyo.Any, doc=translate("Dias de alocação", lang))
+    model.FreightMin = pyo.Param(initialize=limits["frete_min"], mutable=True, within=pyo.Any, doc=translate("Carga mínima de frete por rota", lang))
+    model.FreightMax = pyo.Param(initialize=limits["frete_max"], mutable=True, within=pyo.Any, doc=translate("Carga máxima de frete por rota", lang))
+
+    def reception_min_init(model, d):
+        return limits["carga_min"]
+    model.ReceptionMin = pyo.Param(model.Destinations, initialize=reception_min_init, mutable=True, within=pyo.Any, doc=translate("Carga mínima diária de recepção", lang))
+
+    def reception_max_init(model, d):
+        return reception_max[d]
+    model.ReceptionMax = pyo.Param(model.Destinations, initialize=reception_max_init, mutable=True, within=pyo.Any, doc=translate("Carga máxima diária de recepção ou capacidade do banco", lang))
+
+    _add_common_params(model, supply, demand_total_capacity, demand_initial_inventory, distance,
+                       freight_cost, avg_freight, storage_cost, big_m_cap, big_m_unalloc, lang)
+
+    # Big M para as Rotas (Indexado por ValidRoutes)
+    def big_m_flow_init(model, o, d, p):
+        return _upper_flow_value(limits["frete_max"], pyo.value(model.Supply[o, p]))
+
+    model.UpperFlow = pyo.Param(model.ValidRoutes, initialize=big_m_flow_init, mutable=True, doc=translate("Big M Dinâmico e Local por Rota", lang))
+
+    # Trip ceiling per route: a weak integer bound makes the LP relaxation weak and the search tree large
+    def max_trips_init(model, o, d, p):
+        return _max_trips_value(limits["frete_min"], limits["frete_max"], pyo.value(model.Supply[o, p]))
+
+    model.MaxTrips = pyo.Param(model.ValidRoutes, initialize=max_trips_init, mutable=True, doc=translate("Número máximo de viagens na rota", lang))
+
+    # 2. Big M for Warehouses (Indexed by Destinations)
+    def big_m_warehouse_init(model, d):
+        return _warehouse_big_m_value(limits["frete_min"], limits["frete_max"], supply, routes_by_destination.get(d, []))
+
+    model.BigMWarehouse = pyo.Param(model.Destinations, initialize=big_m_warehouse_init, mutable=True, doc=translate("Big M Dinâmico por Armazém", lang))
+
+    # =========================================================================
+    # 3.3 DECISION VARIABLES
+    # =========================================================================
+    # Values the solver will attempt to determine to optimize the result.
+
+    # Fluxo de produto (quantidade a ser transportada) em toneladas
+    model.Flow = pyo.Var(model.ValidRoutes, domain=pyo.NonNegativeReals, doc=translate("Quantidade transportada (o, d, p)", lang))
+
+    # Slack variables (Dummies) to ensure mathematical viability of the model
+    model.DummyCapacity = pyo.Var(model.Destinations, domain=pyo.NonNegativeReals, doc=translate("Capacidade extra artificial alocada (ton)", lang))
+    model.DummyUnallocated = pyo.Var(model.SupplyPairs, domain=pyo.NonNegativeReals, doc=translate("Oferta não alocada a nenhum destino (ton)", lang))
+    model.DummyReception = pyo.Var(model.Destinations, domain=pyo.NonNegativeReals, doc=translate("Capacidade de recepção diária extra artificial alocada (ton)", lang))
+
+    # Binary Variables for Limits
+    def route_active_bounds(model, o, d, p):
+        return (0, model.MaxTrips[o, d, p])
+    model.RouteActive = pyo.Var(model.ValidRoutes, domain=pyo.NonNegativeIntegers, bounds=route_active_bounds, doc=translate("Número de viagens na rota", lang))
+    # model.WarehouseActive declared further down in the MILP Constraints section
+
+    # =========================================================================
+    # 3.4 OBJECTIVE FUNCTION
+    # =========================================================================
+    # Mathematical expression to be minimized (Minimize Costs).
+
+    _add_route_cost(model, lang)
+
+    def objective_rule(model):
+        normal_costs = model.RouteCost
+        dummy_capacity_costs = pyo.quicksum(model.DummyCapacity[d] for d in model.Destinations) * model.BigMCapacity
+        dummy_reception_costs = pyo.quicksum(model.DummyReception[d] for d in model.Destinations) * (model.BigMCapacity * 0.1)
+        dummy_unallocated_costs = pyo.quicksum(model.DummyUnallocated[o, p] for (o, p) in model.SupplyPairs) * model.BigMUnallocated
+        return normal_costs + dummy_capacity_costs + dummy_reception_costs + dummy_unallocated_costs
+
+    model.Objective = pyo.Objective(rule=objective_rule, sense=pyo.minimize, doc=translate("Minimização dos Custos Totais", lang))
+    _add_lexicographic_objectives(model, lang)
+
+    # =========================================================================
+    # 3.5 CONSTRAINTS
+    # =========================================================================
+    # Rules that decision variables must strictly obey.
+
+    _add_supply_and_capacity_constraints(model, routes_by_origin_product, routes_by_destination, lang)
+
+    # =========================================================================
+    # 3.6 MILP CONSTRAINTS (ADDITIONAL LOGISTICS LIMITS)
+    # =========================================================================
+    def route_active_max_rule(model, o, d, p):
+        return model.Flow[o, d, p] <= model.RouteActive[o, d, p] * model.UpperFlow[o, d, p]
+
+    model.RouteActiveMaxRule = pyo.Constraint(model.ValidRoutes, rule=route_active_max_rule, doc=translate("Limite máximo de frete ou local", lang))
+
+    # Minimum Freight limit (optional)
+    if limits["frete_min"] is not None:
+        def route_active_min_rule(model, o, d, p):
+            return model.Flow[o, d, p] >= model.RouteActive[o, d, p] * model.FreightMin
+        model.RouteActiveMinRule = pyo.Constraint(model.ValidRoutes, rule=route_active_min_rule, doc=translate("Limite mínimo de frete na rota caso ela seja usada", lang))
+
+    # Binary variable for warehouse activation:
+    # If a warehouse is used (receives any flow), WarehouseActive = 1
+    model.WarehouseActive = pyo.Var(model.Destinations, domain=pyo.Binary, doc=translate("1 se o armazém receber qualquer rota, 0 caso contrário", lang))
+
+    # Link warehouse flow with its activation variable (WarehouseActive)
+    def link_warehouse_active_rule(model, d):
+        checkpoint()
+        valid_ops = routes_by_destination.get(d, [])
+        if not valid_ops:
+            return model.WarehouseActive[d] == 0
+
+        flow_sum = pyo.quicksum(model.Flow[o, d, p] for (o, p) in valid_ops)
+
+        # Using clean parameter
+        return flow_sum <= model.WarehouseActive[d] * model.BigMWarehouse[d]
+
+    model.LinkWarehouseActive = pyo.Constraint(model.Destinations, rule=link_warehouse_active_rule, doc=translate("Vincula o armazém a rotas ativas", lang))
+
+    # Minimum cargo reception limit in warehouse (optional)
+    def min_reception_rule(model, d):
+        if limits["carga_min"] is None:
+            return pyo.Constraint.Skip
+
+        valid_ops = routes_by_destination.get(d, [])
+        if not valid_ops:
+            return pyo.Constraint.Skip
+        flow_sum = pyo.quicksum(model.Flow[o, d, p] for (o, p) in valid_ops)
+        return flow_sum >= model.WarehouseActive[d] * (model.ReceptionMin[d] * model.Days)
+    model.MinReceptionRule = pyo.Constraint(model.Destinations, rule=min_reception_rule, doc=translate("Recepção Mínima do Armazém se for ativado", lang))
+
+    # Maximum cargo reception limit in warehouse (optional or by Database Reception Cap.)
+    _add_max_reception_constraint(model, reception_max, routes_by_destination, lang)
+
+    return model
+
+def _add_max_reception_constraint(model, reception_max, routes_by_destination, lang="pt"):
+    """
+    Maximum reception of each warehouse over the allocation days, exceeded only through
+    DummyReception. Shared by the MILP and the LP with linear logistics limits.
+    """
+    def max_reception_rule(model, d):
+        valid_ops = routes_by_destination.get(d, [])
+        if not valid_ops:
+            return pyo.Constraint.Skip
+
+        flow_sum = pyo.quicksum(model.Flow[o, d, p] for (o, p) in valid_ops)
+
+        if reception_max.get(d) is not None:
+            # Flow can use dummy reception if limit is exceeded
+            return flow_sum <= model.ReceptionMax[d] * model.Days + model.DummyReception[d]
+        return pyo.Constraint.Skip
+
+    model.MaxReceptionRule = pyo.Constraint(model.Destinations, rule=max_reception_rule, doc=translate("Recepção Máxima no Armazém com tolerância de folga DummyReception", lang))
+
+def _update_milp_params(model, limits, reception_max):
+    """
+    Applies new logistics limits to an already built MILP model. The set of active limits
+    must be the same as when the model was built (it is part of model_structure_key).
+    """
+    model.Days = limits["days"]
+    model.FreightMin = limits["frete_min"]
+    model.FreightMax = limits["frete_max"]
+
+    for d in model.Destinations:
+        model.ReceptionMin[d] = limits["carga_min"]
+        model.ReceptionMax[d] = reception_max[d]
+
+    for (o, d, p) in model.ValidRoutes:
+        supply_value = pyo.value(model.Supply[o, p])
+        model.UpperFlow[o, d, p] = _upper_flow_value(limits["frete_max"], supply_value)
+        model.MaxTrips[o, d, p] = _max_trips_value(limits["frete_min"], limits["frete_max"], supply_value)
+
+    supply = {(o, p): pyo.value(model.Supply[o, p]) for (o, p) in model.SupplyPairs}
+    _, routes_by_destination = build_route_indexes(list(model.ValidRoutes))
+    for d in model.Destinations:
+        model.BigMWarehouse[d] = _warehouse_big_m_value(limits["frete_min"], limits["frete_max"], supply,
+                                                        routes_by_destination.get(d, []))
+
+def _lp_start_flows(valid_routes, supply, demand_total_capacity, demand_initial_inventory, distance,
+                    freight_cost, avg_freight, storage_cost, big_m_cap, big_m_unalloc):
+    """
+    Flows of the allocation LP without logistics limits, solved with the sparse backend.
+    Used to seed the MILP; returns None if the LP could not be solved.
+    """
+    effective_capacity, unit_cost = _transport_lp_data(list(demand_total_capacity.keys()), valid_routes, demand_total_capacity,
+                                                       demand_initial_inventory, distance, freight_cost, avg_freight, storage_cost)
+
+    try:
+        problem = sparse_lp.build_transport_lp(valid_routes, supply, effective_capacity, unit_cost, big_m_cap, big_m_unalloc)
+        result = sparse_lp.solve_transport_lp(problem, time_limit=60)
+    except Exception:
+        return None
+
+    if result["status"] != "optimal":
+        return None
+    return dict(zip(valid_routes, result["x"][:problem["n_routes"]].tolist()))
+
+def _set_milp_start(model, flows, routes_by_destination):
+    """
+    Sets every variable of a MILP model to a feasible solution derived from the given route flows:
+    flows above the supply of their pair (a supply edited since they were found) are scaled down,
+    trips are rounded up per route, routes below the minimum freight and warehouses below the minimum
+    reception are emptied (their supply becomes unallocated), and the dummies absorb the rest.
+    Returns the number of active routes.
+    """
+    freight_min = pyo.value(model.FreightMin, exception=False)
+    days = pyo.value(model.Days, exception=False)
+
+    routed = {}
+    for (o, d, p) in model.ValidRoutes:
+        routed[(o, p)] = routed.get((o, p), 0.0) + max(0.0, flows.get((o, d, p), 0.0))
+    scale = {key: min(1.0, pyo.value(model.Supply[key]) / val) for key, val in routed.items() if val > 0}
+
+    flow = {}
+    trips = {}
+    for r in model.ValidRoutes:
+        val = max(0.0, flows.get(r, 0.0)) * scale.get((r[0], r[2]), 1.0)
+        upper = pyo.value(model.UpperFlow[r])
+        # A zero maximum freight leaves the route unusable
+        n_trips = math.ceil(val / upper - 1e-9) if val > 1e-6 and upper > 0 else 0
+        if n_trips and freight_min is not None and val < n_trips * freight_min - 1e-6:
+            val, n_trips = 0.0, 0
+        flow[r] = val if n_trips else 0.0
+        trips[r] = n_trips
+
+    for d in model.Destinations:
+        valid_ops = routes_by_destination.get(d, [])
+        inflow = sum(flow[(o, d, p)] for (o, p) in valid_ops)
+
+        reception_min = pyo.value(model.ReceptionMin[d], exception=False)
+        if inflow > 0 and reception_min is not None and inflow < reception_min * days - 1e-6:
+            for (o, p) in valid_ops:
+                flow[(o, d, p)] = 0.0
+                trips[(o, d, p)] = 0
+            inflow = 0.0
+
+        reception_max = pyo.value(model.ReceptionMax[d], exception=False)
+        model.WarehouseActive[d] = 1 if inflow > 0 else 0
+        model.DummyCapacity[d] = max(0.0, inflow - pyo.value(model.EffectiveCapacity[d]))
+        model.DummyReception[d] = max(0.0, inflow - reception_max * days) if reception_max is not None else 0.0
+
+    allocated = {}
+    for (o, d, p), val in flow.items():
+        model.Flow[o, d, p] = val
+        model.RouteActive[o, d, p] = trips[(o, d, p)]
+        allocated[(o, p)] = allocated.get((o, p), 0.0) + val
+
+    for (o, p) in model.SupplyPairs:
+        model.DummyUnallocated[o, p] = max(0.0, pyo.value(model.Supply[o, p]) - allocated.get((o, p), 0.0))
+
+    return sum(1 for n in trips.values() if n)
+
+def _print_milp_limits(limits, reception_max, destinations_list, toggle_use_reception, log, lang="pt"):
+    log.print("\n" + translate("--- CONFIGURAÇÕES DE LIMITES LOGÍSTICOS (MILP) ---", lang))
+    log.print(translate("Dias de alocação considerados: {val}", lang).format(val=limits["days"]))
+    if limits["frete_min"] is not None:
+        log.print(translate("Carga mínima de frete por rota ativada: {val} ton", lang).format(val=limits["frete_min"]))
+    if limits["frete_max"] is not None:
+        log.print(translate("Carga máxima de frete por rota ativada: {val} ton", lang).format(val=limits["frete_max"]))
+
+    if destinations_list:
+        first_dest = destinations_list[0]
+        if limits["carga_min"] is not None:
+            log.print(translate("Carga mínima diária de recepção ativada: {val1} ton/dia (Total: {val2} ton)", lang).format(val1=limits["carga_min"], val2=limits["carga_min"] * limits["days"]))
+        if toggle_use_reception:
+            log.print(translate("Capacidade máxima de recepção do banco de dados ativada.", lang))
+        elif reception_max[first_dest] is not None: # Note: this assumes same for all if not toggle
+            log.print(translate("Carga máxima diária de recepção ativada: {val} ton/dia", lang).format(val=reception_max[first_dest]))
+
+def _solve_milp_model(model, log, detailed_log=False, warmstart=False, solver_settings=None, lang="pt", cutoff=None):
+    """
+    Solves a model built by _build_milp_model with CBC.
+    With warmstart, the current variable values are passed to CBC as the initial solution.
+    cutoff makes CBC discard the nodes that cannot beat that objective value.
+    Returns the solution as plain dictionaries, or None if no solution was found. When a solver limit
+    stopped the search after finding an incumbent, that incumbent is returned with "proven_optimal"
+    False; "bound" is the best bound of the search (None if unknown).
+    """
+    settings = solver_settings or normalize_solver_settings()
+    if settings["objective"] == "lexicographic":
+        # Phase 2 starts from the phase 1 solution, which keeps the phase 1 level
+        phase_settings = dict(settings, objective="penalty")
+        return _solve_lexicographic(model, lambda m, first_phase: _solve_milp_model(
+            m, log, detailed_log=detailed_log and first_phase, warmstart=warmstart or not first_phase,
+            solver_settings=phase_settings, lang=lang), log, lang)
+
+    if detailed_log:
+        model.pprint(ostream=log)
+
+    log.print("\n" + translate("Chamando solver CBC (MILP)...", lang))
+    solver = SolverFactory('cbc')
+    for name, val in cbc_options(solver_settings or normalize_solver_settings()).items():
+        solver.options[name] = val
+    if cutoff is not None:
+        solver.options["cutoff"] = cutoff
+
+    results, progress = _solve_with_log(solver, model, log, warmstart=warmstart)
+
+    log.print("\n" + translate("=== STATUS DA OTIMIZAÇÃO ===", lang))
+    log.print(translate("Status do Solver: {status}", lang).format(status=results.solver.status))
+    log.print(translate("Condição de Término: {condition}", lang).format(condition=results.solver.termination_condition))
+
+    termination = results.solver.termination_condition
+    proven = results.solver.status == pyo.SolverStatus.ok and termination == pyo.TerminationCondition.optimal
+    if not proven:
+        # A search stopped by a limit is still useful when it found an incumbent (loaded into the model)
+        if termination not in LIMIT_TERMINATIONS or progress.incumbent is None:
+            return None
+        log.print(translate("Busca interrompida por limite do solver: a melhor solução viável encontrada será usada.", lang))
+
+    with log.timed("solution_load"):
+        # The bound is on the objective being solved, the Big M one or a lexicographic phase
+        solved = pyo.value(next(model.component_data_objects(pyo.Objective, active=True)))
+        return {
+            "objective": pyo.value(model.Objective),
+            "proven_optimal": proven,
+            "bound": progress.bound if progress.bound is not None else (solved if proven else None),
+            "flow": {(o, d, p): pyo.value(model.Flow[o, d, p]) for (o, d, p) in model.ValidRoutes},
+            "trips": {(o, d, p): pyo.value(model.RouteActive[o, d, p]) for (o, d, p) in model.ValidRoutes},
+            "dummy_capacity": {d: pyo.value(model.DummyCapacity[d]) for d in model.Destinations},
+            "dummy_reception": {d: pyo.value(model.DummyReception[d]) for d in model.Destinations},
+            "dummy_unallocated": {(o, p): pyo.value(model.DummyUnallocated[o, p]) for (o, p) in model.SupplyPairs},
+        }
+
+def _report_milp_solution(results_dict, solution, log, origins_list, destinations_list, all_products,
+                          distance, freight_cost, avg_freight, storage_cost, cda_to_name, limits, lang="pt"):
+    """
+    Fills the routes (with trips), KPIs and warnings of results_dict from a MILP solution
+    and prints the allocation details to the log.
+    """
+    log.print("\n" + translate("--- DETALHES DO FLUXO (Alocação) ---", lang))
+    total_transported = 0
+    total_km = 0.0
+    total_freight_cost = 0.0
+    total_storage_cost = 0.0
+
+    for (o, d, p), val in solution["flow"].items():
+        if val > 0.001:
+            d_name = cda_to_name.get(d, d)
+            dist = distance.get((o, d), 999999.0)
+            f_cost = freight_cost.get(o, avg_freight)
+            s_cost = storage_cost.get((d, p), 50.0)
+
+            route_freight = val * dist * f_cost
+            route_storage = val * s_cost
+            route_total = route_freight + route_storage
+
+            viagens = solution["trips"].get((o, d, p))
+            viagens_val = int(round(viagens)) if viagens is not None else None
+
+            log.print(translate("De: {o} | Para: {d} | Produto: {p} | Qtd: {val:.2f} ton | Viagens: {viagens}", lang).format(o=o, d=d_name, p=p, val=val, viagens=viagens_val))
+
+            results_dict["routes"].append({
+                "Origem": o,
+                "Destino": d_name,
+                "Produto": p,
+                "Quantidade (ton)": val,
+                "Distancia (km)": dist,
+                "Custo Frete (R$)": route_freight,
+                "Custo Armazenagem (R$)": route_storage,
+                "Custo Total (R$)": route_total,
+                "Custo Frete Unitario (R$/ton-km)": f_cost,
+                "Custo Armaz. Unitario (R$/ton)": s_cost,
+                "Qtd. de Viagens": viagens_val
+            })
+
+            total_transported += val
+            total_km += dist
+            total_freight_cost += route_freight
+            total_storage_cost += route_storage
+
+    log.print("\n" + translate("Total de produtos alocados: {val:.2f} toneladas", lang).format(val=total_transported))
+
+    results_dict["kpis"]["total_tons"] = total_transported
+    results_dict["kpis"]["total_km"] = total_km
+    results_dict["kpis"]["total_freight_cost"] = total_freight_cost
+    results_dict["kpis"]["total_storage_cost"] = total_storage_cost
+
+    # Check usage of Dummy variables
+    dummy_cap_used = False
+    log.print("\n" + translate("--- AVISOS: CAPACIDADE ARTIFICIAL (DUMMIES) ---", lang))
+    for d in destinations_list:
+        d_val = solution["dummy_capacity"].get(d, 0.0)
+        if d_val > 0.001:
+            dummy_cap_used = True
+            d_name = cda_to_name.get(d, d)
+            msg = translate("O Armazém \'{d_name}\' precisou de capacidade de armazenamento artificial de {d_val:.2f} toneladas.", lang).format(d_name=d_name, d_val=d_val)
+            log.print(translate("ALERTA: {msg}", lang).format(msg=msg))
+            results_dict["warnings"]["capacity"].append(msg)
+
+    if not dummy_cap_used:
+        log.print(translate("Nenhuma capacidade estática artificial foi necessária.", lang))
+
+    if "reception" not in results_dict["warnings"]:
+        results_dict["warnings"]["reception"] = []
+
+    dummy_reception_used = False
+    log.print("\n" + translate("--- AVISOS: RECEPÇÃO DIÁRIA ARTIFICIAL (DUMMIES) ---", lang))
+    for d in destinations_list:
+        d_val = solution["dummy_reception"].get(d, 0.0)
+        if d_val > 0.001:
+            dummy_reception_used = True
+            d_name = cda_to_name.get(d, d)
+            msg = translate("O Armazém \'{d_name}\' precisou de capacidade de recepção diária artificial de {d_val:.2f} toneladas.", lang).format(d_name=d_name, d_val=d_val)
+            log.print(translate("ALERTA: {msg}", lang).format(msg=msg))
+            results_dict["warnings"]["reception"].append(msg)
+
+    if not dummy_reception_used:
+        log.print(translate("Nenhuma capacidade de recepção artificial foi necessária.", lang))
+
+    if "freight" not in results_dict["warnings"]:
+        results_dict["warnings"]["freight"] = []
+
+    dummy_unalloc_used = False
+    log.print("\n" + translate("--- AVISOS: OFERTA SEM ROTAS / NÃO ALOCADA (DUMMIES) ---", lang))
+    for o in origins_list:
+        for p in all_products:
+            u_val = solution["dummy_unallocated"].get((o, p), 0.0)
+            if u_val > 0.001:
+                dummy_unalloc_used = True
+
+                # Infer if non-allocation could be due to tight freight
+                if limits["frete_min"] is not None or limits["frete_max"] is not None:
+                    msg = translate("A origem \'{o}\' possui oferta de \'{p}\' não alocada ({u_val:.2f} toneladas). Isso provavelmente ocorreu devido às restrições de carga de frete mínima/máxima impostas.", lang).format(o=o, p=p, u_val=u_val)
+                    log.print(translate("ALERTA: {msg}", lang).format(msg=msg))
+                    results_dict["warnings"]["freight"].append(msg)
+                else:
+                    msg = translate("A origem \'{o}\' possui oferta de \'{p}\' não alocada: {u_val:.2f} toneladas.", lang).format(o=o, p=p, u_val=u_val)
+                    log.print(translate("ALERTA: {msg}", lang).format(msg=msg))
+                    results_dict["warnings"]["unallocated"].append(msg)
+
+    if not dummy_unalloc_used:
+        log.print(translate("Toda a oferta conseguiu ser escoada em rotas válidas.", lang))
+
+    if dummy_cap_used or dummy_reception_used or dummy_unalloc_used:
+        log.print("\n" + translate("Nota: Foram utilizadas variáveis dummies com custo elevado para impedir que o modelo falhasse por inviabilidade.", lang))
@@ -0,0 +1,160 @@
+"""
+Presolve of the allocation model: a smaller model with the same optimal cost.
+
+presolve_inputs takes the model inputs (see optimization._run_lp_optimization_model) and removes
+what cannot take part in a solution:
+
+- routes of (origin, product) pairs without supply, whose flow is always zero;
+- destinations left without routes, whose capacity, reception and activation are never used;
+- origins and products left without supply.
+
+With aggregate_products it also merges interchangeable products into one commodity: products with
+the same routes (from every origin) and the same storage tariff in every destination. The commodity
+takes the name of its first product and the summed supply of its products. This is exact for the
+LP, where products only meet in the warehouse capacities; the MILP counts trips per route and
+product, so its products are kept apart.
+
+postsolve_solution maps the solution of the reduced model back to the routes of the whole model,
+splitting the flow of each commodity among its products (any split within their supplies has the
+same cost).
+"""
+
+# Storage tariff of routes without a tariff, as in the model objective
+DEFAULT_STORAGE_COST = 50.0
+
+# Flow below this is a floating point zero when splitting a commodity
+_EPS = 1e-9
+
+def interchangeable_products(valid_routes, all_products, destinations_list, storage_cost):
+    """
+    Groups the products with the same (origin, destination) routes and the same storage tariff in
+    every destination. Returns {first product: [products of the group]}, in the order of all_products.
+    """
+    routes_of = {p: set() for p in all_products}
+    for (o, d, p) in valid_routes:
+        if p in routes_of:
+            routes_of[p].add((o, d))
+
+    groups = {}
+    for p in all_products:
+        tariffs = tuple(storage_cost.get((d, p), DEFAULT_STORAGE_COST) for d in destinations_list)
+        groups.setdefault((frozenset(routes_of[p]), tariffs), []).append(p)
+
+    return {members[0]: members for members in groups.values()}
+
+def presolve_inputs(inputs, aggregate_products=False):
+    """
+    Returns (reduced inputs, plan): the inputs of the smaller model and what postsolve_solution
+    needs to map its solution back. plan["removed"] counts the routes, destinations and origins
+    removed and plan["merged"] the products merged into another one.
+    """
+    supply = inputs["supply"]
+    all_products = list(inputs["all_products"])
+
+    if aggregate_products:
+        groups = interchangeable_products(inputs["valid_routes"], all_products, inputs["destinations_list"],
+                                          inputs["storage_cost"])
+    else:
+        groups = {p: [p] for p in all_products}
+    commodity = {p: rep for rep, members in groups.items() for p in members}
+
+    reduced_supply = {}
+    for (o, p), val in supply.items():
+        if val > 0 and p in commodity:
+            key = (o, commodity[p])
+            reduced_supply[key] = reduced_supply.get(key, 0.0) + val
+
+    live_routes = [(o, d, p) for (o, d, p) in inputs["valid_routes"] if supply.get((o, p), 0.0) > 0]
+    # Members of a group share their routes, so the routes of a commodity are those of any member with supply
+    routes = list(dict.fromkeys((o, d, commodity[p]) for (o, d, p) in live_routes))
+
+    origins = {o for (o, _) in reduced_supply}
+    destinations = {d for (_, d, _) in routes}
+    products = {p for (_, p) in reduced_supply}
+
+    reduced = dict(
+        inputs,
+        origins_list=[o for o in inputs["origins_list"] if o in origins],
+        destinations_list=[d for d in inputs["destinations_list"] if d in destinations],
+        all_products=[p for p in groups if p in products],
+        valid_routes=routes,
+        supply=reduced_supply,
+    )
+
+    merged = {rep: members for rep, members in groups.items() if len(members) > 1}
+    plan = {
+        "valid_routes": inputs["valid_routes"],
+        "supply": supply,
+        "groups": merged,
+        "removed": {
+            "routes": len(inputs["valid_routes"]) - len(live_routes),
+            "destinations": len(inputs["destinations_list"]) - len(reduced["destinations_list"]),
+            "origins": len(inputs["origins_list"]) - len(reduced["origins_list"]),
+        },
+        "merged": sum(len(members) - 1 for members in merged.values()),
+    }
+    return reduced, plan
+
+def _split_commodity(flows, members, origin, supply):
+    # Fills the supply of each product in turn from the flows of the commodity: [(destination, flow)]
+    flows = [[d, val] for d, val in flows]
+    split = {}
+    unallocated = {}
+    last = None
+    for p in members:
+        need = supply.get((origin, p), 0.0)
+        if need <= 0:
+            continue
+        last = p
+        for item in flows:
+            take = min(item[1], need)
+            if take > _EPS:
+                split[(origin, item[0], p)] = split.get((origin, item[0], p), 0.0) + take
+                item[1] -= take
+                need -= take
+        unallocated[(origin, p)] = max(0.0, need)
+
+    # Flow above the summed supply is solver tolerance: it stays with the last product
+    for d, val in flows:
+        if val > _EPS and last is not None:
+            split[(origin, d, last)] = split.get((origin, d, last), 0.0) + val
+    return split, unallocated
+
+def postsolve_solution(solution, plan):
+    """
+    Solution of the whole model from the solution of the presolved one: commodities are split back
+    into their products and flow and trips are listed for every route of the whole model (zero on
+    the removed routes). Dummies of removed destinations and origins are left out, they are zero.
+    Returns None for None.
+    """
+    if solution is None:
+        return None
+
+    solution = dict(solution)
+    flow = solution["flow"]
+    if plan["groups"]:
+        unallocated = dict(solution["dummy_unallocated"])
+        by_pair = {}
+        split_flow = {}
+        for (o, d, p), val in flow.items():
+            if p in plan["groups"]:
+                by_pair.setdefault((o, p), []).append((d, val))
+            else:
+                split_flow[(o, d, p)] = val
+
+        # Commodities with supply at an origin, routed or not
+        pairs = set(by_pair) | {(o, p) for (o, p) in unallocated if p in plan["groups"]}
+        for (o, rep) in sorted(pairs):
+            unallocated.pop((o, rep), None)
+            split, left = _split_commodity(by_pair.get((o, rep), []), plan["groups"][rep], o, plan["supply"])
+            split_flow.update(split)
+            unallocated.update(left)
+
+        flow = split_flow
+        solution["dummy_unallocated"] = unallocated
+
+    # Routes in the order of the whole model
+    solution["flow"] = {r: flow.get(r, 0.0) for r in plan["valid_routes"]}
+    if "trips" in solution:
+        solution["trips"] = {r: solution["trips"].get(r, 0.0) for r in plan["valid_routes"]}
+    return solution
@@ -0,0 +1,292 @@
+"""
+Memory and CPU usage of optimization runs.
+
+Large runs can take the worker down when memory runs out, and the OOM killer does not say whether
+the Python process (model build, LP file writing, solution loading) or the CBC subprocess grew too
+much. ResourceMonitor samples both with psutil from a background thread while a run is going: the
+peak RSS and CPU time of this process and of the solver processes of the run (its CBC subprocess,
+or the worker processes of a decomposed run, with their descendants). The app process has other
+children (the session worker, runs of other tabs), so the run starts its solvers with run_watched(),
+or adopts its own children explicitly with adopting_children() around the code that starts them.
+A solver started with run_watched() is reaped by the monitor, which then records its exact CPU time
+and peak RSS, however short it ran.
+
+Memory ceilings, in MB, are read from RUN_MEMORY_LIMIT_MB (this process) and SOLVER_MEMORY_LIMIT_MB
+(the solver processes together); 0 or unset disables them. The ceilings are checked by the sampling
+thread: when one is crossed the solver processes of the run are terminated and the run stops with
+MemoryLimitExceeded at its next check() or checkpoint() (the model build calls checkpoint() as it
+goes), so it ends with an error message instead of being killed by the operating system.
+"""
+import contextlib
+import os
+import subprocess
+import sys
+import threading
+
+import psutil
+
+# Environment variables with the memory ceilings (MB)
+ENV_PYTHON_LIMIT = "RUN_MEMORY_LIMIT_MB"
+ENV_SOLVER_LIMIT = "SOLVER_MEMORY_LIMIT_MB"
+
+MB = 1024 * 1024
+
+class MemoryLimitExceeded(MemoryError):
+    """
+    A run crossed a memory ceiling. kind is "python" or "solver", rss_mb the memory reached
+    and limit_mb the ceiling.
+    """
+    def __init__(self, kind, rss_mb, limit_mb):
+        super().__init__(f"{kind} memory reached {rss_mb:.0f} MB, above the limit of {limit_mb:.0f} MB")
+        self.kind = kind
+        self.rss_mb = rss_mb
+        self.limit_mb = limit_mb
+
+def _limit_from_env(name):
+    try:
+        value = float(os.environ.get(name) or 0)
+    except ValueError:
+        print(f"Warning: ignoring invalid {name}: {os.environ.get(name)!r}")
+        return None
+    return value if value > 0 else None
+
+def _cpu_seconds(times):
+    return times.user + times.system
+
+# Monitor of the run going on in each thread (see current_monitor)
+_current = threading.local()
+
+def current_monitor():
+    """The ResourceMonitor started by this thread and not stopped yet, or None."""
+    return getattr(_current, "monitor", None)
+
+def checkpoint():
+    """
+    Raises the MemoryLimitExceeded of the run of this thread if the sampling thread found a ceiling
+    crossed. Unlike check() it does not sample, so it is cheap enough for the loops of the model build.
+    """
+    monitor = current_monitor()
+    if monitor is not None and monitor.exceeded is not None:
+        raise monitor.exceeded
+
+def adopting_children(name=None):
+    """
+    Context manager making the monitor of this thread adopt the child processes started inside it
+    (only the ones with `name` in their command line if given). Does nothing outside a monitored run.
+    """
+    monitor = current_monitor()
+    return monitor.adopt_children(name) if monitor is not None else contextlib.nullcontext()
+
+def run_watched(cmd, on_line=None):
+    """
+    Runs the command line `cmd` as a solver process of the run of this thread, passing each line
+    of its output (stdout and stderr) to on_line(line) as it arrives. Returns the exit code.
+    """
+    monitor = current_monitor()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors='replace')
+    try:
+        if monitor is not None:
+            monitor.watch(proc.pid)
+        for line in proc.stdout:
+            if on_line is not None:
+                on_line(line)
+    except BaseException:
+        proc.kill()
+        raise
+    finally:
+        proc.stdout.close()
+        if monitor is not None:
+            monitor.reap(proc)
+        else:
+            proc.wait()
+    return proc.returncode
+
+class ResourceMonitor:
+    """
+    Samples the memory and CPU usage of this process and of the solver processes of the run every
+    `interval` seconds between start() and stop() (or as a context manager). Limits given as None
+    are read from the environment, 0 disables them. Peaks shorter than the interval may be missed.
+    """
+    def __init__(self, python_limit_mb=None, solver_limit_mb=None, interval=0.5):
+        if python_limit_mb is None:
+            python_limit_mb = _limit_from_env(ENV_PYTHON_LIMIT)
+        if solver_limit_mb is None:
+            solver_limit_mb = _limit_from_env(ENV_SOLVER_LIMIT)
+        self.python_limit_mb = python_limit_mb or None
+        self.solver_limit_mb = solver_limit_mb or None
+        self.interval = interval
+
+        self.python_peak_mb = 0.0
+        self.solver_peak_mb = 0.0
+        # First ceiling crossed, as a MemoryLimitExceeded (None while within the limits)
+        self.exceeded = None
+
+        self._process = psutil.Process()
+        self._start_times = None
+        self._end_times = None
+        self._live_cpu = {}
+        self._solver_cpu = {}
+        # Solver processes of the run by PID, and the adoptions going on as (children before, name)
+        self._watched = {}
+        self._adopting = []
+        self._previous = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._follow, daemon=True)
+
+    def start(self):
+        self._start_times = self._process.cpu_times()
+        self._previous = current_monitor()
+        _current.monitor = self
+        self.sample()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops sampling."""
+        if self._thread.is_alive():
+            self._stop.set()
+            self._thread.join()
+        self.sample()
+        self._end_times = self._process.cpu_times()
+        if current_monitor() is self:
+            _current.monitor = self._previous
+
+    def watch(self, pid):
+        """Counts the process `pid` and its descendants as solver processes of the run."""
+        with self._lock:
+            self._watched.setdefault(pid, psutil.Process(pid))
+
+    def reap(self, proc):
+        """
+        Waits for the watched subprocess.Popen `proc` to exit and records its CPU time and peak RSS
+        (with its descendants) from the resource usage reported by the operating system.
+        """
+        if not hasattr(os, "wait4"):
+            proc.wait()
+            self.sample()
+            return
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        # ru_maxrss is in bytes on macOS, in KB elsewhere
+        peak_mb = usage.ru_maxrss / (MB if sys.platform == "darwin" else 1024)
+        with self._lock:
+            self._watched.pop(proc.pid, None)
+            self._solver_cpu[proc.pid] = usage.ru_utime + usage.ru_stime
+            self.solver_peak_mb = max(self.solver_peak_mb, peak_mb)
+
+    @contextlib.contextmanager
+    def adopt_children(self, name=None):
+        """
+        Watches the child processes of this process started inside the block, the ones with `name`
+        in their command line if given. Processes started by other threads in the meantime are
+        adopted too, so the block should be kept around the start of the solver only.
+        """
+        with self._lock:
+            adoption = ({child.pid for child in self._process.children()}, name)
+            self._adopting.append(adoption)
+        try:
+            yield self
+        finally:
+            # A solver that ran and exited within an interval is sampled one last time
+            self.sample()
+            with self._lock:
+                self._adopting.remove(adoption)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+    def _follow(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"Warning: resource monitoring unavailable: {e}")
+                return
+
+    def _adopt(self):
+        for before, name in self._adopting:
+            for child in self._process.children():
+                if child.pid in before or child.pid in self._watched:
+                    continue
+                try:
+                    # Right after the fork the command line is still the one of this process
+                    if name is None or any(name in part for part in child.cmdline()):
+                        self._watched[child.pid] = child
+                except psutil.Error:
+                    continue
+
+    def sample(self):
+        """Updates the peaks and enforces the ceilings."""
+        with self._lock:
+            python_mb = self._process.memory_info().rss / MB
+            self._adopt()
+            solver_mb = 0.0
+            solvers = []
+            live_cpu = {}
+            for pid, root in list(self._watched.items()):
+                try:
+                    # Descendants that exited are in the children times of the watched process
+                    times = root.cpu_times()
+                    self._solver_cpu[pid] = _cpu_seconds(times) + times.children_user + times.children_system
+                    tree = [root] + root.children(recursive=True)
+                except psutil.Error:
+                    # The process exited: its last sampled CPU time stays counted
+                    self._watched.pop(pid, None)
+                    continue
+                for proc in tree:
+                    try:
+                        with proc.oneshot():
+                            solver_mb += proc.memory_info().rss / MB
+                            if proc is not root:
+                                live_cpu[proc.pid] = _cpu_seconds(proc.cpu_times())
+                            if not proc.children():
+                                solvers.append(proc)
+                    except psutil.Error:
+                        # The process exited in the meantime
+                        continue
+            self._live_cpu = live_cpu
+
+            self.python_peak_mb = max(self.python_peak_mb, python_mb)
+            self.solver_peak_mb = max(self.solver_peak_mb, solver_mb)
+
+            if self.exceeded is None:
+                if self.python_limit_mb and python_mb > self.python_limit_mb:
+                    self.exceeded = MemoryLimitExceeded("python", python_mb, self.python_limit_mb)
+                elif self.solver_limit_mb and solver_mb > self.solver_limit_mb:
+                    self.exceeded = MemoryLimitExceeded("solver", solver_mb, self.solver_limit_mb)
+
+            if self.exceeded is not None:
+                # Leaf processes are the solvers; the workers of a decomposed run report their failure.
+                # Processes that are not part of the run are never touched
+                for proc in solvers:
+                    try:
+                        proc.terminate()
+                    except psutil.Error:
+                        pass
+
+    def check(self):
+        """Raises the MemoryLimitExceeded of the run if a ceiling was crossed."""
+        self.sample()
+        if self.exceeded is not None:
+            raise self.exceeded
+
+    def kpis(self):
+        """
+        Peak RSS (MB) and CPU time (s) of this process since start() and of the solver processes of
+        the run, as of their last sample (the end of an adopted solver that exits between two samples is
+        missed; the solvers started with run_watched are measured when they exit).
+        """
+        end = self._end_times or self._process.cpu_times()
+        start = self._start_times or end
+        python_cpu = _cpu_seconds(end) - _cpu_seconds(start)
+        return {
+            "peak_rss_mb": self.python_peak_mb,
+            "solver_peak_rss_mb": self.solver_peak_mb,
+            "cpu_time": python_cpu,
+            "solver_cpu_time": sum(self._solver_cpu.values()) + sum(self._live_cpu.values()),
+        }
@@ -0,0 +1,103 @@
+"""
+Content-addressed cache of optimization results.
+
+The key is a hash of the normalized input tables and every model option, so running the
+model again with unchanged stores and toggles returns the stored results_dict and log at once.
+Entries live in a diskcache directory, with a size limit and an expiration time (TTL)
+configurable through the environment.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+import diskcache
+
+from src.logic.run_log import open_run_log
+
+# Defaults, overridable by RESULT_CACHE_SIZE_MB and RESULT_CACHE_TTL (seconds, 0 disables the cache)
+DEFAULT_SIZE_MB = 256
+DEFAULT_TTL = 24 * 3600
+
+def _normalize_option(value):
+    # Blank inputs and None mean the same thing for the model
+    if value is None or (isinstance(value, str) and value.strip() == ""):
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+def _table_digest(df):
+    """Stable digest of a DataFrame: column names, index and values."""
+    if df is None:
+        return "none"
+    payload = df.to_json(orient='split', date_format='iso', double_precision=15)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def result_cache_key(df_supply, df_demand, df_compat, df_dist, df_freight, df_storage, **options):
+    """
+    Hash of the input tables and the model options (blank and None options are equivalent).
+    Must be computed before the run, since the data preparation changes some of the tables.
+    """
+    tables = [_table_digest(df) for df in (df_supply, df_demand, df_compat, df_dist, df_freight, df_storage)]
+    normalized = {name: _normalize_option(val) for name, val in options.items()}
+    payload = json.dumps({"tables": tables, "options": normalized}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class ResultCache:
+    """
+    Stores (results_dict, log text) by result_cache_key in a diskcache directory.
+    """
+    def __init__(self, directory, size_mb=None, ttl=None):
+        if size_mb is None:
+            size_mb = float(os.environ.get("RESULT_CACHE_SIZE_MB", DEFAULT_SIZE_MB))
+        if ttl is None:
+            ttl = float(os.environ.get("RESULT_CACHE_TTL", DEFAULT_TTL))
+
+        self.ttl = ttl
+        self.enabled = ttl > 0 and size_mb > 0
+        self._cache = diskcache.Cache(directory, size_limit=int(size_mb * 1024 * 1024)) if self.enabled else None
+
+    def get(self, key):
+        """
+        Returns (log_filename, results_dict) for a stored run, or None.
+        The log file is written again if it was already removed from the log directory.
+        """
+        if not self.enabled:
+            return None
+
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+
+        log_filename = entry["log_filename"]
+        log_path = os.path.join(tempfile.gettempdir(), 'granum_logs', os.path.basename(log_filename))
+        if not os.path.exists(log_path):
+            log_filename, log_file = open_run_log('optimization_log_cached_')
+            with log_file:
+                log_file.write(entry["log_text"])
+
+        results_dict = entry["results"]
+        results_dict["cached"] = True
+        return log_filename, results_dict
+
+    def set(self, key, log_filename, results_dict):
+        """
+        Stores a finished run. Runs that ended in error are not cached.
+        """
+        if not self.enabled or results_dict.get("status") == "error":
+            return
+
+        log_path = os.path.join(tempfile.gettempdir(), 'granum_logs', os.path.basename(log_filename))
+        try:
+            with open(log_path, 'r', encoding='utf-8') as f:
+                log_text = f.read()
+        except OSError:
+            log_text = ""
+
+        entry = {"log_filename": log_filename, "log_text": log_text, "results": results_dict}
+        self._cache.set(key, entry, expire=self.ttl)
+
+    def clear(self):
+        if self.enabled:
+            self._cache.clear()
@@ -0,0 +1,133 @@
+"""
+Route pruning: which (origin, destination, product) routes enter the model.
+
+A route is valid when the distance is known and the product is compatible with the warehouse.
+Pruning then keeps, for each (origin, product), only the best destinations by a score:
+
+- "percentile": the best `value` percent of the compatible destinations (the Pareto option is 20%);
+- "nearest": the best `value` destinations;
+- "radius": the destinations within `value` km (always by distance).
+
+The score is the distance ("distance") or the unit cost of the route, freight x distance + storage
+("cost"). At least one destination is kept for every (origin, product) with a valid route.
+
+The selection is vectorized with NumPy: the distance order of each origin is sorted once and shared
+by all products, and the kept destinations are the first ones of that order whose running count of
+compatible destinations is within the limit. Ties keep the destination order.
+"""
+import math
+
+import numpy as np
+
+PRUNING_METHODS = ("percentile", "nearest", "radius")
+PRUNING_SCORES = ("distance", "cost")
+
+# The Pareto option: the 20% closest destinations of each (origin, product)
+PARETO_PRUNING = {"method": "percentile", "value": 20.0, "score": "distance"}
+
+# Value of each method when it is left blank or invalid (percent, destinations, km)
+DEFAULT_VALUES = {"percentile": 20.0, "nearest": 3.0, "radius": 300.0}
+
+# Storage tariff of routes without a tariff, as in the model objective
+DEFAULT_STORAGE_COST = 50.0
+
+def normalize_pruning(pruning=None):
+    """
+    Completes a pruning dict ({"method", "value", "score"}): missing or invalid entries take the
+    Pareto method and score and the default value of the method (DEFAULT_VALUES).
+    None or an empty dict means no pruning and returns None.
+    """
+    if not pruning:
+        return None
+
+    method = pruning.get("method") if pruning.get("method") in PRUNING_METHODS else PARETO_PRUNING["method"]
+    score = pruning.get("score") if pruning.get("score") in PRUNING_SCORES else PARETO_PRUNING["score"]
+    try:
+        value = float(pruning.get("value"))
+    except (TypeError, ValueError):
+        value = None
+    if value is None or not value > 0:
+        value = DEFAULT_VALUES[method]
+    if method == "percentile":
+        value = min(value, 100.0)
+
+    return {"method": method, "value": value, "score": score}
+
+def _keep_counts(method, value, n_valid, n_within):
+    # Number of destinations kept per product, in score order
+    if method == "percentile":
+        # Same rounding as the original Pareto rule: ceil(n * 0.20)
+        keep = np.ceil(n_valid * (value / 100.0))
+    elif method == "nearest":
+        keep = np.full(n_valid.shape, math.floor(value), dtype=float)
+    else:
+        keep = n_within.astype(float)
+    return np.minimum(np.maximum(keep, 1), n_valid)
+
+def prune_routes(origins, destinations, products, distance, prod_dest_compat, pruning=None,
+                 freight_cost=None, avg_freight=0.0, storage_cost=None):
+    """
+    Lists the valid routes kept by pruning (see normalize_pruning; None keeps every valid route).
+    freight_cost, avg_freight and storage_cost are needed by the "cost" score.
+    Routes are ordered by origin, then product, then score (destination order without pruning).
+    """
+    pruning = normalize_pruning(pruning)
+    origins = list(origins)
+    destinations = list(destinations)
+    products = list(products)
+    n_dest = len(destinations)
+    if not origins or not products or not n_dest:
+        return []
+
+    dest_index = {d: j for j, d in enumerate(destinations)}
+    origin_index = {o: i for i, o in enumerate(origins)}
+    product_index = {p: k for k, p in enumerate(products)}
+
+    known = np.zeros((len(origins), n_dest), dtype=bool)
+    dist = np.full((len(origins), n_dest), np.inf)
+    for (o, d), val in distance.items():
+        i, j = origin_index.get(o), dest_index.get(d)
+        if i is not None and j is not None:
+            known[i, j] = True
+            dist[i, j] = val
+
+    compat = np.zeros((len(products), n_dest), dtype=bool)
+    for (p, d), ok in prod_dest_compat.items():
+        k, j = product_index.get(p), dest_index.get(d)
+        if ok and k is not None and j is not None:
+            compat[k, j] = True
+
+    use_cost = pruning is not None and pruning["score"] == "cost" and pruning["method"] != "radius"
+    if use_cost:
+        storage_cost = storage_cost or {}
+        storage = np.array([[storage_cost.get((d, p), DEFAULT_STORAGE_COST) for d in destinations] for p in products])
+        freight_cost = freight_cost or {}
+
+    routes = []
+    for i, o in enumerate(origins):
+        valid = compat & known[i]
+        if pruning is None:
+            for k, p in enumerate(products):
+                routes.extend((o, destinations[j], p) for j in np.flatnonzero(valid[k]))
+            continue
+
+        if use_cost:
+            score = dist[i] * freight_cost.get(o, avg_freight) + storage
+            order = np.argsort(score, axis=1, kind='stable')
+        else:
+            # Distance does not depend on the product: one order per origin
+            order = np.broadcast_to(np.argsort(dist[i], kind='stable'), valid.shape)
+
+        valid_sorted = np.take_along_axis(valid, order, axis=1)
+        n_valid = valid_sorted.sum(axis=1)
+        n_within = None
+        if pruning["method"] == "radius":
+            n_within = (valid & (dist[i] <= pruning["value"])).sum(axis=1)
+
+        keep = _keep_counts(pruning["method"], pruning["value"], n_valid, n_within)
+        kept = valid_sorted & (np.cumsum(valid_sorted, axis=1) <= keep[:, None])
+
+        for k, p in enumerate(products):
+            routes.extend((o, destinations[j], p) for j in order[k][kept[k]])
+
+    return routes
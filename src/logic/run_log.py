@@ -0,0 +1,87 @@
+"""
+Per-run optimization logs.
+
+Each run writes its log to its own file in the shared log directory through a RunLog, which is
+passed explicitly through the model code instead of redirecting sys.stdout. Runs sharing a
+process (threads, pools, sweeps) therefore keep separate logs.
+"""
+import contextlib
+import os
+import tempfile
+import time
+
+def log_path(log_filename):
+    """Full path of a log file of the shared log directory."""
+    return os.path.join(tempfile.gettempdir(), 'granum_logs', os.path.basename(log_filename))
+
+def open_run_log(prefix):
+    """
+    Creates the temporary log file of a run in the shared log directory, removing logs older
+    than one hour so we don't run out of disk space. Returns (log_filename, open file).
+    """
+    log_dir = os.path.join(tempfile.gettempdir(), 'granum_logs')
+    os.makedirs(log_dir, exist_ok=True)
+
+    now = time.time()
+    for filename in os.listdir(log_dir):
+        filepath = os.path.join(log_dir, filename)
+        if os.path.isfile(filepath):
+            # Deletes files created more than 1 hour ago
+            if os.stat(filepath).st_mtime < now - 3600:
+                try:
+                    os.remove(filepath)
+                except Exception:
+                    pass
+
+    log_fd, log_path = tempfile.mkstemp(suffix='.txt', prefix=prefix, dir=log_dir)
+    return os.path.basename(log_path), os.fdopen(log_fd, 'w', encoding='utf-8')
+
+class RunLog:
+    """
+    Log of one run over a text stream. print() mirrors the built-in, and write() makes the log
+    usable as a stream (model.pprint(ostream=log), solver output).
+
+    The log also collects the profile of the run: the seconds spent in each phase (timings) and
+    the size of the model solved (model_stats), which the runners copy into results_dict.
+    """
+    def __init__(self, stream, filename=None):
+        self.stream = stream
+        self.filename = filename
+        self.timings = {}
+        self.model_stats = {}
+
+    @classmethod
+    def open(cls, prefix, filename=None):
+        """
+        New log in its own file of the log directory (see open_run_log). With filename, the log
+        is appended to that file of the log directory instead, created beforehand by a caller that
+        follows the run while it is solving (see src.logic.solver_progress).
+        """
+        if filename:
+            return cls(open(log_path(filename), 'a', encoding='utf-8'), os.path.basename(filename))
+        filename, stream = open_run_log(prefix)
+        return cls(stream, filename)
+
+    @contextlib.contextmanager
+    def timed(self, phase):
+        """Adds the wall-clock time of the block (time.perf_counter) to timings[phase]."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - start)
+
+    def add_time(self, phase, seconds):
+        self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+    def print(self, *values, sep=" ", end="\n"):
+        self.stream.write(sep.join(str(val) for val in values) + end)
+
+    def write(self, text):
+        self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        self.stream.close()
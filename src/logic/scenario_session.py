@@ -0,0 +1,152 @@
+"""
+Scenario sessions for fast what-if re-solves.
+
+Building the Pyomo model is a large share of each run. A ScenarioSession keeps the last
+built model of a user alive: when the next run has the same structure (same routes, supply
+and active limits, see optimization.model_structure_key), only the mutable parameters
+(allocation days, freight and reception limits, storage tariffs, capacities and inventories)
+are updated and the model is re-solved. Small edits of the routes and supply (a compatibility
+toggled, a supply weight changed) are applied to the kept model too, when its sets and costs
+still fit them (see optimization._patch_session_model); other edits rebuild it.
+
+Dash background callbacks run each job in a new process, so the sessions live in a separate
+worker process (a multiprocess manager) started by the web server. Jobs reach it through the
+address stored in the environment and fall back to a regular run when it is not available.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from multiprocess.managers import BaseManager
+
+from src.logic.optimization import prepare_model_data, run_prepared_model, run_optimization_model
+
+# Environment variables used by forked background jobs to find the session worker
+ENV_ADDRESS = "GRANUM_SESSION_ADDRESS"
+ENV_AUTHKEY = "GRANUM_SESSION_AUTHKEY"
+
+class ScenarioSession:
+    """
+    Holds the last model built for one user together with its structure and frame keys.
+    """
+    def __init__(self):
+        self.key = None
+        self.frame = None
+        self.model = None
+        self.last_used = time.time()
+
+    def store(self, key, model, frame=None):
+        self.key = key
+        self.frame = frame
+        self.model = model
+
+    def run(self, df_supply, df_demand, df_compat, df_dist, df_freight, df_storage, **options):
+        """
+        Same arguments and return value as run_optimization_model, reusing the kept model when possible.
+        """
+        start_time = time.time()
+        self.last_used = start_time
+        prep_start = time.perf_counter()
+        data = prepare_model_data(df_supply, df_demand, df_compat, df_dist, df_freight, df_storage,
+                                  lang=options.get("lang", "pt"))
+        timings = {"data_prep": time.perf_counter() - prep_start}
+        return run_prepared_model(data, start_time=start_time, session=self, timings=timings, **options)
+
+class SessionRegistry:
+    """
+    Sessions of the worker process, indexed by session id and bounded in number (least recently used first out).
+    """
+    def __init__(self, max_sessions=8):
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        # Each run has its own log, but Pyomo (its temporary file manager, for one) is not thread-safe,
+        # so only one run at a time uses this process
+        self._run_lock = threading.Lock()
+
+    def _get(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None) or ScenarioSession()
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return session
+
+    def run(self, session_id, *tables, **options):
+        """
+        Runs the model in the session of session_id.
+        Returns None, without running, if another run is in progress in the worker.
+        """
+        if not self._run_lock.acquire(blocking=False):
+            return None
+        try:
+            return self._get(session_id).run(*tables, **options)
+        finally:
+            self._run_lock.release()
+
+    def drop(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+_registry = None
+
+def _get_registry():
+    global _registry
+    if _registry is None:
+        _registry = SessionRegistry()
+    return _registry
+
+class SessionManager(BaseManager):
+    pass
+
+SessionManager.register('get_registry', callable=_get_registry, exposed=('run', 'drop'))
+
+def start_session_worker():
+    """
+    Starts the session worker process and publishes its address in the environment,
+    where the background jobs forked afterwards can read it. Returns the manager.
+    """
+    authkey = os.urandom(16)
+    manager = SessionManager(address=('127.0.0.1', 0), authkey=authkey)
+    manager.start()
+
+    host, port = manager.address
+    os.environ[ENV_ADDRESS] = f"{host}:{port}"
+    os.environ[ENV_AUTHKEY] = authkey.hex()
+    return manager
+
+def _connect_registry():
+    address = os.environ.get(ENV_ADDRESS)
+    authkey = os.environ.get(ENV_AUTHKEY)
+    if not address or not authkey:
+        return None
+
+    host, port = address.rsplit(":", 1)
+    manager = SessionManager(address=(host, int(port)), authkey=bytes.fromhex(authkey))
+    manager.connect()
+    return manager.get_registry()
+
+def run_in_session(session_id, df_supply, df_demand, df_compat, df_dist, df_freight, df_storage, **options):
+    """
+    Runs the optimization in the scenario session of session_id, when the session worker is available.
+    Otherwise (no worker, worker busy, backends other than pyomo, decomposed runs) it falls back to
+    run_optimization_model.
+    Returns (log_filename, results_dict).
+    """
+    tables = (df_supply, df_demand, df_compat, df_dist, df_freight, df_storage)
+
+    if session_id and options.get("backend", "pyomo") == "pyomo" and not options.get("decompose"):
+        try:
+            registry = _connect_registry()
+            if registry is not None:
+                result = registry.run(session_id, *tables, **options)
+                if result is not None:
+                    return tuple(result)
+        except Exception as e:
+            print(f"Warning: scenario session unavailable, running without it: {e}")
+
+    return run_optimization_model(*tables, **options)
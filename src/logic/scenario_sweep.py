@@ -0,0 +1,178 @@
+"""
+Scenario sweeps: many variants of the model solved in one batch.
+
+The input tables are prepared once (prepare_model_data) and every option set of the sweep is
+solved from that data by run_prepared_model, concurrently on a bounded process pool. Besides the
+options of run_optimization_model, a scenario can scale the tariffs with 'storage_factor' and
+'freight_factor'. The result is a comparison table of objectives, KPIs and runtimes.
+"""
+import itertools
+import os
+import time
+
+import pandas as pd
+from multiprocess import Pool
+
+from src.logic.optimization import prepare_model_data, run_prepared_model, normalize_solver_settings, SOLVED_STATUSES
+
+# Scenario options applied to the prepared data instead of being passed to the model
+DATA_FACTORS = ("storage_factor", "freight_factor")
+
+def expand_grid(grid):
+    """
+    Cartesian product of a grid {option: [values]}, as a list of option dicts.
+    """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+def _parse_number(text):
+    # Typed numbers, with a decimal point or a decimal comma
+    return float(str(text).strip().replace(',', '.'))
+
+def _parse_list(text):
+    if text is None:
+        return []
+    return [item.strip() for item in str(text).split(';') if item.strip()]
+
+def sweep_grid_from_inputs(pareto_values=None, days_text=None, freight_bands_text=None, storage_factors_text=None):
+    """
+    Builds the sweep grid from the UI fields. Lists are separated by ';':
+    allocation days ("10; 20; 30"), freight bands as min-max ("20-40; 10-30", either side may be blank)
+    and storage tariff factors ("0,9; 1; 1,1"). Blank fields are left out of the grid.
+    Raises ValueError on values that cannot be parsed.
+    """
+    grid = {}
+    if pareto_values:
+        grid["toggle_pareto"] = [bool(val) for val in pareto_values]
+
+    days = [_parse_number(item) for item in _parse_list(days_text)]
+    if days:
+        grid["input_allocation_days"] = days
+
+    bands = []
+    for item in _parse_list(freight_bands_text):
+        if '-' not in item:
+            raise ValueError(item)
+        low, high = item.split('-', 1)
+        bands.append((_parse_number(low) if low.strip() else None, _parse_number(high) if high.strip() else None))
+    if bands:
+        grid["freight_band"] = bands
+
+    factors = [_parse_number(item) for item in _parse_list(storage_factors_text)]
+    if factors:
+        grid["storage_factor"] = factors
+
+    return grid
+
+def grid_scenarios(grid):
+    """
+    Option sets of a grid built by sweep_grid_from_inputs: freight bands become the freight limits
+    (which need the logistics limits switched on).
+    """
+    scenarios = []
+    for scenario in expand_grid(grid):
+        band = scenario.pop("freight_band", None)
+        if band is not None:
+            scenario["toggle_min_max_capacity"] = True
+            scenario["input_min_freight"], scenario["input_max_freight"] = band
+        scenarios.append(scenario)
+    return scenarios
+
+def scale_data(data, storage_factor=1.0, freight_factor=1.0):
+    """
+    Copy of prepared model data with the storage tariffs and freight costs multiplied by the factors.
+    """
+    scaled = dict(data)
+    if storage_factor != 1.0:
+        scaled["storage_cost"] = {key: val * storage_factor for key, val in data["storage_cost"].items()}
+    if freight_factor != 1.0:
+        scaled["freight_cost"] = {key: val * freight_factor for key, val in data["freight_cost"].items()}
+        scaled["avg_freight"] = data["avg_freight"] * freight_factor
+    return scaled
+
+# Prepared data of the sweep, set once per worker process
+_sweep_data = None
+
+def _init_worker(data):
+    global _sweep_data
+    _sweep_data = data
+
+def _run_scenario(options):
+    options = dict(options)
+    factors = {name: float(options.pop(name)) for name in DATA_FACTORS if options.get(name) is not None}
+    return run_prepared_model(scale_data(_sweep_data, **factors), start_time=time.time(), **options)
+
+def run_sweep(df_supply, df_demand, df_compat, df_dist, df_freight, df_storage, scenarios, processes=None,
+              lang="pt", **common_options):
+    """
+    Solves one model per option set in scenarios (a list of dicts, e.g. from expand_grid) on up to
+    `processes` worker processes. common_options apply to every scenario; scenario options override them.
+    The CBC threads of each run are the configured threads divided among the processes.
+    Returns (runs, comparison): the (log_filename, results_dict) of each scenario and the
+    DataFrame built by comparison_table.
+    """
+    data = prepare_model_data(df_supply, df_demand, df_compat, df_dist, df_freight, df_storage, lang=lang)
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(1, min(processes, len(scenarios)))
+
+    option_sets = []
+    for scenario in scenarios:
+        options = dict(common_options, lang=lang)
+        options.update(scenario)
+        settings = normalize_solver_settings(options.get("solver_settings"))
+        settings["threads"] = max(1, settings["threads"] // processes)
+        options["solver_settings"] = settings
+        option_sets.append(options)
+
+    runs = None
+    if processes > 1:
+        try:
+            with Pool(processes=processes, initializer=_init_worker, initargs=(data,)) as pool:
+                runs = pool.map(_run_scenario, option_sets, chunksize=1)
+        except (AssertionError, OSError) as e:
+            # Daemonic processes cannot have children, and the pool may fail to start
+            print(f"Warning: process pool unavailable, running scenarios sequentially: {e}")
+
+    if runs is None:
+        _init_worker(data)
+        runs = [_run_scenario(options) for options in option_sets]
+
+    runs = [tuple(run) for run in runs]
+    return runs, comparison_table(scenarios, runs)
+
+def comparison_table(scenarios, runs):
+    """
+    One row per scenario: its options, status, objective, KPIs, number of warnings, MILP gap and
+    runtime, plus the cost difference to the cheapest scenario with a solution (optimal or time-limited).
+    """
+    rows = []
+    for i, (scenario, (log_filename, results_dict)) in enumerate(zip(scenarios, runs), start=1):
+        kpis = results_dict.get("kpis", {})
+        row = {"Cenário": i}
+        row.update(scenario)
+        row.update({
+            "Status": results_dict.get("status"),
+            "Custo Total (R$)": results_dict.get("objective", 0.0),
+            "Total Movimentado (ton)": kpis.get("total_tons", 0.0),
+            "Distância Total (km)": kpis.get("total_km", 0.0),
+            "Custo Frete (R$)": kpis.get("total_freight_cost", 0.0),
+            "Custo Armazenagem (R$)": kpis.get("total_storage_cost", 0.0),
+            "Avisos": sum(len(msgs) for msgs in results_dict.get("warnings", {}).values()),
+            "Gap (%)": kpis.get("mip_gap"),
+            "Tempo (s)": kpis.get("execution_time", 0.0),
+            "Log": log_filename,
+        })
+        rows.append(row)
+
+    table = pd.DataFrame(rows)
+    if table.empty:
+        return table
+
+    solved = table["Status"].isin(SOLVED_STATUSES)
+    if solved.any():
+        best = table.loc[solved, "Custo Total (R$)"].min()
+        diff = (table["Custo Total (R$)"] - best) / (abs(best) or 1.0) * 100.0
+        table["Diferença para o Melhor (%)"] = diff.where(solved)
+    return table
@@ -0,0 +1,142 @@
+"""
+Sensitivity analysis of an optimal allocation of the pure LP model.
+
+The duals of the LP answer the usual what-if questions without a re-solve: the shadow price of the
+capacity row of a warehouse is what one more ton of capacity there saves, the dual of a supply row
+what one more ton of supply costs, and the reduced cost of an unused route how much cheaper it must
+get before it enters the allocation (the lower end of the ranging of its cost).
+
+The duals are recovered from the optimal flow instead of read from the solver, so every LP backend
+(Pyomo, sparse, column generation, min-cost flow, decomposed) gets them, always consistent with the
+reported allocation. In the residual network of the allocation (see src.logic.min_cost_flow for
+the arcs), the shortest path distances pi from the sink are an optimal dual:
+
+    supply row (o, p):   u = -pi[o, p]
+    capacity row d:      v = min(0, pi[d])
+
+For every route u + v <= cost, with equality on the routes with flow; v = 0 on warehouses with
+spare capacity and v = -Big M capacity on those using artificial capacity. -pi[d] is the cost of
+bringing one more ton into d, so -v is the saving of one more ton of capacity. A negative cycle in
+the residual network means the flow was not optimal, and no duals are returned.
+"""
+import numpy as np
+
+# Flow, slack and dummies below this are floating point zeros
+EPS = 1e-6
+
+# Relative improvement below which a distance is not updated (solver tolerance in the flow)
+RELATIVE_TOLERANCE = 1e-9
+
+def transport_duals(valid_routes, supply, effective_capacity, unit_cost, flow, dummy_capacity, dummy_unallocated,
+                    big_m_capacity, big_m_unallocated):
+    """
+    Optimal duals of the transportation LP for an optimal allocation.
+
+    Args:
+        valid_routes, supply, effective_capacity, unit_cost, big_m_capacity, big_m_unallocated:
+            as in sparse_lp.build_transport_lp.
+        flow: sequence of the flow of each route, aligned with valid_routes.
+        dummy_capacity: dict d -> artificial capacity used.
+        dummy_unallocated: dict (o, p) -> supply left unallocated.
+
+    Returns:
+        dict with the dual of each supply row ('supply', (o, p) -> u) and capacity row ('capacity',
+        d -> v <= 0) and the 'reduced_cost' of each route (array aligned with valid_routes, NaN on
+        routes of pairs without supply), or None if the allocation is not optimal.
+    """
+    n_routes = len(valid_routes)
+    supply_keys = [key for key, val in supply.items() if val > 0]
+    supply_index = {key: i for i, key in enumerate(supply_keys)}
+    dest_keys = list(dict.fromkeys(d for (_, d, _) in valid_routes))
+    dest_index = {d: j for j, d in enumerate(dest_keys)}
+
+    # Nodes: supply pairs, then destinations, then the sink
+    n_supply = len(supply_keys)
+    n_dest = len(dest_keys)
+    sink = n_supply + n_dest
+
+    cost = np.asarray(unit_cost, dtype=float).reshape(n_routes)
+    x = np.asarray(flow, dtype=float).reshape(n_routes)
+    src = np.fromiter((supply_index.get((o, p), -1) for (o, _, p) in valid_routes), dtype=np.int64, count=n_routes)
+    dst = n_supply + np.fromiter((dest_index[d] for (_, d, _) in valid_routes), dtype=np.int64, count=n_routes)
+    priced = src >= 0
+
+    capacity = np.fromiter((effective_capacity.get(d, 0.0) for d in dest_keys), dtype=float, count=n_dest)
+    artificial = np.fromiter((dummy_capacity.get(d, 0.0) for d in dest_keys), dtype=float, count=n_dest)
+    unallocated = np.fromiter((dummy_unallocated.get(key, 0.0) for key in supply_keys), dtype=float, count=n_supply)
+    inflow = np.bincount(dst[priced] - n_supply, weights=x[priced], minlength=n_dest)
+    used = inflow - artificial
+
+    dest_nodes = n_supply + np.arange(n_dest)
+    supply_nodes = np.arange(n_supply)
+    with_flow = priced & (x > EPS)
+    tails, heads, weights = [], [], []
+
+    def add_arcs(tail, head, weight, mask=None):
+        tail, head, weight = np.broadcast_arrays(tail, head, weight)
+        if mask is not None:
+            tail, head, weight = tail[mask], head[mask], weight[mask]
+        tails.append(tail)
+        heads.append(head)
+        weights.append(weight.astype(float))
+
+    # Routes, and back along the routes with flow
+    add_arcs(src[priced], dst[priced], cost[priced])
+    add_arcs(dst[with_flow], src[with_flow], -cost[with_flow])
+    # Real capacity: spare room to the sink, back from the sink where it is used
+    add_arcs(dest_nodes, sink, 0.0, capacity - used > EPS)
+    add_arcs(sink, dest_nodes, 0.0, used > EPS)
+    # Artificial capacity and unallocated supply, at their penalties
+    add_arcs(dest_nodes, sink, float(big_m_capacity))
+    add_arcs(sink, dest_nodes, -float(big_m_capacity), artificial > EPS)
+    add_arcs(supply_nodes, sink, float(big_m_unallocated))
+    add_arcs(sink, supply_nodes, -float(big_m_unallocated), unallocated > EPS)
+
+    tails = np.concatenate(tails)
+    heads = np.concatenate(heads)
+    weights = np.concatenate(weights)
+
+    pi = _shortest_distances(sink + 1, sink, tails, heads, weights)
+    if pi is None:
+        return None
+
+    # Supply too small to leave a residual arc is priced at its penalty
+    supply_duals = np.where(np.isfinite(pi[:n_supply]), -pi[:n_supply], float(big_m_unallocated))
+    capacity_duals = np.minimum(0.0, pi[n_supply:sink])
+    reduced_cost = np.full(n_routes, np.nan)
+    reduced_cost[priced] = cost[priced] - supply_duals[src[priced]] - capacity_duals[dst[priced] - n_supply]
+
+    return {
+        "supply": dict(zip(supply_keys, supply_duals.tolist())),
+        "capacity": dict(zip(dest_keys, capacity_duals.tolist())),
+        "reduced_cost": reduced_cost,
+    }
+
+def _shortest_distances(n_nodes, source, tails, heads, weights):
+    """
+    Bellman-Ford distances from source over the arcs (tails[i] -> heads[i], weights[i]), relaxing
+    every arc at once per pass. Returns None when a negative cycle keeps them from settling.
+    """
+    dist = np.full(n_nodes, np.inf)
+    dist[source] = 0.0
+    for _ in range(n_nodes):
+        candidate = dist[tails] + weights
+        best = np.full(n_nodes, np.inf)
+        np.minimum.at(best, heads, candidate)
+        scale = np.maximum(1.0, np.abs(np.where(np.isfinite(best), best, 0.0)))
+        improved = best < dist - RELATIVE_TOLERANCE * scale
+        if not improved.any():
+            return dist
+        dist[improved] = best[improved]
+    return None
+
+def cost_ranging(unit_cost, flow, reduced_cost):
+    """
+    Lower limit of the cost of each route within which the allocation stays optimal: the cost
+    less its reduced cost for the routes without flow (any higher cost keeps them out), NaN for
+    the routes with flow, whose range depends on the basis and not on the duals alone.
+    """
+    cost = np.asarray(unit_cost, dtype=float)
+    lower = cost - np.asarray(reduced_cost, dtype=float)
+    lower[np.asarray(flow, dtype=float) > EPS] = np.nan
+    return lower
@@ -0,0 +1,266 @@
+"""
+Live progress of a run, read from its log while the solver is running.
+
+The CBC output is streamed into the run log line by line (see optimization._solve_with_log).
+SolverProgress parses those lines into the phase of the solve, the nodes explored, the best
+incumbent, the best bound and the gap; ProgressMonitor follows a log file from a background
+thread and reports it every second, so the web app can show how a run converges and the user can
+stop it once the solution is good enough.
+
+Both the classic CBC messages (Cbc0010I, Cbc0012I, ...) and the summary lines of newer CBC
+builds ("Obj: ... Bound: ... Gap: ... Nodes: ...") are recognized, as well as the cost of the
+heuristic preview written before the solver starts (see optimization._heuristic_preview).
+"""
+import os
+import re
+import threading
+import time
+
+# CBC prints 1e+50 for the incumbent or bound it does not have yet
+NO_VALUE = 1e49
+
+# Phases of a run, in order (Portuguese keys, translated by the UI)
+PHASE_BUILD = "Montando o modelo"
+PHASE_LOAD = "Carregando o problema no solver"
+PHASE_LP = "Resolvendo a relaxação linear"
+PHASE_PREPROCESS = "Pré-processamento"
+PHASE_ROOT = "Cortes e heurísticas no nó raiz"
+PHASE_TREE = "Branch and bound"
+PHASE_DONE = "Finalizando"
+
+# A new solver call starts, forgetting the progress of the previous one
+SOLVER_START = re.compile(r"^Solver command line:")
+
+PHASE_MARKERS = [
+    (re.compile(r"Problem loading|^Coin0001I"), PHASE_LOAD),
+    (re.compile(r"Root LP relaxation|LP solve|^Clp0006I|Continuous objective value"), PHASE_LP),
+    (re.compile(r"▶ Preprocessing|^Cgl0004I"), PHASE_PREPROCESS),
+    (re.compile(r"Root node heuristics|Cut generation \(root|^Cbc0013I|^Cbc0014I"), PHASE_ROOT),
+    (re.compile(r"^Result - "), PHASE_DONE),
+]
+
+_NUMBER = r"([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)"
+
+# Node log: classic CBC and newer builds
+NODES_CLASSIC = re.compile(r"After (\d+) nodes, \d+ on tree, " + _NUMBER + r" best solution, best possible " + _NUMBER)
+NODES_TABLE = re.compile(r"(\d+) nodes(?: \([^)]*\))?, \d+ on tree, best " + _NUMBER + r" - possible " + _NUMBER)
+
+INCUMBENT = [
+    re.compile(r"Integer solution of " + _NUMBER + r" found"),
+    re.compile(r"provided solution with cost " + _NUMBER),
+    re.compile(r"★\S+\s+solution\s+" + _NUMBER),
+    re.compile(r"Root node heuristics — best " + _NUMBER),
+]
+
+# End of search summary of newer builds, with or without an integer solution
+SUMMARY = re.compile(r"(?:Obj|BestSol): " + _NUMBER + r"\s+Bound: " + _NUMBER + r".*?Nodes: (\d+)")
+SUMMARY_NO_SOLUTION = re.compile(r"No integer solution\s+Bound: " + _NUMBER + r"\s+Nodes: (\d+)")
+
+# End of a pure LP solve
+LP_OPTIMAL = [
+    re.compile(r"Optimal — Obj: " + _NUMBER + r"(?!.*Bound:)"),
+    re.compile(r"^Optimal objective " + _NUMBER),
+]
+
+ROOT_LP_BOUND = [
+    re.compile(r"LP Optimal\b.*?Obj: " + _NUMBER),
+    re.compile(r"Continuous objective value is " + _NUMBER),
+]
+
+# Rows of the root cut pass table: pass, rows, tight, frac, suminf, objective, time
+CUT_PASS = re.compile(r"^\s*\d+\s+\d+\s+\d+\s+\d+\s+\S+\s+" + _NUMBER + r"\s+\S+\s*$")
+
+# Size of the problem loaded by newer builds (classic CBC does not print the original size)
+MODEL_SIZE = re.compile(r"\|Rows\| = (\d+)\s+\|Cols\| = (\d+)\s+\|NZ\| = (\d+)")
+
+# Greedy allocation of the run, in the run log language, with the cost formatted with thousands separators
+HEURISTIC_PREVIEW = re.compile(r"^(?:Prévia heurística|Heuristic preview): R\$ (-?[\d,]+(?:\.\d+)?)")
+
+FINAL_OBJECTIVE = re.compile(r"^Objective value:\s+" + _NUMBER)
+FINAL_BOUND = re.compile(r"^Lower bound:\s+" + _NUMBER)
+
+def _value(text):
+    value = float(text)
+    return None if abs(value) >= NO_VALUE else value
+
+class SolverProgress:
+    """
+    Progress of a run, updated by feeding it the lines of its log.
+    """
+    def __init__(self):
+        self.phase = PHASE_BUILD
+        self.nonzeros = None
+        self.preview = None
+        self._reset_search()
+
+    def _reset_search(self):
+        self.nodes = 0
+        self.incumbent = None
+        self.bound = None
+
+    @property
+    def gap(self):
+        """Relative gap between incumbent and bound, in percent (None without both)."""
+        if self.incumbent is None or self.bound is None:
+            return None
+        return abs(self.incumbent - self.bound) / max(abs(self.incumbent), 1e-10) * 100.0
+
+    def feed(self, line):
+        """
+        Parses one log line. Returns True if the progress changed.
+        """
+        before = self.as_dict()
+
+        match = HEURISTIC_PREVIEW.search(line)
+        if match:
+            self.preview = float(match.group(1).replace(",", ""))
+            return self.as_dict() != before
+
+        if SOLVER_START.search(line):
+            self.phase = PHASE_LOAD
+            self._reset_search()
+            return self.as_dict() != before
+
+        for pattern, phase in PHASE_MARKERS:
+            if pattern.search(line):
+                self.phase = phase
+                break
+
+        match = MODEL_SIZE.search(line)
+        if match:
+            self.nonzeros = int(match.group(3))
+
+        match = NODES_CLASSIC.search(line) or NODES_TABLE.search(line)
+        if match:
+            self.phase = PHASE_TREE
+            self.nodes = int(match.group(1))
+            self._set_incumbent(_value(match.group(2)))
+            self._set_bound(_value(match.group(3)))
+            return self.as_dict() != before
+
+        match = SUMMARY.search(line)
+        if match:
+            self._set_incumbent(_value(match.group(1)))
+            self._set_bound(_value(match.group(2)))
+            self.nodes = int(match.group(3))
+            return self.as_dict() != before
+
+        match = SUMMARY_NO_SOLUTION.search(line)
+        if match:
+            self._set_bound(_value(match.group(1)))
+            self.nodes = int(match.group(2))
+            return self.as_dict() != before
+
+        for pattern in LP_OPTIMAL:
+            match = pattern.search(line)
+            if match:
+                self.phase = PHASE_DONE
+                self.incumbent = self.bound = _value(match.group(1))
+                return self.as_dict() != before
+
+        for pattern in INCUMBENT:
+            match = pattern.search(line)
+            if match:
+                self._set_incumbent(_value(match.group(1)))
+                break
+
+        for pattern in ROOT_LP_BOUND:
+            match = pattern.search(line)
+            if match:
+                self._set_bound(_value(match.group(1)))
+                break
+
+        if self.phase == PHASE_ROOT:
+            match = CUT_PASS.match(line)
+            if match:
+                self._set_bound(_value(match.group(1)))
+
+        match = FINAL_OBJECTIVE.match(line)
+        if match:
+            self.incumbent = _value(match.group(1))
+        match = FINAL_BOUND.match(line)
+        if match:
+            self.bound = _value(match.group(1))
+
+        return self.as_dict() != before
+
+    def _set_incumbent(self, value):
+        # Minimization: a new incumbent is never worse than the current one
+        if value is not None and (self.incumbent is None or value < self.incumbent):
+            self.incumbent = value
+
+    def _set_bound(self, value):
+        if value is not None:
+            self.bound = value
+
+    def as_dict(self):
+        return {
+            "phase": self.phase,
+            "nodes": self.nodes,
+            "incumbent": self.incumbent,
+            "bound": self.bound,
+            "gap": self.gap,
+            "preview": self.preview,
+        }
+
+class ProgressMonitor:
+    """
+    Follows a log file from a background thread: every `interval` seconds the new lines are parsed
+    and on_progress(progress) is called, with progress = SolverProgress.as_dict() plus the seconds
+    elapsed since the monitor started ('elapsed').
+    Use as a context manager around the run.
+    """
+    def __init__(self, path, on_progress, interval=1.0):
+        self.path = path
+        self.on_progress = on_progress
+        self.interval = interval
+        self.progress = SolverProgress()
+        self._offset = 0
+        self._start = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._follow, daemon=True)
+
+    def poll(self):
+        """Parses the complete lines written since the last poll. Returns True if the progress changed."""
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                chunk = f.read()
+        except OSError:
+            return False
+
+        # Lines still being written are read on the next poll
+        end = chunk.rfind(b"\n") + 1
+        self._offset += end
+
+        changed = False
+        for line in chunk[:end].decode('utf-8', errors='replace').splitlines():
+            changed = self.progress.feed(line) or changed
+        return changed
+
+    def _report(self):
+        progress = self.progress.as_dict()
+        progress["elapsed"] = time.time() - self._start
+        self.on_progress(progress)
+
+    def _follow(self):
+        while not self._stop.wait(self.interval):
+            try:
+                # The elapsed time is reported even when the log did not change
+                self.poll()
+                self._report()
+            except Exception as e:
+                print(f"Warning: solver progress unavailable: {e}")
+                return
+
+    def __enter__(self):
+        self._start = time.time()
+        if os.path.exists(self.path):
+            self._offset = os.path.getsize(self.path)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        return False
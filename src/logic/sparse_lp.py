@@ -0,0 +1,302 @@
+"""
+Direct sparse-matrix backend for the pure LP allocation model.
+
+The LP path of the optimization (no MILP options) is a capacitated transportation
+problem. Instead of building Pyomo expression objects, this module assembles the
+objective vector, the constraint matrix (CSR) and the bounds straight from NumPy
+arrays of the valid routes, writes an LP file for CBC in one pass and reads the
+solution back into arrays.
+
+Column layout:
+    [0, R)              Flow[o, d, p] for every valid route (same order as valid_routes)
+    [R, R + D)          DummyCapacity[d] for every destination with at least one route
+    [R + D, R + D + S)  DummyUnallocated[o, p] for every (origin, product) with supply > 0
+
+Row layout:
+    [0, S)              Supply rows:   sum_d Flow[o, d, p] + DummyUnallocated[o, p] == Supply[o, p]
+    [S, S + D)          Capacity rows: sum_(o,p) Flow[o, d, p] - DummyCapacity[d] <= EffectiveCapacity[d]
+"""
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from src.logic.resource_monitor import run_watched
+
+# Row senses used in the CSR problem description
+ROW_EQ = 0
+ROW_LE = 1
+
+def build_transport_lp(valid_routes, supply, effective_capacity, unit_cost, big_m_capacity, big_m_unallocated):
+    """
+    Assembles the transportation LP as NumPy arrays.
+
+    Args:
+        valid_routes: list of (o, d, p) tuples.
+        supply: dict (o, p) -> tons available.
+        effective_capacity: dict d -> max(0, total capacity - initial inventory).
+        unit_cost: sequence of the per-ton cost (freight * distance + storage) of each route, aligned with valid_routes.
+        big_m_capacity: penalty per ton of artificial capacity.
+        big_m_unallocated: penalty per ton of unallocated supply.
+
+    Returns:
+        dict with the objective vector 'c', the CSR matrix ('indptr', 'indices', 'data'),
+        'sense' and 'rhs' per row, and the keys needed to map columns back to the model.
+    """
+    n_routes = len(valid_routes)
+
+    # Only (o, p) pairs with positive supply get a supply row, as in the Pyomo model
+    supply_keys = [key for key, val in supply.items() if val > 0]
+    supply_row = {key: i for i, key in enumerate(supply_keys)}
+
+    # Only destinations reachable by some route get a capacity row
+    dest_keys = list(dict.fromkeys(d for (_, d, _) in valid_routes))
+    dest_row = {d: i for i, d in enumerate(dest_keys)}
+
+    n_supply = len(supply_keys)
+    n_dest = len(dest_keys)
+    n_rows = n_supply + n_dest
+    n_cols = n_routes + n_dest + n_supply
+
+    # Row index of every route in the supply block (-1 when the pair has no supply)
+    route_supply_row = np.fromiter((supply_row.get((o, p), -1) for (o, _, p) in valid_routes), dtype=np.int64, count=n_routes)
+    route_dest_row = np.fromiter((dest_row[d] for (_, d, _) in valid_routes), dtype=np.int64, count=n_routes)
+    route_cols = np.arange(n_routes, dtype=np.int64)
+
+    has_supply = route_supply_row >= 0
+
+    # COO triplets: flows in supply rows, flows in capacity rows, dummies on their own rows
+    rows = np.concatenate([
+        route_supply_row[has_supply],
+        n_supply + route_dest_row,
+        n_supply + np.arange(n_dest, dtype=np.int64),
+        np.arange(n_supply, dtype=np.int64),
+    ])
+    cols = np.concatenate([
+        route_cols[has_supply],
+        route_cols,
+        n_routes + np.arange(n_dest, dtype=np.int64),
+        n_routes + n_dest + np.arange(n_supply, dtype=np.int64),
+    ])
+    data = np.concatenate([
+        np.ones(int(has_supply.sum())),
+        np.ones(n_routes),
+        -np.ones(n_dest),
+        np.ones(n_supply),
+    ])
+
+    # COO -> CSR (stable sort by row keeps the column order of each row)
+    order = np.argsort(rows, kind='stable')
+    indices = cols[order]
+    data = data[order]
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+
+    c = np.concatenate([
+        np.asarray(unit_cost, dtype=float),
+        np.full(n_dest, float(big_m_capacity)),
+        np.full(n_supply, float(big_m_unallocated)),
+    ])
+
+    sense = np.concatenate([np.full(n_supply, ROW_EQ, dtype=np.int8), np.full(n_dest, ROW_LE, dtype=np.int8)])
+    rhs = np.concatenate([
+        np.fromiter((supply[key] for key in supply_keys), dtype=float, count=n_supply),
+        np.fromiter((effective_capacity.get(d, 0.0) for d in dest_keys), dtype=float, count=n_dest),
+    ])
+
+    return {
+        "c": c,
+        "indptr": indptr,
+        "indices": indices,
+        "data": data,
+        "sense": sense,
+        "rhs": rhs,
+        "n_rows": n_rows,
+        "n_cols": n_cols,
+        "n_routes": n_routes,
+        "dest_keys": dest_keys,
+        "supply_keys": supply_keys,
+    }
+
+def phase_objectives(problem, big_m_capacity):
+    """
+    Objective vectors of the two phases of a lexicographic solve: the dummies weighted in the
+    proportions of their penalties (artificial capacity = 1), and the route costs alone.
+    c == cost + big_m_capacity * infeasibility.
+    """
+    c = problem["c"]
+    n_routes = problem["n_routes"]
+    infeasibility = np.concatenate([np.zeros(n_routes), c[n_routes:] / float(big_m_capacity)])
+    cost = np.concatenate([c[:n_routes], np.zeros(len(c) - n_routes)])
+    return infeasibility, cost
+
+def add_row(problem, coefs, sense, rhs):
+    """
+    Copy of the problem with one more row: sum_j coefs[j] * x_j (sense) rhs, over the nonzero coefs.
+    """
+    cols = np.flatnonzero(coefs)
+    return dict(
+        problem,
+        indptr=np.append(problem["indptr"], problem["indptr"][-1] + len(cols)),
+        indices=np.concatenate([problem["indices"], cols]),
+        data=np.concatenate([problem["data"], coefs[cols]]),
+        sense=np.append(problem["sense"], np.int8(sense)),
+        rhs=np.append(problem["rhs"], float(rhs)),
+        n_rows=problem["n_rows"] + 1,
+    )
+
+def _format_terms(coefs, cols):
+    return " ".join(f"{'+' if v >= 0 else '-'} {abs(v):.12g} x{j}" for v, j in zip(coefs.tolist(), cols.tolist()))
+
+def write_lp_file(path, problem):
+    """
+    Writes the problem in CPLEX LP format, row by row from the CSR arrays.
+    Every variable is non-negative, which is the LP format default, so no Bounds section is needed.
+    """
+    c = problem["c"]
+    indptr = problem["indptr"]
+    indices = problem["indices"]
+    data = problem["data"]
+    sense = problem["sense"]
+    rhs = problem["rhs"]
+
+    chunk = 64  # Terms per line, keeps lines short for the LP reader
+
+    with open(path, 'w', encoding='ascii') as f:
+        f.write("\\ Granum transportation LP\nMinimize\n obj:")
+        nz = np.flatnonzero(c)
+        if len(nz) == 0:
+            f.write(" 0 x0")
+        for start in range(0, len(nz), chunk):
+            cols = nz[start:start + chunk]
+            f.write(" " + _format_terms(c[cols], cols) + "\n")
+
+        f.write("Subject To\n")
+        for i in range(problem["n_rows"]):
+            lo, hi = indptr[i], indptr[i + 1]
+            f.write(f" r{i}:")
+            for start in range(lo, hi, chunk):
+                end = min(start + chunk, hi)
+                f.write(" " + _format_terms(data[start:end], indices[start:end]) + "\n")
+            op = "=" if sense[i] == ROW_EQ else "<="
+            f.write(f" {op} {rhs[i]:.12g}\n")
+
+        f.write("End\n")
+
+def read_cbc_solution(path, n_cols):
+    """
+    Reads a CBC solution file ('solu' command) into a dense column array.
+
+    Returns:
+        (status, objective, x): status is the first word of the CBC status line
+        (e.g. 'Optimal', 'Infeasible', 'Stopped').
+    """
+    x = np.zeros(n_cols)
+    status = "Unknown"
+    objective = 0.0
+
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        header = f.readline().strip()
+        if header:
+            status = header.split()[0]
+            if "objective value" in header:
+                try:
+                    objective = float(header.rsplit("objective value", 1)[1].split()[0])
+                except (ValueError, IndexError):
+                    objective = 0.0
+
+        for line in f:
+            parts = line.split()
+            # Lines look like: "<index> <name> <value> <reduced cost>", optionally prefixed by '**'
+            if parts and parts[0] == "**":
+                parts = parts[1:]
+            if len(parts) < 3 or not parts[1].startswith("x"):
+                continue
+            try:
+                x[int(parts[1][1:])] = float(parts[2])
+            except ValueError:
+                continue
+
+    return status, objective, x
+
+def read_cbc_duals(path, n_rows):
+    """
+    Reads the row duals of a CBC solution file written with '-printingOptions all', where the rows
+    come before the columns as "<index> r<row> <activity> <dual>". For a minimization the reduced
+    cost of column j is c[j] - sum_i A[i, j] * duals[i].
+    """
+    duals = np.zeros(n_rows)
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        f.readline()
+        for line in f:
+            parts = line.split()
+            if parts and parts[0] == "**":
+                parts = parts[1:]
+            if len(parts) < 4 or not parts[1].startswith("r"):
+                continue
+            try:
+                duals[int(parts[1][1:])] = float(parts[3])
+            except ValueError:
+                continue
+    return duals
+
+def solve_transport_lp(problem, time_limit=600, cbc_path=None, options=None, duals=False):
+    """
+    Writes the problem to a temporary LP file, runs CBC on it and reads the solution back.
+    options are extra CBC command line options (name -> value); a 'sec' option overrides time_limit.
+    With duals, the row duals of an optimal solution are read as well (see read_cbc_duals).
+
+    Returns:
+        dict with 'status' ('optimal', 'infeasible' or 'error'), 'objective', the column
+        values 'x', the row 'duals' (when asked), the raw CBC output in 'log' and the seconds spent
+        writing the LP file, in CBC and reading the solution in 'timings' ('lp_write', 'solver',
+        'solution_load').
+    """
+    cbc = cbc_path or shutil.which('cbc')
+    if not cbc:
+        raise RuntimeError("CBC executable not found in PATH.")
+
+    work_dir = tempfile.mkdtemp(prefix='granum_lp_')
+    lp_path = os.path.join(work_dir, 'model.lp')
+    sol_path = os.path.join(work_dir, 'model.sol')
+
+    timings = {}
+    try:
+        start = time.perf_counter()
+        write_lp_file(lp_path, problem)
+        timings["lp_write"] = time.perf_counter() - start
+
+        cbc_args = {"sec": time_limit}
+        cbc_args.update(options or {})
+        cmd = [cbc]
+        for name, val in cbc_args.items():
+            cmd.extend(['-' + name, str(val)])
+        cmd.extend(['-import', lp_path, '-solve'])
+        if duals:
+            cmd.extend(['-printingOptions', 'all'])
+        cmd.extend(['-solu', sol_path])
+
+        start = time.perf_counter()
+        # Run as a solver process of the run, for its memory ceiling and usage report
+        output = []
+        run_watched(cmd, on_line=output.append)
+        output = "".join(output)
+        timings["solver"] = time.perf_counter() - start
+
+        if not os.path.exists(sol_path):
+            return {"status": "error", "objective": 0.0, "x": np.zeros(problem["n_cols"]), "log": output,
+                    "timings": timings}
+
+        start = time.perf_counter()
+        cbc_status, objective, x = read_cbc_solution(sol_path, problem["n_cols"])
+        status = "optimal" if cbc_status == "Optimal" else "infeasible"
+        result = {"status": status, "objective": objective, "x": x, "log": output, "timings": timings}
+        if duals:
+            result["duals"] = read_cbc_duals(sol_path, problem["n_rows"])
+        timings["solution_load"] = time.perf_counter() - start
+        return result
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -1,5 +1,6 @@
 from src.logic.i18n import translate
-from dash import html, dcc
+import os
+from dash import html, dcc, dash_table
 import dash_bootstrap_components as dbc
 from src.view.theme import UNB_THEME
 
@@ -39,6 +40,111 @@ def get_tab_model_config_layout(lang='pt'):
                         )
                     ], className="mb-4 d-flex align-items-center justify-content-center"),
 
+                    # Container for the route pruning rule (initially hidden)
+                    html.Div(
+                        id="container-pruning-options",
+                        style={"display": "none"},
+                        children=[
+                            dbc.Row([
+                                dbc.Col([
+                                    html.Div([
+                                        dbc.Label(translate("Regra de poda", lang), className="fw-bold small me-2 mb-0", style={"color": "#9ca3af"}),
+                                        html.I(className="bi bi-question-circle-fill text-muted", id="help-pruning-method", style={"cursor": "help", "fontSize": "var(--font-size-small)"}),
+                                        dbc.Tooltip(translate("Percentual: mantém o percentual informado dos melhores destinos de cada origem e produto (Pareto: 20%). Mais próximos: mantém a quantidade informada de destinos. Raio: mantém os destinos a até a distância informada (km). Pelo menos um destino é mantido para cada origem e produto.", lang), target="help-pruning-method")
+                                    ], className="d-flex align-items-center mb-1"),
+                                    dcc.Dropdown(
+                                        id="dropdown-pruning-method",
+                                        options=[
+                                            {"label": translate("Percentual", lang), "value": "percentile"},
+                                            {"label": translate("Mais próximos", lang), "value": "nearest"},
+                                            {"label": translate("Raio (km)", lang), "value": "radius"},
+                                        ],
+                                        value="percentile",
+                                        clearable=False,
+                                        className="mb-4"
+                                    )
+                                ], width=4),
+                                dbc.Col([
+                                    dbc.Label(translate("Valor", lang), className="fw-bold small mb-1", style={"color": "#9ca3af"}),
+                                    dbc.Input(id="input-pruning-value", type="number", min=0, placeholder="20", className="mb-4")
+                                ], width=4),
+                                dbc.Col([
+                                    html.Div([
+                                        dbc.Label(translate("Critério", lang), className="fw-bold small me-2 mb-0", style={"color": "#9ca3af"}),
+                                        html.I(className="bi bi-question-circle-fill text-muted", id="help-pruning-score", style={"cursor": "help", "fontSize": "var(--font-size-small)"}),
+                                        dbc.Tooltip(translate("Ordena os destinos pela distância ou pelo custo unitário da rota (frete por tonelada mais a tarifa de armazenagem do produto). A poda por raio usa sempre a distância.", lang), target="help-pruning-score")
+                                    ], className="d-flex align-items-center mb-1"),
+                                    dcc.Dropdown(
+                                        id="dropdown-pruning-score",
+                                        options=[
+                                            {"label": translate("Distância", lang), "value": "distance"},
+                                            {"label": translate("Custo unitário", lang), "value": "cost"},
+                                        ],
+                                        value="distance",
+                                        clearable=False,
+                                        className="mb-4"
+                                    )
+                                ], width=4)
+                            ])
+                        ]
+                    ),
+
+                    html.Div([
+                        dbc.Switch(
+                            id="toggle-decompose",
+                            value=False,
+                            className="custom-switch mb-0 small"
+                        ),
+                        html.Label(translate("Resolver regiões independentes em paralelo", lang),
+                            htmlFor="toggle-decompose",
+                            className="mb-0 mx-2 text-muted cursor-pointer small"
+                        ),
+                        html.I(className="bi bi-question-circle-fill text-muted", id="help-decompose", style={"cursor": "help", "fontSize": "var(--font-size-small)"}),
+                        dbc.Tooltip(translate("Quando as rotas válidas formam grupos que não compartilham armazéns (por exemplo, pela compatibilidade de produtos ou pelo Princípio de Pareto), cada grupo é resolvido como um modelo separado, em paralelo. O resultado é o mesmo do modelo completo.", lang),
+                            target="help-decompose",
+                            placement="top"
+                        )
+                    ], className="mb-4 d-flex align-items-center justify-content-center"),
+
+                    html.Div([
+                        dbc.Switch(
+                            id="toggle-coarsen",
+                            value=False,
+                            className="custom-switch mb-0 small"
+                        ),
+                        html.Label(translate("Agregar armazéns do mesmo município (escala nacional)", lang),
+                            htmlFor="toggle-coarsen",
+                            className="mb-0 mx-2 text-muted cursor-pointer small"
+                        ),
+                        html.I(className="bi bi-question-circle-fill text-muted", id="help-coarsen", style={"cursor": "help", "fontSize": "var(--font-size-small)"}),
+                        dbc.Tooltip(translate("Armazéns do mesmo município, tipo e tarifa viram um único nó com a capacidade somada; o modelo agregado é resolvido e o volume de cada nó é depois dividido entre os seus armazéns por modelos locais. O log informa o gap de otimalidade em relação ao modelo agregado, que é um limite inferior do custo. Vale para execuções sem limites logísticos.", lang),
+                            target="help-coarsen",
+                            placement="top"
+                        )
+                    ], className="mb-4 d-flex align-items-center justify-content-center"),
+
+                    dbc.Row([
+                        dbc.Col([
+                            html.Div([
+                                dbc.Label(translate("Método de solução", lang), className="fw-bold small me-2 mb-0", style={"color": "#9ca3af"}),
+                                html.I(className="bi bi-question-circle-fill text-muted", id="help-solution-method", style={"cursor": "help", "fontSize": "var(--font-size-small)"}),
+                                dbc.Tooltip(translate("Modelo completo: uma variável por rota válida. Geração de colunas: resolve o LP com as rotas mais baratas de cada origem e produto e acrescenta apenas as que reduzem o custo; chega ao mesmo ótimo com muito menos memória (execuções sem limites logísticos). Busca em kernel: com limites logísticos, resolve MILPs menores com as rotas usadas pela relaxação LP e acrescenta grupos de rotas enquanto houver tempo, dentro do limite de tempo do solver. Heurística gulosa: aloca pelas rotas de menor custo unitário, respeitando capacidades e limites logísticos, em segundos e sem garantia de custo mínimo. Nos outros métodos, a prévia heurística é calculada antes do solver e aparece no progresso da execução.", lang), target="help-solution-method")
+                            ], className="d-flex align-items-center mb-1"),
+                            dcc.Dropdown(
+                                id="dropdown-solution-method",
+                                options=[
+                                    {"label": translate("Modelo completo (CBC)", lang), "value": "pyomo"},
+                                    {"label": translate("Geração de colunas (rotas sob demanda)", lang), "value": "column_generation"},
+                                    {"label": translate("Busca em kernel (MILP grande, no limite de tempo)", lang), "value": "kernel_search"},
+                                    {"label": translate("Heurística gulosa (prévia, sem solver)", lang), "value": "heuristic"},
+                                ],
+                                value="pyomo",
+                                clearable=False,
+                                className="mb-4"
+                            )
+                        ], width=12)
+                    ]),
+
                     html.Div([
                         dbc.Switch(
                             id="toggle-min-max-capacity",
@@ -157,6 +263,136 @@ def get_tab_model_config_layout(lang='pt'):
                             html.Hr(className="mt-0 mb-4")
                         ]
                     ),
+
+                    html.Div([
+                        dbc.Switch(
+                            id="toggle-solver-settings",
+                            value=False,
+                            className="custom-switch mb-0 small"
+                        ),
+                        html.Label(translate("Configurar desempenho do solver", lang),
+                            htmlFor="toggle-solver-settings",
+                            className="mb-0 mx-2 text-muted cursor-pointer small"
+                        ),
+                        html.I(className="bi bi-question-circle-fill text-muted", id="help-solver-settings", style={"cursor": "help", "fontSize": "var(--font-size-small)"}),
+                        dbc.Tooltip(translate("Ative para ajustar threads, gap de otimalidade, limite de tempo, presolve, cortes e semente do solver CBC. Sem esta opção, o solver usa todos os núcleos do servidor, gap zero e limite de 600 segundos.", lang),
+                            target="help-solver-settings",
+                            placement="top"
+                        )
+                    ], className="mb-4 d-flex align-items-center justify-content-center"),
+
+                    # Container for solver options (initially hidden)
+                    html.Div(
+                        id="container-solver-options",
+                        style={"display": "none"},
+                        children=[
+                            html.Hr(className="mt-2 mb-3"),
+
+                            html.P([
+                                html.I(className="bi bi-info-circle me-1"),
+                                translate("Campos deixados em branco usam o valor padrão.", lang)
+                            ], className="text-muted small mb-3 fst-italic", style={"fontSize": "0.8rem"}),
+
+                            html.H6(translate("Configurações do Solver", lang), className="fw-bold small text-primary-custom mb-3"),
+
+                            dbc.Row([
+                                dbc.Col([
+                                    html.Div([
+                                        dbc.Label(translate("Threads", lang), className="fw-bold small me-2 mb-0", style={"color": "#9ca3af"}),
+                                        html.I(className="bi bi-question-circle-fill text-muted", id="help-solver-threads", style={"cursor": "help", "fontSize": "var(--font-size-small)"}),
+                                        dbc.Tooltip(translate("Número de threads usadas pelo branch-and-bound do CBC. Padrão: número de núcleos do servidor.", lang), target="help-solver-threads")
+                                    ], className="d-flex align-items-center mb-1"),
+                                    dbc.Input(id="input-solver-threads", type="number", min=1, step=1, placeholder=str(os.cpu_count() or 1), className="mb-4")
+                                ], width=6),
+                                dbc.Col([
+                                    html.Div([
+                                        dbc.Label(translate("Limite de tempo (s)", lang), className="fw-bold small me-2 mb-0", style={"color": "#9ca3af"}),
+                                        html.I(className="bi bi-question-circle-fill text-muted", id="help-solver-time", style={"cursor": "help", "fontSize": "var(--font-size-small)"}),
+                                        dbc.Tooltip(translate("Tempo máximo de execução do solver, em segundos.", lang), target="help-solver-time")
+                                    ], className="d-flex align-items-center mb-1"),
+                                    dbc.Input(id="input-solver-time-limit", type="number", min=1, placeholder="600", className="mb-4")
+                                ], width=6)
+                            ]),
+
+                            dbc.Row([
+                                dbc.Col([
+                                    html.Div([
+                                        dbc.Label(translate("Gap relativo (%)", lang), className="fw-bold small me-2 mb-0", style={"color": "#9ca3af"}),
+                                        html.I(className="bi bi-question-circle-fill text-muted", id="help-solver-gap", style={"cursor": "help", "fontSize": "var(--font-size-small)"}),
+                                        dbc.Tooltip(translate("O solver para quando a solução encontrada estiver a no máximo este percentual do ótimo. Em modelos com limites de recepção e rota, um gap de 0,5% costuma reduzir muito o tempo de resolução.", lang), target="help-solver-gap")
+                                    ], className="d-flex align-items-center mb-1"),
+                                    dbc.Input(id="input-solver-gap", type="number", min=0, step=0.1, placeholder=translate("Ex: 0.5", lang), className="mb-4")
+                                ], width=6),
+                                dbc.Col([
+                                    html.Div([
+                                        dbc.Label(translate("Gap absoluto (R$)", lang), className="fw-bold small me-2 mb-0", style={"color": "#9ca3af"}),
+                                        html.I(className="bi bi-question-circle-fill text-muted", id="help-solver-abs-gap", style={"cursor": "help", "fontSize": "var(--font-size-small)"}),
+                                        dbc.Tooltip(translate("O solver para quando a diferença entre a solução encontrada e o limite inferior for menor que este valor.", lang), target="help-solver-abs-gap")
+                                    ], className="d-flex align-items-center mb-1"),
+                                    dbc.Input(id="input-solver-abs-gap", type="number", min=0, placeholder=translate("Ex: 1000", lang), className="mb-4")
+                                ], width=6)
+                            ]),
+
+                            dbc.Row([
+                                dbc.Col([
+                                    dbc.Label(translate("Presolve", lang), className="fw-bold small mb-1", style={"color": "#9ca3af"}),
+                                    dcc.Dropdown(
+                                        id="dropdown-solver-presolve",
+                                        options=[
+                                            {"label": translate("Ligado", lang), "value": "on"},
+                                            {"label": translate("Desligado", lang), "value": "off"},
+                                            {"label": translate("Agressivo", lang), "value": "more"},
+                                        ],
+                                        value="on",
+                                        clearable=False,
+                                        className="mb-4"
+                                    )
+                                ], width=4),
+                                dbc.Col([
+                                    dbc.Label(translate("Cortes", lang), className="fw-bold small mb-1", style={"color": "#9ca3af"}),
+                                    dcc.Dropdown(
+                                        id="dropdown-solver-cuts",
+                                        options=[
+                                            {"label": translate("Ligado", lang), "value": "on"},
+                                            {"label": translate("Desligado", lang), "value": "off"},
+                                            {"label": translate("Apenas na raiz", lang), "value": "root"},
+                                            {"label": translate("Se houver progresso", lang), "value": "ifmove"},
+                                        ],
+                                        value="on",
+                                        clearable=False,
+                                        className="mb-4"
+                                    )
+                                ], width=4),
+                                dbc.Col([
+                                    dbc.Label(translate("Semente aleatória", lang), className="fw-bold small mb-1", style={"color": "#9ca3af"}),
+                                    dbc.Input(id="input-solver-seed", type="number", min=0, step=1, placeholder=translate("Ex: 42", lang), className="mb-4")
+                                ], width=4)
+                            ]),
+
+                            dbc.Row([
+                                dbc.Col([
+                                    html.Div([
+                                        dbc.Label(translate("Objetivo", lang), className="fw-bold small me-2 mb-0", style={"color": "#9ca3af"}),
+                                        html.I(className="bi bi-question-circle-fill text-muted", id="help-solver-objective", style={"cursor": "help", "fontSize": "var(--font-size-small)"}),
+                                        dbc.Tooltip(translate("Penalidades: capacidade artificial e oferta não alocada entram no custo com penalidades Big M. Lexicográfico: resolve em duas fases, primeiro minimiza essas folgas e depois o custo real, com coeficientes bem escalados; informa o valor das duas fases.", lang), target="help-solver-objective")
+                                    ], className="d-flex align-items-center mb-1"),
+                                    dcc.Dropdown(
+                                        id="dropdown-solver-objective",
+                                        options=[
+                                            {"label": translate("Penalidades (Big M)", lang), "value": "penalty"},
+                                            {"label": translate("Lexicográfico (duas fases)", lang), "value": "lexicographic"},
+                                        ],
+                                        value="penalty",
+                                        clearable=False,
+                                        className="mb-4"
+                                    )
+                                ], width=12)
+                            ]),
+
+                            html.Hr(className="mt-0 mb-4")
+                        ]
+                    ),
+
                     html.Div([
                         dbc.Switch(
                             id="toggle-detailed-log",
@@ -193,6 +429,8 @@ def get_tab_model_config_layout(lang='pt'):
                             dbc.Spinner(spinner_class_name="text-primary-custom", spinner_style={"width": "3rem", "height": "3rem"}),
                             html.H5(translate("Otimizando alocação...", lang), className="mt-4"),
                             html.P(translate("Isso pode levar alguns minutos. Por favor, aguarde.", lang), className="text-muted text-center mt-2"),
+                            html.Div(id="model-progress-phase", className="fw-bold text-center mt-2"),
+                            html.Div(id="model-progress-stats", className="small text-muted text-center mt-1"),
                             dbc.Button(translate("Interromper Modelo", lang), id="btn-cancel-model", color="none", className="btn-danger-custom mt-4 w-50", disabled=True)
                         ],
                         className="d-flex flex-column align-items-center justify-content-center p-5"
@@ -207,6 +445,88 @@ def get_tab_model_config_layout(lang='pt'):
         centered=True,
     )
 
+    # Card Scenario Sweep
+    sweep_card = dbc.Card(
+        [
+            dbc.CardHeader(
+                html.Div([
+                    html.Span(translate("Comparar Cenários", lang), className="me-2"),
+                    html.I(className="bi bi-question-circle-fill", id="help-sweep", style={"cursor": "help", "fontSize": "var(--font-size-small)"}),
+                    dbc.Tooltip(translate("Roda várias variações do modelo de uma só vez, em paralelo, e compara custos, indicadores e tempos. As demais opções seguem a configuração acima. Separe os valores de cada campo com ponto e vírgula.", lang),
+                        target="help-sweep",
+                        placement="right"
+                    ),
+                ], className="d-flex align-items-center"),
+                className="card-header-custom"
+            ),
+            dbc.CardBody(
+                [
+                    dbc.Row([
+                        dbc.Col([
+                            dbc.Label(translate("Princípio de Pareto", lang), className="fw-bold small mb-1", style={"color": "#9ca3af"}),
+                            dbc.Checklist(
+                                id="checklist-sweep-pareto",
+                                options=[
+                                    {"label": translate("Sem Pareto", lang), "value": "off"},
+                                    {"label": translate("Com Pareto", lang), "value": "on"},
+                                ],
+                                value=[],
+                                inline=True,
+                                className="small mb-4"
+                            )
+                        ], width=6),
+                        dbc.Col([
+                            dbc.Label(translate("Dias de alocação", lang), className="fw-bold small mb-1", style={"color": "#9ca3af"}),
+                            dbc.Input(id="input-sweep-days", type="text", placeholder=translate("Ex: 10; 20; 30", lang), className="mb-4")
+                        ], width=6)
+                    ]),
+                    dbc.Row([
+                        dbc.Col([
+                            dbc.Label(translate("Faixas de frete por rota (mín-máx, ton)", lang), className="fw-bold small mb-1", style={"color": "#9ca3af"}),
+                            dbc.Input(id="input-sweep-freight", type="text", placeholder=translate("Ex: 20-40; 10-30", lang), className="mb-4")
+                        ], width=6),
+                        dbc.Col([
+                            dbc.Label(translate("Fatores da tarifa de armazenagem", lang), className="fw-bold small mb-1", style={"color": "#9ca3af"}),
+                            dbc.Input(id="input-sweep-storage", type="text", placeholder=translate("Ex: 0,9; 1; 1,1", lang), className="mb-4")
+                        ], width=6)
+                    ]),
+                    dbc.Button(translate("Rodar Comparação", lang), id="btn-run-sweep", className="btn-primary-custom w-100 mb-3"),
+                    dbc.Spinner(
+                        html.Div([
+                            html.Div(id="sweep-output-text", className="mt-3 text-center"),
+                            dash_table.DataTable(
+                                id="table-sweep-results",
+                                data=[],
+                                columns=[],
+                                sort_action='native',
+                                page_size=10,
+                                style_table={'overflowX': 'auto', 'borderRadius': '8px', 'border': f"1px solid {UNB_THEME['BORDER_LIGHT']}"},
+                                style_cell={
+                                    'textAlign': 'left',
+                                    'fontFamily': "'Roboto', sans-serif",
+                                    'padding': '12px',
+                                    'fontSize': 'var(--font-size-small)',
+                                    'color': UNB_THEME['SECONDARY']
+                                },
+                                style_header={
+                                    'backgroundColor': '#F8F9FA',
+                                    'color': UNB_THEME['PRIMARY'],
+                                    'fontWeight': 'bold',
+                                    'border': 'none',
+                                    'padding': '12px',
+                                    'borderBottom': f"2px solid {UNB_THEME['BORDER_LIGHT']}"
+                                }
+                            )
+                        ]),
+                        spinner_class_name="text-primary-custom"
+                    )
+                ],
+                className="card-body-custom"
+            ),
+        ],
+        className="card-custom mb-3"
+    )
+
     return html.Div([
         dbc.Row(
             [
@@ -216,5 +536,13 @@ def get_tab_model_config_layout(lang='pt'):
             ],
             className="justify-content-center"
         ),
+        dbc.Row(
+            [
+                dbc.Col([
+                    sweep_card
+                ], width=12, lg=10, className="mb-24 mx-auto"),
+            ],
+            className="justify-content-center"
+        ),
         loading_modal
     ])
@@ -219,6 +219,9 @@ def get_tab_results_layout(lang='pt'):
         className="card-custom mb-3 mt-4"
     )
 
+    # 4. Análise de Sensibilidade (duais do LP, preenchida apenas em execuções LP ótimas)
+    sensitivity_container = html.Div(id="results-sensitivity-container", className="mb-4")
+
     # Modal Confirmação Malha (Muitas rotas)
     confirm_all_routes_modal = dbc.Modal(
         [
@@ -250,5 +253,6 @@ def get_tab_results_layout(lang='pt'):
             dbc.Col(table_card, width=12, className="mb-24")
         ]),
         dbc.Row(dbc.Col(map_card, width=12, className="mb-24")),
+        sensitivity_container,
         confirm_all_routes_modal
     ])
@@ -11,10 +11,16 @@ from src.view.pages.model_config import get_tab_model_config_layout
 from src.view.pages.costs import get_tab_costs_layout
 from src.view.pages.results import get_tab_results_layout
 from src.logic.osrm import OSRMClient
-from src.logic.optimization import run_optimization_model
+from src.logic.scenario_session import start_session_worker, run_in_session
+from src.logic.result_cache import ResultCache, result_cache_key
+from src.logic.scenario_sweep import run_sweep, sweep_grid_from_inputs, grid_scenarios
+from src.logic.run_log import open_run_log, log_path
+from src.logic.solver_progress import ProgressMonitor
+from src.logic.optimization import SOLVED_STATUSES
 from src.logic.i18n import translate
 import dash
 import time
+import uuid
 from dash import DiskcacheManager
 import diskcache
 import plotly.express as px
@@ -136,6 +142,17 @@ def get_conab_txt_data():
 cache = diskcache.Cache("./cache")
 background_callback_manager = DiskcacheManager(cache)
 
+# Cache of finished optimization runs, keyed by the hash of their inputs and options
+result_cache = ResultCache(os.path.join("./cache", "results"))
+
+# Scenario session worker: keeps built models alive between runs for fast what-if re-solves.
+# Started before any background job is forked, so the jobs inherit its address.
+try:
+    session_worker = start_session_worker()
+except Exception as e:
+    print(f"Warning: Could not start scenario session worker: {e}")
+    session_worker = None
+
 # Initialize app with Bootstrap theme and suppress callback exceptions
 app = Dash(
     __name__,
@@ -1097,6 +1114,7 @@ app.layout = html.Div([
     dcc.Store(id='store-distance-matrix'), # New Store for Distance Matrix
     dcc.Store(id='store-model-results'), # New Store for Model Results
     dcc.Store(id='store-model-log'), # New Store for optimization logs
+    dcc.Store(id='store-scenario-session', storage_type='session'), # Scenario session id (what-if re-solves)
     dcc.Store(id='store-help-seen', storage_type='local'),
 
     # Static Download Components (Prevents auto-download bug on language switch)
@@ -3100,6 +3118,24 @@ def toggle_min_max_container(is_active):
         return {"display": "block"}
     return {"display": "none"}
 
+@app.callback(
+    Output("container-pruning-options", "style"),
+    Input("toggle-pareto-routes", "value")
+)
+def toggle_pruning_container(is_active):
+    if is_active:
+        return {"display": "block"}
+    return {"display": "none"}
+
+@app.callback(
+    Output("container-solver-options", "style"),
+    Input("toggle-solver-settings", "value")
+)
+def toggle_solver_container(is_active):
+    if is_active:
+        return {"display": "block"}
+    return {"display": "none"}
+
 @app.callback(
     Output("input-max-load", "disabled"),
     Input("toggle-use-reception", "value")
@@ -3107,6 +3143,52 @@ def toggle_min_max_container(is_active):
 def toggle_carga_max_input(use_reception):
     return use_reception
 
+def load_cost_tables():
+    """
+    Freight and storage tariff tables shipped with the app (empty DataFrames if they cannot be read).
+    """
+    data_dir = os.path.join(os.path.dirname(__file__), 'assets', 'data')
+
+    try:
+        df_freight = pd.read_csv(os.path.join(data_dir, 'Valor_Tonelada_km.csv'), sep=';', encoding='iso-8859-1')
+    except Exception as e:
+        print(f"Warning: Could not load Freight CSV: {e}")
+        df_freight = pd.DataFrame()
+
+    try:
+        df_storage = pd.read_csv(os.path.join(data_dir, 'Tarifa_de_Armazenagem.csv'), sep=';', encoding='iso-8859-1')
+    except Exception as e:
+        print(f"Warning: Could not load Storage CSV: {e}")
+        df_storage = pd.DataFrame()
+
+    return df_freight, df_storage
+
+def pruning_from_inputs(toggle_pareto, method, value, score):
+    """
+    Route pruning rule from the model configuration (None when Pareto is off); a blank value
+    takes the default of the method (see route_pruning.normalize_pruning).
+    """
+    if not toggle_pareto:
+        return None
+    return {"method": method, "value": value, "score": score}
+
+def format_solver_progress(progress, lang='pt'):
+    """
+    Phase line and statistics line of the running-model modal, from a ProgressMonitor report.
+    """
+    stats = [translate("Tempo decorrido: {val:.0f} s", lang).format(val=progress["elapsed"])]
+    if progress.get("preview") is not None:
+        stats.append(translate("Prévia heurística: R$ {val:,.2f}", lang).format(val=progress["preview"]))
+    if progress["nodes"]:
+        stats.append(translate("Nós explorados: {val}", lang).format(val=progress["nodes"]))
+    if progress["incumbent"] is not None:
+        stats.append(translate("Melhor solução: R$ {val:,.2f}", lang).format(val=progress["incumbent"]))
+    if progress["bound"] is not None:
+        stats.append(translate("Limite inferior: R$ {val:,.2f}", lang).format(val=progress["bound"]))
+    if progress["gap"] is not None:
+        stats.append(translate("Gap: {val:.2f}%", lang).format(val=progress["gap"]))
+    return translate(progress["phase"], lang), " | ".join(stats)
+
 # 16. Run Optimization Model (Background Callback)
 @app.callback(
     output=(
@@ -3124,6 +3206,12 @@ def toggle_carga_max_input(use_reception):
         State('store-distance-matrix', 'data'),
         State('toggle-detailed-log', 'value'),
         State('toggle-pareto-routes', 'value'),
+        State('dropdown-pruning-method', 'value'),
+        State('input-pruning-value', 'value'),
+        State('dropdown-pruning-score', 'value'),
+        State('toggle-decompose', 'value'),
+        State('toggle-coarsen', 'value'),
+        State('dropdown-solution-method', 'value'),
         State('toggle-min-max-capacity', 'value'),
         State('input-min-load', 'value'),
         State('input-max-load', 'value'),
@@ -3131,7 +3219,17 @@ def toggle_carga_max_input(use_reception):
         State('input-allocation-days', 'value'),
         State('input-min-freight', 'value'),
         State('input-max-freight', 'value'),
-        State('store-lang', 'data')
+        State('toggle-solver-settings', 'value'),
+        State('input-solver-threads', 'value'),
+        State('input-solver-time-limit', 'value'),
+        State('input-solver-gap', 'value'),
+        State('input-solver-abs-gap', 'value'),
+        State('dropdown-solver-presolve', 'value'),
+        State('dropdown-solver-cuts', 'value'),
+        State('input-solver-seed', 'value'),
+        State('dropdown-solver-objective', 'value'),
+        State('store-lang', 'data'),
+        State('store-scenario-session', 'data')
     ],
     background=True,
     running=[
@@ -3139,10 +3237,18 @@ def toggle_carga_max_input(use_reception):
         (Output("btn-cancel-model", "disabled"), False, True),
     ],
     cancel=[Input("btn-cancel-model", "n_clicks")],
+    # Live solver progress, parsed from the run log while CBC is running
+    progress=[
+        Output("model-progress-phase", "children"),
+        Output("model-progress-stats", "children"),
+    ],
+    progress_default=["", ""],
     prevent_initial_call=True
 )
-def execute_model(n_clicks, stored_data, stored_warehouses, stored_prod_warehouses, stored_matrix, detailed_log,
-                  toggle_pareto, toggle_min_max_capacity, input_min_load, input_max_load, toggle_use_reception, input_allocation_days, input_min_freight, input_max_freight, lang='pt'):
+def execute_model(set_progress, n_clicks, stored_data, stored_warehouses, stored_prod_warehouses, stored_matrix, detailed_log,
+                  toggle_pareto, pruning_method, pruning_value, pruning_score, toggle_decompose, toggle_coarsen, solution_method, toggle_min_max_capacity, input_min_load, input_max_load, toggle_use_reception, input_allocation_days, input_min_freight, input_max_freight,
+                  toggle_solver_settings, solver_threads, solver_time_limit, solver_gap, solver_abs_gap, solver_presolve, solver_cuts, solver_seed,
+                  solver_objective='penalty', lang='pt', session_id=None):
     if not n_clicks:
         return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
 
@@ -3157,31 +3263,26 @@ def execute_model(n_clicks, stored_data, stored_warehouses, stored_prod_warehous
         df_dist = pd.read_json(io.StringIO(stored_matrix), orient='split')
 
         # Load local CSVs for Freight and Storage
-        import os
-        data_dir = os.path.join(os.path.dirname(__file__), 'assets', 'data')
-
-        try:
-            df_freight = pd.read_csv(os.path.join(data_dir, 'Valor_Tonelada_km.csv'), sep=';', encoding='iso-8859-1')
-        except Exception as e:
-            print(f"Warning: Could not load Freight CSV: {e}")
-            df_freight = pd.DataFrame()
+        df_freight, df_storage = load_cost_tables()
+
+        # Solver settings (blank fields keep the defaults); the gap is typed in percent
+        solver_settings = None
+        if toggle_solver_settings:
+            solver_settings = {
+                "threads": solver_threads,
+                "time_limit": solver_time_limit,
+                "rel_gap": solver_gap / 100.0 if solver_gap is not None else None,
+                "abs_gap": solver_abs_gap,
+                "presolve": solver_presolve,
+                "cuts": solver_cuts,
+                "seed": solver_seed,
+                "objective": solver_objective,
+            }
 
-        try:
-            df_storage = pd.read_csv(os.path.join(data_dir, 'Tarifa_de_Armazenagem.csv'), sep=';', encoding='iso-8859-1')
-        except Exception as e:
-            print(f"Warning: Could not load Storage CSV: {e}")
-            df_storage = pd.DataFrame()
-
-        # Run model
-        log_filename, results_dict = run_optimization_model(
-            df_supply=df_supply,
-            df_demand=df_demand,
-            df_compat=df_compat,
-            df_dist=df_dist,
-            df_freight=df_freight,
-            df_storage=df_storage,
+        model_options = dict(
             detailed_log=detailed_log,
             toggle_pareto=toggle_pareto,
+            pruning=pruning_from_inputs(toggle_pareto, pruning_method, pruning_value, pruning_score),
             toggle_min_max_capacity=toggle_min_max_capacity,
             input_min_load=input_min_load,
             input_max_load=input_max_load,
@@ -3189,18 +3290,86 @@ def execute_model(n_clicks, stored_data, stored_warehouses, stored_prod_warehous
             input_allocation_days=input_allocation_days,
             input_min_freight=input_min_freight,
             input_max_freight=input_max_freight,
+            solver_settings=solver_settings,
+            decompose=bool(toggle_decompose),
+            coarsen=bool(toggle_coarsen),
             lang=lang
         )
+        if solution_method and solution_method != "pyomo":
+            # Column generation, kernel search or the greedy heuristic (see run_optimization_model)
+            model_options["backend"] = solution_method
+
+        # Unchanged inputs and options: reuse the stored result instead of running again
+        cache_key = result_cache_key(df_supply, df_demand, df_compat, df_dist, df_freight, df_storage, **model_options)
+        cached_run = result_cache.get(cache_key)
+
+        if cached_run is not None:
+            log_filename, results_dict = cached_run
+        else:
+            # The run writes to a log created here, which is followed to report the solver progress
+            log_filename, log_file = open_run_log('optimization_log_')
+            log_file.close()
+
+            def report_progress(progress):
+                set_progress(format_solver_progress(progress, lang))
+
+            # Run model (in the user's scenario session, so what-if re-runs skip the model construction)
+            with ProgressMonitor(log_path(log_filename), report_progress):
+                log_filename, results_dict = run_in_session(
+                    session_id,
+                    df_supply=df_supply,
+                    df_demand=df_demand,
+                    df_compat=df_compat,
+                    df_dist=df_dist,
+                    df_freight=df_freight,
+                    df_storage=df_storage,
+                    log_filename=log_filename,
+                    **model_options
+                )
+            result_cache.set(cache_key, log_filename, results_dict)
 
         # Get execution time
         exec_time = results_dict.get('kpis', {}).get('execution_time', 0.0)
         time_str = translate(" (Tempo de execução:", lang) + f" {exec_time:.2f} " + translate("segundos)", lang) if exec_time else ""
-
-        status_msg = translate("Modelo executado com sucesso!", lang) + time_str if results_dict.get("status") == "optimal" else translate("Falha ao encontrar solução ótima.", lang) + time_str
-        status_class = "text-success mt-3 fw-bold" if results_dict.get("status") == "optimal" else "text-warning mt-3 fw-bold"
+        if results_dict.get("cached"):
+            time_str += " " + translate("[resultado em cache]", lang)
+        elif results_dict.get("session_reused"):
+            time_str += " " + translate("[modelo reaproveitado]", lang)
+
+        if results_dict.get("status") == "optimal":
+            status_msg = translate("Modelo executado com sucesso!", lang) + time_str
+            status_class = "text-success mt-3 fw-bold"
+        elif results_dict.get("heuristic"):
+            status_msg = translate("Prévia heurística: alocação viável, sem otimalidade comprovada.", lang) + time_str
+            status_class = "text-warning mt-3 fw-bold"
+        elif results_dict.get("kpis", {}).get("coarsening_gap") is not None:
+            gap = results_dict["kpis"]["coarsening_gap"]
+            status_msg = translate("Modelo agregado e refinado: solução viável com gap de {gap:.2f}% para o limite inferior.", lang).format(gap=gap) + time_str
+            status_class = "text-success mt-3 fw-bold"
+        elif results_dict.get("model_stats", {}).get("kernel_routes") is not None:
+            gap = results_dict.get("kpis", {}).get("mip_gap")
+            gap_str = translate(" (gap de {gap:.2f}% para a relaxação LP)", lang).format(gap=gap) if gap is not None else ""
+            if results_dict["model_stats"].get("kernel_search") == "complete":
+                status_msg = translate("Busca em kernel concluída: todos os grupos de rotas testados", lang) + gap_str + "." + time_str
+                status_class = "text-success mt-3 fw-bold"
+            else:
+                status_msg = translate("Busca em kernel: melhor solução encontrada no limite de tempo", lang) + gap_str + "." + time_str
+                status_class = "text-warning mt-3 fw-bold"
+        elif results_dict.get("status") == "feasible" and results_dict.get("model_stats", {}).get("generated_routes") is not None:
+            status_msg = translate("Geração de colunas interrompida pelo limite de rodadas: solução viável, sem otimalidade comprovada.", lang) + time_str
+            status_class = "text-warning mt-3 fw-bold"
+        elif results_dict.get("status") == "feasible":
+            # Incumbent of a search stopped by the time limit (or another solver limit)
+            gap = results_dict.get("kpis", {}).get("mip_gap")
+            gap_str = translate(" (gap de {gap:.2f}%)", lang).format(gap=gap) if gap is not None else ""
+            status_msg = translate("Limite do solver atingido: solução viável, sem otimalidade comprovada", lang) + gap_str + "." + time_str
+            status_class = "text-warning mt-3 fw-bold"
+        else:
+            status_msg = translate("Falha ao encontrar solução ótima.", lang) + time_str
+            status_class = "text-warning mt-3 fw-bold"
 
         # Redirect to results tab on success
-        next_tab = "tab-results" if results_dict.get("status") == "optimal" else dash.no_update
+        next_tab = "tab-results" if results_dict.get("status") in SOLVED_STATUSES else dash.no_update
 
         # The log_filename is just a string (filename) and will be stored in store-model-log
         return status_msg, status_class, results_dict, log_filename, next_tab
@@ -3211,6 +3380,127 @@ def execute_model(n_clicks, stored_data, stored_warehouses, stored_prod_warehous
         return err_msg, "text-danger mt-3", dash.no_update, dash.no_update, dash.no_update
 
 
+@app.callback(
+    Output("store-scenario-session", "data"),
+    Input("store-scenario-session", "modified_timestamp"),
+    State("store-scenario-session", "data")
+)
+def init_scenario_session(ts, session_id):
+    # One scenario session per browser tab
+    if session_id:
+        return dash.no_update
+    return uuid.uuid4().hex
+
+
+# 17. Scenario Sweep (Background Callback)
+
+# Column titles of the scenario comparison table
+SWEEP_COLUMN_LABELS = {
+    "Cenário": "Cenário",
+    "toggle_pareto": "Pareto",
+    "input_allocation_days": "Dias de alocação",
+    "toggle_min_max_capacity": "Limites logísticos",
+    "input_min_freight": "Frete mínimo (ton)",
+    "input_max_freight": "Frete máximo (ton)",
+    "storage_factor": "Fator tarifa armazenagem",
+    "Status": "Status",
+    "Custo Total (R$)": "Custo Total (R$)",
+    "Total Movimentado (ton)": "Total Movimentado (ton)",
+    "Distância Total (km)": "Distância Total (km)",
+    "Custo Frete (R$)": "Custo Frete (R$)",
+    "Custo Armazenagem (R$)": "Custo Armazenagem (R$)",
+    "Avisos": "Avisos",
+    "Gap (%)": "Gap (%)",
+    "Tempo (s)": "Tempo (s)",
+    "Diferença para o Melhor (%)": "Diferença para o Melhor (%)",
+}
+
+@app.callback(
+    output=(
+        Output("sweep-output-text", "children"),
+        Output("sweep-output-text", "className"),
+        Output("table-sweep-results", "data"),
+        Output("table-sweep-results", "columns")
+    ),
+    inputs=[
+        Input("btn-run-sweep", "n_clicks"),
+        State('stored-data', 'data'),
+        State('store-warehouses', 'data'),
+        State('store-prod-warehouses', 'data'),
+        State('store-distance-matrix', 'data'),
+        State('checklist-sweep-pareto', 'value'),
+        State('input-sweep-days', 'value'),
+        State('input-sweep-freight', 'value'),
+        State('input-sweep-storage', 'value'),
+        State('toggle-pareto-routes', 'value'),
+        State('dropdown-pruning-method', 'value'),
+        State('input-pruning-value', 'value'),
+        State('dropdown-pruning-score', 'value'),
+        State('toggle-min-max-capacity', 'value'),
+        State('input-min-load', 'value'),
+        State('input-max-load', 'value'),
+        State('toggle-use-reception', 'value'),
+        State('input-allocation-days', 'value'),
+        State('input-min-freight', 'value'),
+        State('input-max-freight', 'value'),
+        State('store-lang', 'data')
+    ],
+    background=True,
+    running=[
+        (Output("btn-run-sweep", "disabled"), True, False),
+    ],
+    prevent_initial_call=True
+)
+def execute_sweep(n_clicks, stored_data, stored_warehouses, stored_prod_warehouses, stored_matrix,
+                  sweep_pareto, sweep_days, sweep_freight, sweep_storage,
+                  toggle_pareto, pruning_method, pruning_value, pruning_score, toggle_min_max_capacity, input_min_load,
+                  input_max_load, toggle_use_reception, input_allocation_days, input_min_freight, input_max_freight, lang='pt'):
+    if not n_clicks:
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+
+    if not stored_data or not stored_warehouses or not stored_prod_warehouses or not stored_matrix:
+        return translate("Erro: Faltam dados. Certifique-se de preencher todas as abas anteriores (Oferta, Armazéns, Relação Produto x Armazém, Matriz de Distâncias) antes de rodar o modelo.", lang), "text-danger mt-3", [], []
+
+    try:
+        grid = sweep_grid_from_inputs([val == "on" for val in (sweep_pareto or [])], sweep_days, sweep_freight, sweep_storage)
+    except ValueError:
+        return translate("Erro: valores inválidos na comparação de cenários. Use números separados por ponto e vírgula e faixas no formato mín-máx.", lang), "text-danger mt-3", [], []
+
+    if not grid:
+        return translate("Informe ao menos uma variação para comparar.", lang), "text-warning mt-3", [], []
+
+    try:
+        df_supply = pd.read_json(io.StringIO(stored_data), orient='split')
+        df_demand = pd.read_json(io.StringIO(stored_warehouses), orient='split')
+        df_compat = pd.read_json(io.StringIO(stored_prod_warehouses), orient='split')
+        df_dist = pd.read_json(io.StringIO(stored_matrix), orient='split')
+        df_freight, df_storage = load_cost_tables()
+
+        # Options not varied by the sweep follow the model configuration
+        runs, table = run_sweep(
+            df_supply, df_demand, df_compat, df_dist, df_freight, df_storage, grid_scenarios(grid), lang=lang,
+            toggle_pareto=toggle_pareto, toggle_min_max_capacity=toggle_min_max_capacity,
+            # Scenarios with Pareto on use the pruning rule of the model configuration
+            pruning=pruning_from_inputs(True, pruning_method, pruning_value, pruning_score),
+            input_min_load=input_min_load, input_max_load=input_max_load, toggle_use_reception=toggle_use_reception,
+            input_allocation_days=input_allocation_days, input_min_freight=input_min_freight, input_max_freight=input_max_freight
+        )
+
+        table = table.drop(columns=["Log"]).round(2)
+        for col in table.columns:
+            if table[col].dtype == bool:
+                table[col] = table[col].map({True: translate("Sim", lang), False: translate("Não", lang)})
+        table = table.astype(object).where(table.notna(), None)
+        columns = [{"name": translate(SWEEP_COLUMN_LABELS.get(col, col), lang), "id": col} for col in table.columns]
+        status_msg = translate("{n} cenários executados.", lang).format(n=len(runs))
+        return status_msg, "text-success mt-3 fw-bold", table.to_dict('records'), columns
+
+    except Exception as e:
+        import traceback
+        err_msg = f"Erro fatal ao executar a comparação de cenários:\n{str(e)}\n\nTraceback:\n{traceback.format_exc()}"
+        return err_msg, "text-danger mt-3", [], []
+
+
 # --- Results Callbacks ---
 
 @app.callback(
@@ -3227,7 +3517,7 @@ def execute_model(n_clicks, stored_data, stored_warehouses, stored_prod_warehous
     prevent_initial_call=True
 )
 def update_results_kpis_and_table(results_data, lang='pt'):
-    if not results_data or results_data.get("status") != "optimal":
+    if not results_data or results_data.get("status") not in SOLVED_STATUSES:
         return "R$ 0,00", "0.00", "0.00", "R$ 0,00", "R$ 0,00", [], dash.no_update, dash.no_update
 
     kpis = results_data.get("kpis", {})
@@ -3270,6 +3560,62 @@ def update_results_kpis_and_table(results_data, lang='pt'):
     # Render warnings
     warnings_html = []
 
+    # Allocations without proven optimality: the message depends on how the run got there, only a
+    # CBC search stopped by a limit hit the time limit
+    if results_data.get("status") == "feasible":
+        bound = kpis.get("best_bound")
+        gap = kpis.get("mip_gap")
+        bound_label = translate("Melhor limite inferior: {val}", lang)
+        advice = None
+        if results_data.get("heuristic"):
+            title = translate("Prévia Heurística, Otimalidade Não Comprovada", lang)
+            text = translate("Esta alocação foi construída pela heurística gulosa, sem chamar o solver. Ela respeita as restrições do modelo, mas não há limite inferior para medir a distância até o custo ótimo.", lang)
+            advice = translate("Para obter a alocação ótima, execute o modelo com o solver CBC.", lang)
+        elif kpis.get("coarsening_gap") is not None:
+            bound = kpis.get("coarsening_bound")
+            gap = kpis.get("coarsening_gap")
+            title = translate("Modelo Agregado e Refinado", lang)
+            text = translate("A alocação vem do modelo agregado em supernós de armazéns, refinado localmente. O ótimo do modelo agregado é um limite inferior: o custo ótimo está entre ele e o custo total exibido.", lang)
+            advice = translate("Para a alocação ótima exata, execute o modelo sem a agregação de armazéns.", lang)
+        elif results_data.get("model_stats", {}).get("kernel_routes") is not None:
+            # The bound of the whole model is the LP relaxation; the one of the last restricted MILP is shown apart
+            bound_label = translate("Limite inferior (relaxação LP): {val}", lang)
+            if results_data["model_stats"].get("kernel_search") == "complete":
+                title = translate("Busca em Kernel Concluída", lang)
+                text = translate("A busca em kernel testou todos os grupos de rotas e resolveu o último MILP restrito até a otimalidade. Rotas fora do kernel final não entraram nesse MILP, então a otimalidade no modelo completo não é comprovada.", lang)
+            else:
+                title = translate("Busca em Kernel Interrompida pelo Limite de Tempo", lang)
+                text = translate("O limite de tempo acabou antes de a busca em kernel testar todos os grupos de rotas ou de resolver o último MILP restrito até a otimalidade. Esta é a melhor alocação encontrada até então.", lang)
+                advice = translate("Para completar a busca, aumente o limite de tempo nas configurações do solver.", lang)
+        elif results_data.get("model_stats", {}).get("generated_routes") is not None:
+            title = translate("Geração de Colunas Interrompida pelo Limite de Rodadas", lang)
+            text = translate("A geração de colunas atingiu o limite de rodadas antes de comprovar que nenhuma rota omitida reduz o custo. A alocação é viável, mas não há limite inferior para medir a distância até o custo ótimo.", lang)
+            advice = translate("Para a alocação ótima, execute o modelo com outro backend de LP.", lang)
+        else:
+            title = translate("Solução Viável, Otimalidade Não Comprovada", lang)
+            text = translate("O solver atingiu o limite de tempo (ou outro limite de busca) antes de comprovar a otimalidade. Esta é a melhor alocação encontrada até então: o custo ótimo está entre o limite inferior e o custo total exibido.", lang)
+            advice = translate("Para reduzir o gap, aumente o limite de tempo nas configurações do solver ou aceite um gap relativo maior.", lang)
+
+        details = []
+        if bound is not None:
+            details.append(html.Li(bound_label.format(
+                val=f"R$ {bound:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))))
+        restricted_bound = results_data.get("model_stats", {}).get("kernel_restricted_bound")
+        if restricted_bound is not None:
+            details.append(html.Li(translate("Limite inferior do último MILP restrito, só para as suas rotas: {val}", lang).format(
+                val=f"R$ {restricted_bound:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))))
+        if gap is not None:
+            details.append(html.Li(translate("Gap de otimalidade: {val:.2f}%", lang).format(val=gap)))
+        alert_body = [
+            html.H5([html.I(className="bi bi-hourglass-split me-2"), title], className="alert-heading"),
+            html.P(text, className="mb-2"),
+        ]
+        if details:
+            alert_body.append(html.Ul(details, className="mb-2"))
+        if advice:
+            alert_body.append(html.P(advice, className="mb-0"))
+        warnings_html.append(dbc.Alert(alert_body, className="alert-warning-custom shadow-sm mb-3"))
+
     # Legacy fallback for old data
     if isinstance(warnings, list):
         if warnings:
@@ -3373,6 +3719,86 @@ def update_results_kpis_and_table(results_data, lang='pt'):
 
     return obj_str, tons, kms, freight, storage, table_data, columns, warnings_html
 
+@app.callback(
+    Output("results-sensitivity-container", "children"),
+    Input("store-model-results", "data"),
+    State("store-lang", "data"),
+    prevent_initial_call=True
+)
+def update_results_sensitivity(results_data, lang='pt'):
+    # Marginal value of capacity per warehouse, from the duals of an optimal LP run
+    sensitivity = (results_data or {}).get("sensitivity")
+    if not sensitivity or results_data.get("status") not in SOLVED_STATUSES:
+        return []
+
+    table_data = [
+        {
+            "Armazém": row["Armazém"],
+            "Capacidade Efetiva (ton)": round(row["Capacidade Efetiva (ton)"], 2),
+            "Recebido (ton)": round(row["Recebido (ton)"], 2),
+            "Valor Marginal (R$/ton)": round(row["Valor Marginal (R$/ton)"], 2),
+        }
+        for row in sensitivity.get("capacity", [])
+    ]
+
+    return dbc.Card(
+        [
+            dbc.CardHeader(
+                html.Div([
+                    html.Span(translate("Análise de Sensibilidade: Valor Marginal da Capacidade", lang), className="me-2"),
+                    html.I(className="bi bi-question-circle-fill text-muted", id="help-results-sensitivity", style={"cursor": "help", "fontSize": "var(--font-size-small)"}),
+                    dbc.Tooltip(translate("Quanto o custo total cairia com uma tonelada a mais de capacidade em cada armazém, sem rodar o modelo de novo. O valor vale enquanto a mudança não alterar quais armazéns ficam cheios.", lang),
+                        target="help-results-sensitivity",
+                        placement="right"
+                    ),
+                ], className="d-flex align-items-center"),
+                className="card-header-custom"
+            ),
+            dbc.CardBody(
+                [
+                    html.P(translate("Exemplo: um armazém com valor marginal de R$ 12,00/ton economizaria cerca de R$ 12.000,00 com 1.000 t a mais de capacidade. Valor zero indica capacidade ociosa; valores na ordem da penalidade de capacidade artificial indicam um gargalo.", lang), className="text-muted small"),
+                    dash_table.DataTable(
+                        id='table-results-sensitivity',
+                        data=table_data,
+                        columns=[
+                            {'name': translate('Armazém', lang), 'id': 'Armazém'},
+                            {'name': translate('Capacidade Efetiva (ton)', lang), 'id': 'Capacidade Efetiva (ton)'},
+                            {'name': translate('Recebido (ton)', lang), 'id': 'Recebido (ton)'},
+                            {'name': translate('Valor Marginal (R$/ton)', lang), 'id': 'Valor Marginal (R$/ton)'}
+                        ],
+                        filter_action='native',
+                        sort_action='native',
+                        page_size=10,
+                        style_table={'overflowX': 'auto', 'borderRadius': '8px', 'border': f"1px solid {UNB_THEME['BORDER_LIGHT']}"},
+                        style_cell={
+                            'textAlign': 'left',
+                            'fontFamily': "'Roboto', sans-serif",
+                            'padding': '12px',
+                            'fontSize': 'var(--font-size-small)',
+                            'color': UNB_THEME['SECONDARY']
+                        },
+                        style_header={
+                            'backgroundColor': '#F8F9FA',
+                            'color': UNB_THEME['PRIMARY'],
+                            'fontWeight': 'bold',
+                            'border': 'none',
+                            'padding': '12px',
+                            'borderBottom': f"2px solid {UNB_THEME['BORDER_LIGHT']}"
+                        },
+                        style_data_conditional=[
+                            {
+                                'if': {'row_index': 'odd'},
+                                'backgroundColor': '#f8f9fa'
+                            }
+                        ]
+                    )
+                ],
+                className="card-body-custom"
+            )
+        ],
+        className="card-custom mt-4"
+    )
+
 @app.callback(
     Output("main-tabs", "active_tab", allow_duplicate=True),
     Input("btn-go-to-distance-matrix", "n_clicks"),
@@ -3391,7 +3817,7 @@ def navigate_to_distance_matrix(n_clicks):
     prevent_initial_call=True
 )
 def download_results(n_clicks, results_data, lang='pt'):
-    if not n_clicks or not results_data or results_data.get("status") != "optimal":
+    if not n_clicks or not results_data or results_data.get("status") not in SOLVED_STATUSES:
         return dash.no_update
 
     routes = results_data.get("routes", [])
@@ -3466,7 +3892,7 @@ def update_results_map(active_cell, btn_all_routes, btn_confirm_all, table_data,
         margin={"r": 0, "t": 0, "l": 0, "b": 0}
     )
 
-    if not results_data or results_data.get("status") != "optimal":
+    if not results_data or results_data.get("status") not in SOLVED_STATUSES:
         return default_fig, html.P(translate("Resultados indisponíveis.", lang), className="text-muted small")
 
     if not stored_data or not stored_warehouses:
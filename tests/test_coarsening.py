@@ -0,0 +1,101 @@
+import io
+import unittest
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.logic.coarsening import warehouse_clusters, coarsen_inputs, refine_problem
+from src.logic.optimization import _solve_lp_component, _refine, new_results_dict, normalize_solver_settings
+from src.logic.run_log import RunLog
+
+def make_inputs():
+    # D1 and D2 are neighbouring bulk warehouses of Rio Verde; D3 is of another type in the same city
+    # and D4 is in Jataí. D1 alone cannot take the supply of A.
+    origins = ["A", "B"]
+    destinations = ["D1", "D2", "D3", "D4"]
+    products = ["Soja", "Milho"]
+    distance = {("A", "D1"): 10.0, ("A", "D2"): 12.0, ("A", "D3"): 11.0, ("A", "D4"): 80.0,
+                ("B", "D1"): 50.0, ("B", "D2"): 45.0, ("B", "D4"): 20.0}
+    valid_routes = [(o, d, p) for o in origins for d in destinations for p in products if (o, d) in distance]
+    return dict(
+        origins_list=origins, destinations_list=destinations, all_products=products,
+        valid_routes=valid_routes,
+        supply={("A", "Soja"): 150.0, ("A", "Milho"): 40.0, ("B", "Milho"): 60.0},
+        demand_total_capacity={"D1": 100.0, "D2": 80.0, "D3": 30.0, "D4": 500.0},
+        demand_initial_inventory={"D2": 20.0},
+        distance=distance, freight_cost={"A": 0.2, "B": 0.3}, avg_freight=0.25,
+        storage_cost={}, big_m_cap=1e6, big_m_unalloc=1e7
+    )
+
+MUNICIPALITY = {"D1": "Rio Verde", "D2": "RIO VERDE ", "D3": "Rio Verde", "D4": "Jataí"}
+TYPE = {"D1": "Granel", "D2": "Granel", "D3": "Convencional", "D4": "Granel"}
+
+class TestCoarsening(unittest.TestCase):
+    def test_warehouse_clusters(self):
+        inputs = make_inputs()
+        clusters = warehouse_clusters(inputs["destinations_list"], MUNICIPALITY, TYPE, {}, inputs["all_products"])
+        self.assertEqual(clusters, {"D1": ["D1", "D2"], "D3": ["D3"], "D4": ["D4"]})
+
+        # A different tariff, or no municipality, keeps a warehouse apart
+        clusters = warehouse_clusters(inputs["destinations_list"], MUNICIPALITY, TYPE, {("D2", "Milho"): 20.0},
+                                      inputs["all_products"])
+        self.assertEqual(len(clusters), 4)
+        clusters = warehouse_clusters(inputs["destinations_list"], {}, TYPE, {}, inputs["all_products"])
+        self.assertEqual(len(clusters), 4)
+
+    def test_coarse_inputs(self):
+        inputs = make_inputs()
+        clusters = warehouse_clusters(inputs["destinations_list"], MUNICIPALITY, TYPE, {}, inputs["all_products"])
+        coarse, plan = coarsen_inputs(inputs, clusters)
+
+        self.assertEqual(coarse["destinations_list"], ["D1", "D3", "D4"])
+        self.assertEqual(coarse["demand_total_capacity"]["D1"], 100.0 + 60.0)
+        self.assertEqual(coarse["distance"][("A", "D1")], 10.0)
+        self.assertEqual(coarse["distance"][("B", "D1")], 45.0)
+        self.assertEqual(len(coarse["valid_routes"]), len(inputs["valid_routes"]) - 4)
+        self.assertEqual(plan["node_of"]["D2"], "D1")
+
+    def test_refined_solution_is_bounded(self):
+        inputs = make_inputs()
+        settings = normalize_solver_settings()
+        whole = _solve_lp_component(inputs, settings, RunLog(io.StringIO()), backend="sparse")
+
+        clusters = warehouse_clusters(inputs["destinations_list"], MUNICIPALITY, TYPE, {}, inputs["all_products"])
+        coarse, plan = coarsen_inputs(inputs, clusters)
+        for backend in ("sparse", "network"):
+            with self.subTest(backend=backend):
+                log = RunLog(io.StringIO())
+                solution = _solve_lp_component(coarse, settings, log, backend=backend)
+                results = new_results_dict()
+                refined = _refine(solution, plan, inputs, settings, log, results, backend=backend)
+
+                # The coarse optimum bounds the whole model from below, the refined allocation from above
+                self.assertLessEqual(solution["objective"], whole["objective"] + 1e-6)
+                self.assertGreaterEqual(refined["objective"], whole["objective"] - 1e-6)
+                self.assertTrue(refined["coarsened"])
+                self.assertAlmostEqual(results["kpis"]["coarsening_bound"], solution["objective"])
+
+                self.assertEqual(list(refined["flow"]), inputs["valid_routes"])
+                for (o, p), val in inputs["supply"].items():
+                    routed = sum(v for (ro, _, rp), v in refined["flow"].items() if (ro, rp) == (o, p))
+                    self.assertAlmostEqual(routed + refined["dummy_unallocated"].get((o, p), 0.0), val, places=4)
+                # D1 is full; the rest of the supply of A fills D2 before the more expensive warehouses
+                received = {d: sum(v for (_, rd, _), v in refined["flow"].items() if rd == d) for d in ("D1", "D2")}
+                self.assertAlmostEqual(received["D1"], 100.0, places=4)
+                self.assertAlmostEqual(received["D2"], 60.0, places=4)
+
+    def test_refine_problem_skips_single_warehouses(self):
+        inputs = make_inputs()
+        clusters = warehouse_clusters(inputs["destinations_list"], MUNICIPALITY, TYPE, {}, inputs["all_products"])
+        _, plan = coarsen_inputs(inputs, clusters)
+        solution = {"flow": {("A", "D1", "Soja"): 150.0, ("A", "D3", "Milho"): 30.0, ("B", "D1", "Milho"): 10.0}}
+
+        indexes, routes, supply = refine_problem(solution, plan)
+        self.assertEqual(supply, {(("A", "D1"), "Soja"): 150.0, (("B", "D1"), "Milho"): 10.0})
+        self.assertEqual({d for (_, d, _) in routes}, {"D1", "D2"})
+        self.assertEqual([inputs["valid_routes"][r][1] for r in indexes], [d for (_, d, _) in routes])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import sys
+import os
+import shutil
+import functools
+from unittest import mock
+
+import numpy as np
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.logic import column_generation
+from src.logic.column_generation import cheapest_per_group, reduced_costs, solve_column_generation
+from src.logic.optimization import run_optimization_model
+from src.logic.sparse_lp import build_transport_lp, solve_transport_lp
+from tests.test_min_cost_flow import random_instance
+from tests.test_scenario_session import make_tables
+
+class TestColumnGeneration(unittest.TestCase):
+    def test_cheapest_per_group(self):
+        group = np.array([0, 1, 0, 0, 1, 2])
+        cost = np.array([5.0, 1.0, 3.0, 3.0, 2.0, 9.0])
+        # Ties keep the lower index
+        np.testing.assert_array_equal(cheapest_per_group(group, cost, 2), [1, 2, 3, 4, 5])
+        np.testing.assert_array_equal(cheapest_per_group(group, cost, 1, np.array([0, 3, 5])), [3, 5])
+        self.assertEqual(len(cheapest_per_group(group, cost, 1, np.array([], dtype=np.int64))), 0)
+
+    def test_reduced_costs(self):
+        rc = reduced_costs(np.array([10.0, 4.0]), np.array([0, 1]), np.array([1, 0]),
+                           np.array([8.0, 5.0]), np.array([0.0, -3.0]))
+        np.testing.assert_allclose(rc, [5.0, -1.0])
+
+    @unittest.skipIf(shutil.which("cbc") is None, "CBC not installed")
+    def test_matches_full_lp(self):
+        for seed in range(4):
+            valid_routes, supply, capacity, unit_cost = random_instance(seed, n_origins=12, n_dest=8)
+            full = solve_transport_lp(build_transport_lp(valid_routes, supply, capacity, unit_cost, 1000.0, 10000.0))
+
+            result = solve_column_generation(valid_routes, supply, capacity, unit_cost, 1000.0, 10000.0,
+                                             initial_routes=1, routes_per_round=1)
+            self.assertEqual(result["status"], "optimal")
+            self.assertAlmostEqual(result["objective"], full["objective"], delta=1e-6 * max(1.0, abs(full["objective"])))
+            self.assertLess(result["columns"], len(valid_routes))
+
+            # Flows and dummies balance the supply of each pair
+            x = result["x"]
+            for i, key in enumerate(result["supply_keys"]):
+                sent = sum(x[k] for k, (o, _, p) in enumerate(valid_routes) if (o, p) == key)
+                self.assertAlmostEqual(sent + result["dummy_unallocated"][i], supply[key])
+
+    @unittest.skipIf(shutil.which("cbc") is None, "CBC not installed")
+    def test_round_limit_is_not_optimal(self):
+        # A single round of one route per pair leaves routes with negative reduced cost unpriced
+        stopped = functools.partial(solve_column_generation, max_rounds=1, initial_routes=1, routes_per_round=1)
+        with mock.patch.object(column_generation, "solve_column_generation", stopped):
+            log_filename, results = run_optimization_model(*make_tables(), backend="column_generation")
+        log_filename, optimal = run_optimization_model(*make_tables(), backend="column_generation")
+
+        self.assertEqual(results["status"], "feasible")
+        self.assertGreater(results["objective"], optimal["objective"])
+        # The duals of a restricted LP are not those of the whole model
+        self.assertIsNone(results["sensitivity"])
+        self.assertEqual(optimal["status"], "optimal")
+        self.assertIsNotNone(optimal["sensitivity"])
+
+if __name__ == '__main__':
+    unittest.main()
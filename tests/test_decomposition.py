@@ -0,0 +1,74 @@
+import unittest
+import sys
+import os
+
+import pandas as pd
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.logic.decomposition import route_components
+from src.logic.optimization import run_optimization_model
+
+def make_tables():
+    # Soja only fits bulk warehouses and Milho only conventional ones, so the route graph has two
+    # components; Feijão has no compatible warehouse and stays unallocated
+    df_supply = pd.DataFrame({
+        "Cidade": ["Goiânia - GO", "Goiânia - GO", "Anápolis - GO", "Rio Verde - GO", "Anápolis - GO"],
+        "Produto": ["Soja", "Milho", "Soja", "Milho", "Feijão"],
+        "Peso (ton)": [100.0, 50.0, 80.0, 70.0, 10.0],
+    })
+    df_demand = pd.DataFrame({
+        "CDA": ["D1", "D2", "D3", "D4"],
+        "Armazenador": ["COMPANHIA NACIONAL DE ABASTECIMENTO", "PRIVADO", "PRIVADO", "COMPANHIA NACIONAL DE ABASTECIMENTO"],
+        "Capacidade (t)": [120.0, 40.0, 100.0, 60.0],
+        "Estoque": [0.0, 10.0, 0.0, 0.0],
+        "Tipo": ["Granel", "Granel", "Convencional", "Convencional"],
+    })
+    df_compat = pd.DataFrame({"Produto": ["Soja", "Milho", "Feijão"], "Granel": ["☑", "☐", "☐"], "Convencional": ["☐", "☑", "☐"]})
+    df_dist = pd.DataFrame({
+        "Origem": ["Goiânia - GO", "Anápolis - GO", "Rio Verde - GO"],
+        "D1": [10.0, 60.0, 200.0],
+        "D2": [40.0, 15.0, 220.0],
+        "D3": [30.0, 55.0, 25.0],
+        "D4": [80.0, 90.0, 45.0],
+    })
+    df_freight = pd.DataFrame({"Estado": ["GO"], "Frete Tonelada Km": ["0,20"]})
+    df_storage = pd.DataFrame({
+        "Produto": ["Soja", "Milho", "Feijão"],
+        "Armazenar_Publico": ["10,00", "10,00", "10,00"],
+        "Armazenar_Privado": ["12,00", "12,00", "12,00"],
+    })
+    return df_supply, df_demand, df_compat, df_dist, df_freight, df_storage
+
+class TestRouteComponents(unittest.TestCase):
+    def test_components(self):
+        routes = [("A", "D1", "Soja"), ("B", "D2", "Milho"), ("A", "D3", "Soja"), ("C", "D2", "Milho"), ("A", "D2", "Milho")]
+        components = route_components(routes)
+        self.assertEqual(components, [
+            [("B", "D2", "Milho"), ("C", "D2", "Milho"), ("A", "D2", "Milho")],
+            [("A", "D1", "Soja"), ("A", "D3", "Soja")],
+        ])
+
+class TestDecomposedSolve(unittest.TestCase):
+    def assertSameResult(self, **options):
+        _, whole = run_optimization_model(*make_tables(), **options)
+        _, split = run_optimization_model(*make_tables(), decompose=True, **options)
+
+        self.assertEqual(split["status"], "optimal")
+        self.assertAlmostEqual(split["objective"], whole["objective"], places=4)
+        self.assertEqual(split["routes"], whole["routes"])
+        self.assertEqual(split["warnings"], whole["warnings"])
+        for name in ("total_tons", "total_freight_cost", "total_storage_cost"):
+            self.assertAlmostEqual(split["kpis"][name], whole["kpis"][name], places=4)
+
+    def test_lp_backends(self):
+        for backend in ("pyomo", "sparse", "network"):
+            with self.subTest(backend=backend):
+                self.assertSameResult(backend=backend)
+
+    def test_milp(self):
+        self.assertSameResult(toggle_min_max_capacity=True, input_max_freight=30, input_min_load=5)
+
+if __name__ == '__main__':
+    unittest.main()
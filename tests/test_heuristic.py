@@ -0,0 +1,106 @@
+import io
+import unittest
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import pyomo.environ as pyo
+
+from src.logic.heuristic import greedy_allocation, feasible_load
+from src.logic.optimization import (_heuristic_solution, _build_milp_model, _set_milp_start, _solve_lp_component,
+                                    build_route_indexes, parse_milp_limits, normalize_solver_settings)
+from src.logic.run_log import RunLog
+
+class TestFeasibleLoad(unittest.TestCase):
+    def test_whole_trips(self):
+        self.assertEqual(feasible_load(50.0), (50.0, 1))
+        self.assertEqual(feasible_load(50.0, 20.0, 40.0), (50.0, 2))
+        self.assertEqual(feasible_load(15.0, 20.0, 40.0), (0.0, 0))
+        # 100 t do not fit 3 trips of at least 40 t: 2 full trips of 45 t
+        self.assertEqual(feasible_load(100.0, 40.0, 45.0), (90.0, 2))
+        self.assertEqual(feasible_load(15.0, 20.0, None), (0.0, 0))
+
+class TestGreedyAllocation(unittest.TestCase):
+    def setUp(self):
+        self.routes = [("A", "D1", "Soja"), ("A", "D2", "Soja"), ("B", "D1", "Soja"), ("B", "D2", "Soja")]
+        self.capacity = {"D1": 10.0, "D2": 10.0}
+        self.cost = [1.0, 2.0, 1.5, 10.0]
+
+    def test_local_improvement_exchanges_flows(self):
+        supply = {("A", "Soja"): 10.0, ("B", "Soja"): 10.0}
+
+        # The cheapest route takes D1 first and leaves B with its expensive route
+        greedy = greedy_allocation(self.routes, supply, self.capacity, self.cost, 1000.0, 10000.0, improve=False)
+        self.assertEqual(greedy["x"].tolist(), [10.0, 0.0, 0.0, 10.0])
+        self.assertAlmostEqual(greedy["objective"], 110.0)
+
+        improved = greedy_allocation(self.routes, supply, self.capacity, self.cost, 1000.0, 10000.0)
+        self.assertEqual(improved["x"].tolist(), [0.0, 10.0, 10.0, 0.0])
+        self.assertAlmostEqual(improved["objective"], 35.0)
+        self.assertEqual(improved["moves"], 1)
+
+    def test_penalties_in_model_priority(self):
+        # 30 t for 20 t of capacity: the excess goes to artificial capacity, not unallocated
+        supply = {("A", "Soja"): 20.0, ("B", "Soja"): 10.0}
+        result = greedy_allocation(self.routes, supply, self.capacity, self.cost, 1000.0, 10000.0)
+        self.assertAlmostEqual(result["dummy_capacity"].sum(), 10.0)
+        self.assertAlmostEqual(result["dummy_unallocated"].sum(), 0.0)
+        self.assertAlmostEqual(result["x"].sum(), 30.0)
+
+    def test_logistics_limits(self):
+        supply = {("A", "Soja"): 95.0, ("B", "Soja"): 12.0}
+        capacity = {"D1": 1000.0, "D2": 1000.0}
+        result = greedy_allocation(self.routes, supply, capacity, self.cost, 1000.0, 10000.0,
+                                   reception_min={"D1": 50.0, "D2": 50.0}, freight_min=20.0, freight_max=40.0)
+
+        for val, trips in zip(result["x"].tolist(), result["trips"].tolist()):
+            self.assertLessEqual(trips * 20.0, val + 1e-6)
+            self.assertLessEqual(val, trips * 40.0 + 1e-6)
+        # B cannot fill a 20 t trip, A goes in whole trips to one warehouse above the minimum reception
+        self.assertAlmostEqual(result["x"].sum(), 95.0)
+        self.assertAlmostEqual(result["dummy_unallocated"].sum(), 12.0)
+
+class TestHeuristicBackend(unittest.TestCase):
+    def setUp(self):
+        self.inputs = dict(
+            origins_list=["A", "B"], destinations_list=["D1", "D2"], all_products=["Soja"],
+            valid_routes=[("A", "D1", "Soja"), ("A", "D2", "Soja"), ("B", "D2", "Soja")],
+            supply={("A", "Soja"): 65.0, ("B", "Soja"): 45.0},
+            demand_total_capacity={"D1": 50.0, "D2": 100.0}, demand_initial_inventory={},
+            distance={("A", "D1"): 10.0, ("A", "D2"): 20.0, ("B", "D2"): 5.0},
+            freight_cost={"A": 0.2, "B": 0.2}, avg_freight=0.2, storage_cost={},
+            big_m_cap=1000.0, big_m_unalloc=10000.0
+        )
+
+    def test_lp_matches_optimum(self):
+        settings = normalize_solver_settings()
+        optimum = _solve_lp_component(self.inputs, settings, RunLog(io.StringIO()), backend="network")
+        solution = _solve_lp_component(self.inputs, settings, RunLog(io.StringIO()), backend="heuristic")
+        self.assertTrue(solution["heuristic"])
+        self.assertAlmostEqual(solution["objective"], optimum["objective"])
+
+    def test_milp_start_is_feasible(self):
+        limits = parse_milp_limits(1, 40, None, 10, 30)
+        reception_max = {"D1": None, "D2": None}
+        solution = _heuristic_solution(self.inputs, limits, reception_max)
+        self.assertFalse(solution["proven_optimal"])
+
+        model = _build_milp_model(limits=limits, reception_max=reception_max, **self.inputs)
+        _, routes_by_destination = build_route_indexes(self.inputs["valid_routes"])
+        _set_milp_start(model, solution["flow"], routes_by_destination)
+
+        # Nothing to repair: the start has the cost of the heuristic and keeps every constraint
+        self.assertAlmostEqual(pyo.value(model.Objective), solution["objective"])
+        for r, trips in solution["trips"].items():
+            self.assertEqual(pyo.value(model.RouteActive[r]), trips)
+        for con in model.component_data_objects(pyo.Constraint, active=True):
+            body = pyo.value(con.body)
+            if con.has_lb():
+                self.assertGreaterEqual(body, pyo.value(con.lower) - 1e-6, con.name)
+            if con.has_ub():
+                self.assertLessEqual(body, pyo.value(con.upper) + 1e-6, con.name)
+
+if __name__ == '__main__':
+    unittest.main()
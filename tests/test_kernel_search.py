@@ -0,0 +1,140 @@
+import io
+import shutil
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.logic.kernel_search import initial_kernel, make_buckets, kernel_search
+from src.logic.optimization import (_solve_milp_kernel_search, _solve_milp_component, _heuristic_solution,
+                                    parse_milp_limits, normalize_solver_settings)
+from src.logic.run_log import RunLog
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestKernelSearch(unittest.TestCase):
+    def test_initial_kernel(self):
+        lp_flow = [0.0, 5.0, 0.0, 0.0, 2.0]
+        heuristic = [0.0, 0.0, 3.0, 0.0, 0.0]
+        kernel, rest = initial_kernel(lp_flow, [9.0, 0.0, 1.0, 0.5, 0.0], [heuristic])
+        self.assertEqual(kernel.tolist(), [1, 2, 4])
+        # The other routes by reduced cost
+        self.assertEqual(rest.tolist(), [3, 0])
+
+    def test_make_buckets(self):
+        buckets = make_buckets(np.arange(7), 3)
+        self.assertEqual([b.tolist() for b in buckets], [[0, 1, 2], [3, 4, 5], [6]])
+        self.assertEqual(len(make_buckets(np.arange(7), 3, max_buckets=2)), 2)
+
+    def test_improving_buckets_join_the_kernel(self):
+        calls = []
+
+        def solve(routes, incumbent, time_limit):
+            calls.append((routes, incumbent["objective"] if incumbent else None))
+            # Each route of index 5 or more saves 10; the solution uses them all
+            used = [r for r in routes if r >= 5] or routes[:1]
+            return {"objective": 100.0 - 10 * len([r for r in routes if r >= 5]), "used": used}
+
+        result = kernel_search([0, 1], [np.array([5, 6]), np.array([2, 3]), np.array([7])], solve, time_budget=60)
+        self.assertEqual(result["status"], "complete")
+        self.assertEqual(result["solution"]["objective"], 70.0)
+        self.assertEqual([s["improved"] for s in result["steps"]], [True, True, False, True])
+        # Bucket [2, 3] did not improve, so it is not kept for the last step
+        self.assertEqual(calls[-1], ([0, 1, 5, 6, 7], 80.0))
+        self.assertEqual(result["kernel"], 5)
+
+    def test_last_milp_decides_completion(self):
+        def solve(routes, incumbent, time_limit):
+            # Only the MILP with route 3 is stopped by its time limit
+            return {"objective": 50.0, "used": routes[:1], "proven_optimal": 3 not in routes, "bound": 45.0}
+
+        result = kernel_search([0], [np.array([3]), np.array([2])], solve, time_budget=60)
+        self.assertEqual(result["status"], "complete")
+        self.assertEqual([s["proven"] for s in result["steps"]], [True, False, True])
+        self.assertEqual(result["bound"], 45.0)
+
+        result = kernel_search([0], [np.array([2]), np.array([3])], solve, time_budget=60)
+        self.assertEqual(result["status"], "time_budget")
+
+    def test_time_budget(self):
+        clock = FakeClock()
+        limits = []
+
+        def solve(routes, incumbent, time_limit):
+            limits.append(time_limit)
+            clock.now += time_limit
+            return None
+
+        result = kernel_search([0], [np.array([1]), np.array([2]), np.array([3])], solve, time_budget=20,
+                               min_seconds=4, clock=clock)
+        # Every bucket was tried, but the last restricted MILP ran out of time without a solution
+        self.assertEqual(result["status"], "time_budget")
+        self.assertIsNone(result["solution"])
+        # The time left is shared among the stages still to run, with at least min_seconds each
+        self.assertEqual(limits, [5.0, 5.0, 5.0, 5.0])
+
+        clock.now = 0.0
+        limits.clear()
+        result = kernel_search([0], [np.array([1]), np.array([2]), np.array([3])], solve, time_budget=10,
+                               min_seconds=4, clock=clock)
+        self.assertEqual(result["status"], "time_budget")
+        self.assertEqual(limits, [4.0, 4.0])
+        self.assertEqual(len(result["steps"]), 2)
+
+@unittest.skipIf(shutil.which("cbc") is None, "CBC not installed")
+class TestKernelSearchBackend(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        origins = [f"O{i}" for i in range(6)]
+        destinations = [f"D{j}" for j in range(4)]
+        distance = {(o, d): float(rng.integers(10, 200)) for o in origins for d in destinations}
+        self.inputs = dict(
+            origins_list=origins, destinations_list=destinations, all_products=["Soja"],
+            valid_routes=[(o, d, "Soja") for o in origins for d in destinations],
+            supply={(o, "Soja"): float(rng.integers(20, 90)) for o in origins},
+            demand_total_capacity={d: float(rng.integers(60, 150)) for d in destinations}, demand_initial_inventory={},
+            distance=distance, freight_cost={o: 0.2 for o in origins}, avg_freight=0.2, storage_cost={},
+            big_m_cap=1000.0, big_m_unalloc=10000.0
+        )
+        self.limits = parse_milp_limits(1, 40, None, 15, 30)
+        self.reception_max = {d: None for d in destinations}
+
+    def test_between_optimum_and_heuristic(self):
+        settings = dict(normalize_solver_settings(), threads=1, time_limit=30)
+        optimum = _solve_milp_component(self.inputs, settings, RunLog(io.StringIO()), self.limits, self.reception_max)
+        greedy = _heuristic_solution(self.inputs, self.limits, self.reception_max)
+
+        log = RunLog(io.StringIO())
+        solution = _solve_milp_kernel_search(self.inputs, settings, log, self.limits, self.reception_max)
+        self.assertGreaterEqual(solution["objective"], optimum["objective"] - 1e-6)
+        self.assertLessEqual(solution["objective"], greedy["objective"] + 1e-6)
+        # A complete search: the last restricted MILP was solved to optimality
+        self.assertEqual(log.model_stats["kernel_search"], "complete")
+        restricted = log.model_stats["kernel_restricted_bound"]
+        self.assertAlmostEqual(restricted, solution["objective"], delta=1e-4 * solution["objective"])
+        # The last MILP left routes out, so the whole model is not proven optimal and its bound is the LP relaxation
+        self.assertLess(log.model_stats["kernel_routes"], len(self.inputs["valid_routes"]))
+        self.assertFalse(solution["proven_optimal"])
+        self.assertLessEqual(solution["bound"], optimum["objective"] + 1e-6)
+        self.assertLess(solution["bound"], restricted)
+        self.assertEqual(list(solution["flow"]), self.inputs["valid_routes"])
+
+        for (o, p), val in self.inputs["supply"].items():
+            routed = sum(v for (ro, _, rp), v in solution["flow"].items() if (ro, rp) == (o, p))
+            self.assertAlmostEqual(routed + solution["dummy_unallocated"].get((o, p), 0.0), val, places=4)
+        for r, val in solution["flow"].items():
+            trips = solution["trips"][r]
+            self.assertLessEqual(trips * 15.0, val + 1e-6)
+            self.assertLessEqual(val, trips * 30.0 + 1e-6)
+
+if __name__ == '__main__':
+    unittest.main()
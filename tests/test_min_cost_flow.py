@@ -0,0 +1,92 @@
+import unittest
+import sys
+import os
+import shutil
+import time
+
+import numpy as np
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.logic.min_cost_flow import solve_transport_mcf
+from src.logic.sparse_lp import build_transport_lp, solve_transport_lp
+
+def random_instance(seed, n_origins=8, n_dest=5, products=("Soja", "Milho")):
+    rng = np.random.default_rng(seed)
+    supply = {(f"O{i}", p): float(rng.integers(0, 60)) for i in range(n_origins) for p in products}
+    capacity = {f"D{j}": float(rng.integers(10, 120)) for j in range(n_dest)}
+    valid_routes = [(o, d, p) for (o, p) in supply for d in capacity if rng.random() < 0.7]
+    unit_cost = rng.uniform(1.0, 50.0, len(valid_routes)).round(2).tolist()
+    return valid_routes, supply, capacity, unit_cost
+
+class TestMinCostFlow(unittest.TestCase):
+    def test_known_optimum(self):
+        valid_routes = [("A", "D1", "Soja"), ("A", "D2", "Soja"), ("B", "D1", "Milho")]
+        supply = {("A", "Soja"): 10.0, ("B", "Milho"): 5.0, ("C", "Soja"): 3.0}
+        capacity = {"D1": 8.0, "D2": 0.0}
+        result = solve_transport_mcf(valid_routes, supply, capacity, [1.0, 2.0, 3.0], 1000.0, 10000.0)
+
+        # 7 t overflow wherever they go, so everything takes the cheapest route to D1;
+        # the supply of C has no route and stays unallocated
+        np.testing.assert_allclose(result["x"], [10.0, 0.0, 5.0])
+        self.assertEqual(result["dest_keys"], ["D1", "D2"])
+        np.testing.assert_allclose(result["dummy_capacity"], [7.0, 0.0])
+        np.testing.assert_allclose(result["dummy_unallocated"], [0.0, 0.0, 3.0])
+        self.assertAlmostEqual(result["objective"], 10 + 15 + 7000 + 30000)
+
+    def test_degenerate_instances(self):
+        # No supply at all, and capacity that fits the supply exactly
+        result = solve_transport_mcf([("A", "D1", "Soja")], {("A", "Soja"): 0.0}, {"D1": 5.0}, [1.0], 1000.0, 10000.0)
+        np.testing.assert_allclose(result["x"], [0.0])
+        self.assertEqual(result["objective"], 0.0)
+
+        valid_routes = [("A", "D1", "Soja"), ("A", "D2", "Soja"), ("B", "D1", "Soja"), ("B", "D2", "Soja")]
+        supply = {("A", "Soja"): 5.0, ("B", "Soja"): 5.0}
+        result = solve_transport_mcf(valid_routes, supply, {"D1": 5.0, "D2": 5.0}, [1.0, 4.0, 2.0, 3.0], 1000.0, 10000.0)
+        np.testing.assert_allclose(result["x"], [5.0, 0.0, 0.0, 5.0])
+        self.assertAlmostEqual(result["objective"], 20.0)
+
+    @unittest.skipIf(shutil.which("cbc") is None, "CBC not installed")
+    def test_matches_cbc_objective(self):
+        for seed in range(5):
+            valid_routes, supply, capacity, unit_cost = random_instance(seed)
+            result = solve_transport_mcf(valid_routes, supply, capacity, unit_cost, 1000.0, 10000.0)
+
+            problem = build_transport_lp(valid_routes, supply, capacity, unit_cost, 1000.0, 10000.0)
+            solved = solve_transport_lp(problem)
+            objective = solved["objective"]
+            self.assertAlmostEqual(result["objective"], objective, delta=1e-6 * max(1.0, abs(objective)))
+
+            # Flows respect supply and the capacity plus its overflow
+            x = result["x"]
+            self.assertTrue((x >= 0).all())
+            for i, key in enumerate(result["supply_keys"]):
+                sent = sum(x[k] for k, (o, _, p) in enumerate(valid_routes) if (o, p) == key)
+                self.assertAlmostEqual(sent + result["dummy_unallocated"][i], supply[key])
+            for j, d in enumerate(result["dest_keys"]):
+                received = sum(x[k] for k, (_, dd, _) in enumerate(valid_routes) if dd == d)
+                self.assertLessEqual(received, capacity[d] + result["dummy_capacity"][j] + 1e-6)
+
+    @unittest.skipIf(shutil.which("cbc") is None, "CBC not installed")
+    def test_faster_than_sparse_backend(self):
+        # ~20k routes with tight capacity: the native backend must stay well ahead of writing and solving the LP
+        valid_routes, supply, capacity, unit_cost = random_instance(7, n_origins=60, n_dest=120, products=("Soja", "Milho", "Trigo"))
+        total = sum(supply.values())
+        capacity = {d: 0.8 * total * val / sum(capacity.values()) for d, val in capacity.items()}
+
+        start = time.perf_counter()
+        result = solve_transport_mcf(valid_routes, supply, capacity, unit_cost, 1000.0, 10000.0)
+        native_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        solved = solve_transport_lp(build_transport_lp(valid_routes, supply, capacity, unit_cost, 1000.0, 10000.0))
+        sparse_seconds = time.perf_counter() - start
+
+        self.assertAlmostEqual(result["objective"], solved["objective"], delta=1e-6 * abs(solved["objective"]))
+        self.assertLess(native_seconds, sparse_seconds)
+        # A pivot count far above the node count means the pricing went wrong
+        self.assertLess(result["pivots"], 20 * (len(result["supply_keys"]) + len(result["dest_keys"])))
+
+if __name__ == '__main__':
+    unittest.main()
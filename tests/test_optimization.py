@@ -0,0 +1,208 @@
+import io
+import math
+import unittest
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import pyomo.environ as pyo
+
+from src.logic.optimization import (build_route_indexes, _build_milp_model, _set_milp_start, parse_milp_limits,
+                                    normalize_solver_settings, cbc_options, _bound_kpis, _max_trips_value,
+                                    _route_capacity_value, _solve_lp_component, needs_integer_variables,
+                                    _solve_milp_as_lp, _solve_milp_component)
+from src.logic.run_log import RunLog
+
+class TestRouteIndexes(unittest.TestCase):
+    def test_indexes_match_valid_routes(self):
+        valid_routes = [
+            ("A", "D1", "Soja"),
+            ("A", "D2", "Soja"),
+            ("B", "D1", "Milho"),
+            ("A", "D1", "Milho"),
+        ]
+        by_op, by_dest = build_route_indexes(valid_routes)
+
+        self.assertEqual(by_op[("A", "Soja")], ["D1", "D2"])
+        self.assertEqual(by_op[("B", "Milho")], ["D1"])
+        self.assertEqual(sorted(by_dest["D1"]), [("A", "Milho"), ("A", "Soja"), ("B", "Milho")])
+        self.assertEqual(by_dest["D2"], [("A", "Soja")])
+        self.assertNotIn(("B", "Soja"), by_op)
+
+    def test_empty_routes(self):
+        by_op, by_dest = build_route_indexes([])
+        self.assertEqual(by_op, {})
+        self.assertEqual(by_dest, {})
+
+class TestMilpWarmStart(unittest.TestCase):
+    def setUp(self):
+        self.valid_routes = [("A", "D1", "Soja"), ("A", "D2", "Soja"), ("B", "D2", "Soja")]
+        limits = parse_milp_limits(1, 40, None, 10, 30)
+        self.model = _build_milp_model(
+            origins_list=["A", "B"], destinations_list=["D1", "D2"], all_products=["Soja"],
+            valid_routes=self.valid_routes, supply={("A", "Soja"): 65.0, ("B", "Soja"): 5.0},
+            demand_total_capacity={"D1": 100.0, "D2": 100.0}, demand_initial_inventory={},
+            distance={("A", "D1"): 10.0, ("A", "D2"): 20.0, ("B", "D2"): 5.0},
+            freight_cost={"A": 0.2, "B": 0.2}, avg_freight=0.2, storage_cost={},
+            big_m_cap=1000.0, big_m_unalloc=10000.0, limits=limits, reception_max={"D1": None, "D2": None}
+        )
+        _, self.routes_by_destination = build_route_indexes(self.valid_routes)
+
+    def test_start_is_feasible(self):
+        flows = {("A", "D1", "Soja"): 45.0, ("A", "D2", "Soja"): 20.0, ("B", "D2", "Soja"): 5.0}
+        active = _set_milp_start(self.model, flows, self.routes_by_destination)
+
+        # 45 t need 2 trips of at most 30 t; the 5 t route is below the 10 t minimum freight,
+        # which leaves D2 with 20 t, below the 40 t minimum reception, so D2 is emptied.
+        self.assertEqual(active, 1)
+        self.assertEqual(pyo.value(self.model.RouteActive["A", "D1", "Soja"]), 2)
+        self.assertEqual(pyo.value(self.model.WarehouseActive["D2"]), 0)
+        self.assertAlmostEqual(pyo.value(self.model.DummyUnallocated["A", "Soja"]), 20.0)
+        self.assertAlmostEqual(pyo.value(self.model.DummyUnallocated["B", "Soja"]), 5.0)
+
+        for con in self.model.component_data_objects(pyo.Constraint, active=True):
+            body = pyo.value(con.body)
+            if con.has_lb():
+                self.assertGreaterEqual(body, pyo.value(con.lower) - 1e-6, con.name)
+            if con.has_ub():
+                self.assertLessEqual(body, pyo.value(con.upper) + 1e-6, con.name)
+
+    def test_trip_and_warehouse_bounds(self):
+        # 65 t fit in 3 trips of 30 t; 5 t cannot fill one trip of at least 10 t
+        self.assertEqual(self.model.RouteActive["A", "D1", "Soja"].ub, 3)
+        self.assertEqual(self.model.RouteActive["B", "D2", "Soja"].ub, 0)
+        self.assertAlmostEqual(pyo.value(self.model.BigMWarehouse["D2"]), 65.0)
+
+class TestTripBounds(unittest.TestCase):
+    def test_max_trips(self):
+        self.assertEqual(_max_trips_value(None, None, 100.0), 1)
+        self.assertEqual(_max_trips_value(None, 30.0, 65.0), 3)
+        self.assertEqual(_max_trips_value(60.0, 70.0, 100.0), 1)
+        self.assertEqual(_max_trips_value(40.0, 45.0, 100.0), 2)
+        self.assertEqual(_max_trips_value(40.0, None, 80.0), 1)
+        self.assertEqual(_max_trips_value(150.0, None, 100.0), 0)
+
+    def test_route_capacity(self):
+        # Two trips of at most 45 t: 10 of the 100 t cannot go on this route
+        self.assertAlmostEqual(_route_capacity_value(40.0, 45.0, 100.0), 90.0)
+        self.assertAlmostEqual(_route_capacity_value(None, 30.0, 65.0), 65.0)
+        self.assertAlmostEqual(_route_capacity_value(None, None, 65.0), 65.0)
+
+class TestSolverSettings(unittest.TestCase):
+    def test_blank_and_invalid_values_keep_defaults(self):
+        settings = normalize_solver_settings({"threads": "", "time_limit": -5, "rel_gap": "0.005", "presolve": "fast", "seed": 7})
+        self.assertEqual(settings["threads"], os.cpu_count() or 1)
+        self.assertEqual(settings["time_limit"], 600)
+        self.assertAlmostEqual(settings["rel_gap"], 0.005)
+        self.assertEqual(settings["presolve"], "on")
+        self.assertEqual(settings["seed"], 7)
+
+    def test_cbc_options(self):
+        options = cbc_options(normalize_solver_settings({"threads": 4, "abs_gap": 100, "cuts": "root"}))
+        self.assertEqual(options["threads"], 4)
+        self.assertEqual(options["allowableGap"], 100)
+        self.assertEqual(options["cuts"], "root")
+        self.assertEqual(options["timeMode"], "elapsed")
+        self.assertNotIn("randomCbcSeed", options)
+
+class TestLexicographicObjective(unittest.TestCase):
+    def setUp(self):
+        # 120 t of supply for 100 t of capacity: 20 t go to the dummy capacity
+        self.inputs = dict(
+            origins_list=["A", "B"], destinations_list=["D1", "D2"], all_products=["Soja"],
+            valid_routes=[("A", "D1", "Soja"), ("A", "D2", "Soja"), ("B", "D2", "Soja")],
+            supply={("A", "Soja"): 70.0, ("B", "Soja"): 50.0},
+            demand_total_capacity={"D1": 40.0, "D2": 60.0}, demand_initial_inventory={},
+            distance={("A", "D1"): 10.0, ("A", "D2"): 30.0, ("B", "D2"): 5.0},
+            freight_cost={"A": 0.2, "B": 0.2}, avg_freight=0.2, storage_cost={},
+            big_m_cap=1e6, big_m_unalloc=1e7
+        )
+
+    def test_normalize(self):
+        self.assertEqual(normalize_solver_settings()["objective"], "penalty")
+        self.assertEqual(normalize_solver_settings({"objective": "lexicographic"})["objective"], "lexicographic")
+        self.assertEqual(normalize_solver_settings({"objective": "bogus"})["objective"], "penalty")
+
+    def test_same_optimum_as_penalty(self):
+        penalty = _solve_lp_component(self.inputs, normalize_solver_settings(), RunLog(io.StringIO()))
+        for backend in ("pyomo", "sparse"):
+            settings = normalize_solver_settings({"objective": "lexicographic"})
+            solution = _solve_lp_component(self.inputs, settings, RunLog(io.StringIO()), backend=backend)
+
+            self.assertAlmostEqual(solution["objective"], penalty["objective"], delta=1e-6 * penalty["objective"])
+            self.assertAlmostEqual(solution["infeasibility"], 20.0, places=4)
+            self.assertAlmostEqual(solution["objective"], solution["cost"] + 1e6 * solution["infeasibility"],
+                                   delta=1e-6 * penalty["objective"])
+
+class TestBoundKpis(unittest.TestCase):
+    def test_time_limited_incumbent(self):
+        kpis = _bound_kpis(1000.0, 950.0, proven=False)
+        self.assertFalse(kpis["proven_optimal"])
+        self.assertEqual(kpis["best_bound"], 950.0)
+        self.assertAlmostEqual(kpis["mip_gap"], 5.0)
+
+    def test_rounded_bound_and_unknown_bound(self):
+        # CBC prints the bound rounded, slightly above the objective
+        kpis = _bound_kpis(279705795.17, 2.79706e+08, proven=True)
+        self.assertEqual(kpis["mip_gap"], 0.0)
+        self.assertIsNone(_bound_kpis(1000.0, None, proven=False)["mip_gap"])
+
+class TestLinearLimitsAsLp(unittest.TestCase):
+    def setUp(self):
+        # D1 is the cheapest warehouse for both origins, but receives at most 30 t a day
+        self.inputs = dict(
+            origins_list=["A", "B"], destinations_list=["D1", "D2"], all_products=["Soja"],
+            valid_routes=[("A", "D1", "Soja"), ("A", "D2", "Soja"), ("B", "D1", "Soja"), ("B", "D2", "Soja")],
+            supply={("A", "Soja"): 70.0, ("B", "Soja"): 45.0},
+            demand_total_capacity={"D1": 200.0, "D2": 200.0}, demand_initial_inventory={},
+            distance={("A", "D1"): 10.0, ("A", "D2"): 40.0, ("B", "D1"): 20.0, ("B", "D2"): 25.0},
+            freight_cost={"A": 0.2, "B": 0.2}, avg_freight=0.2, storage_cost={},
+            big_m_cap=1e6, big_m_unalloc=1e7
+        )
+        self.settings = dict(normalize_solver_settings(), threads=1)
+
+    def test_classification(self):
+        self.assertFalse(needs_integer_variables(parse_milp_limits(1, None, 30, None, 20)))
+        self.assertTrue(needs_integer_variables(parse_milp_limits(1, None, None, 10, 20)))
+        self.assertTrue(needs_integer_variables(parse_milp_limits(1, 5, None, None, None)))
+        # A zero minimum is still a limit of the MILP
+        self.assertTrue(needs_integer_variables(parse_milp_limits(1, None, None, 0, 20)))
+        self.assertFalse(needs_integer_variables(parse_milp_limits(1, None, None, None, 0)))
+
+    def test_zero_max_freight(self):
+        # The MILP caps every route at zero flow, so the whole supply stays unallocated
+        limits = parse_milp_limits(1, None, None, None, 0)
+        for reception in (None, 30.0):
+            reception_max = {"D1": reception, "D2": None}
+            milp = _solve_milp_component(self.inputs, self.settings, RunLog(io.StringIO()), limits, reception_max)
+            for backend in ("pyomo", "sparse", "network"):
+                with self.subTest(reception=reception, backend=backend):
+                    solution = _solve_milp_as_lp(self.inputs, self.settings, RunLog(io.StringIO()), limits,
+                                                 reception_max, backend=backend)
+                    self.assertAlmostEqual(solution["objective"], milp["objective"], places=3)
+                    self.assertEqual(set(solution["flow"]), set(self.inputs["valid_routes"]))
+                    self.assertTrue(all(val == 0 for val in solution["flow"].values()))
+                    self.assertTrue(all(val == 0 for val in solution["trips"].values()))
+
+    def test_same_optimum_as_milp(self):
+        for reception in (None, 30.0):
+            with self.subTest(reception=reception):
+                limits = parse_milp_limits(2, None, reception, None, 20)
+                reception_max = {"D1": reception, "D2": None}
+                milp = _solve_milp_component(self.inputs, self.settings, RunLog(io.StringIO()), limits, reception_max)
+                for backend in ("pyomo", "sparse"):
+                    solution = _solve_milp_as_lp(self.inputs, self.settings, RunLog(io.StringIO()), limits,
+                                                 reception_max, backend=backend)
+                    self.assertAlmostEqual(solution["objective"], milp["objective"], places=3)
+                    self.assertTrue(solution["proven_optimal"])
+                    for r, val in solution["flow"].items():
+                        self.assertEqual(solution["trips"][r], math.ceil(val / 20 - 1e-9))
+                    received = sum(v for (_, d, _), v in solution["flow"].items() if d == "D1")
+                    if reception is not None:
+                        self.assertLessEqual(received, 60.0 + 1e-6)
+                    self.assertAlmostEqual(solution["dummy_reception"]["D1"], 0.0, places=6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import io
+import unittest
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.logic.presolve import presolve_inputs, postsolve_solution, interchangeable_products
+from src.logic.optimization import _solve_lp_component, normalize_solver_settings
+from src.logic.run_log import RunLog
+
+def make_inputs():
+    # Milho and Trigo go to the same warehouses at the same tariffs; Soja is not accepted in D3.
+    # C has no supply and D4 is only reached from it.
+    origins = ["A", "B", "C"]
+    destinations = ["D1", "D2", "D3", "D4"]
+    products = ["Soja", "Milho", "Trigo"]
+    distance = {("A", "D1"): 10.0, ("A", "D2"): 40.0, ("A", "D3"): 30.0,
+                ("B", "D1"): 60.0, ("B", "D2"): 15.0, ("B", "D3"): 25.0, ("C", "D4"): 5.0}
+    valid_routes = [(o, d, p) for o in origins for p in products for d in destinations
+                    if (o, d) in distance and not (p == "Soja" and d == "D3")]
+    return dict(
+        origins_list=origins, destinations_list=destinations, all_products=products,
+        valid_routes=valid_routes,
+        supply={("A", "Soja"): 100.0, ("A", "Milho"): 50.0, ("A", "Trigo"): 30.0, ("B", "Trigo"): 70.0, ("B", "Soja"): 0.0},
+        demand_total_capacity={"D1": 90.0, "D2": 60.0, "D3": 80.0, "D4": 500.0},
+        demand_initial_inventory={"D2": 10.0},
+        distance=distance, freight_cost={"A": 0.2, "B": 0.3, "C": 0.2}, avg_freight=0.2,
+        storage_cost={("D1", "Soja"): 12.0}, big_m_cap=1e6, big_m_unalloc=1e7
+    )
+
+class TestPresolve(unittest.TestCase):
+    def test_interchangeable_products(self):
+        inputs = make_inputs()
+        groups = interchangeable_products(inputs["valid_routes"], inputs["all_products"], inputs["destinations_list"],
+                                          inputs["storage_cost"])
+        self.assertEqual(groups, {"Soja": ["Soja"], "Milho": ["Milho", "Trigo"]})
+
+        # A different tariff in one warehouse sets the product apart
+        groups = interchangeable_products(inputs["valid_routes"], inputs["all_products"], inputs["destinations_list"],
+                                          {("D2", "Trigo"): 20.0})
+        self.assertEqual(groups, {"Soja": ["Soja"], "Milho": ["Milho"], "Trigo": ["Trigo"]})
+
+    def test_removes_dead_entities(self):
+        reduced, plan = presolve_inputs(make_inputs())
+
+        self.assertEqual(reduced["origins_list"], ["A", "B"])
+        self.assertEqual(reduced["destinations_list"], ["D1", "D2", "D3"])
+        self.assertEqual(reduced["all_products"], ["Soja", "Milho", "Trigo"])
+        self.assertNotIn(("B", "D1", "Soja"), reduced["valid_routes"])
+        self.assertEqual(len(reduced["valid_routes"]), 2 + 3 + 3 + 3)
+        self.assertEqual(plan["removed"], {"routes": 2 + 3 + 3, "destinations": 1, "origins": 1})
+        self.assertEqual(plan["merged"], 0)
+
+    def test_aggregates_products(self):
+        reduced, plan = presolve_inputs(make_inputs(), aggregate_products=True)
+
+        self.assertEqual(reduced["all_products"], ["Soja", "Milho"])
+        self.assertEqual(reduced["supply"], {("A", "Soja"): 100.0, ("A", "Milho"): 80.0, ("B", "Milho"): 70.0})
+        self.assertEqual(len(reduced["valid_routes"]), 2 + 3 + 3)
+        self.assertEqual(plan["groups"], {"Milho": ["Milho", "Trigo"]})
+        self.assertEqual(plan["merged"], 1)
+
+    def test_postsolve_splits_commodities(self):
+        inputs = make_inputs()
+        _, plan = presolve_inputs(inputs, aggregate_products=True)
+        solution = {
+            "objective": 0.0,
+            "flow": {("A", "D1", "Milho"): 60.0, ("A", "D2", "Milho"): 10.0, ("B", "D2", "Milho"): 70.0},
+            "dummy_capacity": {"D1": 0.0},
+            "dummy_unallocated": {("A", "Milho"): 10.0, ("B", "Milho"): 0.0},
+        }
+        full = postsolve_solution(solution, plan)
+
+        self.assertEqual(list(full["flow"]), inputs["valid_routes"])
+        self.assertAlmostEqual(full["flow"][("A", "D1", "Milho")], 50.0)
+        self.assertAlmostEqual(full["flow"][("A", "D1", "Trigo")], 10.0)
+        self.assertAlmostEqual(full["flow"][("A", "D2", "Trigo")], 10.0)
+        self.assertAlmostEqual(full["flow"][("B", "D2", "Trigo")], 70.0)
+        self.assertAlmostEqual(full["dummy_unallocated"][("A", "Trigo")], 10.0)
+        self.assertAlmostEqual(full["dummy_unallocated"][("A", "Milho")], 0.0)
+        self.assertIsNone(postsolve_solution(None, plan))
+
+    def test_same_optimum_as_whole_model(self):
+        inputs = make_inputs()
+        settings = normalize_solver_settings()
+        whole = _solve_lp_component(inputs, settings, RunLog(io.StringIO()))
+
+        reduced, plan = presolve_inputs(inputs, aggregate_products=True)
+        solution = postsolve_solution(_solve_lp_component(reduced, settings, RunLog(io.StringIO())), plan)
+
+        self.assertAlmostEqual(solution["objective"], whole["objective"], places=4)
+        for (o, p), val in inputs["supply"].items():
+            routed = sum(v for (ro, _, rp), v in solution["flow"].items() if (ro, rp) == (o, p))
+            self.assertAlmostEqual(routed + solution["dummy_unallocated"].get((o, p), 0.0), val, places=4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import sys
+import os
+import subprocess
+import time
+from unittest import mock
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.logic.optimization import run_optimization_model
+from src.logic.resource_monitor import ResourceMonitor, MemoryLimitExceeded, ENV_PYTHON_LIMIT, adopting_children, checkpoint, run_watched
+from tests.test_scenario_session import make_tables
+
+# A child process holding about 200 MB until it is terminated
+MEMORY_HOG = "import time; block = bytearray(200 * 1024 * 1024); time.sleep(30)"
+
+class TestResourceMonitor(unittest.TestCase):
+    def test_solver_ceiling_terminates_child(self):
+        monitor = ResourceMonitor(python_limit_mb=0, solver_limit_mb=100, interval=0.05).start()
+        with adopting_children():
+            child = subprocess.Popen([sys.executable, "-c", MEMORY_HOG])
+        try:
+            child.wait(timeout=20)
+        finally:
+            child.kill()
+            monitor.stop()
+
+        with self.assertRaises(MemoryLimitExceeded) as ctx:
+            monitor.check()
+        self.assertEqual(ctx.exception.kind, "solver")
+        self.assertGreater(monitor.kpis()["solver_peak_rss_mb"], 100)
+
+    def test_other_children_are_left_alone(self):
+        # Children of the app that are not part of the run (another tab, the session worker)
+        other = subprocess.Popen([sys.executable, "-c", MEMORY_HOG])
+        monitor = ResourceMonitor(python_limit_mb=0, solver_limit_mb=100, interval=0.05).start()
+        try:
+            with adopting_children("no-such-solver"):
+                time.sleep(1)
+            monitor.check()
+            self.assertIsNone(other.poll())
+            self.assertEqual(monitor.kpis()["solver_peak_rss_mb"], 0)
+        finally:
+            other.kill()
+            monitor.stop()
+
+    def test_python_ceiling_found_by_sampler(self):
+        monitor = ResourceMonitor(solver_limit_mb=0, interval=0.05)
+        monitor.python_limit_mb = monitor._process.memory_info().rss / (1024 * 1024) + 100
+        monitor.start()
+        try:
+            block = bytearray(200 * 1024 * 1024)
+            time.sleep(0.5)
+            # The build only calls checkpoint(), which does not sample
+            with self.assertRaises(MemoryLimitExceeded) as ctx:
+                checkpoint()
+            self.assertEqual(ctx.exception.kind, "python")
+            del block
+        finally:
+            monitor.stop()
+        # Outside the run there is no monitor to report to
+        checkpoint()
+
+    def test_run_records_usage(self):
+        log_filename, results = run_optimization_model(*make_tables())
+
+        self.assertEqual(results["status"], "optimal")
+        self.assertGreater(results["kpis"]["peak_rss_mb"], 0)
+        for name in ("solver_peak_rss_mb", "cpu_time", "solver_cpu_time"):
+            self.assertGreaterEqual(results["kpis"][name], 0)
+
+    def test_sparse_backend_records_solver(self):
+        # CBC runs for a few milliseconds, less than a sampling interval: it is measured when it exits
+        log_filename, results = run_optimization_model(*make_tables(), backend="sparse")
+
+        self.assertEqual(results["status"], "optimal")
+        self.assertGreater(results["kpis"]["solver_peak_rss_mb"], 0)
+        self.assertGreater(results["kpis"]["solver_cpu_time"], 0)
+
+    def test_run_watched_streams_output(self):
+        lines = []
+        monitor = ResourceMonitor(python_limit_mb=0, solver_limit_mb=0, interval=10).start()
+        try:
+            code = run_watched([sys.executable, "-c", "block = bytearray(50 * 1024 * 1024); print('done')"], on_line=lines.append)
+        finally:
+            monitor.stop()
+
+        self.assertEqual(code, 0)
+        self.assertEqual(lines, ["done\n"])
+        self.assertGreater(monitor.kpis()["solver_peak_rss_mb"], 50)
+
+    def test_python_ceiling_aborts_run(self):
+        with mock.patch.dict(os.environ, {ENV_PYTHON_LIMIT: "1"}):
+            log_filename, results = run_optimization_model(*make_tables(), toggle_pareto=True)
+
+        self.assertEqual(results["status"], "error")
+        self.assertIn(ENV_PYTHON_LIMIT, results["warnings"]["general"][0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.logic.run_log import open_run_log
+from src.logic.result_cache import ResultCache, result_cache_key
+
+class TestResultCacheKey(unittest.TestCase):
+    def setUp(self):
+        self.tables = [pd.DataFrame({"Cidade": ["A", "B"], "Peso (ton)": [1.0, 2.5]}) for _ in range(6)]
+
+    def test_same_inputs_same_key(self):
+        copies = [df.copy() for df in self.tables]
+        self.assertEqual(result_cache_key(*self.tables, toggle_pareto=True),
+                         result_cache_key(*copies, toggle_pareto=True))
+
+    def test_blank_options_equal_none(self):
+        self.assertEqual(result_cache_key(*self.tables, input_min_load=""),
+                         result_cache_key(*self.tables, input_min_load=None))
+        self.assertEqual(result_cache_key(*self.tables, input_min_load=5),
+                         result_cache_key(*self.tables, input_min_load=5.0))
+
+    def test_changes_change_key(self):
+        base = result_cache_key(*self.tables, toggle_pareto=False)
+        self.assertNotEqual(base, result_cache_key(*self.tables, toggle_pareto=True))
+
+        changed = [df.copy() for df in self.tables]
+        changed[3].loc[0, "Peso (ton)"] = 1.5
+        self.assertNotEqual(base, result_cache_key(*changed, toggle_pareto=False))
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = ResultCache(self.cache_dir, size_mb=1, ttl=60)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def _write_log(self, text):
+        log_filename, log_file = open_run_log('optimization_log_test_')
+        with log_file:
+            log_file.write(text)
+        return log_filename
+
+    def test_roundtrip_restores_removed_log(self):
+        log_filename = self._write_log("solver output")
+        self.cache.set("k", log_filename, {"status": "optimal", "objective": 10.0})
+        os.remove(os.path.join(tempfile.gettempdir(), 'granum_logs', log_filename))
+
+        new_log, results = self.cache.get("k")
+        self.assertEqual(results["objective"], 10.0)
+        self.assertTrue(results["cached"])
+        with open(os.path.join(tempfile.gettempdir(), 'granum_logs', new_log), encoding='utf-8') as f:
+            self.assertEqual(f.read(), "solver output")
+
+    def test_errors_are_not_cached(self):
+        self.cache.set("k", self._write_log(""), {"status": "error"})
+        self.assertIsNone(self.cache.get("k"))
+
+    def test_zero_ttl_disables_cache(self):
+        cache = ResultCache(self.cache_dir, size_mb=1, ttl=0)
+        cache.set("k", self._write_log(""), {"status": "optimal"})
+        self.assertIsNone(cache.get("k"))
+
+if __name__ == '__main__':
+    unittest.main()
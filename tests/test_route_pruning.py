@@ -0,0 +1,78 @@
+import unittest
+import sys
+import os
+import math
+import random
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.logic.route_pruning import prune_routes, normalize_pruning
+
+def pareto_routes(origins, destinations, products, distance, prod_dest_compat):
+    # The original per-(origin, product) Pareto rule
+    routes = []
+    for o in origins:
+        for p in products:
+            dests = [(d, distance[(o, d)]) for d in destinations if (o, d) in distance and prod_dest_compat.get((p, d), False)]
+            dests.sort(key=lambda x: x[1])
+            routes.extend((o, d, p) for d, _ in dests[:max(1, math.ceil(len(dests) * 0.20))])
+    return routes
+
+class TestRoutePruning(unittest.TestCase):
+    def setUp(self):
+        self.origins = ["A", "B"]
+        self.destinations = ["D1", "D2", "D3", "D4"]
+        self.products = ["Soja", "Milho"]
+        self.distance = {("A", "D1"): 300.0, ("A", "D2"): 100.0, ("A", "D3"): 200.0, ("A", "D4"): 50.0,
+                         ("B", "D1"): 10.0, ("B", "D2"): 20.0, ("B", "D3"): 30.0}
+        self.compat = {(p, d): True for p in self.products for d in self.destinations}
+        self.compat[("Milho", "D4")] = False
+
+    def test_matches_original_pareto_with_ties(self):
+        rng = random.Random(3)
+        for _ in range(20):
+            origins = [f"O{i}" for i in range(rng.randint(1, 15))]
+            destinations = [f"D{j}" for j in range(rng.randint(1, 40))]
+            products = [f"P{k}" for k in range(rng.randint(1, 4))]
+            distance = {(o, d): float(rng.randint(1, 10)) for o in origins for d in destinations if rng.random() < 0.8}
+            compat = {(p, d): rng.random() < 0.6 for p in products for d in destinations}
+
+            self.assertEqual(prune_routes(origins, destinations, products, distance, compat, {"method": "percentile"}),
+                             pareto_routes(origins, destinations, products, distance, compat))
+
+    def test_no_pruning_keeps_valid_routes(self):
+        routes = prune_routes(self.origins, self.destinations, self.products, self.distance, self.compat)
+        self.assertEqual(len(routes), 4 + 3 + 3 + 3)
+        self.assertNotIn(("A", "D4", "Milho"), routes)
+        self.assertNotIn(("B", "D4", "Soja"), routes)
+
+    def test_nearest_and_radius(self):
+        routes = prune_routes(self.origins, self.destinations, self.products, self.distance, self.compat,
+                              {"method": "nearest", "value": 2})
+        self.assertEqual([d for o, d, p in routes if (o, p) == ("A", "Soja")], ["D4", "D2"])
+        self.assertEqual([d for o, d, p in routes if (o, p) == ("A", "Milho")], ["D2", "D3"])
+
+        routes = prune_routes(self.origins, self.destinations, self.products, self.distance, self.compat,
+                              {"method": "radius", "value": 15})
+        self.assertEqual([d for o, d, p in routes if (o, p) == ("B", "Soja")], ["D1"])
+        # Nothing within the radius: the closest destination is kept
+        self.assertEqual([d for o, d, p in routes if (o, p) == ("A", "Soja")], ["D4"])
+
+    def test_cost_score_uses_storage(self):
+        storage = {(d, p): 0.0 for d in self.destinations for p in self.products}
+        storage[("D4", "Soja")] = 1000.0
+        routes = prune_routes(self.origins, self.destinations, self.products, self.distance, self.compat,
+                              {"method": "nearest", "value": 1, "score": "cost"},
+                              freight_cost={"A": 1.0, "B": 1.0}, storage_cost=storage)
+        self.assertIn(("A", "D2", "Soja"), routes)
+        self.assertNotIn(("A", "D4", "Soja"), routes)
+
+    def test_normalize(self):
+        self.assertIsNone(normalize_pruning(None))
+        self.assertEqual(normalize_pruning({"method": "nearest", "value": ""}), {"method": "nearest", "value": 3.0, "score": "distance"})
+        self.assertEqual(normalize_pruning({"method": "bogus", "value": 250, "score": "cost"}),
+                         {"method": "percentile", "value": 100.0, "score": "cost"})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import sys
+import os
+import io
+import tempfile
+from contextlib import redirect_stdout
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.logic.optimization import run_optimization_model
+from src.logic.run_log import RunLog
+from tests.test_scenario_session import make_tables
+
+def read_log(log_filename):
+    with open(os.path.join(tempfile.gettempdir(), 'granum_logs', log_filename), encoding='utf-8') as f:
+        return f.read()
+
+class TestRunLog(unittest.TestCase):
+    def test_runs_write_to_their_own_log(self):
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            log_lp, lp = run_optimization_model(*make_tables())
+            log_milp, milp = run_optimization_model(*make_tables(), toggle_pareto=True)
+
+        self.assertEqual(lp["status"], "optimal")
+        self.assertEqual(milp["status"], "optimal")
+        self.assertNotEqual(log_lp, log_milp)
+        self.assertEqual(stdout.getvalue(), "")
+
+        # CBC output comes from the solver pipe into the log of its run
+        for log_filename in (log_lp, log_milp):
+            self.assertIn("Total time", read_log(log_filename))
+
+    def test_run_profile(self):
+        log_filename, results = run_optimization_model(*make_tables(), toggle_pareto=True)
+
+        for phase in ("data_prep", "routes", "model_build", "lp_write", "solver", "solution_load", "reporting"):
+            self.assertGreaterEqual(results["timings"][phase], 0.0)
+        self.assertGreater(results["model_stats"]["valid_routes"], 0)
+        self.assertGreater(results["model_stats"]["variables"], results["model_stats"]["valid_routes"])
+        self.assertIn("PERFIL DA EXECUÇÃO", read_log(log_filename))
+
+    def test_timed_phases_accumulate(self):
+        log = RunLog(io.StringIO())
+        with log.timed("solver"):
+            pass
+        log.add_time("solver", 1.0)
+        self.assertGreaterEqual(log.timings["solver"], 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+import sys
+import os
+
+import pandas as pd
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.logic.optimization import run_optimization_model
+from src.logic.scenario_session import ScenarioSession, SessionRegistry
+
+def make_tables(storage_pub="10,00", weights=(100.0, 50.0, 80.0), compat=("☑", "☑")):
+    df_supply = pd.DataFrame({
+        "Cidade": ["Goiânia - GO", "Goiânia - GO", "Anápolis - GO"],
+        "Produto": ["Soja", "Milho", "Soja"],
+        "Peso (ton)": list(weights),
+    })
+    df_demand = pd.DataFrame({
+        "CDA": ["D1", "D2"],
+        "Armazenador": ["COMPANHIA NACIONAL DE ABASTECIMENTO", "PRIVADO"],
+        "Capacidade (t)": [120.0, 200.0],
+        "Estoque": [0.0, 20.0],
+        "Tipo": ["Granel", "Granel"],
+    })
+    df_compat = pd.DataFrame({"Produto": ["Soja", "Milho"], "Granel": list(compat)})
+    df_dist = pd.DataFrame({
+        "Origem": ["Goiânia - GO", "Anápolis - GO"],
+        "D1": [10.0, 60.0],
+        "D2": [40.0, 15.0],
+    })
+    df_freight = pd.DataFrame({"Estado": ["GO"], "Frete Tonelada Km": ["0,20"]})
+    df_storage = pd.DataFrame({
+        "Produto": ["Soja", "Milho"],
+        "Armazenar_Publico": [storage_pub, storage_pub],
+        "Armazenar_Privado": ["12,00", "12,00"],
+    })
+    return df_supply, df_demand, df_compat, df_dist, df_freight, df_storage
+
+class TestScenarioSession(unittest.TestCase):
+    def test_parameter_change_reuses_model(self):
+        session = ScenarioSession()
+        options = dict(toggle_min_max_capacity=True, input_min_freight=5, input_max_freight=40, input_allocation_days=10)
+
+        _, first = session.run(*make_tables(), **options)
+        self.assertFalse(first["session_reused"])
+        model = session.model
+
+        # Same structure, new tariff and freight limit: the model is updated and re-solved
+        options["input_max_freight"] = 30
+        _, second = session.run(*make_tables(storage_pub="30,00"), **options)
+        _, fresh = run_optimization_model(*make_tables(storage_pub="30,00"), **options)
+
+        self.assertTrue(second["session_reused"])
+        self.assertIs(session.model, model)
+        self.assertEqual(second["status"], "optimal")
+        self.assertAlmostEqual(second["objective"], fresh["objective"], places=4)
+
+    def test_structure_change_rebuilds(self):
+        session = ScenarioSession()
+        session.run(*make_tables())
+        model = session.model
+
+        # Activating the MILP limits changes the structure
+        _, results = session.run(*make_tables(), toggle_min_max_capacity=True, input_max_freight=30)
+        self.assertFalse(results["session_reused"])
+        self.assertIsNot(session.model, model)
+
+class TestSessionEdits(unittest.TestCase):
+    def assert_patched(self, session, model, results, fresh):
+        self.assertTrue(results["session_reused"])
+        self.assertIs(session.model, model)
+        self.assertEqual(results["status"], "optimal")
+        self.assertAlmostEqual(results["objective"], fresh["objective"], places=4)
+
+    def test_supply_edit_patches_model(self):
+        for options in ({}, dict(toggle_min_max_capacity=True, input_min_freight=5, input_max_freight=40, input_allocation_days=10)):
+            with self.subTest(options=options):
+                session = ScenarioSession()
+                session.run(*make_tables(), **options)
+                model = session.model
+
+                # Goiânia ships more Soja: same routes, new supply
+                tables = make_tables(weights=(140.0, 50.0, 80.0))
+                _, results = session.run(*tables, **options)
+                _, fresh = run_optimization_model(*tables, **options)
+                self.assert_patched(session, model, results, fresh)
+
+    def test_route_toggle_patches_model(self):
+        # With the MILP limits: the LP merges Soja and Milho while they are interchangeable
+        options = dict(toggle_min_max_capacity=True, input_min_freight=5, input_max_freight=40, input_allocation_days=10)
+        session = ScenarioSession()
+        session.run(*make_tables(), **options)
+        model = session.model
+
+        # Milho no longer fits the bulk warehouses, then fits again
+        for compat in (("☑", "☐"), ("☑", "☑")):
+            tables = make_tables(compat=compat)
+            _, results = session.run(*tables, **options)
+            _, fresh = run_optimization_model(*tables, **options)
+            self.assert_patched(session, model, results, fresh)
+
+    def test_large_edit_rebuilds(self):
+        session = ScenarioSession()
+        session.run(*make_tables())
+        model = session.model
+
+        # No product fits the warehouses: every route would be fixed
+        _, results = session.run(*make_tables(compat=("☐", "☐")))
+        self.assertFalse(results["session_reused"])
+        self.assertIsNot(session.model, model)
+
+class TestSessionRegistry(unittest.TestCase):
+    def test_least_recently_used_session_is_dropped(self):
+        registry = SessionRegistry(max_sessions=2)
+        first = registry._get("a")
+        registry._get("b")
+        self.assertIs(registry._get("a"), first)
+        registry._get("c")
+
+        self.assertEqual(len(registry), 2)
+        self.assertIs(registry._get("a"), first)
+        self.assertNotIn("b", registry._sessions)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.logic.optimization import run_optimization_model
+from src.logic.scenario_sweep import expand_grid, sweep_grid_from_inputs, grid_scenarios, run_sweep
+from test_scenario_session import make_tables
+
+class TestSweepGrid(unittest.TestCase):
+    def test_expand_grid(self):
+        scenarios = expand_grid({"toggle_pareto": [False, True], "input_allocation_days": [10.0, 20.0]})
+        self.assertEqual(len(scenarios), 4)
+        self.assertEqual(scenarios[1], {"toggle_pareto": False, "input_allocation_days": 20.0})
+
+    def test_grid_from_inputs(self):
+        grid = sweep_grid_from_inputs([True], "10; 20", "20-40; -30", "0,9; 1.1")
+        self.assertEqual(grid["input_allocation_days"], [10.0, 20.0])
+        self.assertEqual(grid["storage_factor"], [0.9, 1.1])
+
+        scenarios = grid_scenarios(grid)
+        self.assertEqual(len(scenarios), 8)
+        self.assertTrue(all(s["toggle_min_max_capacity"] for s in scenarios))
+        self.assertEqual((scenarios[1]["input_min_freight"], scenarios[1]["input_max_freight"]), (20.0, 40.0))
+        self.assertEqual((scenarios[2]["input_min_freight"], scenarios[2]["input_max_freight"]), (None, 30.0))
+
+        self.assertEqual(sweep_grid_from_inputs([], "", None, " "), {})
+        with self.assertRaises(ValueError):
+            sweep_grid_from_inputs(None, "dez", None, None)
+
+class TestRunSweep(unittest.TestCase):
+    def test_matches_single_runs(self):
+        scenarios = [{}, {"toggle_min_max_capacity": True, "input_max_freight": 30}, {"storage_factor": 2.0}]
+        runs, table = run_sweep(*make_tables(), scenarios, processes=2)
+
+        self.assertEqual(len(runs), 3)
+        self.assertEqual(list(table["Cenário"]), [1, 2, 3])
+        for (_, results), options in zip(runs[:2], scenarios[:2]):
+            _, single = run_optimization_model(*make_tables(), **options)
+            self.assertAlmostEqual(results["objective"], single["objective"], places=4)
+
+        # Doubled storage tariffs cost more, and the cheapest scenario is the reference of the comparison
+        self.assertGreater(runs[2][1]["objective"], runs[0][1]["objective"])
+        self.assertAlmostEqual(table.loc[0, "Diferença para o Melhor (%)"], 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
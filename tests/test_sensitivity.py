@@ -0,0 +1,98 @@
+import io
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.logic.sensitivity import transport_duals, cost_ranging
+from src.logic.optimization import (_solve_lp_component, _report_sensitivity, new_results_dict, normalize_solver_settings,
+                                    run_optimization_model)
+from src.logic.run_log import RunLog
+from tests.test_scenario_session import make_tables
+
+# D1 is the cheap warehouse for A but takes only 40 t; the rest of A goes to D2, which has room left
+ROUTES = [("A", "D1", "Soja"), ("A", "D2", "Soja"), ("B", "D2", "Soja"), ("B", "D1", "Soja")]
+SUPPLY = {("A", "Soja"): 70.0, ("B", "Soja"): 50.0}
+CAPACITY = {"D1": 40.0, "D2": 100.0}
+COST = [2.0, 6.0, 1.0, 9.0]
+
+class TestTransportDuals(unittest.TestCase):
+    def test_optimal_allocation(self):
+        flow = [40.0, 30.0, 50.0, 0.0]
+        duals = transport_duals(ROUTES, SUPPLY, CAPACITY, COST, flow, {}, {}, 1e4, 1e5)
+
+        self.assertAlmostEqual(duals["supply"][("A", "Soja")], 6.0)
+        self.assertAlmostEqual(duals["supply"][("B", "Soja")], 1.0)
+        # One more ton in D1 saves the 4 R$/t between the two warehouses of A; D2 has room left
+        self.assertAlmostEqual(duals["capacity"]["D1"], -4.0)
+        self.assertAlmostEqual(duals["capacity"]["D2"], 0.0)
+        np.testing.assert_allclose(duals["reduced_cost"], [0.0, 0.0, 0.0, 12.0], atol=1e-9)
+
+        # Strong duality: the dual objective is the cost of the allocation
+        dual_objective = sum(SUPPLY[k] * u for k, u in duals["supply"].items()) + \
+            sum(CAPACITY[d] * v for d, v in duals["capacity"].items())
+        self.assertAlmostEqual(dual_objective, float(np.dot(COST, flow)))
+
+        lower = cost_ranging(COST, flow, duals["reduced_cost"])
+        self.assertTrue(np.isnan(lower[:3]).all())
+        self.assertAlmostEqual(lower[3], -3.0)
+
+    def test_artificial_capacity(self):
+        # 120 t for 100 t of capacity: the 20 t of artificial capacity go where A ships cheaper
+        capacity = {"D1": 40.0, "D2": 60.0}
+        flow = [60.0, 10.0, 50.0, 0.0]
+        duals = transport_duals(ROUTES, SUPPLY, capacity, COST, flow, {"D1": 20.0}, {}, 1e4, 1e5)
+        # An extra ton in D1 replaces a ton of artificial capacity; one in D2 too, but A pays 4 R$/t more to reach it
+        self.assertAlmostEqual(duals["capacity"]["D1"], -1e4)
+        self.assertAlmostEqual(duals["capacity"]["D2"], -1e4 + 4.0)
+
+        # Artificial capacity in D2 instead is not optimal
+        self.assertIsNone(transport_duals(ROUTES, SUPPLY, capacity, COST, [40.0, 30.0, 50.0, 0.0], {"D2": 20.0}, {}, 1e4, 1e5))
+
+    def test_suboptimal_allocation(self):
+        # Moving 40 t of A from D2 to D1 would save money: there are no duals for this flow
+        flow = [0.0, 70.0, 30.0, 20.0]
+        self.assertIsNone(transport_duals(ROUTES, SUPPLY, CAPACITY, COST, flow, {}, {}, 1e4, 1e5))
+
+class TestSensitivityReport(unittest.TestCase):
+    def test_report_of_lp_backends(self):
+        inputs = dict(
+            origins_list=["A", "B"], destinations_list=["D1", "D2"], all_products=["Soja"],
+            valid_routes=ROUTES, supply=SUPPLY, demand_total_capacity=CAPACITY, demand_initial_inventory={},
+            distance={("A", "D1"): 10.0, ("A", "D2"): 30.0, ("B", "D2"): 5.0, ("B", "D1"): 45.0},
+            freight_cost={"A": 0.2, "B": 0.2}, avg_freight=0.2, storage_cost={("D1", "Soja"): 0.0, ("D2", "Soja"): 0.0},
+            big_m_cap=1e4, big_m_unalloc=1e5
+        )
+        for backend in ("network", "sparse"):
+            with self.subTest(backend=backend):
+                log = RunLog(io.StringIO())
+                solution = _solve_lp_component(inputs, normalize_solver_settings(), log, backend=backend)
+                results = new_results_dict()
+                _report_sensitivity(results, solution, inputs, log, {"D1": "Armazém 1"}, normalize_solver_settings())
+
+                capacity = results["sensitivity"]["capacity"]
+                self.assertEqual(capacity[0]["Armazém"], "Armazém 1")
+                self.assertAlmostEqual(capacity[0]["Valor Marginal (R$/ton)"], 4.0, places=6)
+                self.assertAlmostEqual(capacity[0]["Recebido (ton)"], 40.0, places=6)
+                self.assertEqual([row["Destino"] for row in results["sensitivity"]["routes"]], ["Armazém 1"])
+                self.assertAlmostEqual(results["sensitivity"]["routes"][0]["Custo Limite (R$/ton)"], -3.0, places=6)
+
+    def test_runs_with_sensitivity(self):
+        # Linear logistics limits are solved as the LP, which has the duals of the LP runs
+        _, results = run_optimization_model(*make_tables(), toggle_min_max_capacity=True, input_allocation_days=1, input_max_freight=30)
+        self.assertEqual((results["model_class"], results["status"]), ("lp", "optimal"))
+        self.assertIsNotNone(results["sensitivity"])
+
+        # The lexicographic phases do not minimize the Big M objective the duals are priced against
+        for options in ({}, dict(toggle_min_max_capacity=True, input_allocation_days=1, input_max_freight=30)):
+            with self.subTest(**options):
+                _, results = run_optimization_model(*make_tables(), solver_settings={"objective": "lexicographic"}, **options)
+                self.assertEqual(results["status"], "optimal")
+                self.assertIsNone(results["sensitivity"])
+
+if __name__ == '__main__':
+    unittest.main()
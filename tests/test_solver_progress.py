@@ -0,0 +1,133 @@
+import io
+from contextlib import redirect_stdout
+import shutil
+import unittest
+import sys
+import os
+
+import pyomo.environ as pyo
+from pyomo.opt import SolverFactory
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.logic.optimization import run_optimization_model, _solve_with_log, _SolverStream
+from src.logic.run_log import RunLog, open_run_log, log_path
+from src.logic.solver_progress import SolverProgress, ProgressMonitor, PHASE_TREE, PHASE_DONE, PHASE_ROOT
+from tests.test_scenario_session import make_tables
+
+class TestSolverProgress(unittest.TestCase):
+    def feed(self, progress, text):
+        for line in text.strip("\n").splitlines():
+            progress.feed(line)
+
+    def test_classic_node_log(self):
+        progress = SolverProgress()
+        self.feed(progress, """
+Solver command line: ['cbc', '-solve']
+Cbc0012I Integer solution of 1250.5 found by DiveCoefficient after 40 iterations and 0 nodes (0.20 seconds)
+Cbc0010I After 0 nodes, 1 on tree, 1250.5 best solution, best possible 1100 (0.31 seconds)
+Cbc0010I After 100 nodes, 12 on tree, 1200 best solution, best possible 1180 (2.10 seconds)
+""")
+        self.assertEqual(progress.phase, PHASE_TREE)
+        self.assertEqual(progress.nodes, 100)
+        self.assertEqual(progress.incumbent, 1200)
+        self.assertEqual(progress.bound, 1180)
+        self.assertAlmostEqual(progress.gap, 20 / 1200 * 100)
+
+    def test_root_without_solution(self):
+        progress = SolverProgress()
+        self.feed(progress, """
+▶ Cut generation (root node)
+  Pass     Rows    Tight   Frac     Suminf        Objective  Time(s)
+     1   128244        0    273      50.88      4.67878e+10     3.30
+     2   128554      310    177         25      4.69488e+10     6.70
+""")
+        self.assertEqual(progress.phase, PHASE_ROOT)
+        self.assertIsNone(progress.incumbent)
+        self.assertEqual(progress.bound, 4.69488e+10)
+        self.assertIsNone(progress.gap)
+
+    def test_summary_and_new_solve_reset(self):
+        progress = SolverProgress()
+        self.feed(progress, """
+✔ Optimal — Obj: 2.79706e+08   Bound: 2.79706e+08   Gap: 0.00%   Nodes: 0   Iters: 1237   Time: 11.1s
+Result - Optimal solution found
+""")
+        self.assertEqual(progress.phase, PHASE_DONE)
+        self.assertEqual(progress.gap, 0.0)
+
+        self.assertTrue(progress.feed("Solver command line: ['cbc']"))
+        self.assertIsNone(progress.incumbent)
+
+    def test_heuristic_preview(self):
+        progress = SolverProgress()
+        self.assertTrue(progress.feed("Prévia heurística: R$ 114,325,744.76 (71 rotas ativas, 48 melhorias locais, 3 ms)"))
+        self.assertEqual(progress.preview, 114325744.76)
+
+        # The preview is kept when the solver starts, in either language of the log
+        progress.feed("Solver command line: ['cbc']")
+        progress.feed("Heuristic preview: R$ 1,250.50 (3 active routes, 0 local improvements, 1 ms)")
+        self.assertEqual(progress.as_dict()["preview"], 1250.5)
+
+class TestSolverStream(unittest.TestCase):
+    def test_lines_split_across_writes(self):
+        log = RunLog(io.StringIO())
+        progress = SolverProgress()
+        stream = _SolverStream(log, progress)
+        stream.write("Result - Optimal ")
+        self.assertEqual(log.stream.getvalue(), "")
+        stream.write("solution found\nCoin0505I Presolved")
+        self.assertEqual(log.stream.getvalue(), "Result - Optimal solution found\n")
+        self.assertEqual(progress.phase, PHASE_DONE)
+
+        # The last line without a newline is written on close
+        stream.close()
+        self.assertTrue(log.stream.getvalue().endswith("Coin0505I Presolved\n"))
+
+    @unittest.skipIf(shutil.which("cbc") is None, "CBC not installed")
+    def test_solve_streams_into_log(self):
+        model = pyo.ConcreteModel()
+        model.x = pyo.Var(within=pyo.NonNegativeIntegers, bounds=(0, 10))
+        model.y = pyo.Var(within=pyo.NonNegativeReals)
+        model.c = pyo.Constraint(expr=2 * model.x + model.y >= 7.5)
+        model.obj = pyo.Objective(expr=3 * model.x + 2 * model.y)
+
+        log = RunLog(io.StringIO())
+        # The output comes from the pipe of the solver, not from sys.stdout
+        with redirect_stdout(io.StringIO()) as stdout:
+            results, progress = _solve_with_log(SolverFactory('cbc'), model, log)
+
+        self.assertEqual(stdout.getvalue(), "")
+        self.assertEqual(len(model.solutions.symbol_map), 0)
+        self.assertEqual(results.solver.termination_condition, pyo.TerminationCondition.optimal)
+        self.assertIn("Result - Optimal solution found", log.stream.getvalue())
+        self.assertEqual(progress.phase, PHASE_DONE)
+        self.assertAlmostEqual(progress.incumbent, pyo.value(model.obj))
+        self.assertTrue(all(log.timings[phase] >= 0 for phase in ("lp_write", "solver", "solution_load")))
+        self.assertAlmostEqual(pyo.value(model.obj), 12.0)
+
+        # Started from its solution, with the objective cut off above it, the search keeps it
+        solver = SolverFactory('cbc')
+        solver.options["cutoff"] = pyo.value(model.obj) + 1e-6
+        results, _ = _solve_with_log(solver, model, RunLog(io.StringIO()), warmstart=True)
+        self.assertEqual(results.solver.termination_condition, pyo.TerminationCondition.optimal)
+        self.assertAlmostEqual(pyo.value(model.obj), 12.0)
+
+class TestProgressMonitor(unittest.TestCase):
+    def test_follows_run_log(self):
+        log_filename, log_file = open_run_log('optimization_log_test_')
+        log_file.close()
+
+        reports = []
+        with ProgressMonitor(log_path(log_filename), reports.append, interval=0.05) as monitor:
+            used_log, results = run_optimization_model(*make_tables(), toggle_pareto=True, log_filename=log_filename)
+        monitor.poll()
+
+        self.assertEqual(used_log, log_filename)
+        self.assertEqual(monitor.progress.phase, PHASE_DONE)
+        self.assertAlmostEqual(monitor.progress.incumbent, results["objective"], places=2)
+        self.assertTrue(all("elapsed" in report for report in reports))
+
+if __name__ == '__main__':
+    unittest.main()
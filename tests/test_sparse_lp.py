@@ -0,0 +1,76 @@
+import unittest
+import sys
+import os
+import tempfile
+
+import numpy as np
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.logic.sparse_lp import build_transport_lp, write_lp_file, read_cbc_solution, read_cbc_duals, ROW_EQ, ROW_LE
+
+class TestSparseLP(unittest.TestCase):
+    def setUp(self):
+        self.valid_routes = [("A", "D1", "Soja"), ("A", "D2", "Soja"), ("B", "D1", "Milho")]
+        self.supply = {("A", "Soja"): 10.0, ("B", "Milho"): 5.0, ("B", "Soja"): 0.0}
+        self.capacity = {"D1": 8.0, "D2": 20.0}
+        self.problem = build_transport_lp(self.valid_routes, self.supply, self.capacity, [1.0, 2.0, 3.0], 1000.0, 10000.0)
+
+    def test_dimensions(self):
+        # 3 flows + 2 dummy capacities + 2 dummy unallocated (pairs with positive supply only)
+        self.assertEqual(self.problem["n_cols"], 7)
+        self.assertEqual(self.problem["n_rows"], 4)
+        self.assertEqual(self.problem["supply_keys"], [("A", "Soja"), ("B", "Milho")])
+        self.assertEqual(self.problem["dest_keys"], ["D1", "D2"])
+        np.testing.assert_array_equal(self.problem["sense"], [ROW_EQ, ROW_EQ, ROW_LE, ROW_LE])
+        np.testing.assert_array_equal(self.problem["rhs"], [10.0, 5.0, 8.0, 20.0])
+        np.testing.assert_array_equal(self.problem["c"], [1.0, 2.0, 3.0, 1000.0, 1000.0, 10000.0, 10000.0])
+
+    def test_csr_rows(self):
+        indptr, indices, data = self.problem["indptr"], self.problem["indices"], self.problem["data"]
+        rows = [dict(zip(indices[indptr[i]:indptr[i + 1]].tolist(), data[indptr[i]:indptr[i + 1]].tolist())) for i in range(4)]
+
+        # Supply rows: flows of the pair plus its unallocated dummy
+        self.assertEqual(rows[0], {0: 1.0, 1: 1.0, 5: 1.0})
+        self.assertEqual(rows[1], {2: 1.0, 6: 1.0})
+        # Capacity rows: flows arriving at the destination minus its capacity dummy
+        self.assertEqual(rows[2], {0: 1.0, 2: 1.0, 3: -1.0})
+        self.assertEqual(rows[3], {1: 1.0, 4: -1.0})
+
+    def test_write_and_read_roundtrip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            lp_path = os.path.join(tmp, "model.lp")
+            write_lp_file(lp_path, self.problem)
+            with open(lp_path) as f:
+                content = f.read()
+            self.assertIn("Minimize", content)
+            self.assertIn(" r0: + 1 x0 + 1 x1 + 1 x5", content)
+            self.assertIn("<= 8", content)
+
+            sol_path = os.path.join(tmp, "model.sol")
+            with open(sol_path, "w") as f:
+                f.write("Optimal - objective value 31.00000000\n")
+                f.write("      0 x0                      8                       0\n")
+                f.write("      1 x1                      2                       0\n")
+                f.write("      2 x2                      5                       0\n")
+            status, objective, x = read_cbc_solution(sol_path, self.problem["n_cols"])
+            self.assertEqual(status, "Optimal")
+            self.assertAlmostEqual(objective, 31.0)
+            np.testing.assert_array_equal(x, [8.0, 2.0, 5.0, 0.0, 0.0, 0.0, 0.0])
+
+    def test_read_duals(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sol_path = os.path.join(tmp, "model.sol")
+            with open(sol_path, "w") as f:
+                f.write("Optimal - objective value 31.00000000\n")
+                f.write("      0 r0                     10                       2\n")
+                f.write("      3 r3                      2             -1.50000001\n")
+                f.write("      0 x0                      8                       0\n")
+            np.testing.assert_array_equal(read_cbc_duals(sol_path, 4), [2.0, 0.0, 0.0, -1.50000001])
+            # Rows are not mistaken for columns
+            _, _, x = read_cbc_solution(sol_path, self.problem["n_cols"])
+            self.assertEqual(x.tolist(), [8.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 import unittest
 from src.view.pages.model_config import get_tab_model_config_layout
+from src.view.view import update_results_kpis_and_table
 import dash
 
 class TestUI(unittest.TestCase):
@@ -8,5 +9,30 @@ class TestUI(unittest.TestCase):
         layout = get_tab_model_config_layout()
         self.assertIsNotNone(layout)
 
+    def test_not_proven_alert_names_its_cause(self):
+        base = {"status": "feasible", "objective": 10.0, "routes": [], "warnings": {},
+                "kpis": {"best_bound": 8.0, "mip_gap": 20.0}}
+        cases = [
+            (dict(base, heuristic=True), "Heuristic Preview"),
+            (dict(base, kpis={"coarsening_bound": 9.9, "coarsening_gap": 1.0}), "Coarsened and Refined Model"),
+            (dict(base, model_stats={"kernel_routes": 5, "kernel_search": "complete", "kernel_restricted_bound": 9.5}),
+             "Kernel Search Complete"),
+            (dict(base, model_stats={"kernel_routes": 5, "kernel_search": "time_budget"}), "Kernel Search Stopped"),
+            (dict(base, model_stats={"generated_routes": 12}), "Column Generation Stopped"),
+            (base, "Feasible Solution"),
+        ]
+        for results, title in cases:
+            with self.subTest(title=title):
+                alerts = update_results_kpis_and_table(results, 'en')[7]
+                self.assertTrue(alerts[0].children[0].children[1].startswith(title))
+                # Only the searches stopped by their limit mention the time limit
+                text = alerts[0].children[1].children
+                self.assertEqual("time limit" in text, title in ("Feasible Solution", "Kernel Search Stopped"))
+
+        # The kernel search bound is the LP relaxation; the one of its last restricted MILP is listed apart
+        details = update_results_kpis_and_table(cases[2][0], 'en')[7][0].children[2].children
+        self.assertTrue(details[0].children.startswith("Lower bound (LP relaxation): R$ 8,00"))
+        self.assertIn("last restricted MILP", details[1].children)
+
 if __name__ == '__main__':
     unittest.main()